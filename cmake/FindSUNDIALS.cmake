@@ -58,6 +58,11 @@ list(APPEND SUNDIALS_LIBRARY_NAMES
     sundials_sunlinsolspgmr
     sundials_sunmatrixdense
     sundials_sunmatrixsparse
+    sundials_sunlinsolband
+    sundials_sunmatrixband
+    sundials_sunlinsolspfgmr
+    sundials_sunlinsolspbcgs
+    sundials_sunlinsolsptfqmr
 )
 
 # For SUNDIALS >= 7.0
@@ -70,6 +75,11 @@ list(APPEND SUNDIALS_LIBRARY_NAMES
     sundials_sunlinsolsuperlumt
 )
 
+# For SUNDIALS with KLU support
+list(APPEND SUNDIALS_LIBRARY_NAMES
+    sundials_sunlinsolklu
+)
+
 set(SUNDIALS_LIBRARIES)
 foreach(lib_name ${SUNDIALS_LIBRARY_NAMES})
     find_library(SUNDIALS_${lib_name}_LIBRARY
@@ -108,6 +118,14 @@ if(SUNDIALS_INCLUDE_DIR)
         set(SUNDIALS_WITH_SUPERLU FALSE)
     endif()
     
+    # Check for KLU support
+    string(FIND "${SUNDIALS_CONFIG_H}" "SUNDIALS_KLU" SUNDIALS_HAS_KLU)
+    if(NOT SUNDIALS_HAS_KLU EQUAL -1)
+        set(SUNDIALS_WITH_KLU TRUE)
+    else()
+        set(SUNDIALS_WITH_KLU FALSE)
+    endif()
+    
     # Check for vector size configuration
     string(FIND "${SUNDIALS_CONFIG_H}" "SUNDIALS_INT32_T" SUNDIALS_HAS_INT32)
     string(FIND "${SUNDIALS_CONFIG_H}" "SUNDIALS_INT64_T" SUNDIALS_HAS_INT64)
@@ -121,6 +139,24 @@ endif()
 # Set up variables
 set(SUNDIALS_INCLUDE_DIRS ${SUNDIALS_INCLUDE_DIR})
 
+# KLU (SuiteSparse) headers and libraries, required when SUNDIALS uses KLU
+if(SUNDIALS_WITH_KLU)
+    find_path(KLU_INCLUDE_DIR NAMES klu.h PATH_SUFFIXES suitesparse)
+    set(KLU_LIBRARIES)
+    foreach(lib_name klu amd colamd btf suitesparseconfig)
+        find_library(KLU_${lib_name}_LIBRARY NAMES ${lib_name})
+        if(KLU_${lib_name}_LIBRARY)
+            list(APPEND KLU_LIBRARIES ${KLU_${lib_name}_LIBRARY})
+        endif()
+    endforeach()
+    if(KLU_INCLUDE_DIR)
+        list(APPEND SUNDIALS_INCLUDE_DIRS ${KLU_INCLUDE_DIR})
+        list(APPEND SUNDIALS_LIBRARIES ${KLU_LIBRARIES})
+    else()
+        set(SUNDIALS_WITH_KLU FALSE)
+    endif()
+endif()
+
 include(FindPackageHandleStandardArgs)
 find_package_handle_standard_args(SUNDIALS
     REQUIRED_VARS SUNDIALS_INCLUDE_DIR SUNDIALS_LIBRARIES
@@ -132,6 +168,9 @@ if(SUNDIALS_FOUND)
     if(SUNDIALS_WITH_SUPERLU)
         message(STATUS "SUNDIALS compiled with SuperLU support")
     endif()
+    if(SUNDIALS_WITH_KLU)
+        message(STATUS "SUNDIALS compiled with KLU support")
+    endif()
     if(SUNDIALS_INDEX_SIZE)
         message(STATUS "SUNDIALS index size: ${SUNDIALS_INDEX_SIZE} bit")
     endif()
@@ -142,5 +181,6 @@ mark_as_advanced(
     SUNDIALS_LIBRARY_DIR
     SUNDIALS_VERSION
     SUNDIALS_WITH_SUPERLU
+    SUNDIALS_WITH_KLU
     SUNDIALS_INDEX_SIZE
 ) 
\ No newline at end of file
@@ -68,7 +68,7 @@ def remove_prefix(name, prefix):
 
 parser = argparse.ArgumentParser(description='Assimulo setup script.')
 parser.register('type','bool',str2bool)
-package_arguments=['plugins','sundials','blas','superlu','lapack','mkl']
+package_arguments=['plugins','sundials','blas','superlu','klu','lapack','mkl']
 package_arguments.sort()
 for pg in package_arguments:
     parser.add_argument("--{}-home".format(pg), 
@@ -89,6 +89,7 @@ parser.add_argument("--extra-fortran-link-flags", help='Extra Fortran link flags
 parser.add_argument("--extra-fortran-link-files", help='Extra Fortran link files (a list enclosed in " ")', default='')
 parser.add_argument("--extra-fortran-compile-flags", help='Extra Fortran compile flags (a list enclosed in " ")', default='--std=legacy')
 parser.add_argument("--version", help='Package version number', default='Default')
+parser.add_argument("--radau5-lapack", type='bool', help="set to false to compile Radau5 without the LAPACK (SciPy) dense LU",default=True)
                                        
 args = parser.parse_known_args()
 version_number_arg = args[0].version
@@ -138,6 +139,7 @@ class Assimulo_prepare(object):
             self.prefix = args[0].prefix.replace('/',os.sep)   # required in this way for cygwin etc.
             self.distutil_args.append('--prefix={}'.format(self.prefix))
         self.SLUdir = args[0].superlu_home
+        self.KLUdir = args[0].klu_home
         self.BLASdir = args[0].blas_home 
         self.sundialsdir = args[0].sundials_home
         self.MKLdir = args[0].mkl_home
@@ -161,6 +163,7 @@ class Assimulo_prepare(object):
         self.extra_fortran_link_files = args[0].extra_fortran_link_files.split()
         self.thirdparty_methods  = thirdparty_methods
         self.with_openmp = args[0].with_openmp
+        self.radau5_lapack = args[0].radau5_lapack
         self.sundials_with_msvc = False
         self.msvcSLU = False
 
@@ -202,9 +205,11 @@ class Assimulo_prepare(object):
         # check packages
         self.check_BLAS()
         self.check_SuperLU()
+        self.check_KLU()
         self.check_SUNDIALS()
         self.check_LAPACK()
         self.check_MKL()
+        self.check_radau5_LAPACK()
         
     def _set_directories(self):
         # directory paths
@@ -378,6 +383,28 @@ class Assimulo_prepare(object):
             logging.debug("Note: the path required is to the folder where the folders 'SRC' and 'lib' are found.")
             self.with_SLU = False
     
+    def check_KLU(self):
+        """
+        Check if KLU (SuiteSparse) installed
+        """
+        self.with_KLU = False
+        candidates = [self.KLUdir] if self.KLUdir != "" else [os.path.sep + os.path.join('usr', 'local'), os.path.sep + 'usr']
+        for directory in candidates:
+            for incdir in [os.path.join(directory, 'include'), os.path.join(directory, 'include', 'suitesparse')]:
+                if os.path.exists(os.path.join(incdir, 'klu.h')):
+                    self.with_KLU = True
+                    self.KLUincdir = incdir
+                    self.KLUlibdir = os.path.join(directory, 'lib')
+                    logging.debug("KLU found in {} and {}: ".format(self.KLUincdir, self.KLUlibdir))
+                    return
+        if self.KLUdir != "":
+            logging.warning("Could not find KLU, disabling support. View more information using --log=DEBUG")
+            logging.debug("Could not find klu.h at the given path {}.".format(self.KLUdir))
+        else:
+            logging.debug("No path to KLU supplied and KLU not found in the default locations.")
+        logging.debug("usage: --klu-home=path")
+        logging.debug("SUNDIALS will not be compiled with support for KLU.")
+    
     def check_SUNDIALS(self):
         """
         Check if Sundials installed
@@ -388,6 +415,7 @@ class Assimulo_prepare(object):
             sundials_version = None
             sundials_vector_type_size = None
             sundials_with_superlu = False
+            sundials_with_klu = False
             sundials_with_msvc = False
             sundials_cvode_with_rtol_vec = False
             try:
@@ -417,6 +445,12 @@ class Assimulo_prepare(object):
                                 sundials_with_superlu = True
                                 logging.debug('SUNDIALS found to be compiled with support for SuperLU.')
                                 break
+                    with open(os.path.join(os.path.join(self.incdirs,'sundials'), 'sundials_config.h')) as f:
+                        for line in f:
+                            if "SUNDIALS_KLU" in line and line.startswith("#define"): #Sundials compiled with support for KLU
+                                sundials_with_klu = True
+                                logging.debug('SUNDIALS found to be compiled with support for KLU.')
+                                break
                     with open(os.path.join(os.path.join(self.incdirs,'sundials'), 'sundials_config.h')) as f:
                         for line in f:
                             if "SUNDIALS_CVODE_RTOL_VEC" in line and line.startswith("#define"): #Sundials with CVode support for rtol vectors
@@ -436,6 +470,7 @@ class Assimulo_prepare(object):
             self.SUNDIALS_version = sundials_version
             self.SUNDIALS_vector_size = sundials_vector_type_size
             self.sundials_with_superlu = sundials_with_superlu
+            self.sundials_with_klu = sundials_with_klu
             self.sundials_with_msvc = sundials_with_msvc
             self.sundials_cvode_with_rtol_vec = sundials_cvode_with_rtol_vec
             if not self.sundials_with_superlu:
@@ -472,6 +507,21 @@ class Assimulo_prepare(object):
             logging.debug("Note: the path required is to where the static library lib is found")
             self.with_LAPACK = False
             
+    def check_radau5_LAPACK(self):
+        """
+        Check if the LAPACK of SciPy (scipy.linalg.cython_lapack) is available for Radau5
+        """
+        self.with_radau5_LAPACK = False
+        if not self.radau5_lapack:
+            logging.debug("Radau5 will not be compiled with support for LAPACK.")
+            return
+        try:
+            import scipy.linalg.cython_lapack
+            self.with_radau5_LAPACK = True
+            logging.debug("Radau5 compiled with the LAPACK of SciPy found in {}".format(os.path.dirname(scipy.linalg.cython_lapack.__file__)))
+        except ImportError:
+            logging.warning("Could not import scipy.linalg.cython_lapack, Radau5 will not be compiled with support for LAPACK.")
+
     def cython_extensionlists(self):
         extra_link_flags = self.static_link_gcc + self.flag_32bit
         
@@ -502,6 +552,7 @@ class Assimulo_prepare(object):
         if self.with_SUNDIALS:
             compile_time_env = {'SUNDIALS_VERSION': self.SUNDIALS_version,
                                 'SUNDIALS_WITH_SUPERLU': self.sundials_with_superlu and self.with_SLU,
+                                'SUNDIALS_WITH_KLU': self.sundials_with_klu and self.with_KLU and self.SUNDIALS_version >= (3,0,0),
                                 'SUNDIALS_VECTOR_SIZE': self.SUNDIALS_vector_size,
                                 'SUNDIALS_CVODE_RTOL_VEC': self.sundials_cvode_with_rtol_vec}
             #CVode and IDA
@@ -514,7 +565,9 @@ class Assimulo_prepare(object):
             ext_list[-1].library_dirs = [self.libdirs]
             
             if self.SUNDIALS_version >= (3,0,0):
-                ext_list[-1].libraries = ["sundials_cvodes", "sundials_nvecserial", "sundials_idas", "sundials_sunlinsoldense", "sundials_sunlinsolspgmr", "sundials_sunmatrixdense", "sundials_sunmatrixsparse"]
+                ext_list[-1].libraries = ["sundials_cvodes", "sundials_nvecserial", "sundials_idas", "sundials_sunlinsoldense", "sundials_sunlinsolspgmr", "sundials_sunmatrixdense", "sundials_sunmatrixsparse",
+                                           "sundials_sunlinsolband", "sundials_sunmatrixband", "sundials_sunlinsolspfgmr", "sundials_sunlinsolspbcgs",
+                                           "sundials_sunlinsolsptfqmr"]
                 if self.SUNDIALS_version >= (7,0,0):
                     ext_list[-1].libraries.extend(["sundials_core"])
             else:
@@ -526,6 +579,10 @@ class Assimulo_prepare(object):
                 ext_list[-1].include_dirs.append(self.SLUincdir)
                 ext_list[-1].library_dirs.append(self.SLUlibdir)
                 ext_list[-1].libraries.extend(self.superLUFiles)
+            if compile_time_env['SUNDIALS_WITH_KLU']: #If SUNDIALS is compiled with support for KLU
+                ext_list[-1].include_dirs.append(self.KLUincdir)
+                ext_list[-1].library_dirs.append(self.KLUlibdir)
+                ext_list[-1].libraries.extend(["sundials_sunlinsolklu", "klu", "amd", "colamd", "btf", "suitesparseconfig"])
         
             #Kinsol
             ext_list += cythonize(["assimulo"+os.path.sep+"solvers"+os.path.sep+"kinsol.pyx"], 
@@ -543,16 +600,19 @@ class Assimulo_prepare(object):
                 ext_list[-1].include_dirs.append(self.SLUincdir)
                 ext_list[-1].library_dirs.append(self.SLUlibdir)
                 ext_list[-1].libraries.extend(self.superLUFiles)
+            if compile_time_env['SUNDIALS_WITH_KLU']:
+                ext_list[-1].include_dirs.append(self.KLUincdir)
 
         ## Radau5
         ext_list += cythonize([os.path.join("assimulo","thirdparty","radau5","radau5ode.pyx")],
                             include_path=[".", "assimulo", os.path.join("assimulo", "lib")],
+                            compile_time_env={'RADAU5_WITH_LAPACK': self.with_radau5_LAPACK},
                             force = True,
                             compiler_directives={'language_level' : "3str"})
         ext_list[-1].include_dirs = [np.get_include(), "assimulo", os.path.join("assimulo", "lib"),
                                     os.path.join("assimulo","thirdparty","radau5"),
                                     self.incdirs]
-        extra_sources = ["radau5.c", "radau5_io.c"]
+        extra_sources = ["radau5.c", "radau5_io.c", "radau5_linsol.c"]
         if self.with_SLU:
             ext_list[-1].include_dirs += [self.SLUincdir]
             extra_sources += ["superlu_double.c", "superlu_complex.c", "superlu_util.c"]
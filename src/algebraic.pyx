@@ -22,6 +22,7 @@ cimport numpy as np
 from timeit import default_timer as timer
 
 from assimulo.exception import Algebraic_Exception, AssimuloException
+from assimulo.ode import _reconstruct_solver
 from assimulo.problem import Algebraic_Problem
 
 include "constants.pxi" #Includes the constants (textual include)
@@ -74,6 +75,36 @@ cdef class Algebraic:
         self.elapsed_step_time = -1.0
         self.clock_start = -1.0
 
+    def __reduce__(self):
+        """
+        Support for pickling, e.g. for passing a solver to a
+        multiprocessing worker. The solver is recreated without calling
+        __init__ and its problem, options, statistics and current
+        iterate are restored.
+        """
+        return (_reconstruct_solver, (type(self),), self.__getstate__())
+
+    def __getstate__(self):
+        return {"problem": self.problem, "options": self.options, "solver_options": self.solver_options,
+                "problem_info": self.problem_info, "statistics": self.statistics, "y0": self.y0, "y": self.y,
+                "attributes": dict(getattr(self, "__dict__", {}))}
+
+    def __setstate__(self, state):
+        self.problem = state["problem"]
+        self.options = state["options"]
+        self.solver_options = state["solver_options"]
+        self.problem_info = state["problem_info"]
+        self.statistics = state["statistics"]
+        self.y0 = state["y0"]
+        self.y = state["y"]
+
+        if state["attributes"]:
+            self.__dict__.update(state["attributes"])
+
+        #Timer, as after __init__
+        self.elapsed_step_time = -1.0
+        self.clock_start = -1.0
+
     cdef _reset_solution_variables(self):
         pass
     
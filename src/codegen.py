@@ -0,0 +1,461 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import re
+import sys
+import ctypes
+import shutil
+import weakref
+import tempfile
+import subprocess
+import numpy as np
+import scipy.sparse as sps
+
+from assimulo.exception import Codegen_Exception, AssimuloException, AssimuloRecoverableError
+from assimulo.problem import Explicit_Problem, Implicit_Problem
+from assimulo.support import LowLevelCallback
+
+try:
+    import sympy
+except ImportError:
+    sympy = None
+
+_HEADER = """/* Generated by assimulo.codegen from the symbolic model '{name}'. */
+#include <math.h>
+#include <string.h>
+
+#ifdef _WIN32
+#define ASSIMULO_EXPORT __declspec(dllexport)
+#else
+#define ASSIMULO_EXPORT
+#endif
+"""
+
+class SymbolicModel(object):
+    """
+    A model given by symbolic (SymPy) expressions, from which C code for
+    the problem functions is generated and compiled into a shared library
+    with the system C compiler. The compiled functions are loaded as
+    low-level callbacks (see assimulo.support.LowLevelCallback), such that
+    neither the right-hand side nor the Jacobian involves Python.
+
+    Generated are the right-hand side (residual), the analytic Jacobian,
+    both dense and as the values of its fixed sparsity pattern, the state
+    events and, for explicit models with parameters, the right-hand side
+    of the forward sensitivity equations.
+
+    Example::
+
+        y1, y2, mu = sympy.symbols("y1 y2 mu")
+        model = SymbolicModel([y1, y2], [y2, mu*(1 - y1**2)*y2 - y1], parameters = [mu])
+        compiled = model.compile()
+        problem = compiled.problem([2.0, -0.6], p = [5.0])
+    """
+    def __init__(self, states, equations, t = None, parameters = None, state_events = None,
+                 derivatives = None, name = "model"):
+        """
+        Parameters::
+
+            states
+                        - The state variables, a list of SymPy symbols.
+
+            equations
+                        - The right-hand side, dy/dt = equations, or for
+                          implicit models (derivatives given) the residual,
+                          0 = equations. A list of SymPy expressions.
+
+            t
+                        - The time variable, a SymPy symbol.
+                          Default None, the model is autonomous.
+
+            parameters
+                        - The parameters, a list of SymPy symbols. Their
+                          values are given when the model is loaded and can
+                          be changed without recompiling.
+
+            state_events
+                        - The event indicators, a list of SymPy expressions.
+
+            derivatives
+                        - The state derivatives of an implicit model, a list
+                          of SymPy symbols.
+
+            name
+                        - The name of the model, used as prefix of the
+                          generated C functions.
+        """
+        if sympy is None:
+            raise Codegen_Exception("SymPy is required for the generation of compiled problem functions.")
+        if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", name):
+            raise Codegen_Exception("The name of the model must be a valid C identifier, got '%s'."%name)
+
+        self.name = name
+        self.states = list(states)
+        self.equations = [sympy.sympify(eq) for eq in equations]
+        self.t = t
+        self.parameters = list(parameters) if parameters is not None else []
+        self.state_events = [sympy.sympify(ev) for ev in state_events] if state_events is not None else []
+        self.derivatives = list(derivatives) if derivatives is not None else None
+
+        if len(self.equations) != len(self.states):
+            raise Codegen_Exception("The number of equations (%d) must equal the number of states (%d)."%(len(self.equations), len(self.states)))
+        if self.implicit and len(self.derivatives) != len(self.states):
+            raise Codegen_Exception("The number of derivatives (%d) must equal the number of states (%d)."%(len(self.derivatives), len(self.states)))
+
+        #Symbols as they are named in the generated code
+        self._c_symbols = {}
+        for i, y in enumerate(self.states):
+            self._c_symbols[y] = sympy.Symbol("y[%d]"%i)
+        for i, yd in enumerate(self.derivatives or []):
+            self._c_symbols[yd] = sympy.Symbol("yd[%d]"%i)
+        for i, p in enumerate(self.parameters):
+            self._c_symbols[p] = sympy.Symbol("p[%d]"%i)
+        if self.t is not None:
+            self._c_symbols[self.t] = sympy.Symbol("t")
+        #Coefficient of dF/dyd in the implicit Jacobian, a dummy cannot collide with a symbol of the model
+        self._c = sympy.Dummy("c")
+        self._c_symbols[self._c] = sympy.Symbol("c")
+
+        known = set(self._c_symbols)
+        for expr in self.equations + self.state_events:
+            unknown = expr.free_symbols - known
+            if unknown:
+                raise Codegen_Exception("The model contains the unknown symbols %s."%", ".join(sorted(str(s) for s in unknown)))
+
+        equations = sympy.Matrix(self.equations)
+        if self.implicit:
+            self._jac = equations.jacobian(self.states)
+            self._jac_yd = equations.jacobian(self.derivatives)
+        else:
+            self._jac = equations.jacobian(self.states)
+            self._jac_yd = None
+        self._dfdp = equations.jacobian(self.parameters) if self.parameters else None
+        self.jac_pattern = self._pattern()
+
+    @property
+    def implicit(self):
+        """
+        True if the model is implicit, i.e. given by a residual.
+        """
+        return self.derivatives is not None
+
+    @property
+    def dim(self):
+        return len(self.states)
+
+    def _pattern(self):
+        """
+        The structural sparsity pattern of the Jacobian (dF/dy + c*dF/dyd
+        for implicit models) in sorted CSC format.
+        """
+        n = self.dim
+        rows, cols = [], []
+        for j in range(n):
+            for i in range(n):
+                if self._jac[i, j] != 0 or (self._jac_yd is not None and self._jac_yd[i, j] != 0):
+                    rows.append(i)
+                    cols.append(j)
+        pattern = sps.csc_matrix((np.ones(len(rows)), (rows, cols)), shape = (n, n))
+        pattern.sort_indices()
+        return pattern
+
+    def _function(self, signature, outputs, zero = None):
+        """
+        Returns the C code of a function with the given signature, which
+        assigns the expressions of the (target, expression) pairs in
+        outputs after common subexpression elimination. If zero is given,
+        the output array zero[0] of length zero[1] is first set to zero.
+        """
+        targets = [target for target, _ in outputs]
+        expressions = [sympy.sympify(expr).xreplace(self._c_symbols) for _, expr in outputs]
+        replacements, reduced = sympy.cse(expressions, symbols = sympy.numbered_symbols("_x"))
+
+        lines = ["ASSIMULO_EXPORT int %s_%s {"%(self.name, signature)]
+        if self.parameters:
+            lines.append("    const double* p = (const double*)user_data;")
+        for symbol, expr in replacements:
+            lines.append("    const double %s = %s;"%(symbol, sympy.ccode(expr)))
+        if zero is not None:
+            lines.append("    memset(%s, 0, %d*sizeof(double));"%zero)
+        for target, expr in zip(targets, reduced):
+            lines.append("    %s = %s;"%(target, sympy.ccode(expr)))
+        lines.append("    return 0;")
+        lines.append("}")
+        return "\n".join(lines)
+
+    def c_code(self):
+        """
+        Returns the C code of the problem functions, see
+        assimulo.support.LowLevelCallback for their signatures.
+        The parameters are passed as the user data (double array).
+        """
+        n = self.dim
+        code = [_HEADER.format(name = self.name)]
+        pattern = self.jac_pattern
+        entries = [(pattern.indices[k], j) for j in range(n) for k in range(pattern.indptr[j], pattern.indptr[j+1])]
+
+        if self.implicit:
+            c = self._c
+            code.append(self._function("res(double t, const double* y, const double* yd, double* res, void* user_data)",
+                                       [("res[%d]"%i, eq) for i, eq in enumerate(self.equations)]))
+            code.append(self._function("jac(double c, double t, const double* y, const double* yd, double* jac, void* user_data)",
+                                       [("jac[%d]"%(j*n + i), self._jac[i, j] + c*self._jac_yd[i, j]) for i, j in entries],
+                                       zero = ("jac", n*n)))
+            if self.state_events:
+                code.append(self._function("state_events(double t, const double* y, const double* yd, double* gout, void* user_data)",
+                                           [("gout[%d]"%i, ev) for i, ev in enumerate(self.state_events)]))
+        else:
+            code.append(self._function("rhs(double t, const double* y, double* ydot, void* user_data)",
+                                       [("ydot[%d]"%i, eq) for i, eq in enumerate(self.equations)]))
+            code.append(self._function("jac(double t, const double* y, double* jac, void* user_data)",
+                                       [("jac[%d]"%(j*n + i), self._jac[i, j]) for i, j in entries],
+                                       zero = ("jac", n*n)))
+            code.append(self._function("jac_data(double t, const double* y, double* data, void* user_data)",
+                                       [("data[%d]"%k, self._jac[i, j]) for k, (i, j) in enumerate(entries)]))
+            if self.state_events:
+                code.append(self._function("state_events(double t, const double* y, double* gout, void* user_data)",
+                                           [("gout[%d]"%i, ev) for i, ev in enumerate(self.state_events)]))
+            if self.parameters:
+                #Sensitivity right-hand side, sdot = df/dy*s + df/dp with s and sdot stored column-major
+                s = [[sympy.Symbol("s[%d]"%(k*n + j)) for j in range(n)] for k in range(len(self.parameters))]
+                sens = [("sdot[%d]"%(k*n + i), sum((self._jac[i, j]*s[k][j] for j in range(n) if self._jac[i, j] != 0), self._dfdp[i, k]))
+                        for k in range(len(self.parameters)) for i in range(n)]
+                code.append(self._function("sens(double t, const double* y, const double* s, double* sdot, void* user_data)", sens))
+        return "\n\n".join(code) + "\n"
+
+    def compile(self, directory = None, compiler = None, flags = None):
+        """
+        Generates the C code, compiles it into a shared library and loads it.
+
+        Parameters::
+
+            directory
+                        - The directory of the generated source and library.
+                          Default None, a new temporary directory which is
+                          removed together with the returned CompiledModel.
+
+            compiler
+                        - The C compiler. Default is the environment
+                          variable CC, otherwise 'cc'.
+
+            flags
+                        - The list of compiler flags.
+                          Default ['-O2', '-fPIC', '-shared'].
+
+        Returns::
+
+            A CompiledModel.
+        """
+        temporary = directory is None
+        if temporary:
+            directory = tempfile.mkdtemp(prefix = "assimulo_codegen_")
+        if compiler is None:
+            compiler = os.environ.get("CC", "cc")
+        if flags is None:
+            flags = ["-O2", "-fPIC", "-shared"]
+        suffix = ".dll" if sys.platform.startswith("win") else (".dylib" if sys.platform == "darwin" else ".so")
+
+        source = os.path.join(directory, self.name + ".c")
+        library = os.path.join(directory, "lib" + self.name + suffix)
+        try:
+            with open(source, "w") as f:
+                f.write(self.c_code())
+
+            try:
+                result = subprocess.run([compiler] + list(flags) + ["-o", library, source, "-lm"],
+                                        stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines = True)
+            except OSError as e:
+                raise Codegen_Exception("Could not run the C compiler '%s': %s"%(compiler, e))
+            if result.returncode != 0:
+                raise Codegen_Exception("Compilation of the generated code failed:\n%s"%result.stderr)
+
+            compiled = CompiledModel(self, library)
+        except BaseException:
+            if temporary:
+                shutil.rmtree(directory, ignore_errors = True)
+            raise
+
+        if temporary: #The loaded library stays mapped when its file is removed
+            weakref.finalize(compiled, shutil.rmtree, directory, ignore_errors = True)
+        return compiled
+
+class CompiledModel(object):
+    """
+    The compiled problem functions of a SymbolicModel. The parameter
+    values are stored in the array p, which is passed as user data to
+    the compiled functions and may be changed in-place between
+    simulations.
+    """
+    def __init__(self, model, library, p = None):
+        """
+        Parameters::
+
+            model
+                        - The SymbolicModel.
+
+            library
+                        - The path of the compiled shared library.
+
+            p
+                        - The parameter values. Default zeros.
+        """
+        self.model = model
+        self.library = library
+        self._lib = ctypes.CDLL(library)
+        self._p = np.zeros(max(len(model.parameters), 1)) #Never empty, its address is the user data
+        if p is not None:
+            self.p = p
+
+    def _get_p(self):
+        """
+        The parameter values used by the compiled functions.
+        """
+        return self._p[:len(self.model.parameters)]
+
+    def _set_p(self, p):
+        p = np.asarray(p, dtype = float).ravel()
+        if len(p) != len(self.model.parameters):
+            raise Codegen_Exception("The model has %d parameters, got %d values."%(len(self.model.parameters), len(p)))
+        self._p[:len(p)] = p #In-place, the address is used by the low-level callbacks
+
+    p = property(_get_p, _set_p)
+
+    def function(self, kind):
+        """
+        Returns the compiled function (a ctypes function pointer) of the
+        given kind: 'rhs', 'res', 'jac', 'jac_data', 'state_events' or 'sens'.
+        """
+        try:
+            return getattr(self._lib, "%s_%s"%(self.model.name, kind))
+        except AttributeError:
+            raise Codegen_Exception("The model has no compiled '%s' function."%kind)
+
+    def problem(self, y0, t0 = 0.0, yd0 = None, p = None, sparse = False, sensitivities = False, name = None):
+        """
+        Returns an Explicit_Problem (Implicit_Problem for implicit models)
+        with the compiled functions as rhs (res), jac and state_events.
+
+        Parameters::
+
+            y0, t0, yd0
+                        - The initial values.
+
+            p
+                        - The parameter values, stored in-place in self.p.
+
+            sparse
+                        - If True, the Jacobian only evaluates the values of
+                          its sparsity pattern (explicit models), to be used
+                          with the SPARSE linear solvers. Default False.
+
+            sensitivities
+                        - If True, the parameters are sensitivity parameters
+                          (p0) of the problem and rhs_sens is provided
+                          (explicit models). The compiled functions are then
+                          called through thin Python wrappers, as low-level
+                          callbacks do not support sensitivity parameters.
+
+            name
+                        - The name of the problem. Default the model name.
+        """
+        model = self.model
+        if p is not None:
+            self.p = p
+        if name is None:
+            name = model.name
+
+        if model.implicit:
+            if sparse or sensitivities:
+                raise Codegen_Exception("Sparse Jacobians and sensitivities are only supported for explicit models.")
+            problem = Implicit_Problem(LowLevelCallback(self.function("res"), user_data = self._p), y0, yd0, t0, name = name)
+            problem.jac = LowLevelCallback(self.function("jac"), user_data = self._p)
+            if model.state_events:
+                problem.state_events = LowLevelCallback(self.function("state_events"), size = len(model.state_events), user_data = self._p)
+            return problem
+
+        if sensitivities:
+            if not model.parameters:
+                raise Codegen_Exception("The model has no parameters for the sensitivity analysis.")
+            return self._sensitivity_problem(y0, t0, sparse, name)
+
+        problem = Explicit_Problem(LowLevelCallback(self.function("rhs"), user_data = self._p), y0, t0, name = name)
+        if sparse:
+            problem.jac = LowLevelCallback(self.function("jac_data"), user_data = self._p, pattern = model.jac_pattern)
+        else:
+            problem.jac = LowLevelCallback(self.function("jac"), user_data = self._p)
+        if model.state_events:
+            problem.state_events = LowLevelCallback(self.function("state_events"), size = len(model.state_events), user_data = self._p)
+        return problem
+
+    def _sensitivity_problem(self, y0, t0, sparse, name):
+        """
+        Returns an Explicit_Problem with the parameters as sensitivity
+        parameters, calling the compiled functions with the parameters
+        given by the solver. The state events are not given the
+        parameters by the solvers, they use those of the last call to rhs.
+        """
+        model = self.model
+        n, nnz, n_p = model.dim, model.jac_pattern.nnz, len(model.parameters)
+        pattern = model.jac_pattern
+        rhs_c, sens_c = self.function("rhs"), self.function("sens")
+        jac_c = self.function("jac_data" if sparse else "jac")
+
+        def call(function, t, *arrays):
+            ret = function(ctypes.c_double(t), *[ctypes.c_void_p(a.ctypes.data) for a in arrays])
+            if ret > 0:
+                raise AssimuloRecoverableError("The compiled function returned the recoverable error %d."%ret)
+            if ret < 0:
+                raise AssimuloException("The compiled function failed with return value %d."%ret)
+
+        p_cur = self.p.copy() #The current parameters of the solver, for state_events
+
+        def rhs(t, y, p):
+            p_cur[:] = p
+            ydot = np.empty(n)
+            call(rhs_c, t, np.ascontiguousarray(y, dtype = float), ydot, p_cur)
+            return ydot
+
+        def jac(t, y, p):
+            if sparse:
+                data = np.empty(nnz)
+                call(jac_c, t, np.ascontiguousarray(y, dtype = float), data, np.ascontiguousarray(p, dtype = float))
+                return sps.csc_matrix((data, pattern.indices, pattern.indptr), shape = (n, n))
+            J = np.empty((n, n), order = "F")
+            call(jac_c, t, np.ascontiguousarray(y, dtype = float), J, np.ascontiguousarray(p, dtype = float))
+            return J
+
+        def rhs_sens(t, y, s, p, out = None):
+            if out is None:
+                out = np.empty((n, n_p), order = "F")
+            call(sens_c, t, np.ascontiguousarray(y, dtype = float), np.asfortranarray(s, dtype = float), out,
+                 np.ascontiguousarray(p, dtype = float))
+            return out
+
+        problem = Explicit_Problem(rhs, y0, t0, p0 = self.p.copy(), name = name)
+        problem.jac = jac
+        problem.rhs_sens = rhs_sens
+        if sparse:
+            problem.jac_pattern = pattern
+        if model.state_events:
+            events_c, n_g = self.function("state_events"), len(model.state_events)
+            def state_events(t, y, sw = None):
+                gout = np.empty(n_g)
+                call(events_c, t, np.ascontiguousarray(y, dtype = float), gout, p_cur)
+                return gout
+            problem.state_events = state_events
+        return problem
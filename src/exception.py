@@ -59,3 +59,6 @@ class DASP3_Exception(AssimuloException):
     pass
 class RKStarter_Exception(AssimuloException):
     pass
+
+class Codegen_Exception(AssimuloException):
+    pass
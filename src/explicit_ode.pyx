@@ -90,7 +90,7 @@ cdef class Explicit_ODE(ODE):
         
         #Check the dimension of the state event function
         if self.problem_info["state_events"]:
-            self.problem_info["dimRoot"] = len(problem.state_events(self.t0,self.y0, self.sw0))
+            self.problem_info["dimRoot"] = len(self._problem_state_events(self.t0,self.y0, self.sw0))
         
         self.t = self.t0
         self.y = self.y0.copy()
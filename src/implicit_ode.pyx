@@ -65,18 +65,18 @@ cdef class Implicit_ODE(ODE):
             if isinstance(self.problem, cExplicit_Problem): #The problem is an explicit, get the yd0 values from the right-hand-side
                 self.problem_info["type"] = 0 #Change to explicit problem
                 if self.problem_info["state_events"]:
-                    self.yd0 = problem.rhs(self.t0, self.y0, self.sw0)
+                    self.yd0 = self._problem_rhs(self.t0, self.y0, self.sw0)
                 else:
-                    self.yd0 = problem.rhs(self.t0, self.y0)
+                    self.yd0 = self._problem_rhs(self.t0, self.y0)
             else:
                 raise Implicit_ODE_Exception('yd0 must be specified in the problem.')
         
         #Check the dimension of the state event function
         if self.problem_info["state_events"]:
             if self.problem_info["type"] == 1:
-                self.problem_info["dimRoot"] = len(problem.state_events(self.t0,self.y0, self.yd0, self.sw0))
+                self.problem_info["dimRoot"] = len(self._problem_state_events(self.t0,self.y0, self.yd0, self.sw0))
             else:
-                self.problem_info["dimRoot"] = len(problem.state_events(self.t0,self.y0, self.sw0))
+                self.problem_info["dimRoot"] = len(self._problem_state_events(self.t0,self.y0, self.sw0))
         self.t  = self.t0
         self.y  = self.y0.copy()
         self.yd = self.yd0.copy()
@@ -36,7 +36,7 @@ cdef N_Vector N_VNewEmpty_Euclidean(long int n) noexcept:
     return v
 
 cdef inline N_Vector arr2nv(x) noexcept:
-    x=np.array(x)
+    x=np.ascontiguousarray(x, dtype=float) #Copied only if needed
     cdef long int n = len(x)
     cdef np.ndarray[realtype, ndim=1,mode='c'] ndx=x
     cdef void* data_ptr=PyArray_DATA(ndx)
@@ -54,7 +54,7 @@ cdef inline N_Vector arr2nv(x) noexcept:
     return v
 
 cdef inline N_Vector arr2nv_euclidean(x) noexcept:
-    x=np.array(x)
+    x=np.ascontiguousarray(x, dtype=float) #Copied only if needed
     cdef long int n = len(x)
     cdef np.ndarray[realtype, ndim=1,mode='c'] ndx=x
     cdef void* data_ptr=PyArray_DATA(ndx)
@@ -63,7 +63,7 @@ cdef inline N_Vector arr2nv_euclidean(x) noexcept:
     return v
     
 cdef inline void arr2nv_inplace(x, N_Vector out) noexcept:
-    x=np.array(x)
+    x=np.ascontiguousarray(x, dtype=float) #Copied only if needed
     cdef long int n = len(x)
     cdef np.ndarray[realtype, ndim=1,mode='c'] ndx=x
     cdef void* data_ptr=PyArray_DATA(ndx)
@@ -81,15 +81,96 @@ cdef inline void nv2arr_inplace(N_Vector v, np.ndarray o) noexcept:
     cdef realtype* v_data = (<N_VectorContent_Serial>v.content).data
     memcpy(PyArray_DATA(o), v_data, n*sizeof(realtype))
     
+cdef inline N_Vector arr2nv_view(np.ndarray x, N_Vector work) noexcept:
+    """Point the data-less work N_Vector (N_VCloneEmpty) to the memory of the contiguous array x, no copy"""
+    N_VSetArrayPointer_Serial(<realtype*>PyArray_DATA(x), work)
+    return work
+    
 cdef inline void nv2mat_inplace(int Ns, N_Vector *v, np.ndarray o) noexcept:
-    cdef long int i,j, Nf
+    """Copy the Ns N_Vectors into the columns of the Fortran-ordered matrix o"""
+    cdef long int i, Nf
+    cdef realtype* o_data = <realtype*>PyArray_DATA(o)
     for i in range(Ns):
         Nf = (<N_VectorContent_Serial>v[i].content).length
-        for j in range(Nf):
-            o[j,i] = (<N_VectorContent_Serial>v[i].content).data[j]
+        memcpy(o_data + i*Nf, (<N_VectorContent_Serial>v[i].content).data, Nf*sizeof(realtype))
+
+cdef inline void mat2nv_inplace(int Ns, np.ndarray o, N_Vector *v) noexcept:
+    """Copy the columns of the Fortran-ordered matrix o into the Ns N_Vectors"""
+    cdef long int i, Nf
+    cdef realtype* o_data = <realtype*>PyArray_DATA(o)
+    for i in range(Ns):
+        Nf = (<N_VectorContent_Serial>v[i].content).length
+        memcpy((<N_VectorContent_Serial>v[i].content).data, o_data + i*Nf, Nf*sizeof(realtype))
+
+cdef inline np.ndarray realtype2view(realtype *data, int n):
+    """Create numpy array viewing (not owning) the memory of a realtype*"""
+    cdef np.npy_intp dims = n
+    return np.PyArray_SimpleNewFromData(1, &dims, np.NPY_DOUBLE, <void*>data)
+
+cdef inline np.ndarray realtype2matview(realtype *data, int nrow, int ncol):
+    """Create Fortran-ordered numpy array viewing the memory of a column-major realtype* matrix"""
+    return realtype2view(data, nrow*ncol).reshape((nrow, ncol), order='F')
 
 cdef inline realtype2arr(realtype *data, int n):
     """Create new numpy array from realtype*"""
     cdef np.ndarray[realtype, ndim=1, mode='c'] x=np.empty(n)
     memcpy(PyArray_DATA(x), data, n*sizeof(realtype))
     return x
+
+KRYLOV_SOLVERS = ("SPGMR", "SPFGMR", "SPBCGS", "SPTFQMR") #The iterative (Krylov) linear solvers
+GRAM_SCHMIDT = {"MODIFIED": MODIFIED_GS, "CLASSICAL": CLASSICAL_GS} #Orthogonalization of the GMRES solvers
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef SUNDIALS.SUNLinearSolver new_krylov_solver(str name, N_Vector y, int pretype, int maxl,
+                                                    int max_restarts, int gstype, void* ctx) noexcept:
+        """
+        Creates the Krylov linear solver name (see KRYLOV_SOLVERS), the number
+        of restarts and the Gram-Schmidt orthogonalization are only used by
+        SPGMR and SPFGMR. The context ctx is only used by SUNDIALS >= 6.
+        """
+        cdef SUNDIALS.SUNLinearSolver LS = NULL
+        IF SUNDIALS_VERSION >= (6,0,0):
+            if name == "SPGMR":
+                LS = SUNDIALS.SUNLinSol_SPGMR(y, pretype, maxl, <SUNDIALS.SUNContext>ctx)
+            elif name == "SPFGMR":
+                LS = SUNDIALS.SUNLinSol_SPFGMR(y, pretype, maxl, <SUNDIALS.SUNContext>ctx)
+            elif name == "SPBCGS":
+                LS = SUNDIALS.SUNLinSol_SPBCGS(y, pretype, maxl, <SUNDIALS.SUNContext>ctx)
+            elif name == "SPTFQMR":
+                LS = SUNDIALS.SUNLinSol_SPTFQMR(y, pretype, maxl, <SUNDIALS.SUNContext>ctx)
+        ELIF SUNDIALS_VERSION >= (4,0,0):
+            if name == "SPGMR":
+                LS = SUNDIALS.SUNLinSol_SPGMR(y, pretype, maxl)
+            elif name == "SPFGMR":
+                LS = SUNDIALS.SUNLinSol_SPFGMR(y, pretype, maxl)
+            elif name == "SPBCGS":
+                LS = SUNDIALS.SUNLinSol_SPBCGS(y, pretype, maxl)
+            elif name == "SPTFQMR":
+                LS = SUNDIALS.SUNLinSol_SPTFQMR(y, pretype, maxl)
+        ELSE:
+            if name == "SPGMR":
+                LS = SUNDIALS.SUNSPGMR(y, pretype, maxl)
+            elif name == "SPFGMR":
+                LS = SUNDIALS.SUNSPFGMR(y, pretype, maxl)
+            elif name == "SPBCGS":
+                LS = SUNDIALS.SUNSPBCGS(y, pretype, maxl)
+            elif name == "SPTFQMR":
+                LS = SUNDIALS.SUNSPTFQMR(y, pretype, maxl)
+        if LS == NULL:
+            return NULL
+        
+        IF SUNDIALS_VERSION >= (4,0,0):
+            if name == "SPGMR":
+                SUNDIALS.SUNLinSol_SPGMRSetMaxRestarts(LS, max_restarts)
+                SUNDIALS.SUNLinSol_SPGMRSetGSType(LS, gstype)
+            elif name == "SPFGMR":
+                SUNDIALS.SUNLinSol_SPFGMRSetMaxRestarts(LS, max_restarts)
+                SUNDIALS.SUNLinSol_SPFGMRSetGSType(LS, gstype)
+        ELSE:
+            if name == "SPGMR":
+                SUNDIALS.SUNSPGMRSetMaxRestarts(LS, max_restarts)
+                SUNDIALS.SUNSPGMRSetGSType(LS, gstype)
+            elif name == "SPFGMR":
+                SUNDIALS.SUNSPFGMRSetMaxRestarts(LS, max_restarts)
+                SUNDIALS.SUNSPFGMRSetGSType(LS, gstype)
+        return LS
@@ -20,6 +20,55 @@ import traceback
 import scipy.sparse as sps
 from assimulo.exception import AssimuloRecoverableError
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void jac2dense_inplace(object jac, realtype* data, int nrow, int ncol):
+    """
+    Copies a dense (numpy) or sparse (CSC) Jacobian into the column-major
+    memory of a dense SUNDIALS matrix.
+    """
+    cdef int i, j
+    cdef const int[:] indptr, indices
+    cdef const double[:] values
+    
+    if isinstance(jac, sps.csc_matrix):
+        indptr = jac.indptr.astype(np.intc, copy=False)
+        indices = jac.indices.astype(np.intc, copy=False)
+        values = jac.data.astype(np.float64, copy=False)
+        for j in range(ncol):
+            for i in range(indptr[j], indptr[j+1]):
+                data[j*nrow + indices[i]] = values[i]
+    else:
+        realtype2matview(data, nrow, ncol)[:,:] = jac
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void jac2band_inplace(object jac, realtype* data, int n, int ldim, int s_mu, int mu, int ml):
+    """
+    Copies the band of a dense (numpy) or sparse (CSC) Jacobian into the
+    column-major memory of a band SUNDIALS matrix, where the element (i,j)
+    is stored at data[j*ldim + i-j+s_mu]. Elements outside the band are
+    ignored.
+    """
+    cdef int i, j, k
+    cdef const int[:] indptr, indices
+    cdef const double[:] values
+    
+    if isinstance(jac, sps.csc_matrix):
+        indptr = jac.indptr.astype(np.intc, copy=False)
+        indices = jac.indices.astype(np.intc, copy=False)
+        values = jac.data.astype(np.float64, copy=False)
+        for j in range(n):
+            for k in range(indptr[j], indptr[j+1]):
+                i = indices[k]
+                if -mu <= i - j <= ml:
+                    data[j*ldim + i-j+s_mu] = values[k]
+    else:
+        jac = np.asarray(jac, dtype=np.float64)
+        band = realtype2matview(data, ldim, n)
+        for k in range(-mu, ml+1): #The diagonal i-j = k
+            band[s_mu+k, max(0,-k):n-max(0,k)] = np.diagonal(jac, -k)
+
 cdef int cv_rhs(realtype t, N_Vector yv, N_Vector yvdot, void* problem_data) noexcept:
     """
     This method is used to connect the Assimulo.Problem.f to the Sundials
@@ -28,13 +77,23 @@ cdef int cv_rhs(realtype t, N_Vector yv, N_Vector yvdot, void* problem_data) noe
     cdef ProblemData pData = <ProblemData>problem_data
     cdef np.ndarray y = pData.work_y
     cdef realtype* resptr=(<N_VectorContent_Serial>yvdot.content).data
-    cdef int i
+    cdef int i, ret
+    
+    if pData.RHS_CFUNC != NULL: #Low-level callback
+        ret = (<c_rhs_t>pData.RHS_CFUNC)(t, (<N_VectorContent_Serial>yv.content).data, resptr, pData.RHS_CDATA)
+        return CV_SUCCESS if ret == 0 else (CV_REC_ERR if ret > 0 else CV_UNREC_RHSFUNC_ERR)
     
     nv2arr_inplace(yv, y)
     
     if pData.dimSens>0: #Sensitivity activated
-        p = realtype2arr(pData.p,pData.dimSens)
+        p = pData.load_p()
         try:
+            if pData.fcn_out: #In-place evaluation into the N_Vector
+                if pData.sw != NULL:
+                    (<object>pData.RHS)(t,y,sw=<list>pData.sw, p=p, out=realtype2view(resptr, pData.dim))
+                else:
+                    (<object>pData.RHS)(t,y,p,out=realtype2view(resptr, pData.dim))
+                return CV_SUCCESS
             if pData.sw != NULL:
                 rhs = (<object>pData.RHS)(t,y,sw=<list>pData.sw, p=p)
             else:
@@ -46,6 +105,12 @@ cdef int cv_rhs(realtype t, N_Vector yv, N_Vector yvdot, void* problem_data) noe
         
     else: #No sensitivity
         try:
+            if pData.fcn_out: #In-place evaluation into the N_Vector
+                if pData.sw != NULL:
+                    (<object>pData.RHS)(t,y,<list>pData.sw,out=realtype2view(resptr, pData.dim))
+                else:
+                    (<object>pData.RHS)(t,y,out=realtype2view(resptr, pData.dim))
+                return CV_SUCCESS
             if pData.sw != NULL:
                 rhs = (<object>pData.RHS)(t,y,<list>pData.sw)
             else:
@@ -55,8 +120,10 @@ cdef int cv_rhs(realtype t, N_Vector yv, N_Vector yvdot, void* problem_data) noe
         except BaseException:
             return CV_UNREC_RHSFUNC_ERR
     
-    for i in range(pData.dim):
-        resptr[i] = rhs[i]
+    try:
+        realtype2view(resptr, pData.dim)[:] = rhs #Copied without element-wise Python access
+    except BaseException:
+        return CV_UNREC_RHSFUNC_ERR
     
     return CV_SUCCESS
             
@@ -67,23 +134,26 @@ cdef int cv_sens_rhs_all(int Ns, realtype t, N_Vector yv, N_Vector yvdot,
     cdef ProblemData pData = <ProblemData>problem_data
     cdef np.ndarray y = pData.work_y
     cdef np.ndarray s = pData.work_ys
-    cdef realtype* resptr
-    cdef int i, j
+    cdef np.ndarray sens_out = pData.work_ysdot #Fortran-ordered, the columns are copied to yvSdot
     
     nv2arr_inplace(yv, y)
     nv2mat_inplace(Ns, yvS, s)
-    p = realtype2arr(pData.p,pData.dimSens)
+    p = pData.load_p()
     
     try:
-        if pData.sw != NULL:
-            sens_rhs = (<object>pData.RHS_SENS_ALL)(t,y,s,p,<list>pData.sw)
+        if pData.sens_out: #In-place evaluation into the work matrix
+            if pData.sw != NULL:
+                (<object>pData.RHS_SENS_ALL)(t,y,s,p,<list>pData.sw,out=sens_out)
+            else:
+                (<object>pData.RHS_SENS_ALL)(t,y,s,p,out=sens_out)
         else:
-            sens_rhs = (<object>pData.RHS_SENS_ALL)(t,y,s,p)
+            if pData.sw != NULL:
+                sens_rhs = (<object>pData.RHS_SENS_ALL)(t,y,s,p,<list>pData.sw)
+            else:
+                sens_rhs = (<object>pData.RHS_SENS_ALL)(t,y,s,p)
+            sens_out[:,:] = sens_rhs
         
-        for i in range(Ns):
-            resptr=(<N_VectorContent_Serial>yvSdot[i].content).data
-            for j in range(pData.dim):
-                resptr[j] = sens_rhs[j,i]
+        mat2nv_inplace(Ns, sens_out, yvSdot)
         
         return CV_SUCCESS
     except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -96,8 +166,97 @@ cdef int cv_sens_rhs_all(int Ns, realtype t, N_Vector yv, N_Vector yvdot,
 
 
 IF SUNDIALS_VERSION >= (3,0,0):
+    SPARSE_INDEX_TYPE = np.int64 if sizeof(sunindextype) == 8 else np.int32 #Index type of the sparse matrices
+ELSE:
+    SPARSE_INDEX_TYPE = np.intc
+
+cdef int cv_jac_pattern_data(realtype t, ProblemData pData, realtype* data, int nnz) noexcept:
+    """
+    Evaluates the values of a Jacobian with a fixed sparsity pattern in-place
+    into data, ordered as the (CSC) pattern.
+    """
+    cdef np.ndarray y = pData.work_y
+    cdef int ret
+    
+    if pData.JAC_DATA_CFUNC != NULL: #Low-level callback, writes the values directly
+        ret = (<c_jac_t>pData.JAC_DATA_CFUNC)(t, <realtype*>PyArray_DATA(y), data, pData.JAC_CDATA)
+        if ret != 0:
+            return CVDLS_JACFUNC_RECVR if ret > 0 else CVDLS_JACFUNC_UNRECVR
+        return CVDLS_SUCCESS
+    
+    out = realtype2view(data, nnz)
+    try:
+        if pData.dimSens > 0: #Sensitivity activated
+            p = pData.load_p()
+            if pData.sw != NULL:
+                (<object>pData.JAC)(t,y,p=p,sw=<list>pData.sw,out=out)
+            else:
+                (<object>pData.JAC)(t,y,p=p,out=out)
+        else:
+            if pData.sw != NULL:
+                (<object>pData.JAC)(t,y,sw=<list>pData.sw,out=out)
+            else:
+                (<object>pData.JAC)(t,y,out=out)
+        return CVDLS_SUCCESS
+    except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return CVDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+    except BaseException:
+        traceback.print_exc()
+        return CVDLS_JACFUNC_UNRECVR
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef void jac2sparse_inplace(object jac, SUNMatrixContent_Sparse Jacobian, int csr) except *:
+        """
+        Copies a sparse (scipy) Jacobian into a sparse SUNDIALS matrix, in
+        CSC or (csr) CSR format, converting it if needed.
+        """
+        cdef sunindextype nnz
+        cdef np.ndarray jdata, jindices, jindptr
+        
+        if not sps.issparse(jac):
+            raise AssimuloException("The Jacobian must be stored on Scipy's CSC format (or CSR format).")
+        jac = jac.tocsr() if csr else jac.tocsc()
+        nnz = jac.nnz
+        if nnz > Jacobian.NNZ:
+            raise AssimuloException("The Jacobian has more entries than supplied to the problem class via 'jac_nnz'")
+        
+        jdata = np.ascontiguousarray(jac.data, dtype=np.float64)
+        jindices = np.ascontiguousarray(jac.indices, dtype=SPARSE_INDEX_TYPE)
+        jindptr = np.ascontiguousarray(jac.indptr, dtype=SPARSE_INDEX_TYPE)
+        
+        memcpy(Jacobian.data, PyArray_DATA(jdata), nnz*sizeof(realtype))
+        memcpy(Jacobian.indexvals, PyArray_DATA(jindices), nnz*sizeof(sunindextype))
+        memcpy(Jacobian.indexptrs, PyArray_DATA(jindptr), (Jacobian.NP+1)*sizeof(sunindextype))
+    
+    cdef realtype* load_jac_pattern(ProblemData pData, SUNMatrixContent_Sparse Jacobian) noexcept:
+        """
+        Copies the structure of the fixed Jacobian sparsity pattern into the
+        sparse SUNDIALS matrix. Returns the memory for the values of the
+        pattern, in CSC order, which are copied by store_jac_pattern.
+        """
+        cdef sunindextype nnz = pData.jac_indices.shape[0]
+        memcpy(Jacobian.indexvals, PyArray_DATA(pData.jac_indices), nnz*sizeof(sunindextype))
+        memcpy(Jacobian.indexptrs, PyArray_DATA(pData.jac_indptr), (Jacobian.NP+1)*sizeof(sunindextype))
+        if pData.jac_perm is None: #CSC, the values are evaluated directly into the matrix
+            return Jacobian.data
+        return <realtype*>PyArray_DATA(pData.work_jac_data)
+    
     @cython.boundscheck(False)
     @cython.wraparound(False)
+    cdef void store_jac_pattern(ProblemData pData, SUNMatrixContent_Sparse Jacobian) noexcept:
+        """
+        Reorders the values of the fixed Jacobian sparsity pattern (CSC) into
+        the (CSR) sparse SUNDIALS matrix.
+        """
+        cdef sunindextype k, nnz = pData.jac_indices.shape[0]
+        cdef realtype* values
+        cdef np.intp_t* perm
+        if pData.jac_perm is not None:
+            values = <realtype*>PyArray_DATA(pData.work_jac_data)
+            perm = <np.intp_t*>PyArray_DATA(pData.jac_perm)
+            for k in range(nnz):
+                Jacobian.data[k] = values[perm[k]]
+    
     cdef int cv_jac_sparse(realtype t, N_Vector yv, N_Vector fy, SUNMatrix Jac,
                     void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept:
         """
@@ -107,19 +266,18 @@ IF SUNDIALS_VERSION >= (3,0,0):
         cdef ProblemData pData = <ProblemData>problem_data
         cdef SUNMatrixContent_Sparse Jacobian = <SUNMatrixContent_Sparse>Jac.content
         cdef np.ndarray y = pData.work_y
-        cdef int i
-        cdef sunindextype nnz = Jacobian.NNZ
-        cdef int ret_nnz
-        cdef sunindextype dim = Jacobian.N
-        cdef realtype* data = Jacobian.data
-        cdef sunindextype* rowvals = Jacobian.rowvals[0]
-        cdef sunindextype* colptrs = Jacobian.colptrs[0]
+        cdef int ret
         
         nv2arr_inplace(yv, y)
+        
+        if pData.jac_pattern_out: #Fixed sparsity pattern, only the values are evaluated
+            ret = cv_jac_pattern_data(t, pData, load_jac_pattern(pData, Jacobian), pData.jac_indices.shape[0])
+            store_jac_pattern(pData, Jacobian)
+            return ret
 
         try:
             if pData.dimSens > 0: #Sensitivity activated
-                p = realtype2arr(pData.p,pData.dimSens)
+                p = pData.load_p()
                 if pData.sw != NULL:
                     jac=(<object>pData.JAC)(t,y,p=p,sw=<list>pData.sw)
                 else:
@@ -129,19 +287,8 @@ IF SUNDIALS_VERSION >= (3,0,0):
                     jac=(<object>pData.JAC)(t,y,sw=<list>pData.sw)
                 else:
                     jac=(<object>pData.JAC)(t,y)
-                
-            if not isinstance(jac, sps.csc_matrix):
-                jac = sps.csc_matrix(jac)
-                raise AssimuloException("The Jacobian must be stored on Scipy's CSC format.")
-            ret_nnz = jac.nnz
-            if ret_nnz > nnz:
-                raise AssimuloException("The Jacobian has more entries than supplied to the problem class via 'jac_nnz'")    
-
-            for i in range(min(ret_nnz,nnz)):
-                data[i]    = jac.data[i]
-                rowvals[i] = jac.indices[i]
-            for i in range(dim+1):
-                colptrs[i] = jac.indptr[i]
+            
+            jac2sparse_inplace(jac, Jacobian, pData.jac_csr)
             
             return CVDLS_SUCCESS
         except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -182,9 +329,15 @@ ELSE:
             int *rowvals;
             int *colptrs;
         """
+        if pData.jac_pattern_out: #Fixed sparsity pattern, only the values are evaluated
+            nnz = pData.jac_indices.shape[0]
+            memcpy(rowvals, PyArray_DATA(pData.jac_indices), nnz*sizeof(int))
+            memcpy(colptrs, PyArray_DATA(pData.jac_indptr), (dim+1)*sizeof(int))
+            return cv_jac_pattern_data(t, pData, data, nnz)
+        
         try:
             if pData.dimSens > 0: #Sensitivity activated
-                p = realtype2arr(pData.p,pData.dimSens)
+                p = pData.load_p()
                 if pData.sw != NULL:
                     jac=(<object>pData.JAC)(t,y,p=p,sw=<list>pData.sw)
                 else:
@@ -227,14 +380,44 @@ IF SUNDIALS_VERSION >= (3,0,0):
         """
         cdef SUNMatrixContent_Dense Jacobian = <SUNMatrixContent_Dense>Jac.content
         cdef ProblemData pData = <ProblemData>problem_data
-        cdef realtype* col_i=Jacobian.cols[0]
         cdef np.ndarray y = pData.work_y
-        cdef int i,j, Neq = pData.dim
+        cdef int ret, Neq = pData.dim
+        
+        if pData.load_jac(Jacobian.data, 1.0): #Warm start, Jacobian from the previous simulation
+            return CVDLS_SUCCESS
+        
+        if pData.JAC_CFUNC != NULL: #Low-level callback, writes the column-major Jacobian directly
+            ret = (<c_jac_t>pData.JAC_CFUNC)(t, (<N_VectorContent_Serial>yv.content).data, Jacobian.data, pData.JAC_CDATA)
+            if ret != 0:
+                return CVDLS_JACFUNC_RECVR if ret > 0 else CVDLS_JACFUNC_UNRECVR
+            pData.store_jac(Jacobian.data, 1.0)
+            return CVDLS_SUCCESS
         
         nv2arr_inplace(yv, y)
 
+        if pData.jac_out: #In-place evaluation into the dense matrix
+            try:
+                out = realtype2matview(Jacobian.data, Neq, Neq)
+                if pData.dimSens>0:
+                    p = pData.load_p()
+                    if pData.sw != NULL:
+                        (<object>pData.JAC)(t,y,sw=<list>pData.sw,p=p,out=out)
+                    else:
+                        (<object>pData.JAC)(t,y,p,out=out)
+                elif pData.sw != NULL:
+                    (<object>pData.JAC)(t,y,sw=<list>pData.sw,out=out)
+                else:
+                    (<object>pData.JAC)(t,y,out=out)
+            except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+                return CVDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+            except BaseException:
+                traceback.print_exc()
+                return CVDLS_JACFUNC_UNRECVR
+            pData.store_jac(Jacobian.data, 1.0)
+            return CVDLS_SUCCESS
+
         if pData.dimSens>0: #Sensitivity activated
-            p = realtype2arr(pData.p,pData.dimSens)
+            p = pData.load_p()
             try:
                 if pData.sw != NULL:
                     jac=(<object>pData.JAC)(t,y,sw=<list>pData.sw,p=p)
@@ -257,16 +440,13 @@ IF SUNDIALS_VERSION >= (3,0,0):
                 traceback.print_exc()
                 return CVDLS_JACFUNC_UNRECVR
         
-        if isinstance(jac, sps.csc_matrix):
-            for j in range(Neq):
-                col_i = Jacobian.cols[j]
-                for i in range(jac.indptr[j], jac.indptr[j+1]):
-                    col_i[jac.indices[i]] = jac.data[i]
-        else:
-            for i in range(Neq):
-                col_i = Jacobian.cols[i]
-                for j in range(Neq):
-                    col_i[j] = jac[j,i]
+        try:
+            jac2dense_inplace(jac, Jacobian.data, Neq, Neq)
+        except BaseException:
+            traceback.print_exc()
+            return CVDLS_JACFUNC_UNRECVR
+        
+        pData.store_jac(Jacobian.data, 1.0)
         
         return CVDLS_SUCCESS
 ELSE:
@@ -277,14 +457,44 @@ ELSE:
         Jacobian function.
         """
         cdef ProblemData pData = <ProblemData>problem_data
-        cdef realtype* col_i=DENSE_COL(Jacobian,0)
         cdef np.ndarray y = pData.work_y
-        cdef int i,j
+        cdef int ret
+        
+        if pData.load_jac(Jacobian.data, 1.0): #Warm start, Jacobian from the previous simulation
+            return CVDLS_SUCCESS
+        
+        if pData.JAC_CFUNC != NULL: #Low-level callback, writes the column-major Jacobian directly
+            ret = (<c_jac_t>pData.JAC_CFUNC)(t, (<N_VectorContent_Serial>yv.content).data, Jacobian.data, pData.JAC_CDATA)
+            if ret != 0:
+                return CVDLS_JACFUNC_RECVR if ret > 0 else CVDLS_JACFUNC_UNRECVR
+            pData.store_jac(Jacobian.data, 1.0)
+            return CVDLS_SUCCESS
         
         nv2arr_inplace(yv, y)
 
+        if pData.jac_out: #In-place evaluation into the dense matrix
+            try:
+                out = realtype2matview(Jacobian.data, Neq, Neq)
+                if pData.dimSens>0:
+                    p = pData.load_p()
+                    if pData.sw != NULL:
+                        (<object>pData.JAC)(t,y,sw=<list>pData.sw,p=p,out=out)
+                    else:
+                        (<object>pData.JAC)(t,y,p,out=out)
+                elif pData.sw != NULL:
+                    (<object>pData.JAC)(t,y,sw=<list>pData.sw,out=out)
+                else:
+                    (<object>pData.JAC)(t,y,out=out)
+            except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+                return CVDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+            except BaseException:
+                traceback.print_exc()
+                return CVDLS_JACFUNC_UNRECVR
+            pData.store_jac(Jacobian.data, 1.0)
+            return CVDLS_SUCCESS
+
         if pData.dimSens>0: #Sensitivity activated
-            p = realtype2arr(pData.p,pData.dimSens)
+            p = pData.load_p()
             try:
                 if pData.sw != NULL:
                     jac=(<object>pData.JAC)(t,y,sw=<list>pData.sw,p=p)
@@ -307,20 +517,74 @@ ELSE:
                 traceback.print_exc()
                 return CVDLS_JACFUNC_UNRECVR
                 
-        if isinstance(jac, sps.csc_matrix):
-            for j in range(Neq):
-                col_i = DENSE_COL(Jacobian, j)
-                for i in range(jac.indptr[j], jac.indptr[j+1]):
-                    col_i[jac.indices[i]] = jac.data[i]
-        else:
-            for i in range(Neq):
-                col_i = DENSE_COL(Jacobian, i)
-                for j in range(Neq):
-                    col_i[j] = jac[j,i]
+        try:
+            jac2dense_inplace(jac, Jacobian.data, Neq, Neq)
+        except BaseException:
+            traceback.print_exc()
+            return CVDLS_JACFUNC_UNRECVR
+        
+        pData.store_jac(Jacobian.data, 1.0)
         
         return CVDLS_SUCCESS
         
         
+cdef int cv_jac_band_data(realtype t, N_Vector yv, ProblemData pData, realtype* data, 
+                          int ldim, int s_mu, int mu, int ml) noexcept:
+    """
+    Evaluates the Jacobian into the memory of a band SUNDIALS matrix, either
+    in-place into the band (keyword out, the band storage of
+    scipy.linalg.solve_banded with mu+ml+1 rows) or by copying the band of
+    the returned Jacobian.
+    """
+    cdef np.ndarray y = pData.work_y
+    cdef int Neq = pData.dim
+    
+    nv2arr_inplace(yv, y)
+    
+    try:
+        if pData.dimSens > 0: #Sensitivity activated
+            p = pData.load_p()
+            if pData.sw != NULL:
+                args, kwargs = (t,y), {"sw": <list>pData.sw, "p": p}
+            else:
+                args, kwargs = (t,y,p), {}
+        elif pData.sw != NULL:
+            args, kwargs = (t,y), {"sw": <list>pData.sw}
+        else:
+            args, kwargs = (t,y), {}
+        
+        if pData.jac_band_out: #In-place evaluation into the band
+            (<object>pData.JAC)(*args, out=realtype2matview(data, ldim, Neq)[s_mu-mu:s_mu+ml+1], **kwargs)
+        else:
+            jac2band_inplace((<object>pData.JAC)(*args, **kwargs), data, Neq, ldim, s_mu, mu, ml)
+    except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return CVDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+    except BaseException:
+        traceback.print_exc()
+        return CVDLS_JACFUNC_UNRECVR
+    
+    return CVDLS_SUCCESS
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int cv_jac_band(realtype t, N_Vector yv, N_Vector fy, SUNMatrix Jac, 
+                void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept:
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        band Jacobian function.
+        """
+        cdef SUNMatrixContent_Band Jacobian = <SUNMatrixContent_Band>Jac.content
+        return cv_jac_band_data(t, yv, <ProblemData>problem_data, Jacobian.data, 
+                                Jacobian.ldim, Jacobian.s_mu, Jacobian.mu, Jacobian.ml)
+ELSE:
+    cdef int cv_jac_band(long int Neq, long int mupper, long int mlower, realtype t, N_Vector yv, N_Vector fy, 
+                DlsMat Jacobian, void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept:
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        band Jacobian function.
+        """
+        return cv_jac_band_data(t, yv, <ProblemData>problem_data, Jacobian.data, 
+                                Jacobian.ldim, Jacobian.s_mu, Jacobian.mu, Jacobian.ml)
+
 cdef int cv_jacv(N_Vector vv, N_Vector Jv, realtype t, N_Vector yv, N_Vector fyv,
 				    void *problem_data, N_Vector tmp) noexcept:
     """
@@ -336,15 +600,14 @@ cdef int cv_jacv(N_Vector vv, N_Vector Jv, realtype t, N_Vector yv, N_Vector fyv
     cdef realtype* jacvptr=(<N_VectorContent_Serial>Jv.content).data
     
     if pData.dimSens>0: #Sensitivity activated
-        p = realtype2arr(pData.p,pData.dimSens)
+        p = pData.load_p()
         try:
             if pData.sw != NULL:
                 jacv = (<object>pData.JACV)(t,y,fy,v,sw=<list>pData.sw,p=p)
             else:
                 jacv = (<object>pData.JACV)(t,y,fy,v,p=p)
             
-            for i in range(pData.dim):
-                jacvptr[i] = jacv[i]
+            realtype2view(jacvptr, pData.dim)[:] = jacv
             
             return SPGMR_SUCCESS
         except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -359,8 +622,7 @@ cdef int cv_jacv(N_Vector vv, N_Vector Jv, realtype t, N_Vector yv, N_Vector fyv
             else:
                 jacv = (<object>pData.JACV)(t,y,fy,v)
             
-            for i in range(pData.dim):
-                jacvptr[i] = jacv[i]
+            realtype2view(jacvptr, pData.dim)[:] = jacv
             
             return SPGMR_SUCCESS
         except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -414,8 +676,7 @@ IF SUNDIALS_VERSION >= (3,0,0):
         except BaseException:
             return CV_UNREC_RHSFUNC_ERR
                     
-        for i in range(pData.dim):
-            zptr[i] = zres[i]
+        realtype2view(zptr, pData.dim)[:] = zres
         
         return CVSPILS_SUCCESS
 ELSE:
@@ -465,8 +726,7 @@ ELSE:
         except BaseException:
             return CV_UNREC_RHSFUNC_ERR
                     
-        for i in range(pData.dim):
-            zptr[i] = zres[i]
+        realtype2view(zptr, pData.dim)[:] = zres
         
         return CVSPILS_SUCCESS
 
@@ -495,6 +755,14 @@ cdef int cv_prec(realtype t, N Vector yv, N Vector fyv,
         return SPGMR_PSOLVE_FAIL_UNREC
 """
 
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int cv_bbd_local(sunindextype Nlocal, realtype t, N_Vector yv, N_Vector gv, void* problem_data) noexcept:
+        """
+        The local function of the band-block-diagonal preconditioner, which
+        in the serial case is the right-hand side itself.
+        """
+        return cv_rhs(t, yv, gv, problem_data)
+
 cdef int cv_root(realtype t, N_Vector yv, realtype *gout, void* problem_data) noexcept:
     """
     This method is used to connect the Assimulo.Problem.state_events to the Sundials
@@ -504,17 +772,24 @@ cdef int cv_root(realtype t, N_Vector yv, realtype *gout, void* problem_data) no
     cdef np.ndarray y = pData.work_y
     cdef int i
     
+    if pData.ROOT_CFUNC != NULL: #Low-level callback
+        if (<c_events_t>pData.ROOT_CFUNC)(t, (<N_VectorContent_Serial>yv.content).data, gout, pData.ROOT_CDATA) != 0:
+            return CV_RTFUNC_FAIL
+        return CV_SUCCESS
+    
     nv2arr_inplace(yv, y)
     
     try:
+        if pData.root_out: #In-place evaluation into gout
+            (<object>pData.ROOT)(t,y,<list>pData.sw if pData.sw != NULL else None,out=realtype2view(gout, pData.dimRoot))
+            return CV_SUCCESS
         if pData.sw != NULL:
             root=(<object>pData.ROOT)(t,y,<list>pData.sw) #Call to the Python root function 
         else:
             root=(<object>pData.ROOT)(t,y,None) #Call to the Python root function
             
         #memcpy(gout,<realtype*>root.data,pData.memSizeRoot) #Copy data from the return to the output
-        for i in range(pData.dimRoot):
-            gout[i]=root[i]
+        realtype2view(gout, pData.dimRoot)[:] = root
     
         return CV_SUCCESS
     except BaseException:
@@ -530,22 +805,32 @@ cdef int ida_res(realtype t, N_Vector yv, N_Vector yvdot, N_Vector residual, voi
     cdef np.ndarray y = pData.work_y
     cdef np.ndarray yd = pData.work_yd
     cdef realtype* resptr=(<N_VectorContent_Serial>residual.content).data
-    cdef int i
+    cdef int i, ret
+    
+    if pData.RHS_CFUNC != NULL: #Low-level callback
+        ret = (<c_res_t>pData.RHS_CFUNC)(t, (<N_VectorContent_Serial>yv.content).data, 
+                                          (<N_VectorContent_Serial>yvdot.content).data, resptr, pData.RHS_CDATA)
+        return IDA_SUCCESS if ret == 0 else (IDA_REC_ERR if ret > 0 else IDA_RES_FAIL)
     
     nv2arr_inplace(yv, y)
     nv2arr_inplace(yvdot, yd)
     
     if pData.dimSens!=0: #SENSITIVITY 
-        p = realtype2arr(pData.p,pData.dimSens)
+        p = pData.load_p()
         try:
+            if pData.fcn_out: #In-place evaluation into the N_Vector
+                if pData.sw != NULL:
+                    (<object>pData.RHS)(t,y,yd,sw=<list>pData.sw,p=p,out=realtype2view(resptr, pData.dim))
+                else:
+                    (<object>pData.RHS)(t,y,yd,p,out=realtype2view(resptr, pData.dim))
+                return IDA_SUCCESS
             if pData.sw != NULL:
                 res=(<object>pData.RHS)(t,y,yd,sw=<list>pData.sw,p=p)  # call to the python residual function
             else:
                 res=(<object>pData.RHS)(t,y,yd,p)
             
             #memcpy((<N_VectorContent_Serial>residual.content).data,<realtype*>res.data,pData.memSize)
-            for i in range(pData.dim):
-                resptr[i] = res[i]
+            realtype2view(resptr, pData.dim)[:] = res
 
             return IDA_SUCCESS
         except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -555,6 +840,12 @@ cdef int ida_res(realtype t, N_Vector yv, N_Vector yvdot, N_Vector residual, voi
             return IDA_RES_FAIL
     else: #NO SENSITIVITY
         try:
+            if pData.fcn_out: #In-place evaluation into the N_Vector
+                if pData.sw != NULL:
+                    (<object>pData.RHS)(t,y,yd,<list>pData.sw,out=realtype2view(resptr, pData.dim))
+                else:
+                    (<object>pData.RHS)(t,y,yd,out=realtype2view(resptr, pData.dim))
+                return IDA_SUCCESS
             if pData.sw != NULL:
                 res=(<object>pData.RHS)(t,y,yd,<list>pData.sw)  #Call to the Python residual function
             else:
@@ -562,8 +853,7 @@ cdef int ida_res(realtype t, N_Vector yv, N_Vector yvdot, N_Vector residual, voi
                 #res = (<object>pData.RHS)(t,y,yd)
             
             #memcpy((<N_VectorContent_Serial>residual.content).data,<realtype*>res.data,pData.memSize)
-            for i in range(pData.dim):
-                resptr[i] = res[i]
+            realtype2view(resptr, pData.dim)[:] = res
             
             return IDA_SUCCESS
         except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -581,27 +871,55 @@ IF SUNDIALS_VERSION >= (3,0,0):
         """
         cdef SUNMatrixContent_Dense Jacobian = <SUNMatrixContent_Dense>Jac.content
         cdef ProblemData pData = <ProblemData>problem_data
-        cdef np.ndarray[realtype, ndim=2, mode='c'] jac #Used for return from the user function
-        cdef realtype* col_i=Jacobian.cols[0]
         cdef np.ndarray y = pData.work_y
         cdef np.ndarray yd = pData.work_yd
-        cdef int i,j, Neq = pData.dim
+        cdef int ret, Neq = pData.dim
+        
+        if pData.load_jac(Jacobian.data, c): #Warm start, Jacobian from the previous simulation
+            return IDADLS_SUCCESS
+        
+        if pData.JAC_CFUNC != NULL: #Low-level callback, writes the column-major Jacobian directly
+            ret = (<c_jac_res_t>pData.JAC_CFUNC)(c, t, (<N_VectorContent_Serial>yv.content).data, 
+                                                (<N_VectorContent_Serial>yvdot.content).data, Jacobian.data, pData.JAC_CDATA)
+            if ret != 0:
+                return IDADLS_JACFUNC_RECVR if ret > 0 else IDADLS_JACFUNC_UNRECVR
+            pData.store_jac(Jacobian.data, c)
+            return IDADLS_SUCCESS
         
         nv2arr_inplace(yv, y)
         nv2arr_inplace(yvdot, yd)
         
+        if pData.jac_out: #In-place evaluation into the dense matrix
+            try:
+                out = realtype2matview(Jacobian.data, Neq, Neq)
+                if pData.dimSens!=0:
+                    p = pData.load_p()
+                    if pData.sw != NULL:
+                        (<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw,p=p,out=out)
+                    else:
+                        (<object>pData.JAC)(c,t,y,yd,p=p,out=out)
+                elif pData.sw != NULL:
+                    (<object>pData.JAC)(c,t,y,yd,<list>pData.sw,out=out)
+                else:
+                    (<object>pData.JAC)(c,t,y,yd,out=out)
+            except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+                return IDADLS_JACFUNC_RECVR #Recoverable Error
+            except BaseException:
+                traceback.print_exc()
+                return IDADLS_JACFUNC_UNRECVR
+            pData.store_jac(Jacobian.data, c)
+            return IDADLS_SUCCESS
+        
         if pData.dimSens!=0: #SENSITIVITY 
-            p = realtype2arr(pData.p,pData.dimSens)
+            p = pData.load_p()
             try:
                 if pData.sw != NULL:
                     jac=(<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw,p=p)  # call to the python residual function
                 else:
                     jac=(<object>pData.JAC)(c,t,y,yd,p=p)
                 
-                for i in range(Neq):
-                    col_i = Jacobian.cols[i]
-                    for j in range(Neq):
-                        col_i[j] = jac[j,i]
+                jac2dense_inplace(jac, Jacobian.data, Neq, Neq)
+                pData.store_jac(Jacobian.data, c)
                 return IDADLS_SUCCESS
             except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
                 return IDADLS_JACFUNC_RECVR #Recoverable Error
@@ -615,10 +933,8 @@ IF SUNDIALS_VERSION >= (3,0,0):
                 else:
                     jac=(<object>pData.JAC)(c,t,y,yd)
                 
-                for i in range(Neq):
-                    col_i = Jacobian.cols[i]
-                    for j in range(Neq):
-                        col_i[j] = jac[j,i]
+                jac2dense_inplace(jac, Jacobian.data, Neq, Neq)
+                pData.store_jac(Jacobian.data, c)
                 return IDADLS_SUCCESS
             except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
                 return IDADLS_JACFUNC_RECVR #Recoverable Error
@@ -633,27 +949,55 @@ ELSE:
         Jacobian function.
         """
         cdef ProblemData pData = <ProblemData>problem_data
-        cdef np.ndarray[realtype, ndim=2, mode='c'] jac #Used for return from the user function
-        cdef realtype* col_i=DENSE_COL(Jacobian,0)
         cdef np.ndarray y = pData.work_y
         cdef np.ndarray yd = pData.work_yd
-        cdef int i,j
+        cdef int ret
+        
+        if pData.load_jac(Jacobian.data, c): #Warm start, Jacobian from the previous simulation
+            return IDADLS_SUCCESS
+        
+        if pData.JAC_CFUNC != NULL: #Low-level callback, writes the column-major Jacobian directly
+            ret = (<c_jac_res_t>pData.JAC_CFUNC)(c, t, (<N_VectorContent_Serial>yv.content).data, 
+                                                (<N_VectorContent_Serial>yvdot.content).data, Jacobian.data, pData.JAC_CDATA)
+            if ret != 0:
+                return IDADLS_JACFUNC_RECVR if ret > 0 else IDADLS_JACFUNC_UNRECVR
+            pData.store_jac(Jacobian.data, c)
+            return IDADLS_SUCCESS
         
         nv2arr_inplace(yv, y)
         nv2arr_inplace(yvdot, yd)
         
+        if pData.jac_out: #In-place evaluation into the dense matrix
+            try:
+                out = realtype2matview(Jacobian.data, Neq, Neq)
+                if pData.dimSens!=0:
+                    p = pData.load_p()
+                    if pData.sw != NULL:
+                        (<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw,p=p,out=out)
+                    else:
+                        (<object>pData.JAC)(c,t,y,yd,p=p,out=out)
+                elif pData.sw != NULL:
+                    (<object>pData.JAC)(c,t,y,yd,<list>pData.sw,out=out)
+                else:
+                    (<object>pData.JAC)(c,t,y,yd,out=out)
+            except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+                return IDADLS_JACFUNC_RECVR #Recoverable Error
+            except BaseException:
+                traceback.print_exc()
+                return IDADLS_JACFUNC_UNRECVR
+            pData.store_jac(Jacobian.data, c)
+            return IDADLS_SUCCESS
+        
         if pData.dimSens!=0: #SENSITIVITY 
-            p = realtype2arr(pData.p,pData.dimSens)
+            p = pData.load_p()
             try:
                 if pData.sw != NULL:
                     jac=(<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw,p=p)  # call to the python residual function
                 else:
                     jac=(<object>pData.JAC)(c,t,y,yd,p=p)
                 
-                for i in range(Neq):
-                    col_i = DENSE_COL(Jacobian, i)
-                    for j in range(Neq):
-                        col_i[j] = jac[j,i]
+                jac2dense_inplace(jac, Jacobian.data, Neq, Neq)
+                pData.store_jac(Jacobian.data, c)
                 return IDADLS_SUCCESS
             except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
                 return IDADLS_JACFUNC_RECVR #Recoverable Error
@@ -667,10 +1011,8 @@ ELSE:
                 else:
                     jac=(<object>pData.JAC)(c,t,y,yd)
                 
-                for i in range(Neq):
-                    col_i = DENSE_COL(Jacobian, i)
-                    for j in range(Neq):
-                        col_i[j] = jac[j,i]
+                jac2dense_inplace(jac, Jacobian.data, Neq, Neq)
+                pData.store_jac(Jacobian.data, c)
                 return IDADLS_SUCCESS
             except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
                 return IDADLS_JACFUNC_RECVR #Recoverable Error
@@ -679,6 +1021,116 @@ ELSE:
                 return IDADLS_JACFUNC_UNRECVR
             
 
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int ida_jac_sparse(realtype t, realtype c, N_Vector yv, N_Vector yvdot, N_Vector residual, SUNMatrix Jac,
+                 void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept:
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        Sparse Jacobian function.
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef SUNMatrixContent_Sparse Jacobian = <SUNMatrixContent_Sparse>Jac.content
+        cdef np.ndarray y = pData.work_y
+        cdef np.ndarray yd = pData.work_yd
+        cdef realtype* data
+        
+        nv2arr_inplace(yv, y)
+        nv2arr_inplace(yvdot, yd)
+        
+        try:
+            if pData.dimSens != 0: #Sensitivity activated
+                p = pData.load_p()
+                if pData.sw != NULL:
+                    args, kwargs = (c,t,y,yd), {"sw": <list>pData.sw, "p": p}
+                else:
+                    args, kwargs = (c,t,y,yd), {"p": p}
+            elif pData.sw != NULL:
+                args, kwargs = (c,t,y,yd,<list>pData.sw), {}
+            else:
+                args, kwargs = (c,t,y,yd), {}
+            
+            if pData.jac_pattern_out: #Fixed sparsity pattern, only the values are evaluated
+                data = load_jac_pattern(pData, Jacobian)
+                (<object>pData.JAC)(*args, out=realtype2view(data, pData.jac_indices.shape[0]), **kwargs)
+                store_jac_pattern(pData, Jacobian)
+            else:
+                jac2sparse_inplace((<object>pData.JAC)(*args, **kwargs), Jacobian, pData.jac_csr)
+            
+            return IDADLS_SUCCESS
+        except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+            return IDADLS_JACFUNC_RECVR #Recoverable Error
+        except BaseException:
+            traceback.print_exc()
+            return IDADLS_JACFUNC_UNRECVR
+
+cdef int ida_jac_band_data(realtype t, realtype c, N_Vector yv, N_Vector yvdot, ProblemData pData, 
+                           realtype* data, int ldim, int s_mu, int mu, int ml) noexcept:
+    """
+    Evaluates the Jacobian into the memory of a band SUNDIALS matrix, either
+    in-place into the band (keyword out, the band storage of
+    scipy.linalg.solve_banded with mu+ml+1 rows) or by copying the band of
+    the returned Jacobian.
+    """
+    cdef np.ndarray y = pData.work_y
+    cdef np.ndarray yd = pData.work_yd
+    cdef int Neq = pData.dim
+    
+    nv2arr_inplace(yv, y)
+    nv2arr_inplace(yvdot, yd)
+    
+    try:
+        if pData.dimSens != 0: #Sensitivity activated
+            p = pData.load_p()
+            if pData.sw != NULL:
+                args, kwargs = (c,t,y,yd), {"sw": <list>pData.sw, "p": p}
+            else:
+                args, kwargs = (c,t,y,yd), {"p": p}
+        elif pData.sw != NULL:
+            args, kwargs = (c,t,y,yd,<list>pData.sw), {}
+        else:
+            args, kwargs = (c,t,y,yd), {}
+        
+        if pData.jac_band_out: #In-place evaluation into the band
+            (<object>pData.JAC)(*args, out=realtype2matview(data, ldim, Neq)[s_mu-mu:s_mu+ml+1], **kwargs)
+        else:
+            jac2band_inplace((<object>pData.JAC)(*args, **kwargs), data, Neq, ldim, s_mu, mu, ml)
+    except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return IDADLS_JACFUNC_RECVR #Recoverable Error
+    except BaseException:
+        traceback.print_exc()
+        return IDADLS_JACFUNC_UNRECVR
+    
+    return IDADLS_SUCCESS
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int ida_jac_band(realtype t, realtype c, N_Vector yv, N_Vector yvdot, N_Vector residual, SUNMatrix Jac,
+                 void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept:
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        band Jacobian function.
+        """
+        cdef SUNMatrixContent_Band Jacobian = <SUNMatrixContent_Band>Jac.content
+        return ida_jac_band_data(t, c, yv, yvdot, <ProblemData>problem_data, Jacobian.data, 
+                                 Jacobian.ldim, Jacobian.s_mu, Jacobian.mu, Jacobian.ml)
+ELSE:
+    cdef int ida_jac_band(long int Neq, long int mupper, long int mlower, realtype t, realtype c, N_Vector yv, 
+                 N_Vector yvdot, N_Vector residual, DlsMat Jacobian, void* problem_data, 
+                 N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept:
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        band Jacobian function.
+        """
+        return ida_jac_band_data(t, c, yv, yvdot, <ProblemData>problem_data, Jacobian.data, 
+                                 Jacobian.ldim, Jacobian.s_mu, Jacobian.mu, Jacobian.ml)
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int ida_bbd_local(sunindextype Nlocal, realtype t, N_Vector yv, N_Vector yvdot, N_Vector gv, void* problem_data) noexcept:
+        """
+        The local function of the band-block-diagonal preconditioner, which
+        in the serial case is the residual itself.
+        """
+        return ida_res(t, yv, yvdot, gv, problem_data)
+
 cdef int ida_root(realtype t, N_Vector yv, N_Vector yvdot, realtype *gout, void* problem_data) noexcept:
     """
     This method is used to connect the Assimulo.Problem.state_events to the Sundials
@@ -690,18 +1142,26 @@ cdef int ida_root(realtype t, N_Vector yv, N_Vector yvdot, realtype *gout, void*
     cdef np.ndarray yd = pData.work_yd
     cdef int i
     
+    if pData.ROOT_CFUNC != NULL: #Low-level callback
+        if (<c_events_res_t>pData.ROOT_CFUNC)(t, (<N_VectorContent_Serial>yv.content).data, 
+                                              (<N_VectorContent_Serial>yvdot.content).data, gout, pData.ROOT_CDATA) != 0:
+            return IDA_RTFUNC_FAIL
+        return IDA_SUCCESS
+    
     nv2arr_inplace(yv, y)
     nv2arr_inplace(yvdot, yd)
     
     try:
+        if pData.root_out: #In-place evaluation into gout
+            (<object>pData.ROOT)(t,y,yd,<list>pData.sw if pData.sw != NULL else None,out=realtype2view(gout, pData.dimRoot))
+            return IDA_SUCCESS
         if pData.sw != NULL:
             root=(<object>pData.ROOT)(t,y,yd,<list>pData.sw)  #Call to the Python root function
         else:
             root=(<object>pData.ROOT)(t,y,yd,None)  #Call to the Python root function
     
         #memcpy(gout,<realtype*>root.data,pData.memSizeRoot) #Copy data from the return to the output
-        for i in range(pData.dimRoot):
-            gout[i]=root[i]
+        realtype2view(gout, pData.dimRoot)[:] = root
         
         return IDA_SUCCESS
     except BaseException:
@@ -723,15 +1183,14 @@ cdef int ida_jacv(realtype t, N_Vector yy, N_Vector yp, N_Vector rr, N_Vector vv
     cdef realtype* jacvptr=(<N_VectorContent_Serial>Jv.content).data
     
     if pData.dimSens>0: #Sensitivity activated
-        p = realtype2arr(pData.p,pData.dimSens)
+        p = pData.load_p()
         try:
             if pData.sw != NULL:
                 jacv = (<object>pData.JACV)(t,y,yd,res,v,cj,sw=<list>pData.sw,p=p)
             else:
                 jacv = (<object>pData.JACV)(t,y,yd,res,v,cj,p=p)
         
-            for i in range(pData.dim):
-                jacvptr[i] = jacv[i]
+            realtype2view(jacvptr, pData.dim)[:] = jacv
             
             return SPGMR_SUCCESS
         except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -746,8 +1205,7 @@ cdef int ida_jacv(realtype t, N_Vector yy, N_Vector yp, N_Vector rr, N_Vector vv
             else:
                 jacv = (<object>pData.JACV)(t,y,yd,res,v,cj)
             
-            for i in range(pData.dim):
-                jacvptr[i] = jacv[i]
+            realtype2view(jacvptr, pData.dim)[:] = jacv
             
             return SPGMR_SUCCESS
         except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -756,6 +1214,264 @@ cdef int ida_jacv(realtype t, N_Vector yy, N_Vector yp, N_Vector rr, N_Vector vv
             traceback.print_exc()
             return SPGMR_PSOLVE_FAIL_UNREC
 
+# The ILU(0) preconditioner of the Krylov solvers
+# ===============================================
+cdef class ILUPreconditioner:
+    """
+    Incomplete LU factorization without fill-in, ILU(0), of the iteration
+    matrix alpha*I + beta*J on the sparsity pattern of the Jacobian J (and
+    the diagonal). The factorization and the triangular solves run without
+    Python objects, the Jacobian is kept for later factorizations.
+    """
+    cdef:
+        int n
+        int njacs          #Number of Jacobian evaluations since the last statistics
+        np.ndarray jac_indptr  #Row pointers of the Jacobian (CSR)
+        np.ndarray jac_indices #Column indices of the Jacobian
+        np.ndarray jac_data    #Values of the Jacobian, None until evaluated
+        np.ndarray indptr      #Row pointers of the factors
+        np.ndarray indices     #Column indices of the factors
+        np.ndarray values      #The factors, L (unit diagonal, not stored) and U
+        np.ndarray diag        #Positions of the diagonal entries
+        np.ndarray work        #Positions of the entries of the current row
+    
+    def __init__(self, int n):
+        self.n = n
+        self.njacs = 0
+        self.jac_data = None
+        self.indptr = np.empty(n + 1, dtype=np.intc)
+        self.indices = np.empty(0, dtype=np.intc)
+        self.values = np.empty(0)
+        self.diag = np.empty(n, dtype=np.intc)
+        self.work = np.full(n, -1, dtype=np.intc)
+    
+    cdef set_jac(self, object jac):
+        """
+        Stores a copy of the (dense or sparse) Jacobian in CSR format.
+        """
+        jac = sps.csr_matrix(jac, dtype=np.float64, copy=True)
+        jac.sum_duplicates() #Also sorts the indices
+        self.jac_indptr = np.ascontiguousarray(jac.indptr, dtype=np.intc)
+        self.jac_indices = np.ascontiguousarray(jac.indices, dtype=np.intc)
+        self.jac_data = jac.data
+        if self.values.shape[0] < jac.nnz + self.n:
+            self.indices = np.empty(jac.nnz + self.n, dtype=np.intc)
+            self.values = np.empty(jac.nnz + self.n)
+        self.njacs += 1
+    
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    @cython.cdivision(True)
+    cdef int factor(self, realtype alpha, realtype beta) noexcept:
+        """
+        Forms alpha*I + beta*J and factorizes it in-place. Returns 1 on a
+        zero pivot.
+        """
+        cdef int* jptr = <int*>PyArray_DATA(self.jac_indptr)
+        cdef int* jind = <int*>PyArray_DATA(self.jac_indices)
+        cdef realtype* jval = <realtype*>PyArray_DATA(self.jac_data)
+        cdef int* ptr = <int*>PyArray_DATA(self.indptr)
+        cdef int* ind = <int*>PyArray_DATA(self.indices)
+        cdef realtype* val = <realtype*>PyArray_DATA(self.values)
+        cdef int* diag = <int*>PyArray_DATA(self.diag)
+        cdef int* work = <int*>PyArray_DATA(self.work)
+        cdef int i, j, k, kk, pos = 0
+        
+        for i in range(self.n): #The structure of J and the diagonal
+            ptr[i] = pos
+            diag[i] = -1
+            for k in range(jptr[i], jptr[i+1]):
+                j = jind[k]
+                if j > i and diag[i] < 0:
+                    ind[pos], val[pos], diag[i] = i, alpha, pos
+                    pos += 1
+                ind[pos], val[pos] = j, beta*jval[k]
+                if j == i:
+                    val[pos] += alpha
+                    diag[i] = pos
+                pos += 1
+            if diag[i] < 0:
+                ind[pos], val[pos], diag[i] = i, alpha, pos
+                pos += 1
+        ptr[self.n] = pos
+        
+        for i in range(self.n): #Row-wise elimination, only on the existing entries
+            for k in range(ptr[i], ptr[i+1]):
+                work[ind[k]] = k
+            for k in range(ptr[i], diag[i]):
+                j = ind[k]
+                val[k] /= val[diag[j]]
+                for kk in range(diag[j]+1, ptr[j+1]):
+                    if work[ind[kk]] >= 0:
+                        val[work[ind[kk]]] -= val[k]*val[kk]
+            for k in range(ptr[i], ptr[i+1]):
+                work[ind[k]] = -1
+            if val[diag[i]] == 0.0:
+                return 1
+        return 0
+    
+    @cython.cdivision(True)
+    cdef void solve(self, realtype* r, realtype* z) noexcept:
+        """
+        Solves LU z = r by forward and backward substitution.
+        """
+        cdef int* ptr = <int*>PyArray_DATA(self.indptr)
+        cdef int* ind = <int*>PyArray_DATA(self.indices)
+        cdef realtype* val = <realtype*>PyArray_DATA(self.values)
+        cdef int* diag = <int*>PyArray_DATA(self.diag)
+        cdef int i, k
+        cdef realtype s
+        
+        for i in range(self.n):
+            s = r[i]
+            for k in range(ptr[i], diag[i]):
+                s -= val[k]*z[ind[k]]
+            z[i] = s
+        for i in range(self.n-1, -1, -1):
+            s = z[i]
+            for k in range(diag[i]+1, ptr[i+1]):
+                s -= val[k]*z[ind[k]]
+            z[i] = s/val[diag[i]]
+
+cdef object cv_jac_matrix(realtype t, ProblemData pData):
+    """
+    Evaluates the Jacobian at work_y as a dense array or sparse matrix.
+    """
+    cdef np.ndarray y = pData.work_y
+    cdef np.ndarray data
+    cdef int ret
+    
+    if pData.jac_pattern_out: #Fixed sparsity pattern, only the values are evaluated
+        data = np.empty(pData.jac_indices.shape[0])
+        ret = cv_jac_pattern_data(t, pData, <realtype*>PyArray_DATA(data), data.shape[0])
+        if ret == CVDLS_JACFUNC_RECVR:
+            raise AssimuloRecoverableError("The evaluation of the Jacobian failed.")
+        elif ret != CVDLS_SUCCESS:
+            raise AssimuloException("The evaluation of the Jacobian failed.")
+        return sps.csc_matrix((data, pData.jac_indices, pData.jac_indptr), shape=(pData.dim, pData.dim))
+    
+    if pData.JAC_CFUNC != NULL: #Low-level callback, writes the column-major Jacobian
+        data = np.empty((pData.dim, pData.dim), order='F')
+        ret = (<c_jac_t>pData.JAC_CFUNC)(t, <realtype*>PyArray_DATA(y), <realtype*>PyArray_DATA(data), pData.JAC_CDATA)
+        if ret > 0:
+            raise AssimuloRecoverableError("The evaluation of the Jacobian failed.")
+        elif ret < 0:
+            raise AssimuloException("The evaluation of the Jacobian failed.")
+        return data
+    
+    if pData.dimSens > 0: #Sensitivity activated
+        p = pData.load_p()
+        if pData.sw != NULL:
+            return (<object>pData.JAC)(t,y,sw=<list>pData.sw,p=p)
+        return (<object>pData.JAC)(t,y,p)
+    if pData.sw != NULL:
+        return (<object>pData.JAC)(t,y,sw=<list>pData.sw)
+    return (<object>pData.JAC)(t,y)
+
+cdef object ida_jac_matrix(realtype t, realtype c, ProblemData pData):
+    """
+    Evaluates the Jacobian dF/dy + c*dF/dyd at work_y and work_yd as a
+    dense array or sparse matrix.
+    """
+    cdef np.ndarray y = pData.work_y
+    cdef np.ndarray yd = pData.work_yd
+    cdef np.ndarray data
+    cdef int ret
+    
+    if pData.JAC_CFUNC != NULL: #Low-level callback, writes the column-major Jacobian
+        data = np.empty((pData.dim, pData.dim), order='F')
+        ret = (<c_jac_res_t>pData.JAC_CFUNC)(c, t, <realtype*>PyArray_DATA(y), <realtype*>PyArray_DATA(yd),
+                                            <realtype*>PyArray_DATA(data), pData.JAC_CDATA)
+        if ret > 0:
+            raise AssimuloRecoverableError("The evaluation of the Jacobian failed.")
+        elif ret < 0:
+            raise AssimuloException("The evaluation of the Jacobian failed.")
+        return data
+    
+    if pData.dimSens != 0: #Sensitivity activated
+        p = pData.load_p()
+        if pData.sw != NULL:
+            args, kwargs = (c,t,y,yd), {"sw": <list>pData.sw, "p": p}
+        else:
+            args, kwargs = (c,t,y,yd), {"p": p}
+    elif pData.sw != NULL:
+        args, kwargs = (c,t,y,yd,<list>pData.sw), {}
+    else:
+        args, kwargs = (c,t,y,yd), {}
+    
+    if pData.jac_pattern_out: #Fixed sparsity pattern, only the values are evaluated
+        data = np.empty(pData.jac_indices.shape[0])
+        (<object>pData.JAC)(*args, out=data, **kwargs)
+        return sps.csc_matrix((data, pData.jac_indices, pData.jac_indptr), shape=(pData.dim, pData.dim))
+    return (<object>pData.JAC)(*args, **kwargs)
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int cv_ilu_setup(realtype t, N_Vector yy, N_Vector fyy,
+                      bint jok, bint *jcurPtr,
+                      realtype gamma, void *problem_data) noexcept:
+        """
+        Factorizes I - gamma*J, the Jacobian is reevaluated unless jok.
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef ILUPreconditioner ilu = pData.ilu
+        
+        jcurPtr[0] = 0
+        if not jok or ilu.jac_data is None:
+            nv2arr_inplace(yy, pData.work_y)
+            try:
+                ilu.set_jac(cv_jac_matrix(t, pData))
+            except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+                return CV_REC_ERR #Recoverable Error (See Sundials description)
+            except BaseException:
+                traceback.print_exc()
+                return CV_UNREC_RHSFUNC_ERR
+            jcurPtr[0] = 1
+        
+        if ilu.factor(1.0, -gamma) != 0:
+            return CV_REC_ERR #Zero pivot, recoverable with a smaller step-size
+        return CVSPILS_SUCCESS
+    
+    cdef int cv_ilu_solve(realtype t, N_Vector yy, N_Vector fyy,
+                      N_Vector rr, N_Vector z,
+                      realtype gamma, realtype delta,
+                      int lr, void *problem_data) noexcept:
+        """
+        Applies the ILU(0) factors of I - gamma*J.
+        """
+        (<ProblemData>problem_data).ilu.solve((<N_VectorContent_Serial>rr.content).data, (<N_VectorContent_Serial>z.content).data)
+        return CVSPILS_SUCCESS
+    
+    cdef int ida_ilu_setup(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      realtype cj, void *problem_data) noexcept:
+        """
+        Evaluates and factorizes dF/dy + cj*dF/dyd.
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef ILUPreconditioner ilu = pData.ilu
+        
+        nv2arr_inplace(yy, pData.work_y)
+        nv2arr_inplace(yp, pData.work_yd)
+        try:
+            ilu.set_jac(ida_jac_matrix(t, cj, pData))
+        except(np.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+            return IDA_REC_ERR #Recoverable Error (See Sundials description)
+        except BaseException:
+            traceback.print_exc()
+            return IDA_RES_FAIL
+        
+        if ilu.factor(0.0, 1.0) != 0:
+            return IDA_REC_ERR #Zero pivot, recoverable with a smaller step-size
+        return IDASPILS_SUCCESS
+    
+    cdef int ida_ilu_solve(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      N_Vector rvec, N_Vector zvec, realtype cj, realtype delta,
+                      void *problem_data) noexcept:
+        """
+        Applies the ILU(0) factors of dF/dy + cj*dF/dyd.
+        """
+        (<ProblemData>problem_data).ilu.solve((<N_VectorContent_Serial>rvec.content).data, (<N_VectorContent_Serial>zvec.content).data)
+        return IDASPILS_SUCCESS
+
 # Error handling callback functions
 # =================================
 IF SUNDIALS_VERSION >= (7,0,0):
@@ -828,6 +1544,13 @@ cdef class ProblemData:
         void *SENS         #Should store the sensitivity function
         void *PREC_SOLVE   #Should store the preconditioner solve function
         void *PREC_SETUP   #Should store the preconditioner setup function
+        void *RHS_CFUNC    #Low-level (C) residual or right-hand-side, called without Python objects
+        void *RHS_CDATA    #User data of the low-level residual or right-hand-side
+        void *JAC_CFUNC    #Low-level (C) dense jacobian
+        void *JAC_DATA_CFUNC #Low-level (C) values of a jacobian with a fixed sparsity pattern
+        void *JAC_CDATA    #User data of the low-level jacobian
+        void *ROOT_CFUNC   #Low-level (C) root function
+        void *ROOT_CDATA   #User data of the low-level root function
         void *y            #Temporary storage for the states
         void *yd           #Temporary storage for the derivatives
         void *sw           #Storage for the switches
@@ -840,12 +1563,115 @@ cdef class ProblemData:
         int memSizeRoot    #dimRoot*sizeof(realtype) used when copying memory
         int memSizeJac     #dim*dim*sizeof(realtype) used when copying memory
         int verbose        #Defines the verbosity
+        int fcn_out        #The residual or right-hand-side is evaluated in-place (keyword out)
+        int root_out       #The root function is evaluated in-place (keyword out)
+        int jac_out        #The dense Jacobian is evaluated in-place (keyword out)
+        int jac_pattern_out #Only the values of the fixed pattern Jacobian are evaluated in-place (keyword out)
+        int jac_band_out   #The band Jacobian is evaluated in-place into the band storage (keyword out)
+        int sens_out       #The sensitivity right-hand-side is evaluated in-place (keyword out)
+        int warm_start     #Keep a copy of the Jacobian for the next simulation
+        int jac_stored     #A copy of the Jacobian is stored in work_jac
+        int jac_reuse      #Use the stored Jacobian at the next Jacobian evaluation
+        realtype jac_c     #The coefficient c for which the stored (IDA) Jacobian was evaluated
         object PREC_DATA   #Arbitrary data from the preconditioner
         np.ndarray work_y
         np.ndarray work_yd
         np.ndarray work_ys
+        np.ndarray work_ysdot
+        np.ndarray work_p
+        np.ndarray work_jac
+        np.ndarray jac_indices #Row indices of the fixed Jacobian sparsity pattern
+        np.ndarray jac_indptr  #Column pointers of the fixed Jacobian sparsity pattern
+        np.ndarray jac_perm    #Positions of the CSR ordered values in the CSC ordered pattern (None for CSC)
+        np.ndarray work_jac_data #The CSC ordered values of the pattern, reordered into a CSR matrix
+        int jac_csr        #The sparse Jacobian is stored in CSR (instead of CSC) format
+        ILUPreconditioner ilu #The ILU(0) preconditioner (precond "ILU")
         
     cdef create_work_arrays(self):
         self.work_y = np.empty(self.dim)
         self.work_yd = np.empty(self.dim)
-        self.work_ys = np.empty((self.dim, self.dimSens))
+        self.work_ys = np.empty((self.dim, self.dimSens), order='F')
+        self.work_ysdot = np.empty((self.dim, self.dimSens), order='F')
+        self.work_p = np.empty(self.dimSens)
+    
+    cdef np.ndarray load_p(self):
+        """
+        Returns the (possibly perturbed) parameters in the reused work array.
+        """
+        memcpy(PyArray_DATA(self.work_p), self.p, self.dimSens*sizeof(realtype))
+        return self.work_p
+    
+    cdef set_c_callbacks(self, object rhs, object jac, object root, int implicit):
+        """
+        Stores the function pointers of the low-level (C) callbacks among
+        the given functions, these are called directly by the callbacks.
+        Only callbacks bound to the problem type (implicit) are used.
+        """
+        self.RHS_CFUNC = self.RHS_CDATA = NULL
+        self.JAC_CFUNC = self.JAC_DATA_CFUNC = self.JAC_CDATA = NULL
+        self.ROOT_CFUNC = self.ROOT_CDATA = NULL
+        if isinstance(rhs, LowLevelCallback) and (<LowLevelCallback>rhs).implicit == implicit:
+            self.RHS_CFUNC = (<LowLevelCallback>rhs).function
+            self.RHS_CDATA = (<LowLevelCallback>rhs).user_data
+        if isinstance(jac, LowLevelCallback) and (<LowLevelCallback>jac).implicit == implicit:
+            if (<LowLevelCallback>jac).pattern is None:
+                self.JAC_CFUNC = (<LowLevelCallback>jac).function
+            else:
+                self.JAC_DATA_CFUNC = (<LowLevelCallback>jac).function
+            self.JAC_CDATA = (<LowLevelCallback>jac).user_data
+        if isinstance(root, LowLevelCallback) and (<LowLevelCallback>root).implicit == implicit:
+            self.ROOT_CFUNC = (<LowLevelCallback>root).function
+            self.ROOT_CDATA = (<LowLevelCallback>root).user_data
+    
+    cdef set_jac_pattern(self, object pattern, int pattern_out, int csr = 0):
+        """
+        Stores the structure of a fixed (CSC) Jacobian sparsity pattern with
+        the index type of the sparse matrices. With csr, the structure is
+        stored in CSR format, the values are still evaluated in CSC order and
+        then reordered.
+        """
+        self.jac_pattern_out = pattern_out if pattern is not None else 0
+        self.jac_csr = csr
+        self.jac_perm = self.work_jac_data = None
+        if pattern is None:
+            self.jac_indices = self.jac_indptr = None
+        elif csr:
+            positions = sps.csc_matrix((np.arange(pattern.nnz), pattern.indices, pattern.indptr), shape=pattern.shape).tocsr()
+            self.jac_indices = np.ascontiguousarray(positions.indices, dtype=SPARSE_INDEX_TYPE)
+            self.jac_indptr = np.ascontiguousarray(positions.indptr, dtype=SPARSE_INDEX_TYPE)
+            self.jac_perm = np.ascontiguousarray(positions.data, dtype=np.intp)
+            self.work_jac_data = np.empty(pattern.nnz)
+        else:
+            self.jac_indices = np.ascontiguousarray(pattern.indices, dtype=SPARSE_INDEX_TYPE)
+            self.jac_indptr = np.ascontiguousarray(pattern.indptr, dtype=SPARSE_INDEX_TYPE)
+    
+    cdef set_warm_start(self, int warm_start):
+        self.warm_start = warm_start
+        if warm_start and self.work_jac is None:
+            self.work_jac = np.empty(self.dim*self.dim)
+        if not warm_start:
+            self.jac_stored = 0
+            self.jac_reuse = 0
+    
+    cdef int load_jac(self, realtype* jac_data, realtype c) noexcept:
+        """
+        Copies the Jacobian stored from the previous simulation into
+        jac_data. Returns 1 if the stored Jacobian has been used.
+        """
+        if not self.jac_reuse:
+            return 0
+        self.jac_reuse = 0
+        #The same range of c/c_old for which IDA keeps its current Jacobian
+        if c/self.jac_c < 0.6 or c/self.jac_c > 5.0/3.0:
+            return 0
+        memcpy(jac_data, PyArray_DATA(self.work_jac), self.memSizeJac)
+        return 1
+    
+    cdef void store_jac(self, realtype* jac_data, realtype c) noexcept:
+        """
+        Keeps a copy of the Jacobian for the next simulation.
+        """
+        if self.warm_start:
+            memcpy(PyArray_DATA(self.work_jac), jac_data, self.memSizeJac)
+            self.jac_c = c
+            self.jac_stored = 1
@@ -72,6 +72,8 @@ cdef extern from "sundials/sundials_nvector.h":
     cdef struct _generic_N_Vector:
         void* content
         N_Vector_Ops ops
+    
+    N_Vector N_VCloneEmpty(N_Vector w) noexcept
 
 cdef extern from "nvector/nvector_serial.h":
     cdef struct _N_VectorContent_Serial:
@@ -195,6 +197,24 @@ IF SUNDIALS_VERSION >= (3,0,0):
             SUNMatrix SUNSparseMatrix(sunindextype M, sunindextype N, sunindextype NNZ, int sparsetype, SUNContext ctx) noexcept
         ELSE:
             SUNMatrix SUNSparseMatrix(sunindextype M, sunindextype N, sunindextype NNZ, int sparsetype) noexcept
+    cdef extern from "sunmatrix/sunmatrix_band.h":
+        ctypedef _SUNMatrixContent_Band *SUNMatrixContent_Band
+        cdef struct _SUNMatrixContent_Band:
+            sunindextype M
+            sunindextype N
+            sunindextype ldim
+            sunindextype mu
+            sunindextype ml
+            sunindextype s_mu
+            realtype *data
+            sunindextype ldata
+            realtype **cols
+        IF SUNDIALS_VERSION >= (6,0,0):
+            SUNMatrix SUNBandMatrix(sunindextype N, sunindextype mu, sunindextype ml, SUNContext ctx) noexcept
+        ELIF SUNDIALS_VERSION >= (4,0,0):
+            SUNMatrix SUNBandMatrix(sunindextype N, sunindextype mu, sunindextype ml) noexcept
+        ELSE:
+            SUNMatrix SUNBandMatrix(sunindextype N, sunindextype mu, sunindextype ml, sunindextype smu) noexcept
     cdef extern from "sunlinsol/sunlinsol_dense.h":
         IF SUNDIALS_VERSION >= (4,0,0):
             IF SUNDIALS_VERSION >= (6,0,0):
@@ -203,6 +223,14 @@ IF SUNDIALS_VERSION >= (3,0,0):
                 SUNLinearSolver SUNLinSol_Dense(N_Vector y, SUNMatrix A) noexcept
         ELSE:
             SUNLinearSolver SUNDenseLinearSolver(N_Vector y, SUNMatrix A) noexcept
+    cdef extern from "sunlinsol/sunlinsol_band.h":
+        IF SUNDIALS_VERSION >= (4,0,0):
+            IF SUNDIALS_VERSION >= (6,0,0):
+                SUNLinearSolver SUNLinSol_Band(N_Vector y, SUNMatrix A, SUNContext ctx) noexcept
+            ELSE:
+                SUNLinearSolver SUNLinSol_Band(N_Vector y, SUNMatrix A) noexcept
+        ELSE:
+            SUNLinearSolver SUNBandLinearSolver(N_Vector y, SUNMatrix A) noexcept
     cdef extern from "sunlinsol/sunlinsol_spgmr.h":
         IF SUNDIALS_VERSION >= (4,0,0):
             IF SUNDIALS_VERSION >= (6,0,0):
@@ -211,6 +239,40 @@ IF SUNDIALS_VERSION >= (3,0,0):
                 SUNLinearSolver SUNLinSol_SPGMR(N_Vector y, int pretype, int maxl) noexcept
         ELSE:
             SUNLinearSolver SUNSPGMR(N_Vector y, int pretype, int maxl) noexcept
+        IF SUNDIALS_VERSION >= (4,0,0):
+            int SUNLinSol_SPGMRSetGSType(SUNLinearSolver S, int gstype) noexcept
+            int SUNLinSol_SPGMRSetMaxRestarts(SUNLinearSolver S, int maxrs) noexcept
+        ELSE:
+            int SUNSPGMRSetGSType(SUNLinearSolver S, int gstype) noexcept
+            int SUNSPGMRSetMaxRestarts(SUNLinearSolver S, int maxrs) noexcept
+    cdef extern from "sunlinsol/sunlinsol_spfgmr.h":
+        IF SUNDIALS_VERSION >= (4,0,0):
+            IF SUNDIALS_VERSION >= (6,0,0):
+                SUNLinearSolver SUNLinSol_SPFGMR(N_Vector y, int pretype, int maxl, SUNContext ctx) noexcept
+            ELSE:
+                SUNLinearSolver SUNLinSol_SPFGMR(N_Vector y, int pretype, int maxl) noexcept
+            int SUNLinSol_SPFGMRSetGSType(SUNLinearSolver S, int gstype) noexcept
+            int SUNLinSol_SPFGMRSetMaxRestarts(SUNLinearSolver S, int maxrs) noexcept
+        ELSE:
+            SUNLinearSolver SUNSPFGMR(N_Vector y, int pretype, int maxl) noexcept
+            int SUNSPFGMRSetGSType(SUNLinearSolver S, int gstype) noexcept
+            int SUNSPFGMRSetMaxRestarts(SUNLinearSolver S, int maxrs) noexcept
+    cdef extern from "sunlinsol/sunlinsol_spbcgs.h":
+        IF SUNDIALS_VERSION >= (4,0,0):
+            IF SUNDIALS_VERSION >= (6,0,0):
+                SUNLinearSolver SUNLinSol_SPBCGS(N_Vector y, int pretype, int maxl, SUNContext ctx) noexcept
+            ELSE:
+                SUNLinearSolver SUNLinSol_SPBCGS(N_Vector y, int pretype, int maxl) noexcept
+        ELSE:
+            SUNLinearSolver SUNSPBCGS(N_Vector y, int pretype, int maxl) noexcept
+    cdef extern from "sunlinsol/sunlinsol_sptfqmr.h":
+        IF SUNDIALS_VERSION >= (4,0,0):
+            IF SUNDIALS_VERSION >= (6,0,0):
+                SUNLinearSolver SUNLinSol_SPTFQMR(N_Vector y, int pretype, int maxl, SUNContext ctx) noexcept
+            ELSE:
+                SUNLinearSolver SUNLinSol_SPTFQMR(N_Vector y, int pretype, int maxl) noexcept
+        ELSE:
+            SUNLinearSolver SUNSPTFQMR(N_Vector y, int pretype, int maxl) noexcept
 
 ELSE: 
     #Dummy defines
@@ -218,6 +280,7 @@ ELSE:
     ctypedef void *SUNMatrix
     ctypedef void *SUNMatrixContent_Dense
     ctypedef void *SUNMatrixContent_Sparse
+    ctypedef void *SUNMatrixContent_Band
     ctypedef int sunindextype
 
 
@@ -293,6 +356,36 @@ IF SUNDIALS_WITH_SUPERLU:
 ELSE:
     cdef inline int with_superlu() noexcept: return 0
 
+IF SUNDIALS_WITH_KLU:
+    cdef inline int with_klu() noexcept: return 1
+ELSE:
+    cdef inline int with_klu() noexcept: return 0
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    IF SUNDIALS_WITH_KLU:
+        cdef extern from "sunlinsol/sunlinsol_klu.h":
+            IF SUNDIALS_VERSION >= (6,0,0):
+                SUNLinearSolver SUNLinSol_KLU(N_Vector y, SUNMatrix A, SUNContext ctx) noexcept
+            ELIF SUNDIALS_VERSION >= (4,0,0):
+                SUNLinearSolver SUNLinSol_KLU(N_Vector y, SUNMatrix A) noexcept
+            ELSE:
+                SUNLinearSolver SUNKLU(N_Vector y, SUNMatrix A) noexcept
+            IF SUNDIALS_VERSION >= (4,0,0):
+                int SUNLinSol_KLUSetOrdering(SUNLinearSolver S, int ordering_choice) noexcept
+            ELSE:
+                int SUNKLUSetOrdering(SUNLinearSolver S, int ordering_choice) noexcept
+    ELSE:
+        IF SUNDIALS_VERSION >= (6,0,0):
+            cdef inline SUNLinearSolver SUNLinSol_KLU(N_Vector y, SUNMatrix A, SUNContext ctx) noexcept: return NULL
+        ELIF SUNDIALS_VERSION >= (4,0,0):
+            cdef inline SUNLinearSolver SUNLinSol_KLU(N_Vector y, SUNMatrix A) noexcept: return NULL
+        ELSE:
+            cdef inline SUNLinearSolver SUNKLU(N_Vector y, SUNMatrix A) noexcept: return NULL
+        IF SUNDIALS_VERSION >= (4,0,0):
+            cdef inline int SUNLinSol_KLUSetOrdering(SUNLinearSolver S, int ordering_choice) noexcept: return -1
+        ELSE:
+            cdef inline int SUNKLUSetOrdering(SUNLinearSolver S, int ordering_choice) noexcept: return -1
+
 IF SUNDIALS_VERSION >= (4,0,0):
     cdef extern from "cvodes/cvodes.h":
         IF SUNDIALS_VERSION >= (6,0,0):
@@ -478,6 +571,12 @@ ELSE:
                        DlsMat Jac, void *user_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept
         int CVDlsSetDenseJacFn(void *cvode_mem, CVDlsDenseJacFn djac) noexcept
 
+    cdef extern from "cvodes/cvodes_band.h":
+        int CVBand(void *cvode_mem, long int N, long int mupper, long int mlower) noexcept
+        ctypedef int (*CVDlsBandJacFn)(long int N, long int mupper, long int mlower, realtype t, N_Vector y, N_Vector fy, 
+                       DlsMat Jac, void *user_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept
+        int CVDlsSetBandJacFn(void *cvode_mem, CVDlsBandJacFn bjac) noexcept
+
     cdef extern from "cvodes/cvodes_spgmr.h":
         int CVSpgmr(void *cvode_mem, int pretype, int max1) noexcept
     
@@ -523,6 +622,8 @@ IF SUNDIALS_VERSION >= (6,0,0):
         int CVodeGetNumRhsEvals(void *cvode_mem, long int *nfevalsLS) noexcept #Number of res evals due to jac*vector evals
         int CVodeGetNumPrecEvals(void *cvode_mem, long int *npevals) noexcept
         int CVodeGetNumPrecSolves(void *cvode_mem, long int *npsolves) noexcept
+        int CVodeGetNumLinIters(void *cvode_mem, long int *nliters) noexcept
+        int CVodeGetNumLinConvFails(void *cvode_mem, long int *nlcfails) noexcept
 ELSE:
     cdef extern from "cvodes/cvodes_spils.h":
         IF SUNDIALS_VERSION >= (4,0,0):
@@ -531,12 +632,28 @@ ELSE:
             int CVodeGetNumRhsEvals(void *cvode_mem, long int *nfevalsLS) noexcept #Number of res evals due to jac*vector evals
             int CVodeGetNumPrecEvals(void *cvode_mem, long int *npevals) noexcept
             int CVodeGetNumPrecSolves(void *cvode_mem, long int *npsolves) noexcept
+            int CVodeGetNumLinIters(void *cvode_mem, long int *nliters) noexcept
+            int CVodeGetNumLinConvFails(void *cvode_mem, long int *nlcfails) noexcept
         ELSE:
             int CVSpilsSetPreconditioner(void *cvode_mem, CVSpilsPrecSetupFn psetup, CVSpilsPrecSolveFn psolve) noexcept
             int CVSpilsGetNumJtimesEvals(void *cvode_mem, long int *njvevals) noexcept #Number of jac*vector evals
             int CVSpilsGetNumRhsEvals(void *cvode_mem, long int *nfevalsLS) noexcept #Number of res evals due to jac*vector evals
             int CVSpilsGetNumPrecEvals(void *cvode_mem, long int *npevals) noexcept
             int CVSpilsGetNumPrecSolves(void *cvode_mem, long int *npsolves) noexcept
+            int CVSpilsGetNumLinIters(void *cvode_mem, long int *nliters) noexcept
+            int CVSpilsGetNumConvFails(void *cvode_mem, long int *nlcfails) noexcept
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef extern from "cvodes/cvodes_bandpre.h":
+        int CVBandPrecInit(void *cvode_mem, sunindextype N, sunindextype mu, sunindextype ml) noexcept
+        int CVBandPrecGetNumRhsEvals(void *cvode_mem, long int *nfevalsBP) noexcept
+
+    cdef extern from "cvodes/cvodes_bbdpre.h":
+        ctypedef int (*CVLocalFn)(sunindextype Nlocal, realtype t, N_Vector y, N_Vector g, void *user_data) noexcept
+        ctypedef int (*CVCommFn)(sunindextype Nlocal, realtype t, N_Vector y, void *user_data) noexcept
+        int CVBBDPrecInit(void *cvode_mem, sunindextype Nlocal, sunindextype mudq, sunindextype mldq,
+                          sunindextype mukeep, sunindextype mlkeep, realtype dqrely, CVLocalFn gloc, CVCommFn cfn) noexcept
+        int CVBBDPrecGetNumGfnEvals(void *cvode_mem, long int *ngevalsBBDP) noexcept
 
 cdef extern from "idas/idas.h":
     ctypedef int (*IDAResFn)(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr, void *user_data) noexcept
@@ -689,6 +806,13 @@ ELSE:
                        N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept
         int IDADlsSetDenseJacFn(void *ida_mem, IDADlsDenseJacFn djac)
     
+    cdef extern from "idas/idas_band.h":
+        int IDABand(void *ida_mem, long int Neq, long int mupper, long int mlower)
+        ctypedef int (*IDADlsBandJacFn)(long int Neq, long int mupper, long int mlower, realtype tt, realtype cj, 
+                       N_Vector yy, N_Vector yp, N_Vector rr, DlsMat Jac, void *user_data, 
+                       N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) noexcept
+        int IDADlsSetBandJacFn(void *ida_mem, IDADlsBandJacFn bjac)
+    
     cdef extern from "idas/idas_spgmr.h":
         int IDASpgmr(void *ida_mem, int max1)
         
@@ -699,14 +823,45 @@ IF SUNDIALS_VERSION >= (6,0,0):
     cdef extern from "ida/ida_ls.h": 
         int IDAGetNumJtimesEvals(void *ida_mem, long int *njvevals) #Number of jac*vector
         int IDAGetNumResEvals(void *ida_mem, long int *nfevalsLS) #Number of rhs due to jac*vector
+        int IDAGetNumLinIters(void *ida_mem, long int *nliters) #Number of linear iterations
+        int IDAGetNumLinConvFails(void *ida_mem, long int *nlcfails) #Number of linear convergence failures
 ELSE:
     cdef extern from "idas/idas_spils.h":
         IF SUNDIALS_VERSION >= (4,0,0):
             int IDAGetNumJtimesEvals(void *ida_mem, long int *njvevals) #Number of jac*vector
             int IDAGetNumResEvals(void *ida_mem, long int *nfevalsLS) #Number of rhs due to jac*vector
+            int IDAGetNumLinIters(void *ida_mem, long int *nliters) #Number of linear iterations
+            int IDAGetNumLinConvFails(void *ida_mem, long int *nlcfails) #Number of linear convergence failures
         ELSE:
             int IDASpilsGetNumJtimesEvals(void *ida_mem, long int *njvevals) #Number of jac*vector
             int IDASpilsGetNumResEvals(void *ida_mem, long int *nfevalsLS) #Number of rhs due to jac*vector
+            int IDASpilsGetNumLinIters(void *ida_mem, long int *nliters) #Number of linear iterations
+            int IDASpilsGetNumConvFails(void *ida_mem, long int *nlcfails) #Number of linear convergence failures
+
+IF SUNDIALS_VERSION >= (4,0,0):
+    cdef extern from "idas/idas_ls.h":
+        ctypedef int (*IDALsPrecSetupFn)(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr, realtype c_j, void *user_data) noexcept
+        ctypedef int (*IDALsPrecSolveFn)(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr,
+                      N_Vector rvec, N_Vector zvec, realtype c_j, realtype delta, void *user_data) noexcept
+        int IDASetPreconditioner(void *ida_mem, IDALsPrecSetupFn pset, IDALsPrecSolveFn psolve) noexcept
+        int IDAGetNumPrecEvals(void *ida_mem, long int *npevals) noexcept
+        int IDAGetNumPrecSolves(void *ida_mem, long int *npsolves) noexcept
+ELIF SUNDIALS_VERSION >= (3,0,0):
+    cdef extern from "idas/idas_spils.h":
+        ctypedef int (*IDASpilsPrecSetupFn)(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr, realtype c_j, void *user_data) noexcept
+        ctypedef int (*IDASpilsPrecSolveFn)(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr,
+                      N_Vector rvec, N_Vector zvec, realtype c_j, realtype delta, void *user_data) noexcept
+        int IDASpilsSetPreconditioner(void *ida_mem, IDASpilsPrecSetupFn pset, IDASpilsPrecSolveFn psolve) noexcept
+        int IDASpilsGetNumPrecEvals(void *ida_mem, long int *npevals) noexcept
+        int IDASpilsGetNumPrecSolves(void *ida_mem, long int *npsolves) noexcept
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef extern from "idas/idas_bbdpre.h":
+        ctypedef int (*IDABBDLocalFn)(sunindextype Nlocal, realtype tt, N_Vector yy, N_Vector yp, N_Vector gval, void *user_data) noexcept
+        ctypedef int (*IDABBDCommFn)(sunindextype Nlocal, realtype tt, N_Vector yy, N_Vector yp, void *user_data) noexcept
+        int IDABBDPrecInit(void *ida_mem, sunindextype Nlocal, sunindextype mudq, sunindextype mldq,
+                           sunindextype mukeep, sunindextype mlkeep, realtype dq_rel_yy, IDABBDLocalFn Gres, IDABBDCommFn Gcomm) noexcept
+        int IDABBDPrecGetNumGfnEvals(void *ida_mem, long int *ngevalsBBDP) noexcept
 
 
 ####################
@@ -40,10 +40,12 @@ cdef class ODE:
     cdef int time_limit_activated, display_progress_activated
     cdef double clock_start
     cdef public object _event_info
+    cdef public object _problem_rhs, _problem_res, _problem_jac, _problem_state_events, _problem_rhs_sens
     cdef object _py_err
     
     #cdef public list t,y,yd,p,sw_cur
     cdef public list t_sol, y_sol, yd_sol, p_sol, sw
+    cdef public list step_times, step_orders
         
     cpdef log_message(self, message, int level)
     cpdef log_event(self, double time, object event_info, int level)
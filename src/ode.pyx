@@ -21,16 +21,23 @@ import numpy as np
 cimport numpy as np
 import itertools
 import multiprocessing
+import scipy.sparse as sps
 from timeit import default_timer as timer
 
 from assimulo.exception import ODE_Exception, AssimuloException
-from assimulo.problem import Explicit_Problem, Delay_Explicit_Problem, Implicit_Problem, SingPerturbed_Problem
-from assimulo.support import Statistics
+from assimulo.problem import Explicit_Problem, Delay_Explicit_Problem, Implicit_Problem, SingPerturbed_Problem, cExplicit_Problem
+from assimulo.support import Statistics, LowLevelCallback, ColoredJacobian, ComplexStepSensitivity, detect_jac_pattern, bind_low_level_callbacks, accepts_out
 
 include "constants.pxi" #Includes the constants (textual include)
 
 realtype = float 
 
+def _reconstruct_solver(cls):
+    """
+    Creates an empty solver instance of the given class, used when unpickling.
+    """
+    return cls.__new__(cls)
+
 cdef class ODE:
     """
     Base class for all our integrators.
@@ -49,7 +56,9 @@ cdef class ODE:
                         "store_event_points":True, 
                         "time_limit":0, 
                         "clock_step":False, 
-                        "num_threads":1} #multiprocessing.cpu_count()
+                        "num_threads":1, #multiprocessing.cpu_count()
+                        "record_steps":False,
+                        "step_schedule":None}
         #self.internal_flags = {"state_events":False,"step_events":False,"time_events":False} #Flags for checking the problem (Does the problem have state events?)
         #Flags for determining what the solver supports
         self.supports = {"state_events":False,
@@ -57,10 +66,13 @@ cdef class ODE:
                          "report_continuously":False,
                          "sensitivity_calculations":False,
                          "interpolated_sensitivity_output":False,
-                         "rtol_as_vector":False}
+                         "rtol_as_vector":False,
+                         "step_schedule":False}
         self.problem_info = {"dim":0,"dimRoot":0,"dimSens":0,"state_events":False,"step_events":False,"time_events":False,
                              "jac_fcn":False, "sens_fcn":False, "jacv_fcn":False,"switches":False,"type":0,"jaclag_fcn":False,
-                             'prec_solve':False, 'prec_setup':False, "jac_fcn_nnz": -1}
+                             'prec_solve':False, 'prec_setup':False, "jac_fcn_nnz": -1,
+                             "fcn_out":False, "state_events_out":False, "jac_out":False,
+                             "jac_pattern":None, "jac_pattern_out":False, "fused_jac":False, "sens_out":False}
         #Type of the problem
         #0 = Explicit
         #1 = Implicit
@@ -116,14 +128,92 @@ cdef class ODE:
             self.t0 = float(problem.t0)
         else:
             self.t0 = 0.0
+        
+        #Wrap low-level (C) callbacks, these are called directly by the solvers
+        callbacks = bind_low_level_callbacks(problem, not isinstance(problem, cExplicit_Problem), self.problem_info["dim"],
+                                             self.problem_info["neq"], self.problem_info["switches"], self.problem_info["dimSens"])
+        
+        #The problem functions used by the solvers, the problem's, their low-level wrappers or generated below,
+        #the wrappers and generated ones are kept by the solver and the problem is left unchanged
+        self._problem_rhs = callbacks.get("rhs", getattr(problem, "rhs", None))
+        self._problem_res = callbacks.get("res", getattr(problem, "res", None))
+        self._problem_jac = callbacks.get("jac", getattr(problem, "jac", None))
+        self._problem_state_events = callbacks.get("state_events", getattr(problem, "state_events", None))
+        self._problem_rhs_sens = getattr(problem, "rhs_sens", None)
+        
+        #Sparsity pattern detected by probing the right-hand side
+        jac_pattern = getattr(problem, "jac_pattern", None)
+        if isinstance(jac_pattern, str):
+            if jac_pattern != "auto" or not isinstance(problem, cExplicit_Problem):
+                raise ODE_Exception("The jac_pattern can only be detected ('auto') for explicit problems, got '%s'."%problem.jac_pattern)
+            #The detected pattern is cached on the problem, for the point it was probed at
+            probe = (self.t0, tuple(self.y0), tuple(self.sw0) if self.problem_info["switches"] else None,
+                     tuple(self.p0) if self.problem_info["dimSens"] > 0 else None)
+            cached = getattr(problem, "_detected_jac_pattern", None)
+            if cached is not None and cached[0] == probe:
+                jac_pattern = cached[1]
+            else:
+                args, kwargs = (), {}
+                if self.problem_info["switches"] and self.problem_info["dimSens"] > 0:
+                    kwargs = {"sw": self.sw0.tolist(), "p": self.p0}
+                elif self.problem_info["switches"]:
+                    args = (self.sw0.tolist(),)
+                elif self.problem_info["dimSens"] > 0:
+                    args = (self.p0,)
+                jac_pattern = detect_jac_pattern(self._problem_rhs, self.t0, self.y0, args, kwargs)
+                try:
+                    problem._detected_jac_pattern = (probe, jac_pattern)
+                except AttributeError: #A cdef problem without attribute dictionary
+                    pass
+        
+        #Without jac, a sparsity pattern gives a finite difference Jacobian compressed by column coloring,
+        #complex_step instead differentiates rhs with complex perturbations (exact to machine precision)
+        complex_step = isinstance(problem, cExplicit_Problem) and getattr(problem, "complex_step", False)
+        if complex_step and isinstance(self._problem_rhs, LowLevelCallback):
+            raise ODE_Exception("complex_step requires a Python rhs, a low-level (C) rhs is only evaluated at real states.")
+        if isinstance(problem, cExplicit_Problem) and (jac_pattern is not None or complex_step) and \
+           self._problem_jac is None and not hasattr(problem, "rhs_and_jac") and not self.problem_info["switches"]:
+            if jac_pattern is not None:
+                self._problem_jac = ColoredJacobian(self._problem_rhs, jac_pattern, complex_step = complex_step)
+            else: #Dense, the pattern is not passed on to the solvers
+                self._problem_jac = ColoredJacobian(self._problem_rhs, np.ones((self.problem_info["dim"], self.problem_info["dim"])), complex_step = True)
+        if complex_step and self.problem_info["dimSens"] > 0 and self._problem_rhs_sens is None:
+            self._problem_rhs_sens = ComplexStepSensitivity(self._problem_rhs)
+        
+        #In-place evaluation, the solvers provide the output buffer as the keyword 'out'
+        self.problem_info["fcn_out"] = accepts_out(self._problem_rhs if isinstance(problem, cExplicit_Problem) else self._problem_res)
+        self.problem_info["state_events_out"] = accepts_out(self._problem_state_events)
+        self.problem_info["jac_out"] = accepts_out(self._problem_jac)
+        self.problem_info["sens_out"] = accepts_out(self._problem_rhs_sens)
+        
+        #Fixed sparsity pattern of the Jacobian, the in-place Jacobian then only fills the data vector
+        if isinstance(self._problem_jac, LowLevelCallback) and self._problem_jac.pattern is not None:
+            jac_pattern = self._problem_jac.pattern #The low-level jac only evaluates the values of its pattern
+            self.problem_info["jac_out"] = True
+        if jac_pattern is not None:
+            pattern = sps.csc_matrix(jac_pattern, dtype=float)
+            pattern.sum_duplicates() #Also sorts the indices
+            self.problem_info["jac_pattern"] = pattern
+            self.problem_info["jac_pattern_out"] = self.problem_info["jac_out"]
+            self.problem_info["jac_out"] = False
+            
+        #Right-hand side (residual) and Jacobian computed together, the Jacobian is cached by the solvers
+        if hasattr(problem, "rhs_and_jac" if isinstance(problem, cExplicit_Problem) else "res_and_jac"):
+            self.problem_info["fused_jac"] = problem.jac_use if hasattr(problem, "jac_use") else True
+        if self.problem_info["fused_jac"]:
+            self.problem_info["fcn_out"] = False
+            self.problem_info["jac_out"] = False
+            self.problem_info["jac_pattern_out"] = False
             
-        if hasattr(problem, "jac"):
+        if self._problem_jac is not None:
             if hasattr(problem, "jac_use"):
                 self.problem_info["jac_fcn"] = problem.jac_use
             else:
                 self.problem_info["jac_fcn"] = True
         if hasattr(problem, "jac_nnz"):
             self.problem_info["jac_fcn_nnz"] = problem.jac_nnz
+        if self.problem_info["jac_pattern"] is not None:
+            self.problem_info["jac_fcn_nnz"] = self.problem_info["jac_pattern"].nnz
         if hasattr(problem, "jacv"):
             self.problem_info["jacv_fcn"] = True
         if hasattr(problem, "jaclag"):
@@ -132,7 +222,7 @@ cdef class ODE:
             self.problem_info["prec_solve"] = True
         if hasattr(problem, "prec_setup"):
             self.problem_info["prec_setup"] = True
-        if hasattr(problem, "rhs_sens"):
+        if self._problem_rhs_sens is not None:
             self.problem_info["sens_fcn"] = True
             
         #Reset solution variables
@@ -140,6 +230,7 @@ cdef class ODE:
         
         #Specify storing of sensitivity to 0
         problem._sensitivity_result = 0
+        problem._fcn_out = self.problem_info["fcn_out"]
         
         #Initialize timer
         self.elapsed_step_time = -1.0
@@ -178,7 +269,80 @@ cdef class ODE:
         
     def __call__(self, double tfinal, int ncp=0, list cpts=None):
         return self.simulate(tfinal, ncp, cpts)
-        
+
+    def __reduce__(self):
+        """
+        Support for pickling, e.g. for passing a solver to a
+        multiprocessing worker. The solver is recreated without calling
+        __init__ and its problem, options, statistics and current state
+        are restored. The memory of the underlying C/Fortran code is set
+        up anew on the next call to simulate.
+        """
+        return (_reconstruct_solver, (type(self),), self.__getstate__())
+
+    def __getstate__(self):
+        return {"problem": self.problem, "options": self.options, "solver_options": self.solver_options,
+                "problem_info": self.problem_info, "supports": self.supports, "statistics": self.statistics,
+                "t0": self.t0, "y0": self.y0, "yd0": self.yd0, "p0": self.p0, "sw0": self.sw0,
+                "t": self.t, "y": self.y, "yd": self.yd, "p": self.p, "sw": self.sw,
+                "t_sol": self.t_sol, "y_sol": self.y_sol, "yd_sol": self.yd_sol, "p_sol": self.p_sol,
+                "step_times": self.step_times, "step_orders": self.step_orders,
+                "event_data": self.event_data, "event_info": self._event_info,
+                "chattering_check": self.chattering_check, "display_counter": self.display_counter,
+                "chattering_clear_counter": self.chattering_clear_counter, "chattering_ok_print": self.chattering_ok_print,
+                "problem_rhs": self._problem_rhs, "problem_res": self._problem_res, "problem_jac": self._problem_jac,
+                "problem_state_events": self._problem_state_events, "problem_rhs_sens": self._problem_rhs_sens,
+                "attributes": dict(getattr(self, "__dict__", {}))}
+
+    def __setstate__(self, state):
+        self.problem = state["problem"]
+        self.options = state["options"]
+        self.solver_options = state["solver_options"]
+        self.problem_info = state["problem_info"]
+        self.supports = state["supports"]
+        self.statistics = state["statistics"]
+
+        self.t0  = state["t0"]
+        self.y0  = state["y0"]
+        self.yd0 = state["yd0"]
+        self.p0  = state["p0"]
+        self.sw0 = state["sw0"]
+
+        self.t  = state["t"]
+        self.y  = state["y"]
+        self.yd = state["yd"]
+        self.p  = state["p"]
+        self.sw = state["sw"]
+
+        self.t_sol  = state["t_sol"]
+        self.y_sol  = state["y_sol"]
+        self.yd_sol = state["yd_sol"]
+        self.p_sol  = state["p_sol"]
+        self.step_times  = state["step_times"]
+        self.step_orders = state["step_orders"]
+
+        self.event_data = state["event_data"]
+        self._event_info = state["event_info"]
+        self.chattering_check = state["chattering_check"]
+        self.display_counter = state["display_counter"]
+        self.chattering_clear_counter = state["chattering_clear_counter"]
+        self.chattering_ok_print = state["chattering_ok_print"]
+
+        self._problem_rhs = state["problem_rhs"]
+        self._problem_res = state["problem_res"]
+        self._problem_jac = state["problem_jac"]
+        self._problem_state_events = state["problem_state_events"]
+        self._problem_rhs_sens = state["problem_rhs_sens"]
+
+        if state["attributes"]:
+            self.__dict__.update(state["attributes"])
+
+        #Timer, as after __init__
+        self.elapsed_step_time = -1.0
+        self.clock_start = -1.0
+        self.time_limit_activated = 1 if self.options["time_limit"] else 0
+        self._py_err = None
+
     cdef _reset_solution_variables(self):
         """
         Resets solution variables.
@@ -187,6 +351,8 @@ cdef class ODE:
         self.y_sol = []
         self.yd_sol = []
         self.p_sol = [[] for i in range(self.problem_info["dimSens"])]
+        self.step_times = []
+        self.step_orders = []
         
         
     cpdef simulate(self, double tfinal, int ncp=0, object ncp_list=None):
@@ -249,6 +415,15 @@ cdef class ODE:
             self.log_message("The current solver does not support step events (report continuously). Disabling step events and continues.", WHISPER)
             self.problem_info["step_events"] = False
         
+        if (self.options["record_steps"] or self.options["step_schedule"] is not None) and self.supports["step_schedule"] is False:
+            self.log_message("The current solver does not support recording or replaying of the step-size schedule. Disabling and continues.", WHISPER)
+            self.options["record_steps"] = False
+            self.options["step_schedule"] = None
+        
+        if self.options["step_schedule"] is not None and self.options["backward"]:
+            self.log_message("Replaying a step-size schedule is not supported for backward integration. Disabling and continues.", WHISPER)
+            self.options["step_schedule"] = None
+        
         if self.time_limit_activated and self.supports["report_continuously"] is False:
             self.log_message("The current solver does not support time-limits. Limit is ignored and continues.", WHISPER)
         
@@ -509,6 +684,85 @@ cdef class ODE:
         
     backward = property(_get_backward,_set_backward)
     
+    def _set_record_steps(self, record_steps):
+        self.options["record_steps"] = bool(record_steps)
+        
+    def _get_record_steps(self):
+        """
+        Specifies if the accepted steps should be recorded. The end
+        times of the accepted steps of the latest call to simulate are
+        stored in the list step_times and, for solvers with variable
+        order (CVode), the orders used in step_orders. The recorded
+        times can be given to the option step_schedule of a later
+        simulation.
+        
+            Parameters::
+            
+                record_steps
+                
+                    - Default False
+                    - Boolean
+        """
+        return self.options["record_steps"]
+        
+    record_steps = property(_get_record_steps, _set_record_steps)
+    
+    def _set_step_schedule(self, step_schedule):
+        if step_schedule is None:
+            self.options["step_schedule"] = None
+            return
+        try:
+            step_schedule = np.array(step_schedule, dtype=realtype, ndmin=1)
+        except (ValueError, TypeError):
+            raise AssimuloException("The step schedule must be a list or array of floats.")
+        if step_schedule.ndim != 1:
+            raise AssimuloException("The step schedule must be one-dimensional.")
+        if len(step_schedule) > 1 and not np.all(np.diff(step_schedule) > 0.0):
+            raise AssimuloException("The step schedule must be strictly increasing.")
+        self.options["step_schedule"] = step_schedule
+        
+    def _get_step_schedule(self):
+        """
+        A sequence of time points that the solver should use as the ends
+        of its steps, e.g. the step_times recorded (see record_steps) 
+        during a nominal simulation. Perturbed simulations following the 
+        same mesh give solutions that depend smoothly on the perturbation, 
+        which is for instance needed for sensitivities by finite
+        differences. How strictly the schedule is followed depends on 
+        the solver:
+        
+            Radau5ODE       - The steps end at the scheduled points and
+                              the error estimate is not used to reject
+                              steps. A step is only reduced if the Newton
+                              iteration fails.
+            Dopri5, RodasODE- Each scheduled step is taken as a separate
+                              integration with the initial and maximal
+                              step-size set to the scheduled step. A
+                              failed error test leads to additional
+                              steps within the scheduled step.
+            CVode           - The scheduled points are used as stop times,
+                              i.e. the steps end at the scheduled points
+                              but CVode may take additional steps in
+                              between. The order is chosen by CVode.
+        
+        Only supported for forward integration.
+        
+            Parameters::
+            
+                step_schedule
+                
+                    - Default None, i.e. the step-size is chosen by the
+                      error control of the solver.
+                    - Should be a strictly increasing list or array of
+                      floats.
+                      
+                        Example:
+                            step_schedule = nominal_sim.step_times
+        """
+        return self.options["step_schedule"]
+        
+    step_schedule = property(_get_step_schedule, _set_step_schedule)
+    
     cpdef log_message(self, message,int level):
         if level >= self.options["verbosity"]:
             print(message)
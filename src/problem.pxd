@@ -20,6 +20,7 @@ cimport numpy as np
 
 cdef class cProblem:
     cdef public int _sensitivity_result
+    cdef public int _fcn_out
     
 cdef class cImplicit_Problem(cProblem):
     cpdef res_internal(self, np.ndarray[double, ndim=1] res, double t, np.ndarray[double, ndim=1] y, np.ndarray[double, ndim=1] yd)
@@ -29,7 +30,7 @@ cdef class cOverdetermined_Problem(cProblem):
     
 cdef class cExplicit_Problem(cProblem):
     cpdef int rhs_internal(self, np.ndarray[double, ndim=1] yd, double t, np.ndarray[double, ndim=1] y)
-    cpdef np.ndarray res(self, t, y, yd, sw=*)
+    cpdef np.ndarray res(self, t, y, yd, sw=*, out=*)
         
 cdef class cDelay_Explicit_Problem(cExplicit_Problem):
     pass
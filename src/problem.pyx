@@ -20,8 +20,15 @@
 import numpy as np
 cimport numpy as np
 
-from assimulo.support import set_type_shape_array
+from assimulo.exception import AssimuloException
+from assimulo.support import set_type_shape_array, is_low_level_callable
 include "constants.pxi" #Includes the constants (textual include)
+
+def _reconstruct_problem(cls):
+    """
+    Creates an empty problem instance of the given class, used when unpickling.
+    """
+    return cls.__new__(cls)
     
 cdef class cProblem:
     
@@ -38,6 +45,26 @@ cdef class cProblem:
             self.name = name
         self.t0  = t0
     
+    def __reduce__(self):
+        """
+        Support for pickling, e.g. for passing a problem to a
+        multiprocessing worker. The problem is recreated without calling
+        __init__ and its attributes are restored.
+        """
+        return (_reconstruct_problem, (type(self),), self.__getstate__())
+    
+    def __getstate__(self):
+        for kind in ("rhs", "res", "jac", "state_events"):
+            if is_low_level_callable(getattr(self, kind, None)):
+                raise AssimuloException("Problems with low-level (C) functions cannot be pickled, '%s' is a "
+                                        "function pointer which is not valid in another process."%kind)
+        return (self._sensitivity_result, self._fcn_out, dict(getattr(self, "__dict__", {})))
+    
+    def __setstate__(self, state):
+        self._sensitivity_result, self._fcn_out, attributes = state
+        if attributes:
+            self.__dict__.update(attributes)
+    
     def initialize(self, solver):
         """
         Method for specializing initiation.
@@ -101,7 +128,10 @@ cdef class cImplicit_Problem(cProblem):
         
     cpdef res_internal(self, np.ndarray[double, ndim=1] res, double t, np.ndarray[double, ndim=1] y, np.ndarray[double, ndim=1] yd):
         try:
-            res[:] = self.res(t,y,yd)
+            if self._fcn_out:
+                self.res(t,y,yd,out=res)
+            else:
+                res[:] = self.res(t,y,yd)
         except Exception:
             return ID_FAIL
         return ID_OK
@@ -130,7 +160,10 @@ cdef class cOverdetermined_Problem(cProblem):
         
     cpdef res_internal(self, np.ndarray[double, ndim=1] res, double t, np.ndarray[double, ndim=1] y, np.ndarray[double, ndim=1] yd):
         try:
-            res[:] = self.res(t,y,yd)
+            if self._fcn_out:
+                self.res(t,y,yd,out=res)
+            else:
+                res[:] = self.res(t,y,yd)
         except Exception:
             return ID_FAIL
         return ID_OK
@@ -159,12 +192,22 @@ cdef class cExplicit_Problem(cProblem):
                 
     cpdef int rhs_internal(self, np.ndarray[double, ndim=1] yd, double t, np.ndarray[double, ndim=1] y):
         try:
-            yd[:] = self.rhs(t,y)
+            if self._fcn_out:
+                self.rhs(t,y,out=yd)
+            else:
+                yd[:] = self.rhs(t,y)
         except Exception:
             return ID_FAIL
         return ID_OK
         
-    cpdef np.ndarray res(self, t, y, yd, sw=None):
+    cpdef np.ndarray res(self, t, y, yd, sw=None, out=None):
+        if out is not None: #Only used if rhs supports in-place evaluation
+            if sw is None:
+                self.rhs(t, y, out=out)
+            else:
+                self.rhs(t, y, sw, out=out)
+            np.subtract(yd, out, out=out)
+            return out
         if sw is None:
             return yd-self.rhs(t,y)
         else:
@@ -250,6 +293,17 @@ class Implicit_Problem(cImplicit_Problem):
                     
                     Returns:
                         A numpy array of size len(y).
+                
+                Alternatively a low-level (C) function, e.g. a ctypes
+                function pointer, a numba cfunc or a scipy.LowLevelCallable.
+                The same holds for jac and state_events, see
+                assimulo.support.LowLevelCallback for the signatures.
+                
+                If the function has an additional keyword argument out,
+                res(t,y,yd,out=None), the solvers pass a writable array
+                (a view of their internal buffer) in which the residual
+                is to be stored in-place. The function should return a new
+                array when out is None. The same holds for state_events.
             y0
                 Defines the starting values of y0.
             yd0
@@ -296,6 +350,20 @@ class Implicit_Problem(cImplicit_Problem):
                 
                 Returns:
                     A numpy array of size len(y)*len(y).
+                
+                With an additional keyword argument out, jac(c, t, y, yd, sw, out=None),
+                the (dense) Jacobian is written in-place into out, a Fortran-ordered
+                view of the solver's matrix (IDA), all entries have to be set.
+            
+            def res_and_jac(self, t, y, yd, sw)
+                Optional, computes the residual and the Jacobian together, e.g. when
+                they share intermediate quantities. Used by IDA instead of res, the
+                Jacobian is kept and reused when it is requested at the same point,
+                otherwise jac is called (if defined) or res_and_jac is called again.
+                
+                Returns:
+                    A tuple (res, jac), where jac is either a pair of numpy arrays
+                    (dF/dx, dF/dx') or a function jac(c) returning J.
                     
             def handle_result(self, solver, t, y, yd)
                 Method for specifying how the result is  handled. 
@@ -424,6 +492,17 @@ class Explicit_Problem(cExplicit_Problem):
                     
                     Returns:
                         A numpy array of size len(y).
+                
+                Alternatively a low-level (C) function, e.g. a ctypes
+                function pointer, a numba cfunc or a scipy.LowLevelCallable.
+                The same holds for jac and state_events, see
+                assimulo.support.LowLevelCallback for the signatures.
+                
+                If the function has an additional keyword argument out,
+                rhs(t,y,out=None), the solvers pass a writable array
+                (a view of their internal buffer) in which the derivative
+                is to be stored in-place. The function should return a new
+                array when out is None. The same holds for state_events.
             
             y0
                 Defines the starting values 
@@ -461,6 +540,43 @@ class Explicit_Problem(cExplicit_Problem):
                 
                 Returns:
                     A numpy matrix of size len(y)*len(y).
+                
+                With an additional keyword argument out, jac(t, y, sw=None, out=None),
+                the (dense) Jacobian is written in-place into out, a Fortran-ordered
+                view of the solver's matrix (CVode and Radau5ODE), all entries have
+                to be set.
+            
+            jac_pattern
+                Attribute, a fixed sparsity pattern of the Jacobian (any scipy.sparse
+                format or a dense array), from which jac_nnz is derived. With the
+                SPARSE linear solver (CVode and Radau5ODE), a jac with the keyword out
+                is then called with a view of the data vector of the sparse matrix and
+                only fills the values, in the order of the pattern in CSC format.
+                A low-level jac created with a pattern, LowLevelCallback(jac, pattern=P),
+                provides its own pattern and is called directly by these solvers. Such
+                problems can be generated from SymPy expressions, see assimulo.codegen.
+                If the problem has no jac (and no switches), the Jacobian is approximated
+                by finite differences of rhs with the columns grouped by a coloring of the
+                pattern, costing one rhs evaluation per color instead of one per state
+                (see assimulo.support.ColoredJacobian). Used by CVode, Radau5ODE and RodasODE.
+                Set jac_pattern = "auto" to detect the pattern when a solver is created,
+                by probing rhs around (t0, y0) state by state (see
+                assimulo.support.detect_jac_pattern). The detected pattern is cached
+                on the problem for that point, such that further solvers created for
+                the same (t0, y0) do not probe again. The generated Jacobian is kept by
+                the solver, jac_pattern itself is not changed.
+            
+            def rhs_and_jac(self, t, y, sw)
+                Optional, computes the right-hand-side and the Jacobian together, e.g.
+                when they share intermediate quantities. Used by CVode, Radau5ODE and
+                RodasODE instead of rhs, the Jacobian is kept and reused when it is
+                requested at the same point, otherwise jac is called (if defined) or
+                rhs_and_jac is called again. rhs is still used by the other solvers.
+                
+                Returns:
+                    A tuple (rhs, jac), where jac is a numpy matrix of size
+                    len(y)*len(y) or a function without arguments returning it,
+                    which is called only if the solver needs the Jacobian.
                     
             def jacv(self, t, y, fy, v)
                 Defines a Jacobian Vector product. df/dx*v.
@@ -468,6 +584,28 @@ class Explicit_Problem(cExplicit_Problem):
                 Returns:
                     A numpy vector of size len(y).
             
+            def rhs_sens(self, t, y, s, p, sw)
+                Defines the right-hand-side of the forward sensitivity equations,
+                df/dx*s + df/dp, where s is the len(y)*len(p) sensitivity matrix (CVode).
+                
+                Returns:
+                    A numpy array of size len(y)*len(p).
+                
+                With an additional keyword argument out, rhs_sens(t, y, s, p, out=None),
+                the result is written in-place into out, a Fortran-ordered array of
+                the same size reused by the solver.
+            
+            complex_step
+                Attribute, set complex_step = True if rhs accepts complex y (and p) and
+                propagates them, e.g. NumPy code without abs, comparisons or casts to
+                float. Without jac, the Jacobian is then computed by complex-step
+                differentiation, imag(rhs(t, y + i*h*e_j))/h with h = 1e-20, which is
+                exact to machine precision, combined with the column coloring of
+                jac_pattern if given (see assimulo.support.ColoredJacobian). Without
+                rhs_sens, the forward sensitivity right-hand-side is computed the same
+                way, with one complex rhs evaluation per parameter (CVode, see
+                assimulo.support.ComplexStepSensitivity).
+            
             def handle_result(self, solver, t, y)
                 Method for specifying how the result is handled. 
                 By default the data is stored in two vectors, solver.(t_sol/y_sol). If
@@ -565,6 +703,21 @@ cdef class cAlgebraic_Problem:
         if name:
             self.name = name
     
+    def __reduce__(self):
+        """
+        Support for pickling, e.g. for passing a problem to a
+        multiprocessing worker. The problem is recreated without calling
+        __init__ and its attributes are restored.
+        """
+        return (_reconstruct_problem, (type(self),), self.__getstate__())
+    
+    def __getstate__(self):
+        return dict(getattr(self, "__dict__", {}))
+    
+    def __setstate__(self, state):
+        if state:
+            self.__dict__.update(state)
+    
     def initialize(self, solver):
         """
         Method for specializing initiation.
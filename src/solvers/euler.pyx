@@ -93,17 +93,51 @@ cdef class ImplicitEuler(Explicit_ODE):
         self._steps_since_last_jac = 0 #Keep track on how long ago we updated the jacobian
         self._inith = 0 #Used for taking an initial step of correct length after an event.
     
+    def __getstate__(self):
+        state = Explicit_ODE.__getstate__(self)
+        state["old_jac"] = self._old_jac
+        state["needjac"] = self._needjac
+        state["curjac"] = self._curjac
+        state["steps_since_last_jac"] = self._steps_since_last_jac
+        state["told"] = self._told
+        state["h"] = self._h
+        state["inith"] = self._inith
+        return state
+    
+    def __setstate__(self, state):
+        Explicit_ODE.__setstate__(self, state)
+        self._old_jac = state["old_jac"]
+        self._needjac = state["needjac"]
+        self._curjac = state["curjac"]
+        self._steps_since_last_jac = state["steps_since_last_jac"]
+        self._told = state["told"]
+        self._h = state["h"]
+        self._inith = state["inith"]
+        
+        #Internal temporary result vector
+        self.yd1 = np.array([0.0]*len(self.y0))
+        self._yold = np.array([0.0]*len(self.y0))
+        self._ynew = np.array([0.0]*len(self.y0))
+        
+        self._leny = len(self.y) #Dimension of the problem
+        self._eps  = np.finfo('double').eps
+    
     def set_problem_data(self): 
+        #The right-hand side is written into (and returned as) the buffer yd1
+        fcn_out = self.problem_info["fcn_out"]
         if self.problem_info["state_events"]: 
             def event_func(t, y):
                 try:
-                    res = self.problem.state_events(t, y, self.sw)
+                    res = self._problem_state_events(t, y, self.sw)
                 except BaseException as E:
                     self._py_err = E
                     return -1, None # non-recoverable
                 return 0, res ## OK
             def f(t, y): 
-                return self.problem.rhs(t, y, self.sw)
+                if fcn_out:
+                    self._problem_rhs(t, y, self.sw, out=self.yd1)
+                    return self.yd1
+                return self._problem_rhs(t, y, self.sw)
             self.f = f
             self.event_func = event_func
             self._event_info = np.array([0] * self.problem_info["dimRoot"]) 
@@ -111,8 +145,13 @@ cdef class ImplicitEuler(Explicit_ODE):
             if ret < 0:
                 raise self._py_err
             self.statistics["nstatefcns"] += 1
+        elif fcn_out:
+            def f(t, y):
+                self._problem_rhs(t, y, out=self.yd1)
+                return self.yd1
+            self.f = f
         else: 
-            self.f = self.problem.rhs
+            self.f = self._problem_rhs
     
     
     def _set_usejac(self, jac):
@@ -329,13 +368,15 @@ cdef class ImplicitEuler(Explicit_ODE):
         self._steps_since_last_jac = 0
         
         if self.usejac: #Retrieve the user-defined jacobian
-            jac = self.problem.jac(t,y)
+            jac = self._problem_jac(t,y)
             
             if isinstance(jac, sps.csc_matrix):
                 jac = jac.toarray()
         else:           #Calculate a numeric jacobian
             delt = np.array([(self._eps*max(abs(yi),1.e-5))**0.5 for yi in y])*np.identity(self._leny) #Calculate a disturbance
-            Fdelt = np.array([self.f(t,y+e) for e in delt]) #Add the disturbance (row by row) 
+            Fdelt = np.empty((len(y),len(y)))
+            for i in range(len(y)):
+                Fdelt[i] = self.f(t,y+delt[i]) #Add the disturbance (row by row) 
             grad = ((Fdelt-self.f(t,y)).T/delt.diagonal()).T
             jac = np.array(grad).T
             
@@ -388,7 +429,7 @@ cdef class ImplicitEuler(Explicit_ODE):
                 
                 #jac = self._jacobian(tn1, yn1)
                 
-                #ynew = yn1 - np.dot(np.linalg.inv(h*jac-I),(yn-yn1+h*self.problem.rhs(tn1,yn1)))
+                #ynew = yn1 - np.dot(np.linalg.inv(h*jac-I),(yn-yn1+h*self._problem_rhs(tn1,yn1)))
                 ynew = yn1 - np.linalg.solve(h*jac-I, yn-yn1+h*self.f(tn1,yn1) )
                 self.statistics["nfcns"] += 1
                 
@@ -534,17 +575,40 @@ cdef class ExplicitEuler(Explicit_ODE):
         self.supports["interpolated_output"] = False
         self.supports["state_events"] = True
     
+    def __getstate__(self):
+        state = Explicit_ODE.__getstate__(self)
+        state["told"] = self._told
+        state["h"] = self._h
+        state["inith"] = self._inith
+        return state
+    
+    def __setstate__(self, state):
+        Explicit_ODE.__setstate__(self, state)
+        self._told = state["told"]
+        self._h = state["h"]
+        self._inith = state["inith"]
+        
+        #Internal temporary result vector
+        self.yd1 = np.array([0.0]*len(self.y0))
+        self._yold = np.array([0.0]*len(self.y0))
+        self._ynew = np.array([0.0]*len(self.y0))
+    
     def set_problem_data(self): 
+        #The right-hand side is written into (and returned as) the buffer yd1
+        fcn_out = self.problem_info["fcn_out"]
         if self.problem_info["state_events"]: 
             def event_func(t, y):
                 try:
-                    res = self.problem.state_events(t, y, self.sw)
+                    res = self._problem_state_events(t, y, self.sw)
                 except BaseException as E:
                     self._py_err = E
                     return -1, None # non-recoverable
                 return 0, res ## OK
             def f(t, y): 
-                return self.problem.rhs(t, y, self.sw)
+                if fcn_out:
+                    self._problem_rhs(t, y, self.sw, out=self.yd1)
+                    return self.yd1
+                return self._problem_rhs(t, y, self.sw)
             self.f = f
             self.event_func = event_func
             self._event_info = np.array([0] * self.problem_info["dimRoot"]) 
@@ -552,8 +616,13 @@ cdef class ExplicitEuler(Explicit_ODE):
             if ret < 0:
                 raise self._py_err
             self.statistics["nstatefcns"] += 1
+        elif fcn_out:
+            def f(t, y):
+                self._problem_rhs(t, y, out=self.yd1)
+                return self.yd1
+            self.f = f
         else: 
-            self.f = self.problem.rhs
+            self.f = self._problem_rhs
     
     cpdef step(self,double t,np.ndarray y,double tf,dict opts):
         cdef double h
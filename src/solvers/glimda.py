@@ -161,7 +161,7 @@ class GLIMDA(Implicit_ODE):
         dfdx_dummy = lambda t:t #df/dx
         dqdx_dummy = lambda t:t #dq/dx
         qeval_dummy = lambda x,t:x #q(x,t)
-        res_dummy = lambda yd,y,t:self.problem.res(t,y,yd) #Needed to correct the order of the arguments
+        res_dummy = lambda yd,y,t:self._problem_res(t,y,yd) #Needed to correct the order of the arguments
 
         #Store the opts
         self._opts = opts
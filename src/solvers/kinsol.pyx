@@ -29,7 +29,7 @@ from sundials_includes cimport N_Vector, realtype, N_VectorContent_Serial, DENSE
 from sundials_includes cimport memcpy, N_VNew_Serial, DlsMat, SUNMatrix, SUNMatrixContent_Dense, SUNMatrixContent_Sparse
 IF SUNDIALS_VERSION < (5,0,0):
     from sundials_includes cimport SlsMat
-from sundials_includes cimport malloc, free
+from sundials_includes cimport malloc, free, N_VSetArrayPointer_Serial
 IF SUNDIALS_VERSION >= (6,0,0):
     from sundials_includes cimport N_VDestroy
 ELSE:
@@ -89,6 +89,8 @@ cdef class KINSOL(Algebraic):
         self.options["no_min_epsilon"] = False #Specifies wheter the scaled linear residual is bounded from below
         self.options["max_beta_fails"] = 10
         self.options["max_krylov"] = 0
+        self.options["max_restarts"] = 0 #Maximum number of restarts of SPGMR and SPFGMR
+        self.options["gram_schmidt"] = "MODIFIED" #Orthogonalization of SPGMR and SPFGMR
         self.options["precond"] = PREC_NONE
         
         #Statistics
@@ -103,7 +105,17 @@ cdef class KINSOL(Algebraic):
         
         #Initialize Kinsol
         self.initialize_kinsol()
-                
+
+    def __setstate__(self, state):
+        Algebraic.__setstate__(self, state)
+
+        #The problem data and the memory of KINSOL are set up anew
+        self.pData = ProblemDataEquationSolver()
+        self._eps = np.finfo('double').eps
+        self._added_linear_solver = False
+        self.set_problem_data()
+        self.initialize_kinsol()
+
     def __dealloc__(self):
         
         if self.y_temp != NULL:
@@ -273,22 +285,23 @@ cdef class KINSOL(Algebraic):
                     flag = SUNDIALS.KINDlsSetDenseJacFn(self.kinsol_mem, kin_jac);
                 if flag < 0:
                     raise KINSOLError(flag)
-        elif self.options["linear_solver"] == "SPGMR":
+        elif self.options["linear_solver"] in KRYLOV_SOLVERS:
             IF SUNDIALS_VERSION >= (3,0,0):
                 #Create the linear solver
-                IF SUNDIALS_VERSION >= (4,0,0):
-                    IF SUNDIALS_VERSION >= (6,0,0):
-                        self.sun_linearsolver = SUNDIALS.SUNLinSol_SPGMR(self.y_temp, self.options["precond"], self.options["max_krylov"], ctx)
-                    ELSE:
-                       self.sun_linearsolver = SUNDIALS.SUNLinSol_SPGMR(self.y_temp, self.options["precond"], self.options["max_krylov"])
+                IF SUNDIALS_VERSION >= (6,0,0):
+                    self.sun_linearsolver = new_krylov_solver(self.options["linear_solver"], self.y_temp, self.options["precond"], self.options["max_krylov"],
+                                                              self.options["max_restarts"], GRAM_SCHMIDT[self.options["gram_schmidt"]], <void*>ctx)
                 ELSE:
-                    self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.y_temp, self.options["precond"], self.options["max_krylov"])
+                    self.sun_linearsolver = new_krylov_solver(self.options["linear_solver"], self.y_temp, self.options["precond"], self.options["max_krylov"],
+                                                              self.options["max_restarts"], GRAM_SCHMIDT[self.options["gram_schmidt"]], NULL)
                 #Attach it to Kinsol
                 IF SUNDIALS_VERSION >= (4,0,0):
                     flag = SUNDIALS.KINSetLinearSolver(self.kinsol_mem, self.sun_linearsolver, NULL)
                 ELSE:
                     flag = SUNDIALS.KINSpilsSetLinearSolver(self.kinsol_mem, self.sun_linearsolver)
             ELSE:
+                if self.options["linear_solver"] != "SPGMR":
+                    raise Exception("The %s linear solver requires SUNDIALS 3.0.0 or newer."%self.options["linear_solver"])
                 #Specify the use of KINSpgmr linear solver.
                 flag = SUNDIALS.KINSpgmr(self.kinsol_mem, self.options["max_krylov"])
             if flag < 0:
@@ -477,7 +490,7 @@ cdef class KINSOL(Algebraic):
             raise KINSOLError(flag)
         self.statistics["nbcfails"] = nbcfails
         
-        if self.options["linear_solver"] == "SPGMR":
+        if self.options["linear_solver"] in KRYLOV_SOLVERS:
             IF SUNDIALS_VERSION >= (4,0,0):
                 flag = SUNDIALS.KINGetNumLinIters(self.kinsol_mem, &nliters)
             ELSE:
@@ -549,7 +562,7 @@ cdef class KINSOL(Algebraic):
         self.log_message(' Number of Backtrack Operations (Linesearch) : '+ str(self.statistics["nbacktr"]),   verbose) #The function KINGetNumBacktrackOps returns the number of backtrack operations (step length adjustments) performed by the line search algorithm.
         self.log_message(' Number of Beta-condition Failures           : '+ str(self.statistics["nbcfails"]),  verbose) #The function KINGetNumBetaCondFails returns the number of β-condition failures.
         
-        if self.options["linear_solver"] == "SPGMR":
+        if self.options["linear_solver"] in KRYLOV_SOLVERS:
             self.log_message(' Number of Jacobian*Vector Evaluations       : '+ str(self.statistics["njevals"]),   verbose)
             self.log_message(' Number of F-Eval During Jac*Vec-Eval        : '+ str(self.statistics["nfevalsLS"]), verbose)
             self.log_message(' Number of Linear Iterations                 : '+ str(self.statistics["nliters"]), verbose)
@@ -664,10 +677,10 @@ cdef class KINSOL(Algebraic):
     max_beta_fails = property(_get_max_beta_fails_method,_set_max_beta_fails_method)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR":
+        if lsolver.upper() == "DENSE" or lsolver.upper() in KRYLOV_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise Exception('The linear solver must be either "DENSE" or "SPGMR".')
+            raise Exception('The linear solver must be either "DENSE", "SPGMR", "SPFGMR", "SPBCGS" or "SPTFQMR".')
         
     def _get_linear_solver(self):
         """
@@ -676,7 +689,12 @@ cdef class KINSOL(Algebraic):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR'.
+                        - Default 'DENSE'. Can also be one of the Krylov
+                          solvers 'SPGMR', 'SPFGMR' (flexible GMRES),
+                          'SPBCGS' (BiCGStab) and 'SPTFQMR' (TFQMR).
+                        - The Krylov solvers use max_dim_krylov_subspace,
+                          and the GMRES variants max_restarts and
+                          gram_schmidt.
         """
         return self.options["linear_solver"]
     
@@ -731,6 +749,62 @@ cdef class KINSOL(Algebraic):
     
     max_dim_krylov_subspace = property(_get_max_krylov, _set_max_krylov)
     
+    def _set_max_restarts(self, max_restarts):
+        try:
+            max_restarts = int(max_restarts)
+        except Exception:
+            raise Exception("The maximum number of restarts should be an integer.")
+        if max_restarts < 0:
+            raise Exception("The maximum number of restarts should be a non-negative integer.")
+        self.options["max_restarts"] = max_restarts
+    
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts of the SPGMR and SPFGMR
+        linear solvers.
+        
+            Parameters::
+            
+                    max_restarts
+                            - A non-negative integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of max_restarts.
+        
+        See SUNDIALS documentation 'SUNLinSol_SPGMRSetMaxRestarts'
+        """
+        return self.options["max_restarts"]
+    
+    max_restarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_gram_schmidt(self, gram_schmidt):
+        if str(gram_schmidt).upper() in GRAM_SCHMIDT:
+            self.options["gram_schmidt"] = str(gram_schmidt).upper()
+        else:
+            raise Exception('The Gram-Schmidt orthogonalization must be either "MODIFIED" or "CLASSICAL".')
+    
+    def _get_gram_schmidt(self):
+        """
+        Specifies the Gram-Schmidt orthogonalization of the SPGMR and SPFGMR
+        linear solvers.
+        
+            Parameters::
+            
+                    gram_schmidt
+                            - Default 'MODIFIED'. Can also be 'CLASSICAL'.
+            
+            Returns::
+            
+                The current value of gram_schmidt.
+        
+        See SUNDIALS documentation 'SUNLinSol_SPGMRSetGSType'
+        """
+        return self.options["gram_schmidt"]
+    
+    gram_schmidt = property(_get_gram_schmidt, _set_gram_schmidt)
+    
     def get_residual_norm_nonlinear_iterations(self): 
         return self.pData.nl_fnorm
         
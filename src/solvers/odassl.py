@@ -252,7 +252,7 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
     def integrate(self, t, y, yprime, tf, opts):
         ny  = self.problem_info["dim"]
         
-        neq = len(set_type_shape_array(self.problem.res(t,y,yprime)))
+        neq = len(set_type_shape_array(self._problem_res(t,y,yprime)))
         #neq = self.problem_info["neq"]
         lrw = 40+8*ny + neq**2 + 3*neq
         rwork = np.zeros((lrw,))                                                
@@ -296,7 +296,7 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
         #REPORTED IN TICKET:244 THIS IS HOWEVER NECESSARY AS A 
         #WORKAROUND FOR NOW...
         def py_residual(t,y,yd):
-            return self.problem.res(t,y,yd)
+            return self._problem_res(t,y,yd)
         callback_residual = py_residual
         #----
         if opts["report_continuously"]:
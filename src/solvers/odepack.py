@@ -145,7 +145,7 @@ class LSODAR(Explicit_ODE):
         tol=self.options["atol"]  
         tolscale=tol[0]**(1./pr)
         normscale=1.
-        f=self.problem.rhs
+        f=self._problem_rhs
         
         t0=t
         tf=RWORK[0]
@@ -207,7 +207,7 @@ class LSODAR(Explicit_ODE):
             #H=self.autostart(t,y)
             #H=3*H
             # b) compute the Nordsieck array and put it into RWORK
-            rkNordsieck = RKStarterNordsieck(self.problem.rhs,H,number_of_steps=self.rkstarter)
+            rkNordsieck = RKStarterNordsieck(self._problem_rhs,H,number_of_steps=self.rkstarter)
             t,nordsieck = rkNordsieck(t,y,self.sw)
             nordsieck=nordsieck.T
             nordsieck_start_index = 21+3*self.problem_info["dimRoot"] - 1
@@ -268,7 +268,7 @@ class LSODAR(Explicit_ODE):
         Calculates the Jacobian, either by an approximation or by the user
         defined (jac specified in the problem class).
         """
-        jac = self.problem.jac(t,y)
+        jac = self._problem_jac(t,y)
         
         if isinstance(jac, sps.csc_matrix):
             jac = jac.toarray()
@@ -298,17 +298,39 @@ class LSODAR(Explicit_ODE):
         IWORK[8] = self.maxords
         
         #Dummy methods
+        #The results are either returned or written into the Fortran buffers ydot and gout
+        fcn_out = self.problem_info["fcn_out"]
+        events_out = self.problem_info["state_events_out"]
         if self.problem_info["state_events"]:
             if self.problem_info["switches"]:
-                def state_events(t,y,sw):
-                    return self.problem.state_events(t,y,sw)
+                def state_events(t,y,gout,sw):
+                    if events_out:
+                        self._problem_state_events(t,y,sw,out=gout)
+                    else:
+                        return self._problem_state_events(t,y,sw)
                 g_fcn = state_events
             else:
-                def state_events(t,y):
-                    return self.problem.state_events(t,y)
+                def state_events(t,y,gout):
+                    if events_out:
+                        self._problem_state_events(t,y,out=gout)
+                    else:
+                        return self._problem_state_events(t,y)
                 g_fcn = state_events
         else:
             g_fcn = g_dummy
+        
+        if self.problem_info["switches"]:
+            def rhs(t,y,ydot,sw):
+                if fcn_out:
+                    self._problem_rhs(t,y,sw,out=ydot)
+                else:
+                    return self._problem_rhs(t,y,sw)
+        else:
+            def rhs(t,y,ydot):
+                if fcn_out:
+                    self._problem_rhs(t,y,out=ydot)
+                else:
+                    return self._problem_rhs(t,y)
 
         #jac_dummy = (lambda t,y:np.zeros((len(y),len(y)))) if not self.usejac else self.problem.jac
         jac_fcn = jac_dummy if not self.usejac else self._jacobian
@@ -332,7 +354,6 @@ class LSODAR(Explicit_ODE):
         #Tolerances:
         atol = self.atol
         rtol = self.rtol*np.ones(self.problem_info["dim"])
-        rhs = self.problem.rhs
         
         #if normal_mode == 0:
         if opts["report_continuously"] or opts["output_list"] is None:
@@ -213,7 +213,7 @@ class Radar5ODE(Explicit_ODE):
         ydelay = self.compute_ydelay(t,y, past,  ipast)
 
         # Now we can compute the right-hand-side
-        return self.problem.rhs(t, y, ydelay)
+        return self._problem_rhs(t, y, ydelay)
     
     def Fjac(self, t, y, past, ipast):
         # First find the correct place in the past vector for each time-lag
@@ -221,7 +221,7 @@ class Radar5ODE(Explicit_ODE):
         ydelay = self.compute_ydelay(t,y,  None, None,  past,  ipast)
         
         # Now we can compute the right-hand-side
-        return self.problem.jac(t, y, ydelay)
+        return self._problem_jac(t, y, ydelay)
 
 
     def integrate(self, t, y, tf, opts):
@@ -15,6 +15,8 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+from abc import ABC, abstractmethod
+
 import numpy as np
 import scipy.linalg as spl
 import scipy.sparse as sps
@@ -37,6 +39,7 @@ from assimulo.ode import (
 
 from assimulo.explicit_ode import Explicit_ODE
 from assimulo.implicit_ode import Implicit_ODE
+from assimulo.support import LowLevelCallback, RHSJacobianCache, get_bandwidths, check_bandwidth
 from assimulo.lib.radau_core import Radau_Common, Radau_Exception
 
 class Radau5Error(AssimuloException):
@@ -66,6 +69,55 @@ class Radau5Error(AssimuloException):
                 return repr('Radau failed with flag %s. At time %f.'%(self.value, self.t))
 
 
+class Radau5LinearSolver(ABC):
+    """
+    Base class of user-provided linear solvers of Radau5ODE, which replace
+    the built-in ones, see Radau5ODE.linear_solver. In the Newton iteration,
+    Radau5 solves linear systems with the real and complex matrices
+    
+        E1 = fac1*I - J    and    E2 = (alpha + i*beta)*I - J,
+    
+    with J the Jacobian of the right-hand side. The linear solver evaluates
+    (or approximates) J itself, in jac, hence usejac is not used.
+    
+    Exceptions raised by the methods are treated as in the right-hand side,
+    i.e., the step is retried with a smaller step-size after a recoverable
+    one (e.g., numpy.linalg.LinAlgError for a singular matrix). The arrays
+    passed to the methods are only valid during the call. A subclass has to
+    implement all the methods.
+    """
+    
+    @abstractmethod
+    def jac(self, t, y, fy):
+        """
+        Called when a new Jacobian J is required at (t, y), fy = f(t, y).
+        """
+    
+    @abstractmethod
+    def factor_real(self, fac1):
+        """
+        Decomposes the real matrix E1 = fac1*I - J.
+        """
+    
+    @abstractmethod
+    def factor_complex(self, alpha, beta):
+        """
+        Decomposes the complex matrix E2 = (alpha + i*beta)*I - J.
+        """
+    
+    @abstractmethod
+    def solve_real(self, b):
+        """
+        Returns the solution x of E1*x = b, b is a real array.
+        """
+    
+    @abstractmethod
+    def solve_complex(self, b):
+        """
+        Returns the solution x of E2*x = b, b is a complex array.
+        """
+
+
 class Radau5ODE(Radau_Common,Explicit_ODE):
     """
     Radau IIA fifth-order three-stages with step-size control and 
@@ -108,45 +160,243 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         self.options["safe"]     = 0.9 #Safety factor
         self.options["atol"]     = 1.0e-6*np.ones(self.problem_info["dim"]) #Absolute tolerance
         self.options["rtol"]     = 1.0e-6 #Relative tolerance
-        self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
+        self.options["usejac"]   = True if (self.problem_info["jac_fcn"] or self.problem_info["fused_jac"]) else False
         self.options["maxsteps"] = 100000
         self.options["linear_solver"] = "DENSE" #Using dense or sparse linear solver in Newton iteration
+        self.options["warm_start"] = False #Keep the Jacobian between consecutive simulations
+        self.options["lapack"] = True #Using LAPACK for the dense LU decompositions, if available
+        self.options["mupper"] = None #Upper half-bandwidth of the Jacobian for the BAND linear solver
+        self.options["mlower"] = None #Lower half-bandwidth of the Jacobian for the BAND linear solver
+        self.options["maxl"] = 20 #Maximum dimension of the Krylov subspace for the KRYLOV linear solver
+        self.options["krylov_tol"] = 0.05 #Linear residual tolerance of the KRYLOV linear solver, relative to the Newton tolerance
         
         #Solver support
         self.supports["report_continuously"] = True
         self.supports["interpolated_output"] = True
         self.supports["state_events"] = True
+        self.supports["step_schedule"] = True
+        
+        self.statistics.add_key("nliters", "Number of linear iterations")
+        self.statistics.add_key("nlcfails", "Number of linear convergence failures")
         
         self._leny = len(self.y) #Dimension of the problem
         self._type = '(explicit)'
         self._event_info = None
         self._werr = np.zeros(self._leny)
+        self._rad_memory_config = None
+        self._prec_data = None
+
+    def __getstate__(self):
+        state = Explicit_ODE.__getstate__(self)
+        #The wrapped problem functions and the memory of the C code are set up anew on the next call to simulate
+        for name in ("f", "event_func", "radau5", "rad_memory"):
+            state["attributes"].pop(name, None)
+        state["attributes"]["_rad_memory_config"] = None
+        return state
 
     def _get_linear_solver(self):
         return self.options["linear_solver"]
 
     def _set_linear_solver(self, linear_solver):
         """
-        Which type of linear solver to use, "DENSE" or "SPARSE"
+        Which type of linear solver to use, "DENSE", "SPARSE", "BAND" or "KRYLOV",
+        or a user-provided linear solver
         
             Parameters::
             
                 linear_solver
                                 - Default "DENSE"
                             
-                                - needs to be either "DENSE" or "SPARSE"
+                                - needs to be either "DENSE", "SPARSE", "BAND" or "KRYLOV",
+                                  or an instance of Radau5LinearSolver
+                                
+                                - "BAND" uses banded LU decompositions, see
+                                  mupper and mlower for the bandwidths
+                                
+                                - "KRYLOV" is matrix-free, it solves the linear
+                                  systems by GMRES with Jacobian-vector products
+                                  approximated by directional differences of the
+                                  right-hand side, see maxl and krylov_tol. The
+                                  problem's prec_solve (and prec_setup) is used
+                                  as preconditioner, if given.
+                                
+                                - A Radau5LinearSolver replaces the built-in
+                                  linear solvers, e.g., to use a sparse LU
+                                  decomposition of SciPy. It evaluates the
+                                  Jacobian itself.
         """
         
+        if isinstance(linear_solver, Radau5LinearSolver):
+            self.options["linear_solver"] = linear_solver
+            return
         try:
             linear_solver_upper = linear_solver.upper()
         except Exception:
-            raise Radau_Exception("'linear_solver' parameter needs to be the STRING 'DENSE' or 'SPARSE'. Set value: {}, type: {}".format(linear_solver, type(linear_solver))) from None
-        if linear_solver_upper not in ["DENSE", "SPARSE"]:
-            raise Radau_Exception("'linear_solver' parameter needs to be either 'DENSE' or 'SPARSE'. Set value: {}".format(linear_solver)) from None
+            raise Radau_Exception("'linear_solver' parameter needs to be the STRING 'DENSE', 'SPARSE', 'BAND' or 'KRYLOV'. Set value: {}, type: {}".format(linear_solver, type(linear_solver))) from None
+        if linear_solver_upper not in ["DENSE", "SPARSE", "BAND", "KRYLOV"]:
+            raise Radau_Exception("'linear_solver' parameter needs to be either 'DENSE', 'SPARSE', 'BAND' or 'KRYLOV'. Set value: {}".format(linear_solver)) from None
         self.options["linear_solver"] = linear_solver.upper()
         
     linear_solver = property(_get_linear_solver, _set_linear_solver)
 
+    def _get_warm_start(self):
+        """
+        Keep the Jacobian (and the memory of the Radau5 solver) between
+        consecutive simulations, e.g. after a call to re_init or after
+        an event. The kept Jacobian is used for the first step and is
+        recomputed once the Newton iteration fails to converge, as in
+        the normal case.
+        
+            Parameters::
+            
+                warm_start
+                                - Default False
+                            
+                                - Should be a boolean.
+        """
+        return self.options["warm_start"]
+
+    def _set_warm_start(self, warm_start):
+        self.options["warm_start"] = bool(warm_start)
+        if not self.options["warm_start"]:
+            self._free_rad_memory()
+        
+    warm_start = property(_get_warm_start, _set_warm_start)
+
+    def _get_lapack(self):
+        """
+        Use the LAPACK routines dgetrf/dgetrs and zgetrf/zgetrs (from the
+        LAPACK which SciPy is linked against) for the decompositions of the
+        real and complex iteration matrices of the 'DENSE' linear solver,
+        instead of the built-in routines. If Radau5 has not been compiled
+        with LAPACK, the built-in routines are used.
+        
+            Parameters::
+            
+                lapack
+                                - Default True
+                            
+                                - Should be a boolean.
+        """
+        return self.options["lapack"]
+
+    def _set_lapack(self, lapack):
+        self.options["lapack"] = bool(lapack)
+        
+    lapack = property(_get_lapack, _set_lapack)
+
+    def _set_mupper(self, mupper):
+        self.options["mupper"] = check_bandwidth(mupper, Radau_Exception)
+    
+    def _get_mupper(self):
+        """
+        Specifies the upper half-bandwidth of the Jacobian for the BAND
+        linear solver, i.e. J[i,j] = 0 for j-i > mupper.
+        
+            Parameters::
+            
+                    mupper
+                            - A non-negative integer.
+                            - Default None, the upper half-bandwidth of
+                              the problem's jac_pattern.
+            
+            Returns::
+            
+                The current value of mupper.
+        
+        See assimulo.support.get_bandwidths for the band storage of the
+        Jacobian.
+        """
+        return self.options["mupper"]
+    
+    mupper = property(_get_mupper, _set_mupper)
+    
+    def _set_mlower(self, mlower):
+        self.options["mlower"] = check_bandwidth(mlower, Radau_Exception)
+    
+    def _get_mlower(self):
+        """
+        Specifies the lower half-bandwidth of the Jacobian for the BAND
+        linear solver, i.e. J[i,j] = 0 for i-j > mlower.
+        
+            Parameters::
+            
+                    mlower
+                            - A non-negative integer.
+                            - Default None, the lower half-bandwidth of
+                              the problem's jac_pattern.
+            
+            Returns::
+            
+                The current value of mlower.
+        
+        See mupper.
+        """
+        return self.options["mlower"]
+    
+    mlower = property(_get_mlower, _set_mlower)
+
+    def _set_maxl(self, maxl):
+        try:
+            maxl = int(maxl)
+        except Exception:
+            raise Radau_Exception("The maximum dimension of the Krylov subspace should be an integer.") from None
+        if maxl < 1:
+            raise Radau_Exception("The maximum dimension of the Krylov subspace should be a positive integer.")
+        self.options["maxl"] = maxl
+    
+    def _get_maxl(self):
+        """
+        Specifies the maximum dimension of the Krylov subspace, i.e. the
+        maximum number of GMRES iterations per linear system, of the KRYLOV
+        linear solver. If the linear residual tolerance (see krylov_tol) is
+        not reached, the final iterate is used as Newton increment.
+        
+            Parameters::
+            
+                    maxl
+                            - A positive integer.
+                            - Default 20.
+            
+            Returns::
+            
+                The current value of maxl.
+        """
+        return self.options["maxl"]
+    
+    maxl = property(_get_maxl, _set_maxl)
+    
+    def _set_krylov_tol(self, krylov_tol):
+        try:
+            krylov_tol = float(krylov_tol)
+        except (ValueError, TypeError):
+            raise Radau_Exception("The Krylov tolerance must be a float.") from None
+        if krylov_tol <= 0.0 or krylov_tol >= 1.0:
+            raise Radau_Exception("The Krylov tolerance must be between 0 and 1.")
+        self.options["krylov_tol"] = krylov_tol
+    
+    def _get_krylov_tol(self):
+        """
+        Specifies the tolerance of the KRYLOV linear solver, relative to
+        the tolerance of the Newton iteration (fnewt). GMRES stops once the
+        weighted norm of the linear residual is below krylov_tol*fnewt
+        times the modulus of the shift (fac1, or alphn + i*betan, for the
+        real and complex system).
+        
+            Parameters::
+            
+                    krylov_tol
+                            - A float between 0 and 1.
+                            - Default 0.05.
+            
+            Returns::
+            
+                The current value of krylov_tol.
+        """
+        return self.options["krylov_tol"]
+    
+    krylov_tol = property(_get_krylov_tol, _set_krylov_tol)
+
     def _get_implementation(self):
         self.log_message("Deprecation Warning: Radau5ODE only supports the 'c' implementation and this attribute will be removed in the future\n", LOUD)
         return 'c'
@@ -170,7 +420,7 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         except Exception:
             raise Radau_Exception("Failed to import the Radau5 solver.") from None
 
-        if self.usejac and not hasattr(self.problem, "jac"):
+        if self.usejac and self._problem_jac is None and not self.problem_info["fused_jac"]:
             raise Radau_Exception("Use of an analytical Jacobian is enabled, but problem does contain a 'jac' function.")
         
         if self.options["linear_solver"] == "SPARSE":
@@ -194,14 +444,30 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
                 self.finalize()
                 raise Radau5Error(value = ret, err_msg = self.rad_memory.get_err_msg())
 
-        self.rad_memory = self.radau5.RadauMemory()
         sparseLU = int(self.options["linear_solver"] == "SPARSE")
-        ret = self.rad_memory.initialize(self.problem_info["dim"], sparseLU, self.options["num_threads"], self.problem_info["jac_fcn_nnz"])
-        if ret == -3: # SuperLU not enabled
-            self.finalize()
-            raise Radau5Error(value = ret, err_msg = "Radau5 solver has not been compiled with superLU enabled.")
-        check_init_return(ret)
+        mujac, mljac = get_bandwidths(self.options, self.problem_info["jac_pattern"], self.problem_info["dim"], Radau_Exception) if self.options["linear_solver"] == "BAND" else (-1, -1)
+        maxl = self.options["maxl"] if self.options["linear_solver"] == "KRYLOV" else 0
+        user_linsol = self.options["linear_solver"] if isinstance(self.options["linear_solver"], Radau5LinearSolver) else None
+        #The difference quotients of the BAND solver perturb mujac+mljac+1 columns at a time
+        self._nfcn_per_jac = min(self.problem_info["dim"], mujac + mljac + 1) if mljac >= 0 else self.problem_info["dim"]
+        if maxl > 0:
+            self._nfcn_per_jac = 0 #Counted per Jacobian-vector product instead
+        if user_linsol is not None:
+            self._nfcn_per_jac = 0 #The user-provided linear solver evaluates the Jacobian
+        #The Jacobian kept for a warm start belongs to the linear solver, hence it is part of the configuration
+        rad_memory_config = (self.problem_info["dim"], sparseLU, self.options["num_threads"], self.problem_info["jac_fcn_nnz"], mljac, mujac, maxl, user_linsol)
+        if not self.options["warm_start"] or self._rad_memory_config != rad_memory_config:
+            self._free_rad_memory()
+            self.rad_memory = self.radau5.RadauMemory()
+            ret = self.rad_memory.initialize(*rad_memory_config[:-1])
+            if ret == -3: # SuperLU not enabled
+                self.finalize()
+                raise Radau5Error(value = ret, err_msg = "Radau5 solver has not been compiled with superLU enabled.")
+            check_init_return(ret)
+            self._rad_memory_config = rad_memory_config
         # set parameters
+        ret = self.rad_memory.set_warm_start(self.warm_start)
+        check_init_return(ret)
         ret = self.rad_memory.set_nmax(self.maxsteps)
         check_init_return(ret)
         ret = self.rad_memory.set_nmax_newton(self.newt)
@@ -228,20 +494,42 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         check_init_return(ret)
         ret = self.rad_memory.set_fac_upper(self.fac2)
         check_init_return(ret)
+        ret = self.rad_memory.set_step_schedule(self.options["step_schedule"])
+        check_init_return(ret)
+
+        lapack = self.options["lapack"] and self.options["linear_solver"] == "DENSE"
+        if lapack and not self.radau5.lapack_available:
+            self.log_message("Using the built-in dense LU decompositions since Radau5 has not been compiled with LAPACK.", LOUD)
+            lapack = False
+        ret = self.rad_memory.set_lapack(lapack)
+        check_init_return(ret)
+        if maxl > 0:
+            ret = self.rad_memory.set_krylov_tol(self.krylov_tol)
+            check_init_return(ret)
 
     def set_problem_data(self):
+        self._prec_data = None #Passed from prec_setup to prec_solve of the KRYLOV linear solver
+        
+        #The Jacobian of a fused rhs_and_jac is cached and reused by _jacobian
+        if self.problem_info["fused_jac"]:
+            self._fused = RHSJacobianCache(self.problem.rhs_and_jac, self._problem_jac if self.problem_info["jac_fcn"] else None)
+            rhs_fcn = self._fused.rhs
+        else:
+            self._fused = None
+            rhs_fcn = self._problem_rhs
+        
         if self.problem_info["state_events"]:
             def event_func(t, y):
                 try:
-                    res = self.problem.state_events(t, y, self.sw)
+                    res = self._problem_state_events(t, y, self.sw)
                 except BaseException as E:
                     self._py_err = E
                     return -1, None # non-recoverable
                 return 0, res ## OK
-            def f(t, y):
+            def f(t, y, out=None):
                 ret = 0
                 try:
-                    rhs = self.problem.rhs(t, y, self.sw)
+                    rhs = rhs_fcn(t, y, self.sw) if out is None else rhs_fcn(t, y, self.sw, out=out)
                     return rhs, [ret]
                 except BaseException as E:
                     rhs = y.copy()
@@ -260,10 +548,10 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
                 raise self._py_err
             self.statistics["nstatefcns"] += 1
         else:
-            def f(t, y):
+            def f(t, y, out=None):
                 ret = 0
                 try:
-                    rhs = self.problem.rhs(t, y)
+                    rhs = rhs_fcn(t, y) if out is None else rhs_fcn(t, y, out=out)
                 except BaseException as E:
                     rhs = y.copy()
                     if isinstance(E, (np.linalg.LinAlgError, ZeroDivisionError, AssimuloRecoverableError)): ## recoverable
@@ -273,6 +561,10 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
                         ret = -1 #Non-recoverable
                 return rhs, [ret]
             self.f = f
+        
+        #Low-level (C) functions are called directly by the C core
+        if isinstance(rhs_fcn, LowLevelCallback):
+            self.f = rhs_fcn
     
     def interpolate(self, time):
         y = np.empty(self._leny)
@@ -293,6 +585,9 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
             self._werr = werr
             ret = 0
             
+            if self.options["record_steps"]:
+                self.step_times.append(t)
+            
             if self.problem_info["state_events"]:
                 flag, t, y = self.event_locator(told, t, y)
                 if flag == ID_PY_EVENT: ret = 1
@@ -331,15 +626,22 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
             
         return ret
         
-    def _jacobian(self, t, y):
+    def _jacobian(self, t, y, out=None):
         """
         Calculates the Jacobian, either by an approximation or by the user
-        defined (jac specified in the problem class).
+        defined (jac specified in the problem class). If given, the dense
+        Jacobian is written into out.
         """
         ret = 0
         try:
-            jac = self.problem.jac(t,y)
-            if isinstance(jac, sps.csc_matrix) and (self.options["linear_solver"] == "DENSE"):
+            if out is not None:
+                self._problem_jac(t, y, out=out)
+                return out, [ret]
+            if self._fused is not None:
+                jac = self._fused.jac(t, y, self.sw) if self.problem_info["state_events"] else self._fused.jac(t, y)
+            else:
+                jac = self._problem_jac(t,y)
+            if isinstance(jac, sps.csc_matrix) and (self.options["linear_solver"] != "SPARSE"):
                 jac = jac.toarray()
         except BaseException as E:
             jac = np.eye(len(y))
@@ -349,15 +651,82 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
                 self._py_err = E
                 ret = -1 #Non-recoverable
         return jac, [ret]
+
+    def _prec_solve(self, t, y, fy, r, gamma, delta):
+        """
+        Calls the preconditioner solve (prec_solve in the problem class) of
+        the KRYLOV linear solver, which approximately solves
+        (I - gamma*J) z = r, as in CVode.
+        """
+        ret = 0
+        try:
+            z = self.problem.prec_solve(t, y, fy, r, gamma, delta, self._prec_data)
+        except BaseException as E:
+            z = r
+            if isinstance(E, (np.linalg.LinAlgError, ZeroDivisionError, AssimuloRecoverableError)): ## recoverable
+                ret = 1 #Recoverable error
+            else:
+                self._py_err = E
+                ret = -1 #Non-recoverable
+        return z, [ret]
+
+    def _prec_setup(self, t, y, fy, jok, gamma):
+        """
+        Calls the preconditioner setup (prec_setup in the problem class) of
+        the KRYLOV linear solver, which returns [jcur, prec_data] as in CVode.
+        The prec_data is passed on to prec_solve.
+        """
+        ret = 0
+        try:
+            _, self._prec_data = self.problem.prec_setup(t, y, fy, jok, gamma, self._prec_data)
+        except BaseException as E:
+            if isinstance(E, (np.linalg.LinAlgError, ZeroDivisionError, AssimuloRecoverableError)): ## recoverable
+                ret = 1 #Recoverable error
+            else:
+                self._py_err = E
+                ret = -1 #Non-recoverable
+        return None, [ret]
+
+    def _linsol_call(self, method, *args):
+        """
+        Calls a method of the user-provided linear solver (a Radau5LinearSolver).
+        """
+        ret = 0
+        res = None
+        try:
+            res = method(*args)
+        except BaseException as E:
+            if isinstance(E, (np.linalg.LinAlgError, ZeroDivisionError, AssimuloRecoverableError)): ## recoverable
+                ret = 1 #Recoverable error
+            else:
+                self._py_err = E
+                ret = -1 #Non-recoverable
+        return res, [ret]
             
     def integrate(self, t, y, tf, opts):
-        IJAC  = 1 if self.usejac else 0 #Switch for the jacobian, 0==NO JACOBIAN
-        if self.usejac and not hasattr(self.problem, "jac"):
+        krylov = self.options["linear_solver"] == "KRYLOV"
+        user_linsol = self.options["linear_solver"] if isinstance(self.options["linear_solver"], Radau5LinearSolver) else None
+        IJAC  = 1 if self.usejac and not krylov and user_linsol is None else 0 #Switch for the jacobian, 0==NO JACOBIAN (matrix-free KRYLOV or user-provided linear solver)
+        if self.usejac and self._problem_jac is None and not self.problem_info["fused_jac"]:
             raise Radau_Exception("Use of an analytical Jacobian is enabled, but problem does contain a 'jac' function.")
         IOUT  = 1 #solout is called after every step
         
         #Dummy methods
-        jac_dummy = (lambda t:t) if not self.usejac else self._jacobian
+        jac_dummy = (lambda t:t) if not IJAC else self._jacobian
+        if IJAC and not self.problem_info["fused_jac"] and isinstance(self._problem_jac, LowLevelCallback) and \
+           self.options["linear_solver"] != "BAND" and (self.options["linear_solver"] == "DENSE") == (self._problem_jac.pattern is None):
+            jac_dummy = self._problem_jac #Called directly by the C core
+        jac_out = IJAC and self.problem_info["jac_out"] and (self.options["linear_solver"] == "DENSE" or \
+                  (self.options["linear_solver"] == "BAND" and not isinstance(self._problem_jac, LowLevelCallback)))
+        jac_pattern = None
+        if self.usejac and self.problem_info["jac_pattern_out"] and self.options["linear_solver"] == "SPARSE":
+            jac_pattern = self.problem_info["jac_pattern"] #Only the values are evaluated, into the internal buffer
+        prec_solve = self._prec_solve if krylov and self.problem_info["prec_solve"] else None
+        prec_setup = self._prec_setup if prec_solve is not None and self.problem_info["prec_setup"] else None
+        linsol = None
+        if user_linsol is not None:
+            linsol = [lambda *args, method = method: self._linsol_call(method, *args) for method in
+                      (user_linsol.jac, user_linsol.factor_real, user_linsol.factor_complex, user_linsol.solve_real, user_linsol.solve_complex)]
         
         #Check for initialization
         if opts["initialize"]:
@@ -370,16 +739,25 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         self._opts = opts
         self.rad_memory.reinit()
         t, y, flag =  self.radau5.radau5_py_solve(self.f, t, y.copy(), tf, self.inith, self.rtol*np.ones(self.problem_info["dim"]), self.atol, 
-                                                  jac_dummy, IJAC, self._solout, IOUT, self.rad_memory)
+                                                  jac_dummy, IJAC, self._solout, IOUT, self.rad_memory, self.problem_info["fcn_out"], jac_out,
+                                                  jac_pattern, prec_solve, prec_setup, linsol)
         
         #Retrieving statistics
         nfcns, njacs, _, nsteps, nerrfails, nLU, _ = self.rad_memory.get_stats()
         self.statistics["nsteps"]    += nsteps
         self.statistics["nfcns"]     += nfcns
         self.statistics["njacs"]     += njacs
-        self.statistics["nfcnjacs"]  += (njacs*self.problem_info["dim"] if not self.usejac else 0)
+        self.statistics["nfcnjacs"]  += (njacs*self._nfcn_per_jac if not IJAC else 0)
         self.statistics["nerrfails"] += nerrfails
         self.statistics["nlus"]      += nLU
+        if krylov:
+            nliters, nlcfails, njvevals, nprecs, nprecsetups = self.rad_memory.get_krylov_stats()
+            self.statistics["nliters"]     += nliters
+            self.statistics["nlcfails"]    += nlcfails
+            self.statistics["njacvecs"]    += njvevals
+            self.statistics["nfcnjacs"]    += njvevals
+            self.statistics["nprecs"]      += nprecs
+            self.statistics["nprecsetups"] += nprecsetups
         
         #Checking return
         if flag == 0:
@@ -418,8 +796,15 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
     def finalize(self):
         """
         Called after simulation is done, de-allocate memory internally to the called C solver.
+        The memory is kept if warm_start is activated.
         """
-        self.rad_memory.finalize()
+        if not self.options["warm_start"]:
+            self._free_rad_memory()
+    
+    def _free_rad_memory(self):
+        if self._rad_memory_config is not None:
+            self.rad_memory.finalize()
+            self._rad_memory_config = None
 
 class _Radau5ODE(Radau_Common,Explicit_ODE):
     """
@@ -852,11 +1237,11 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
         self._needjac = False #A new jacobian is not needed
         
         if self.usejac: #Retrieve the user-defined jacobian
-            cjac = self.problem.jac(t,y)
+            cjac = self._problem_jac(t,y)
         else:           #Calculate a numeric jacobian
             delt = np.array([(self._eps*max(abs(yi),1.e-5))**0.5 for yi in y])*np.identity(self._leny) #Calculate a disturbance
-            Fdelt = np.array([self.problem.rhs(t,y+e) for e in delt]) #Add the disturbance (row by row) 
-            grad = ((Fdelt-self.problem.rhs(t,y)).T/delt.diagonal()).T
+            Fdelt = np.array([self._problem_rhs(t,y+e) for e in delt]) #Add the disturbance (row by row) 
+            grad = ((Fdelt-self._problem_rhs(t,y)).T/delt.diagonal()).T
             cjac = np.array(grad).T
 
             self.statistics["nfcnjacs"] += 1+self._leny #Add the number of function evaluations
@@ -993,6 +1378,13 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
         self._type = '(implicit)'
         self._event_info = None
 
+    def __getstate__(self):
+        state = Implicit_ODE.__getstate__(self)
+        #The Fortran module and the wrapped residual are set again by initialize and simulate
+        for name in ("_f", "event_func", "radau5"):
+            state["attributes"].pop(name, None)
+        return state
+
     def _get_implementation(self):
         return 'f'
     
@@ -1024,15 +1416,15 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
         if self.problem_info["state_events"]:
             if self.problem_info["type"] == 1:
                 def event_func(t, y, yd):
-                    return self.problem.state_events(t, y, yd, self.sw)
+                    return self._problem_state_events(t, y, yd, self.sw)
             else:
                 def event_func(t, y, yd):
-                    return self.problem.state_events(t, y, self.sw)
+                    return self._problem_state_events(t, y, self.sw)
             def f(t, y):
                 ret = 0
                 try:
                     leny = self._leny
-                    res = self.problem.res(t, y[:leny], y[leny:2*leny], self.sw)
+                    res = self._problem_res(t, y[:leny], y[leny:2*leny], self.sw)
                 except BaseException as err:
                     res = y[:leny].copy()
                     if isinstance(err, (np.linalg.LinAlgError, ZeroDivisionError, AssimuloRecoverableError)): ## recoverable
@@ -1050,7 +1442,7 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
                 ret = 0
                 try:
                     leny = self._leny
-                    res = self.problem.res(t, y[:leny], y[leny:2*leny])
+                    res = self._problem_res(t, y[:leny], y[leny:2*leny])
                 except BaseException as err:
                     res = y[:leny].copy()
                     if isinstance(err, (np.linalg.LinAlgError, ZeroDivisionError, AssimuloRecoverableError)): ## recoverable
@@ -1154,7 +1546,7 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
         
         #Dummy methods
         mas_dummy = lambda t:t
-        jac_dummy = (lambda t:t) if not self.usejac else self.problem.jac
+        jac_dummy = (lambda t:t) if not self.usejac else self._problem_jac
         
         #Check for initialization
         if opts["initialize"]:
@@ -1667,7 +2059,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
         q = np.append(y,yd)
         
         if self.usejac: #Retrieve the user-defined jacobian
-            cjac = self.problem.jac(t,y,yd)
+            cjac = self._problem_jac(t,y,yd)
         else:           #Calculate a numeric jacobian
             delt = np.array([(self._eps*max(abs(yi),1.e-5))**0.5 for yi in q])*np.identity(self._2leny) #Calculate a disturbance
             Fdelt = np.array([self._ode_f(t,q+e) for e in delt]) #Add the disturbance (row by row) 
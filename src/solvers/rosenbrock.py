@@ -21,7 +21,7 @@ import scipy.sparse as sp
 from assimulo.ode import NORMAL, ID_PY_EVENT, ID_PY_COMPLETE
 from assimulo.explicit_ode import Explicit_ODE
 from assimulo.exception import Rodas_Exception
-from assimulo.support import set_type_shape_array
+from assimulo.support import set_type_shape_array, RHSJacobianCache
 
 from assimulo.lib import rodas
 
@@ -294,32 +294,53 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         self.options["safe"]     = 0.9 #Safety factor
         self.options["atol"]     = 1.0e-6*np.ones(self.problem_info["dim"]) #Absolute tolerance
         self.options["rtol"]     = 1.0e-6 #Relative tolerance
-        self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
+        self.options["usejac"]   = True if (self.problem_info["jac_fcn"] or self.problem_info["fused_jac"]) else False
         self.options["maxsteps"] = 10000
         
         #Solver support
         self.supports["report_continuously"] = True
         self.supports["interpolated_output"] = True
         self.supports["state_events"] = True
+        self.supports["step_schedule"] = True
         
         #Internal
         self._leny = len(self.y) #Dimension of the problem
+        self._schedule_restart = False
+        
+    def __getstate__(self):
+        state = Explicit_ODE.__getstate__(self)
+        #Closures over the problem, created by set_problem_data at the start of simulate
+        for name in ("f", "event_func"):
+            state["attributes"].pop(name, None)
+        return state
         
     def initialize(self):
         #Reset statistics
         self.statistics.reset()
             
     def set_problem_data(self):
+        #The right-hand side is either returned or written into the Fortran buffer dy
+        fcn_out = self.problem_info["fcn_out"]
+        #The Jacobian of a fused rhs_and_jac is cached and reused by _jacobian
+        if self.problem_info["fused_jac"]:
+            self._fused = RHSJacobianCache(self.problem.rhs_and_jac, self._problem_jac if self.problem_info["jac_fcn"] else None)
+            rhs_fcn = self._fused.rhs
+        else:
+            self._fused = None
+            rhs_fcn = self._problem_rhs
         if self.problem_info["state_events"]:
             def event_func(t, y):
                 try:
-                    res = self.problem.state_events(t, y, self.sw)
+                    res = self._problem_state_events(t, y, self.sw)
                 except BaseException as E:
                     self._py_err = E
                     return -1, None # non-recoverable
                 return 0, res ## OK
-            def f(t, y):
-                return self.problem.rhs(t, y, self.sw)
+            def f(t, y, dy):
+                if fcn_out:
+                    rhs_fcn(t, y, self.sw, out=dy)
+                else:
+                    return rhs_fcn(t, y, self.sw)
             self.f = f
             self.event_func = event_func
             self._event_info = [0] * self.problem_info["dimRoot"]
@@ -328,7 +349,12 @@ class RodasODE(Rodas_Common, Explicit_ODE):
                 raise self._py_err
             self.statistics["nstatefcns"] += 1
         else:
-            self.f = self.problem.rhs
+            def f(t, y, dy):
+                if fcn_out:
+                    rhs_fcn(t, y, out=dy)
+                else:
+                    return rhs_fcn(t, y)
+            self.f = f
     
     def interpolate(self, time):
         y = np.empty(self._leny)
@@ -341,8 +367,15 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         """
         This method is called after every successful step taken by Rodas
         """
+        #Initial call of a restart when following the step schedule, already reported
+        if self._schedule_restart and t == told:
+            return irtrn
+        
         self.cont = cont #Saved to be used by the interpolation function.
         
+        if self.options["record_steps"] and t != told:
+            self.step_times.append(t)
+        
         if self.problem_info["state_events"]:
             flag, t, y = self.event_locator(told, t, y)
             #Convert to Fortran indicator.
@@ -379,7 +412,10 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         Calculates the Jacobian, either by an approximation or by the user
         defined (jac specified in the problem class).
         """
-        jac = self.problem.jac(t,y)
+        if self._fused is not None:
+            jac = self._fused.jac(t, y, self.sw) if self.problem_info["state_events"] else self._fused.jac(t, y)
+        else:
+            jac = self._problem_jac(t,y)
         
         if isinstance(jac, sp.csc_matrix):
             jac = jac.toarray()
@@ -423,8 +459,39 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         #Store the opts
         self._opts = opts
         
-        t, y, h, iwork, flag = rodas.rodas(self.f, IFCN, t, y.copy(), tf, self.inith, self.rtol*np.ones(self.problem_info["dim"]), self.atol,
-                    ITOL, jac_dummy, IJAC, MLJAC, MUJAC, dfx_dummy, IDFX, mas_dummy, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
+        def rodas_call(t, y, tf, h):
+            t, y, h, iwork, flag = rodas.rodas(self.f, IFCN, t, y.copy(), tf, h, self.rtol*np.ones(self.problem_info["dim"]), self.atol,
+                        ITOL, jac_dummy, IJAC, MLJAC, MUJAC, dfx_dummy, IDFX, mas_dummy, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
+            
+            #Retrieving statistics
+            self.statistics["nsteps"]      += iwork[16]
+            self.statistics["nfcns"]        += iwork[13]
+            self.statistics["njacs"]        += iwork[14]
+            #self.statistics["nstepstotal"] += iwork[15]
+            self.statistics["nfcnjacs"]    += (iwork[14]*self.problem_info["dim"] if not self.usejac else 0)
+            self.statistics["nerrfails"]     += iwork[17]
+            self.statistics["nlus"]         += iwork[18]
+            
+            return t, y, flag
+        
+        if self.options["step_schedule"] is None:
+            t, y, flag = rodas_call(t, y, tf, self.inith)
+        else:
+            #Each scheduled step is taken by a separate call with the initial and maximal
+            #step-size set to the scheduled step. A failed error test still leads to 
+            #additional (smaller) steps within the scheduled step.
+            tol = 10*np.finfo(float).eps*max(abs(t), abs(tf))
+            schedule = self.options["step_schedule"]
+            schedule = schedule[(schedule > t + tol) & (schedule < tf - tol)]
+            try:
+                for tout in np.append(schedule, tf):
+                    WORK[1] = tout - t
+                    t, y, flag = rodas_call(t, y, tout, tout - t)
+                    self._schedule_restart = True
+                    if flag != 1:
+                        break
+            finally:
+                self._schedule_restart = False
                     
         #Checking return
         if flag == 1:
@@ -434,15 +501,6 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         else:
             raise Exception("Rodas failed with flag %d"%flag)
         
-        #Retrieving statistics
-        self.statistics["nsteps"]      += iwork[16]
-        self.statistics["nfcns"]        += iwork[13]
-        self.statistics["njacs"]        += iwork[14]
-        #self.statistics["nstepstotal"] += iwork[15]
-        self.statistics["nfcnjacs"]    += (iwork[14]*self.problem_info["dim"] if not self.usejac else 0)
-        self.statistics["nerrfails"]     += iwork[17]
-        self.statistics["nlus"]         += iwork[18]
-        
         return flag, self._tlist, self._ylist
         
     def state_event_info(self):
@@ -67,25 +67,39 @@ class Dopri5(Explicit_ODE):
         self.supports["report_continuously"] = True
         self.supports["interpolated_output"] = True
         self.supports["state_events"] = True
+        self.supports["step_schedule"] = True
         
         #Internal
         self._leny = len(self.y) #Dimension of the problem
+        self._schedule_restart = False
+        
+    def __getstate__(self):
+        state = Explicit_ODE.__getstate__(self)
+        #Closures over the problem, created by set_problem_data at the start of simulate
+        for name in ("f", "event_func"):
+            state["attributes"].pop(name, None)
+        return state
         
     def initialize(self):
         #Reset statistics
         self.statistics.reset()
     
     def set_problem_data(self):
+        #The right-hand side is either returned or written into the Fortran buffer dy
+        fcn_out = self.problem_info["fcn_out"]
         if self.problem_info["state_events"]:
             def event_func(t, y):
                 try:
-                    res = self.problem.state_events(t, y, self.sw)
+                    res = self._problem_state_events(t, y, self.sw)
                 except BaseException as E:
                     self._py_err = E
                     return -1, None # non-recoverable
                 return 0, res ## OK
-            def f(t, y):
-                return self.problem.rhs(t, y, self.sw)
+            def f(t, y, dy):
+                if fcn_out:
+                    self._problem_rhs(t, y, self.sw, out=dy)
+                else:
+                    return self._problem_rhs(t, y, self.sw)
             self.f = f
             self.event_func = event_func
             self._event_info = [0] * self.problem_info["dimRoot"]
@@ -94,7 +108,12 @@ class Dopri5(Explicit_ODE):
                 raise self._py_err
             self.statistics["nstatefcns"] += 1
         else:
-            self.f = self.problem.rhs
+            def f(t, y, dy):
+                if fcn_out:
+                    self._problem_rhs(t, y, out=dy)
+                else:
+                    return self._problem_rhs(t, y)
+            self.f = f
     
     def interpolate(self, time):
         y = np.empty(self._leny)
@@ -107,10 +126,17 @@ class Dopri5(Explicit_ODE):
         """
         This method is called after every successful step taken by Radau5
         """
+        #Initial call of a restart when following the step schedule, already reported
+        if self._schedule_restart and t == told:
+            return irtrn
+        
         #Saved to be used by the interpolation function.
         self.cont = cont
         self.lrc = lrc
         
+        if self.options["record_steps"] and t != told:
+            self.step_times.append(t)
+        
         if self.problem_info["state_events"]:
             flag, t, y = self.event_locator(told, t, y)
             #Convert to Fortram indicator.
@@ -169,7 +195,35 @@ class Dopri5(Explicit_ODE):
         #Store the opts
         self._opts = opts
         
-        t, y, iwork, flag = dopri5.dopri5(self.f, t, y.copy(), tf, self.rtol*np.ones(self.problem_info["dim"]), self.atol, ITOL, self._solout, IOUT, WORK, IWORK)
+        def dopri5_call(t, y, tf):
+            t, y, iwork, flag = dopri5.dopri5(self.f, t, y.copy(), tf, self.rtol*np.ones(self.problem_info["dim"]), self.atol, ITOL, self._solout, IOUT, WORK, IWORK)
+            
+            #Retrieving statistics
+            self.statistics["nsteps"]      += iwork[18]
+            self.statistics["nfcns"]        += iwork[16]
+            #self.statistics["nstepstotal"] += iwork[17]
+            self.statistics["nerrfails"]     += iwork[19]
+            
+            return t, y, flag
+        
+        if self.options["step_schedule"] is None:
+            t, y, flag = dopri5_call(t, y, tf)
+        else:
+            #Each scheduled step is taken by a separate call with the initial and maximal
+            #step-size set to the scheduled step. A failed error test still leads to 
+            #additional (smaller) steps within the scheduled step.
+            tol = 10*np.finfo(float).eps*max(abs(t), abs(tf))
+            schedule = self.options["step_schedule"]
+            schedule = schedule[(schedule > t + tol) & (schedule < tf - tol)]
+            try:
+                for tout in np.append(schedule, tf):
+                    WORK[5] = WORK[6] = tout - t
+                    t, y, flag = dopri5_call(t, y, tout)
+                    self._schedule_restart = True
+                    if flag != 1:
+                        break
+            finally:
+                self._schedule_restart = False
         
         #Checking return
         if flag == 1:
@@ -179,12 +233,6 @@ class Dopri5(Explicit_ODE):
         else:
             raise Exception("Dopri5 failed with flag %d"%flag)
         
-        #Retrieving statistics
-        self.statistics["nsteps"]      += iwork[18]
-        self.statistics["nfcns"]        += iwork[16]
-        #self.statistics["nstepstotal"] += iwork[17]
-        self.statistics["nerrfails"]     += iwork[19]
-        
         return flag, self._tlist, self._ylist
         
     def state_event_info(self):
@@ -463,6 +511,13 @@ class RungeKutta34(Explicit_ODE):
         self.supports["interpolated_output"] = True
         self.supports["state_events"] = True
     
+    def __getstate__(self):
+        state = Explicit_ODE.__getstate__(self)
+        #The problem closures and the interpolant of the last step are created again when stepping
+        for name in ("f", "event_func", "interpolate"):
+            state["attributes"].pop(name, None)
+        return state
+    
     def initialize(self):
         #Reset statistics
         self.statistics.reset()
@@ -471,14 +526,17 @@ class RungeKutta34(Explicit_ODE):
         if self.problem_info["state_events"]: 
             def event_func(t, y):
                 try:
-                    res = self.problem.state_events(t, y, self.sw)
+                    res = self._problem_state_events(t, y, self.sw)
                 except BaseException as E:
                     self._py_err = E
                     return -1, None # non-recoverable
                 return 0, res ## OK
             def f(dy ,t, y): 
                 try:
-                    dy[:] = self.problem.rhs(t, y, self.sw)
+                    if self.problem_info["fcn_out"]:
+                        self._problem_rhs(t, y, self.sw, out=dy)
+                    else:
+                        dy[:] = self._problem_rhs(t, y, self.sw)
                 except Exception:
                     return False
                 return True
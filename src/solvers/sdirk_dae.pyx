@@ -124,8 +124,8 @@ class SDIRK_DAE(Implicit_ODE):
 
         
         #Dummy methods
-        g_dummy = (lambda t:x) if not self.problem_info["state_events"] else self.problem.state_events
-        jac_dummy = (lambda t,y:np.zeros((len(y),len(y)))) if not self.usejac else self.problem.jac
+        g_dummy = (lambda t:x) if not self.problem_info["state_events"] else self._problem_state_events
+        jac_dummy = (lambda t,y:np.zeros((len(y),len(y)))) if not self.usejac else self._problem_jac
         
         #Extra args to rhs and state_events
         rhs_extra_args = (self.sw,) if self.problem_info["switches"] else ()
@@ -147,7 +147,7 @@ class SDIRK_DAE(Implicit_ODE):
         if opts["report_continuously"] or opts["output_list"] is None:
             while (ISTATE == 2 or ISTATE == 1) and t < tf:
             
-                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(self.problem.rhs, y.copy(), t, tf, ITOL, 
+                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(self._problem_rhs, y.copy(), t, tf, ITOL, 
                         self.rtol*np.ones(self.problem_info["dim"]), self.atol,
                         ITASK, ISTATE, IOPT, RWORK, IWORK, jac_dummy, JT, g_dummy, JROOT,
                         f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
@@ -188,7 +188,7 @@ class SDIRK_DAE(Implicit_ODE):
             for tout in output_list:
                 output_index += 1
 
-                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(self.problem.rhs, y.copy(), t, tout, ITOL, 
+                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(self._problem_rhs, y.copy(), t, tout, ITOL, 
                     self.rtol*np.ones(self.problem_info["dim"]), self.atol,
                     ITASK, ISTATE, IOPT, RWORK, IWORK, jac_dummy, JT, g_dummy, JROOT,
                     f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
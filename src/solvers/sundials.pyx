@@ -24,16 +24,17 @@ from assimulo.exception import AssimuloException
 
 from assimulo.explicit_ode cimport Explicit_ODE 
 from assimulo.implicit_ode cimport Implicit_ODE
-from assimulo.support import set_type_shape_array
+from assimulo.support import set_type_shape_array, RHSJacobianCache, ColoredJacobian, get_bandwidths, check_bandwidth
+from assimulo.support cimport LowLevelCallback, c_rhs_t, c_res_t, c_jac_t, c_jac_res_t, c_events_t, c_events_res_t
 
 cimport sundials_includes as SUNDIALS
 
 #Various C includes transferred to namespace
 from sundials_includes cimport N_Vector, realtype, N_VectorContent_Serial, DENSE_COL, sunindextype
-from sundials_includes cimport memcpy, N_VNew_Serial, DlsMat, SUNMatrix, SUNMatrixContent_Dense, SUNMatrixContent_Sparse
+from sundials_includes cimport memcpy, N_VNew_Serial, DlsMat, SUNMatrix, SUNMatrixContent_Dense, SUNMatrixContent_Sparse, SUNMatrixContent_Band
 IF SUNDIALS_VERSION < (5,0,0):
     from sundials_includes cimport SlsMat
-from sundials_includes cimport malloc, free, N_VConst_Serial
+from sundials_includes cimport malloc, free, N_VConst_Serial, N_VSetArrayPointer_Serial, N_VCloneEmpty
 IF SUNDIALS_VERSION >= (6,0,0):
     from sundials_includes cimport N_VCloneVectorArray, N_VDestroy
 ELSE:
@@ -47,6 +48,7 @@ include "../lib/sundials_callbacks_ida_cvode.pxi"
 
 _sundials_version = SUNDIALS_VERSION
 MINH_FORCE_FACTOR = 10
+KLU_ORDERINGS = {"AMD": 0, "COLAMD": 1, "NATURAL": 2} #Fill-reducing orderings of the KLU linear solver
 
 cpdef get_sundials_version():
     """Return SUNDIALS version as tuple."""
@@ -69,6 +71,7 @@ cdef class IDA(Implicit_ODE):
     cdef void* ida_mem
     cdef ProblemData pData      #A struct containing information about the problem
     cdef N_Vector yTemp, ydTemp, nv_atol
+    cdef N_Vector nv_work       #Data-less vector pointing to the output arrays of the getters
     cdef N_Vector *ySO
     cdef N_Vector *ydSO
     cdef object f
@@ -97,11 +100,19 @@ cdef class IDA(Implicit_ODE):
         self.options["suppress_alg"] = False #Turn on or off the local error test on algebraic variables
         self.options["suppress_sens"] = False #Turn on or off the local error test on the sensitivity variables
         self.options["linear_solver"] = "DENSE"
+        self.options["mupper"] = None        #Upper half-bandwidth of the BAND linear solver
+        self.options["mlower"] = None        #Lower half-bandwidth of the BAND linear solver
+        self.options["klu_ordering"] = "COLAMD" #Fill-reducing ordering of the KLU linear solver
+        self.options["sparse_format"] = "CSC" #Storage format of the sparse Jacobian (KLU)
+        self.options["maxkrylov"] = 0 #Maximum Krylov subspace dimension, 0 gives the SUNDIALS default
+        self.options["precond_module"] = None #The SUNDIALS preconditioner module, "BBD"
+        self.options["max_restarts"] = 0 #Maximum number of restarts of SPGMR and SPFGMR
+        self.options["gram_schmidt"] = "MODIFIED" #Orthogonalization of SPGMR and SPFGMR
         self.options["maxsteps"] = 10000     #Maximum number of steps
         self.options["maxh"] = 0.0           #Maximum step-size
         self.options["maxord"] = 5           #Maximum order of method
         self.options["maxcorS"] = 3          #Maximum number of nonlinear iteration for sensitivity variables
-        self.options["usejac"]   = True if (self.problem_info["jac_fcn"] or self.problem_info["jacv_fcn"]) else False
+        self.options["usejac"]   = True if (self.problem_info["jac_fcn"] or self.problem_info["jacv_fcn"] or self.problem_info["fused_jac"]) else False
         self.options["usesens"] = True if self.problem_info["dimSens"] > 0 else False
         self.options["inith"] = 0.0          #Initial step-size
         self.options["algvar"] = np.array([1.0]*self.problem_info["dim"])
@@ -110,6 +121,7 @@ cdef class IDA(Implicit_ODE):
         self.options["dqrhomax"] = 0.0
         self.options["pbar"] = [1]*self.problem_info["dimSens"]
         self.options["external_event_detection"] = False #Sundials rootfinding is used for event location as default 
+        self.options["warm_start"] = False #Keep the Jacobian between consecutive simulations
 
         #Solver support
         self.supports["report_continuously"] = True
@@ -117,6 +129,9 @@ cdef class IDA(Implicit_ODE):
         self.supports["interpolated_sensitivity_output"] = True
         self.supports["state_events"] = True
         
+        self.statistics.add_key("nliters", "Number of linear iterations")
+        self.statistics.add_key("nlcfails", "Number of linear convergence failures")
+        
         #Get options from Problem
         if hasattr(problem, 'pbar'):
             self.pbar = problem.pbar
@@ -126,11 +141,28 @@ cdef class IDA(Implicit_ODE):
             self.algvar = problem.algvar
         if hasattr(problem, 'yS0'):
             self.yS0 = problem.yS0
+    
+    def __getstate__(self):
+        state = Implicit_ODE.__getstate__(self)
+        state["yS0"] = self.yS0
+        return state
+    
+    def __setstate__(self, state):
+        Implicit_ODE.__setstate__(self, state)
+        self.yS0 = state["yS0"]
         
+        #The problem data is set up anew, the memory of IDA on the next call to simulate
+        self.pData = ProblemData()
+        self.set_problem_data()
         
     cdef set_problem_data(self):
-        #Sets the residual or rhs
-        self.pt_fcn = self.problem.res
+        #Sets the residual or rhs, the Jacobian of a fused function is cached
+        if self.problem_info["fused_jac"]:
+            fused = RHSJacobianCache(self.problem.res_and_jac, self._problem_jac if self.problem_info["jac_fcn"] else None)
+            self.pt_fcn = fused.res
+        else:
+            fused = None
+            self.pt_fcn = self._problem_res
         self.pData.RHS = <void*>self.pt_fcn#<void*>self.problem.f
         self.pData.dim = self.problem_info["dim"] 
         self.pData.memSize = self.pData.dim*sizeof(realtype)
@@ -142,19 +174,27 @@ cdef class IDA(Implicit_ODE):
         #self.pData.yd = <void*>self.ydTemp 
         
         if self.problem_info["state_events"] is True: #Sets the root function
-            self.pt_root = self.problem.state_events
+            self.pt_root = self._problem_state_events
             self.pData.ROOT = <void*>self.pt_root#<void*>self.problem.state_events
             self.pData.dimRoot = self.problem_info["dimRoot"]
             self.pData.memSizeRoot = self.pData.dimRoot*sizeof(realtype) 
     
-        if self.problem_info["jac_fcn"] is True: #Sets the jacobian 
-            self.pt_jac = self.problem.jac 
+        if self.problem_info["jac_fcn"] is True or fused is not None: #Sets the jacobian 
+            self.pt_jac = self._problem_jac if fused is None else fused.jac_res 
             self.pData.JAC = <void*>self.pt_jac#<void*>self.problem.jac
             self.pData.memSizeJac = self.pData.dim*self.pData.dim*sizeof(realtype)
         
         if self.problem_info["jacv_fcn"] is True: #Sets the jacobian times vector
             self.pt_jacv = self.problem.jacv
             self.pData.JACV = <void*>self.pt_jacv#<void*>self.problem.jacv
+        
+        #Low-level (C) functions are called directly from the callbacks
+        self.pData.set_c_callbacks(self.pt_fcn, self.pt_jac if (self.problem_info["jac_fcn"] or fused is not None) else None,
+                                   self._problem_state_events if self.problem_info["state_events"] else None, True)
+        self.pData.fcn_out = self.problem_info["fcn_out"]
+        self.pData.root_out = self.problem_info["state_events_out"]
+        self.pData.jac_out = self.problem_info["jac_out"]
+        self.pData.jac_band_out = self.problem_info["jac_out"] and not isinstance(self.pt_jac, (LowLevelCallback, ColoredJacobian))
             
         if self.problem_info["sens_fcn"] is True: #Sets the sensitivity function
             self.pt_sens = self.problem.sens
@@ -179,6 +219,9 @@ cdef class IDA(Implicit_ODE):
         if self.ydTemp != NULL:
             #Deallocate N_Vector
             N_VDestroy(self.ydTemp)
+        
+        if self.nv_work != NULL:
+            N_VDestroy(self.nv_work)
             
         if self.nv_atol != NULL:
             N_VDestroy(self.nv_atol)
@@ -251,8 +294,13 @@ cdef class IDA(Implicit_ODE):
                 cdef void* comm = NULL
             SUNDIALS.SUNContext_Create(comm, &ctx)
 
+        if self.yTemp != NULL: #Only used as template and output vector, the solver keeps copies
+            N_VDestroy(self.yTemp)
+            N_VDestroy(self.ydTemp)
         self.yTemp  = arr2nv(self.y)
         self.ydTemp = arr2nv(self.yd)
+        if self.nv_work == NULL:
+            self.nv_work = N_VCloneEmpty(self.yTemp)
         
         #Updates the switches
         if self.problem_info["switches"]:
@@ -311,28 +359,124 @@ cdef class IDA(Implicit_ODE):
                     flag = SUNDIALS.IDADense(self.ida_mem, self.pData.dim)
                 if flag < 0:
                     raise IDAError(flag, self.t)
-                        
-            elif self.options["linear_solver"] == 'SPGMR':
+            
+            elif self.options["linear_solver"] == 'BAND':
+                mupper, mlower = get_bandwidths(self.options, self.problem_info["jac_pattern"], self.pData.dim)
                 IF SUNDIALS_VERSION >= (3,0,0):
-                    #Create the linear solver
+                    #Create a band Sundials matrix, with storage for the fill-in of the LU factorization
+                    IF SUNDIALS_VERSION >= (6,0,0):
+                        self.sun_matrix = SUNDIALS.SUNBandMatrix(self.pData.dim, mupper, mlower, ctx)
+                    ELIF SUNDIALS_VERSION >= (4,0,0):
+                        self.sun_matrix = SUNDIALS.SUNBandMatrix(self.pData.dim, mupper, mlower)
+                    ELSE:
+                        self.sun_matrix = SUNDIALS.SUNBandMatrix(self.pData.dim, mupper, mlower, min(self.pData.dim-1, mupper+mlower))
+                    #Create a band Sundials linear solver
                     IF SUNDIALS_VERSION >= (4,0,0):
                         IF SUNDIALS_VERSION >= (6,0,0):
-                            self.sun_linearsolver = SUNDIALS.SUNLinSol_SPGMR(self.yTemp, PREC_NONE, 0, ctx)
+                            self.sun_linearsolver = SUNDIALS.SUNLinSol_Band(self.yTemp, self.sun_matrix, ctx)
                         ELSE:
-                            self.sun_linearsolver = SUNDIALS.SUNLinSol_SPGMR(self.yTemp, PREC_NONE, 0)
+                            self.sun_linearsolver = SUNDIALS.SUNLinSol_Band(self.yTemp, self.sun_matrix)
                     ELSE:
-                        self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.yTemp, PREC_NONE, 0)
+                        self.sun_linearsolver = SUNDIALS.SUNBandLinearSolver(self.yTemp, self.sun_matrix)
+                    #Attach it to IDA
+                    IF SUNDIALS_VERSION >= (4,0,0):
+                        flag = SUNDIALS.IDASetLinearSolver(self.ida_mem, self.sun_linearsolver, self.sun_matrix)
+                    ELSE:
+                        flag = SUNDIALS.IDADlsSetLinearSolver(self.ida_mem, self.sun_linearsolver, self.sun_matrix)
+                ELSE:
+                    #Specify the use of the internal band linear algebra functions.
+                    flag = SUNDIALS.IDABand(self.ida_mem, self.pData.dim, mupper, mlower)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+            
+            elif self.options["linear_solver"] in ('SPARSE', 'KLU'):
+                if SUNDIALS.version() < (3,0,0):
+                    raise AssimuloException("The %s linear solver requires SUNDIALS 3.0.0 or newer."%self.options["linear_solver"])
+                if self.options["linear_solver"] == 'KLU' and SUNDIALS.with_klu() == 0:
+                    raise AssimuloException("No support for KLU was detected, please verify that KLU (SuiteSparse) and SUNDIALS has been installed correctly.")
+                if self.options["linear_solver"] == 'SPARSE' and SUNDIALS.with_superlu() == 0:
+                    raise AssimuloException("No support for SuperLU was detected, please verify that SuperLU and SUNDIALS has been installed correctly.")
+                if self.problem_info["jac_fcn_nnz"] == -1:
+                    raise AssimuloException("Need to specify the number of non zero elements in the Jacobian via the option 'jac_nnz' or the sparsity pattern 'jac_pattern'")
+                if self.pData.JAC == NULL or not self.options["usejac"]:
+                    raise AssimuloException("For the %s linear solver, the Jacobian must be provided and activated."%self.options["linear_solver"])
+                
+                #KLU can factorize the Jacobian in either format, SuperLU_MT requires CSC
+                csr = self.options["linear_solver"] == 'KLU' and self.options["sparse_format"] == "CSR"
+                self.pData.set_jac_pattern(self.problem_info["jac_pattern"], self.problem_info["jac_pattern_out"], csr)
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    #Create a sparse Sundials matrix and linear solver
+                    IF SUNDIALS_VERSION >= (6,0,0):
+                        self.sun_matrix = SUNDIALS.SUNSparseMatrix(self.pData.dim, self.pData.dim, self.problem_info["jac_fcn_nnz"], CSR_MAT if csr else CSC_MAT, ctx)
+                        if self.options["linear_solver"] == 'KLU':
+                            self.sun_linearsolver = SUNDIALS.SUNLinSol_KLU(self.yTemp, self.sun_matrix, ctx)
+                        else:
+                            self.sun_linearsolver = SUNDIALS.SUNLinSol_SuperLUMT(self.yTemp, self.sun_matrix, self.options["num_threads"], ctx)
+                    ELSE:
+                        self.sun_matrix = SUNDIALS.SUNSparseMatrix(self.pData.dim, self.pData.dim, self.problem_info["jac_fcn_nnz"], CSR_MAT if csr else CSC_MAT)
+                        if self.options["linear_solver"] == 'KLU':
+                            IF SUNDIALS_VERSION >= (4,0,0):
+                                self.sun_linearsolver = SUNDIALS.SUNLinSol_KLU(self.yTemp, self.sun_matrix)
+                            ELSE:
+                                self.sun_linearsolver = SUNDIALS.SUNKLU(self.yTemp, self.sun_matrix)
+                        else:
+                            self.sun_linearsolver = SUNDIALS.SUNSuperLUMT(self.yTemp, self.sun_matrix, self.options["num_threads"])
+                    if self.options["linear_solver"] == 'KLU':
+                        IF SUNDIALS_VERSION >= (4,0,0):
+                            flag = SUNDIALS.SUNLinSol_KLUSetOrdering(self.sun_linearsolver, KLU_ORDERINGS[self.options["klu_ordering"]])
+                        ELSE:
+                            flag = SUNDIALS.SUNKLUSetOrdering(self.sun_linearsolver, KLU_ORDERINGS[self.options["klu_ordering"]])
+                        if flag < 0:
+                            raise IDAError(flag, self.t)
+                    #Attach it to IDA
+                    IF SUNDIALS_VERSION >= (4,0,0):
+                        flag = SUNDIALS.IDASetLinearSolver(self.ida_mem, self.sun_linearsolver, self.sun_matrix)
+                    ELSE:
+                        flag = SUNDIALS.IDADlsSetLinearSolver(self.ida_mem, self.sun_linearsolver, self.sun_matrix)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+                        
+            elif self.options["linear_solver"] in KRYLOV_SOLVERS:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    #Create the linear solver
+                    IF SUNDIALS_VERSION >= (6,0,0):
+                        self.sun_linearsolver = new_krylov_solver(self.options["linear_solver"], self.yTemp, PREC_NONE if self.options["precond_module"] is None else PREC_LEFT,
+                                                                  self.options["maxkrylov"], self.options["max_restarts"], GRAM_SCHMIDT[self.options["gram_schmidt"]], <void*>ctx)
+                    ELSE:
+                        self.sun_linearsolver = new_krylov_solver(self.options["linear_solver"], self.yTemp, PREC_NONE if self.options["precond_module"] is None else PREC_LEFT,
+                                                                  self.options["maxkrylov"], self.options["max_restarts"], GRAM_SCHMIDT[self.options["gram_schmidt"]], NULL)
                     #Attach it to IDAS
                     IF SUNDIALS_VERSION >= (4,0,0):
                         flag = SUNDIALS.IDASetLinearSolver(self.ida_mem, self.sun_linearsolver, NULL)
                     ELSE:
                         flag = SUNDIALS.IDASpilsSetLinearSolver(self.ida_mem, self.sun_linearsolver)
                 ELSE:
+                    if self.options["linear_solver"] != 'SPGMR':
+                        raise AssimuloException("The %s linear solver requires SUNDIALS 3.0.0 or newer."%self.options["linear_solver"])
                     #Specify the use of SPGMR linear solver.
-                    flag = SUNDIALS.IDASpgmr(self.ida_mem, 0) #0 == Default krylov iterations
+                    flag = SUNDIALS.IDASpgmr(self.ida_mem, self.options["maxkrylov"]) #0 == Default krylov iterations
                 if flag < 0: 
                     raise IDAError(flag, self.t)
                 
+                if self.options["precond_module"] is not None:
+                    IF SUNDIALS_VERSION >= (3,0,0):
+                        if self.options["precond_module"] == "ILU":
+                            if self.pData.JAC == NULL:
+                                raise AssimuloException("The ILU preconditioner needs the Jacobian, jac.")
+                            self.pData.set_jac_pattern(self.problem_info["jac_pattern"], self.problem_info["jac_pattern_out"])
+                            self.pData.ilu = ILUPreconditioner(self.pData.dim)
+                            IF SUNDIALS_VERSION >= (4,0,0):
+                                flag = SUNDIALS.IDASetPreconditioner(self.ida_mem, ida_ilu_setup, ida_ilu_solve)
+                            ELSE:
+                                flag = SUNDIALS.IDASpilsSetPreconditioner(self.ida_mem, ida_ilu_setup, ida_ilu_solve)
+                        else:
+                            mupper, mlower = get_bandwidths(self.options, self.problem_info["jac_pattern"], self.pData.dim)
+                            flag = SUNDIALS.IDABBDPrecInit(self.ida_mem, self.pData.dim, mupper, mlower, mupper, mlower, 0.0, ida_bbd_local, NULL)
+                        if flag < 0:
+                            raise IDAError(flag, self.t)
+                    ELSE:
+                        raise AssimuloException("The %s preconditioner requires SUNDIALS 3.0.0 or newer."%self.options["precond_module"])
+                
             else:
                 raise IDAError(100,self.t) #Unknown error message
                 
@@ -364,6 +508,9 @@ cdef class IDA(Implicit_ODE):
             flag = SUNDIALS.IDAReInit(self.ida_mem, self.t, self.yTemp, self.ydTemp)
             if flag < 0:
                 raise IDAError(flag, self.t)
+            
+            #Use the stored Jacobian for the first evaluation (warm start)
+            self.pData.jac_reuse = self.pData.jac_stored
                 
             if self.pData.dimSens > 0:
                 flag = SUNDIALS.IDASensReInit(self.ida_mem, IDA_STAGGERED if self.options["sensmethod"] == "STAGGERED" else IDA_SIMULTANEOUS, self.ySO, self.ydSO)
@@ -392,8 +539,39 @@ cdef class IDA(Implicit_ODE):
                     flag = SUNDIALS.IDADlsSetDenseJacFn(self.ida_mem, NULL)
                 if flag < 0:
                     raise IDAError(flag,self.t)
+        
+        elif self.options["linear_solver"] == 'BAND':
+            #Specify the jacobian to the solver, otherwise difference quotients are used
+            if self.pData.JAC != NULL and self.options["usejac"]:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    IF SUNDIALS_VERSION >= (4,0,0):
+                        flag = SUNDIALS.IDASetJacFn(self.ida_mem, ida_jac_band)
+                    ELSE:
+                        flag = SUNDIALS.IDADlsSetJacFn(self.ida_mem, ida_jac_band)
+                ELSE:
+                    flag = SUNDIALS.IDADlsSetBandJacFn(self.ida_mem, ida_jac_band)
+            else:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    IF SUNDIALS_VERSION >= (4,0,0):
+                        flag = SUNDIALS.IDASetJacFn(self.ida_mem, NULL)
+                    ELSE:
+                        flag = SUNDIALS.IDADlsSetJacFn(self.ida_mem, NULL)
+                ELSE:
+                    flag = SUNDIALS.IDADlsSetBandJacFn(self.ida_mem, NULL)
+            if flag < 0:
+                raise IDAError(flag,self.t)
+        
+        elif self.options["linear_solver"] in ('SPARSE', 'KLU'):
+            #Specify the sparse jacobian to the solver (required)
+            IF SUNDIALS_VERSION >= (3,0,0):
+                IF SUNDIALS_VERSION >= (4,0,0):
+                    flag = SUNDIALS.IDASetJacFn(self.ida_mem, ida_jac_sparse)
+                ELSE:
+                    flag = SUNDIALS.IDADlsSetJacFn(self.ida_mem, ida_jac_sparse)
+                if flag < 0:
+                    raise IDAError(flag,self.t)
                     
-        elif self.options["linear_solver"] == 'SPGMR':
+        elif self.options["linear_solver"] in KRYLOV_SOLVERS:
             #Specify the jacobian times vector function
             if self.pData.JACV != NULL and self.options["usejac"]:
                 IF SUNDIALS_VERSION >= (3,0,0):
@@ -426,10 +604,10 @@ cdef class IDA(Implicit_ODE):
     def initialize_event_detection(self):
         if self.problem_info["type"] == 1:
             def event_func(t, y, yd): 
-                return self.problem.state_events(t, y, yd, self.sw)
+                return self._problem_state_events(t, y, yd, self.sw)
         else:
             def event_func(t, y, yd): 
-                return self.problem.state_events(t, y, self.sw)
+                return self._problem_state_events(t, y, self.sw)
         self.event_func = event_func
         self.g_old = self.event_func(self.t, self.y, self.yd)
         self.statistics["nstatefcns"] += 1
@@ -522,6 +700,10 @@ cdef class IDA(Implicit_ODE):
         flag = SUNDIALS.IDASVtolerances(self.ida_mem, self.options["rtol"], self.nv_atol)
         if flag < 0:
             raise IDAError(flag)
+        
+        #Keep a copy of the Jacobian for the next simulation
+        self.pData.set_warm_start(self.options["warm_start"] and self.options["linear_solver"] == "DENSE" 
+                                  and self.pData.JAC != NULL and self.options["usejac"])
             
         #Initialize sensitivity if any
         if self.pData.dimSens > 0:
@@ -533,9 +715,6 @@ cdef class IDA(Implicit_ODE):
         cdef double tret = 0.0, tout
         cdef list tr = [], yr = [], ydr = []
         cdef np.ndarray output_list
-        yout = arr2nv(y)
-        ydout = arr2nv(yd)
-        
         #Initialize? 
         if opts["initialize"]:
             self.initialize_ida()
@@ -543,6 +722,11 @@ cdef class IDA(Implicit_ODE):
             if self.options["external_event_detection"]:
                 self.initialize_event_detection()
         
+        #The solution is returned in the (long-lived) template vectors
+        yout, ydout = self.yTemp, self.ydTemp
+        arr2nv_inplace(y, yout)
+        arr2nv_inplace(yd, ydout)
+        
         #Set stop time
         flag = SUNDIALS.IDASetStopTime(self.ida_mem, tf)
         if flag < 0:
@@ -622,10 +806,6 @@ cdef class IDA(Implicit_ODE):
             
             opts["output_index"] = output_index
         
-        #Deallocate
-        N_VDestroy(yout)
-        N_VDestroy(ydout)
-        
         return flag, tr, yr, ydr
     
     
@@ -636,9 +816,6 @@ cdef class IDA(Implicit_ODE):
         cdef double tr
         cdef np.ndarray yr, ydr
         
-        yout  = arr2nv(y)
-        ydout = arr2nv(yd)
-        
         #Get options
         initialize  = opts["initialize"]
         
@@ -647,6 +824,11 @@ cdef class IDA(Implicit_ODE):
             self.initialize_ida()
             self.initialize_options()
         
+        #The solution is returned in the (long-lived) template vectors
+        yout, ydout = self.yTemp, self.ydTemp
+        arr2nv_inplace(y, yout)
+        arr2nv_inplace(yd, ydout)
+        
         #Set stop time
         flag = SUNDIALS.IDASetStopTime(self.ida_mem, tf)
         if flag < 0:
@@ -670,10 +852,6 @@ cdef class IDA(Implicit_ODE):
             flag = ID_COMPLETE
             self.store_statistics(IDA_TSTOP_RETURN)
         
-        #Deallocate
-        N_VDestroy(yout)
-        N_VDestroy(ydout)
-        
         return flag, tr, yr, ydr
     
     cpdef make_consistent(self, method):
@@ -745,36 +923,20 @@ cdef class IDA(Implicit_ODE):
 
     cpdef get_last_estimated_errors(self):
         cdef flag
-        cdef np.ndarray err, pyweight, pyele
-        IF SUNDIALS_VERSION >= (6,0,0):
-            cdef SUNDIALS.SUNContext ctx = NULL
-            IF SUNDIALS_VERSION >= (7,0,0):
-                cdef SUNDIALS.SUNComm comm = SUNDIALS.SUN_COMM_NULL
-            ELSE:
-                cdef void* comm = NULL
-            SUNDIALS.SUNContext_Create(comm, &ctx)
-            cdef N_Vector ele = N_VNew_Serial(self.pData.dim, ctx)
-            cdef N_Vector eweight = N_VNew_Serial(self.pData.dim, ctx)
-        ELSE:
-            cdef N_Vector ele = N_VNew_Serial(self.pData.dim)
-            cdef N_Vector eweight = N_VNew_Serial(self.pData.dim)
+        cdef np.ndarray pyweight = np.empty(self.pData.dim), pyele = np.empty(self.pData.dim)
+        
+        if self.nv_work == NULL:
+            raise IDAError(IDA_MEM_NULL)
         
-        flag = SUNDIALS.IDAGetErrWeights(self.ida_mem, eweight)
+        #The results are written directly into the arrays
+        flag = SUNDIALS.IDAGetErrWeights(self.ida_mem, arr2nv_view(pyweight, self.nv_work))
         if flag < 0:
             raise IDAError(flag)
-        flag = SUNDIALS.IDAGetEstLocalErrors(self.ida_mem, ele)
+        flag = SUNDIALS.IDAGetEstLocalErrors(self.ida_mem, arr2nv_view(pyele, self.nv_work))
         if flag < 0:
             raise IDAError(flag)
         
-        pyweight = nv2arr(eweight)
-        pyele = nv2arr(ele)
-        
-        err = pyweight*pyele
-        
-        N_VDestroy(ele) #Deallocate
-        N_VDestroy(eweight) #Deallocate
-        
-        return err
+        return pyweight*pyele
     
     cpdef np.ndarray interpolate(self,double t,int k = 0):
         """
@@ -783,27 +945,16 @@ cdef class IDA(Implicit_ODE):
         can be from zero to the current order.
         """
         cdef flag
-        cdef np.ndarray res
-        IF SUNDIALS_VERSION >= (6,0,0):
-            cdef SUNDIALS.SUNContext ctx = NULL
-            IF SUNDIALS_VERSION >= (7,0,0):
-                cdef SUNDIALS.SUNComm comm = SUNDIALS.SUN_COMM_NULL
-            ELSE:
-                cdef void* comm = NULL
-            SUNDIALS.SUNContext_Create(comm, &ctx)
-            cdef N_Vector dky=N_VNew_Serial(self.pData.dim, ctx)
-        ELSE:
-            cdef N_Vector dky=N_VNew_Serial(self.pData.dim)
+        cdef np.ndarray res = np.empty(self.pData.dim)
         
-        flag = SUNDIALS.IDAGetDky(self.ida_mem, t, k, dky)
+        if self.nv_work == NULL:
+            raise IDAError(IDA_MEM_NULL, t)
+        
+        flag = SUNDIALS.IDAGetDky(self.ida_mem, t, k, arr2nv_view(res, self.nv_work))
         
         if flag < 0:
             raise IDAError(flag, t)
         
-        res = nv2arr(dky)
-        
-        N_VDestroy(dky) #Deallocate
-        
         return res
         
     cpdef interpolate_sensitivity(self,double t, int k = 0, int i=-1):
@@ -828,44 +979,30 @@ cdef class IDA(Implicit_ODE):
             
                     A matrix containing the Ns vectors or a vector if i is specified.
         """
-        IF SUNDIALS_VERSION >= (6,0,0):
-            cdef SUNDIALS.SUNContext ctx = NULL
-            IF SUNDIALS_VERSION >= (7,0,0):
-                cdef SUNDIALS.SUNComm comm = SUNDIALS.SUN_COMM_NULL
-            ELSE:
-                cdef void* comm = NULL
-            SUNDIALS.SUNContext_Create(comm, &ctx)
-            cdef N_Vector dkyS=N_VNew_Serial(self.pData.dim, ctx)
-        ELSE:
-            cdef N_Vector dkyS=N_VNew_Serial(self.pData.dim)
         cdef flag
         cdef np.ndarray res
         
+        if self.nv_work == NULL:
+            raise IDAError(IDA_MEM_NULL, t)
+        
         if i==-1:
             
-            matrix = []
+            matrix = np.empty((self.pData.dimSens, self.pData.dim))
             
             for x in xrange(self.pData.dimSens):
-                flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, x, dkyS)
+                flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, x, arr2nv_view(matrix[x], self.nv_work))
                 
                 if flag<0:
                     raise IDAError(flag, t)
-                
-                matrix += [nv2arr(dkyS)]
             
-            N_VDestroy(dkyS)
-            
-            return np.array(matrix)
+            return matrix
         else:
-            flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, i, dkyS)
+            res = np.empty(self.pData.dim)
+            flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, i, arr2nv_view(res, self.nv_work))
             
             if flag <0:
                 raise IDAError(flag, t)
             
-            res = nv2arr(dkyS)
-            
-            N_VDestroy(dkyS)
-            
             return res
             
     def _set_lsoff(self, lsoff):
@@ -1181,10 +1318,10 @@ cdef class IDA(Implicit_ODE):
     maxh=property(_get_max_h,_set_max_h)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR":
+        if lsolver.upper() in ("DENSE", "BAND", "SPARSE", "KLU") + KRYLOV_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise AssimuloException('The linear solver must be either "DENSE" or "SPGMR".')
+            raise AssimuloException('The linear solver must be either "DENSE", "BAND", "SPARSE", "KLU", "SPGMR", "SPFGMR", "SPBCGS" or "SPTFQMR".')
         
     def _get_linear_solver(self):
         """
@@ -1193,12 +1330,252 @@ cdef class IDA(Implicit_ODE):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR'.
+                        - Default 'DENSE'. Can also be 'BAND', 'SPARSE',
+                          'KLU' or one of the Krylov solvers 'SPGMR',
+                          'SPFGMR' (flexible GMRES), 'SPBCGS' (BiCGStab)
+                          and 'SPTFQMR' (TFQMR).
+                        - The Krylov solvers use maxkrylov and precond, and
+                          the GMRES variants max_restarts and gram_schmidt.
+                        - 'BAND' uses a banded LU factorization with the
+                          half-bandwidths mupper and mlower, see these.
+                        - 'SPARSE' (SuperLU_MT) and 'KLU' factorize a
+                          sparse Jacobian, which needs to be provided
+                          together with jac_nnz or jac_pattern.
         """
         return self.options["linear_solver"]
     
     linear_solver = property(_get_linear_solver, _set_linear_solver)
     
+    def _set_mupper(self, mupper):
+        self.options["mupper"] = check_bandwidth(mupper)
+    
+    def _get_mupper(self):
+        """
+        Specifies the upper half-bandwidth of the Jacobian for the BAND
+        linear solver and the banded preconditioners (precond), i.e.
+        J[i,j] = 0 for j-i > mupper.
+        
+            Parameters::
+            
+                    mupper
+                            - A non-negative integer.
+                            - Default None, the upper half-bandwidth of
+                              the problem's jac_pattern.
+            
+            Returns::
+            
+                The current value of mupper.
+        
+        See assimulo.support.get_bandwidths for the band storage of the
+        Jacobian.
+        """
+        return self.options["mupper"]
+    
+    mupper = property(_get_mupper, _set_mupper)
+    
+    def _set_mlower(self, mlower):
+        self.options["mlower"] = check_bandwidth(mlower)
+    
+    def _get_mlower(self):
+        """
+        Specifies the lower half-bandwidth of the Jacobian for the BAND
+        linear solver and the banded preconditioners (precond), i.e.
+        J[i,j] = 0 for i-j > mlower.
+        
+            Parameters::
+            
+                    mlower
+                            - A non-negative integer.
+                            - Default None, the lower half-bandwidth of
+                              the problem's jac_pattern.
+            
+            Returns::
+            
+                The current value of mlower.
+        
+        See mupper.
+        """
+        return self.options["mlower"]
+    
+    mlower = property(_get_mlower, _set_mlower)
+    
+    def _set_klu_ordering(self, ordering):
+        if str(ordering).upper() in KLU_ORDERINGS:
+            self.options["klu_ordering"] = str(ordering).upper()
+        else:
+            raise AssimuloException('The KLU ordering must be either "AMD", "COLAMD" or "NATURAL".')
+    
+    def _get_klu_ordering(self):
+        """
+        Specifies the fill-reducing ordering of the KLU linear solver.
+        
+            Parameters::
+            
+                    klu_ordering
+                            - Default 'COLAMD'. Can also be 'AMD' or
+                              'NATURAL' (no reordering).
+            
+            Returns::
+            
+                The current value of klu_ordering.
+        """
+        return self.options["klu_ordering"]
+    
+    klu_ordering = property(_get_klu_ordering, _set_klu_ordering)
+    
+    def _set_sparse_format(self, format):
+        if str(format).upper() in ("CSC", "CSR"):
+            self.options["sparse_format"] = str(format).upper()
+        else:
+            raise AssimuloException('The sparse format must be either "CSC" or "CSR".')
+    
+    def _get_sparse_format(self):
+        """
+        Specifies the storage format of the sparse Jacobian of the KLU
+        linear solver, the SPARSE (SuperLU_MT) linear solver always uses
+        CSC.
+        
+            Parameters::
+            
+                    sparse_format
+                            - Default 'CSC'. Can also be 'CSR'.
+            
+            Returns::
+            
+                The current value of sparse_format.
+        
+        A Jacobian is converted to the format. The values of a Jacobian
+        evaluated in-place into its jac_pattern (keyword out) are always in
+        CSC order and are reordered for CSR.
+        """
+        return self.options["sparse_format"]
+    
+    sparse_format = property(_get_sparse_format, _set_sparse_format)
+    
+    def _set_max_krylov(self, maxkrylov):
+        try:
+            self.options["maxkrylov"] = int(maxkrylov)
+        except Exception:
+            raise AssimuloException("Maximum number of krylov dimension should be an integer.")
+        if self.options["maxkrylov"] < 0:
+            raise AssimuloException("Maximum number of krylov dimension should be an positive integer.")
+            
+    def _get_max_krylov(self):
+        """
+        Specifies the maximum number of dimensions for the krylov subspace to be used
+        by the Krylov linear solvers.
+        
+            Parameters::
+            
+                    maxkrylov
+                            - A positive integer.
+                            - Default 0 (the SUNDIALS default, 5)
+            
+            Returns::
+            
+                The current value of maxkrylov.
+                
+        See SUNDIALS documentation 'SUNLinSol_SPGMR'
+        """
+        return self.options["maxkrylov"]
+    
+    maxkrylov = property(_get_max_krylov, _set_max_krylov)
+    
+    def _set_pre_cond(self, precond):
+        if precond.upper() == "PREC_NONE":
+            self.options["precond_module"] = None
+        elif precond.upper() in ("BBD", "ILU"):
+            self.options["precond_module"] = precond.upper()
+        else:
+            raise AssimuloException('Unknown input of precond. Should be either "PREC_NONE", "BBD" or "ILU"')
+    
+    def _get_pre_cond(self):
+        """
+        Specifies the preconditioning of the Krylov linear solvers.
+        
+            Parameters::
+            
+                    precond
+                            - Should be either "PREC_NONE", "BBD" or "ILU"
+                            - Default PREC_NONE
+            
+            Returns::
+            
+                The current value of precond (as string).
+        
+        "BBD" left preconditions with the SUNDIALS band-block-diagonal
+        preconditioner module, which approximates the iteration matrix by
+        difference quotients of the residual within the half-bandwidths
+        mupper and mlower (or those of jac_pattern).
+        
+        "ILU" left preconditions with an incomplete LU factorization without
+        fill-in, ILU(0), of the iteration matrix dF/dy + cj*dF/dyd given by
+        jac (dense or sparse), on its sparsity pattern.
+                
+        See SUNDIALS documentation 'IDABBDPrecInit'
+        """
+        return "PREC_NONE" if self.options["precond_module"] is None else self.options["precond_module"]
+    
+    precond = property(_get_pre_cond, _set_pre_cond)
+    
+    def _set_max_restarts(self, max_restarts):
+        try:
+            max_restarts = int(max_restarts)
+        except Exception:
+            raise AssimuloException("The maximum number of restarts should be an integer.")
+        if max_restarts < 0:
+            raise AssimuloException("The maximum number of restarts should be a non-negative integer.")
+        self.options["max_restarts"] = max_restarts
+    
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts of the SPGMR and SPFGMR
+        linear solvers.
+        
+            Parameters::
+            
+                    max_restarts
+                            - A non-negative integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of max_restarts.
+        
+        See SUNDIALS documentation 'SUNLinSol_SPGMRSetMaxRestarts'
+        """
+        return self.options["max_restarts"]
+    
+    max_restarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_gram_schmidt(self, gram_schmidt):
+        if str(gram_schmidt).upper() in GRAM_SCHMIDT:
+            self.options["gram_schmidt"] = str(gram_schmidt).upper()
+        else:
+            raise AssimuloException('The Gram-Schmidt orthogonalization must be either "MODIFIED" or "CLASSICAL".')
+    
+    def _get_gram_schmidt(self):
+        """
+        Specifies the Gram-Schmidt orthogonalization of the SPGMR and SPFGMR
+        linear solvers.
+        
+            Parameters::
+            
+                    gram_schmidt
+                            - Default 'MODIFIED'. Can also be 'CLASSICAL',
+                              which needs fewer synchronizations but is
+                              less robust.
+            
+            Returns::
+            
+                The current value of gram_schmidt.
+        
+        See SUNDIALS documentation 'SUNLinSol_SPGMRSetGSType'
+        """
+        return self.options["gram_schmidt"]
+    
+    gram_schmidt = property(_get_gram_schmidt, _set_gram_schmidt)
+    
     def _set_algvar(self,algvar):
         self.options["algvar"] = np.array(algvar,dtype=float) if len(np.array(algvar,dtype=float).shape)>0 else np.array([algvar],dtype=float)
         
@@ -1430,6 +1807,32 @@ cdef class IDA(Implicit_ODE):
              
     external_event_detection = property(_get_external_event_detection, 
                                         _set_external_event_detection)
+
+    def _set_warm_start(self, warm_start):
+        self.options["warm_start"] = bool(warm_start)
+    
+    def _get_warm_start(self):
+        """
+        If True, the last evaluated Jacobian is kept when the solver is
+        re-initialized (for instance by consecutive calls to simulate from
+        a new initial condition or after an event) and is used for the
+        first Newton iteration instead of evaluating the Jacobian again.
+        Only used together with the DENSE linear solver and a user
+        provided Jacobian.
+        
+            Parameters::
+            
+                warm_start
+                        - Default 'False'.
+                        
+                        - Should be a boolean.
+                        
+                            Example:
+                                warm_start = True
+        """
+        return self.options["warm_start"]
+    
+    warm_start = property(_get_warm_start, _set_warm_start)
     
     cdef void store_statistics(self, return_flag):
         """
@@ -1439,7 +1842,8 @@ cdef class IDA(Implicit_ODE):
         cdef long int nniters = 0, nncfails = 0, ngevals = 0
         cdef long int nSniters = 0, nSncfails = 0, njevals = 0, nrevalsLS = 0
         cdef long int nfSevals = 0, nfevalsS = 0, nSetfails = 0, nlinsetupsS = 0
-        cdef long int njvevals = 0, nfevalsLS = 0
+        cdef long int njvevals = 0, nfevalsLS = 0, nliters = 0, nlcfails = 0, nrevalsPM = 0
+        cdef long int npevals = 0, npsolves = 0
         cdef int klast, kcur
         cdef realtype hinused, hlast, hcur, tcur
         
@@ -1448,15 +1852,37 @@ cdef class IDA(Implicit_ODE):
         flag = SUNDIALS.IDAGetNonlinSolvStats(self.ida_mem, &nniters, &nncfails)
         flag = SUNDIALS.IDAGetNumGEvals(self.ida_mem, &ngevals)
 
-        if self.options["linear_solver"] == "SPGMR":
+        if self.options["linear_solver"] in KRYLOV_SOLVERS:
             IF SUNDIALS_VERSION >= (4,0,0):
                 flag = SUNDIALS.IDAGetNumJtimesEvals(self.ida_mem, &njvevals) #Number of jac*vector
                 flag = SUNDIALS.IDAGetNumLinResEvals(self.ida_mem, &nfevalsLS) #Number of rhs due to jac*vector
+                flag = SUNDIALS.IDAGetNumLinIters(self.ida_mem, &nliters) #Number of linear iterations
+                flag = SUNDIALS.IDAGetNumLinConvFails(self.ida_mem, &nlcfails) #Number of linear convergence failures
             ELSE:
                 flag = SUNDIALS.IDASpilsGetNumJtimesEvals(self.ida_mem, &njvevals) #Number of jac*vector
                 flag = SUNDIALS.IDASpilsGetNumResEvals(self.ida_mem, &nfevalsLS) #Number of rhs due to jac*vector
+                flag = SUNDIALS.IDASpilsGetNumLinIters(self.ida_mem, &nliters) #Number of linear iterations
+                flag = SUNDIALS.IDASpilsGetNumConvFails(self.ida_mem, &nlcfails) #Number of linear convergence failures
             self.statistics["nfcnjacs"] += nfevalsLS
             self.statistics["njacvecs"] += njvevals
+            self.statistics["nliters"] += nliters
+            self.statistics["nlcfails"] += nlcfails
+            IF SUNDIALS_VERSION >= (3,0,0):
+                if self.options["precond_module"] is not None:
+                    IF SUNDIALS_VERSION >= (4,0,0):
+                        flag = SUNDIALS.IDAGetNumPrecSolves(self.ida_mem, &npsolves)
+                        flag = SUNDIALS.IDAGetNumPrecEvals(self.ida_mem, &npevals)
+                    ELSE:
+                        flag = SUNDIALS.IDASpilsGetNumPrecSolves(self.ida_mem, &npsolves)
+                        flag = SUNDIALS.IDASpilsGetNumPrecEvals(self.ida_mem, &npevals)
+                    self.statistics["nprecs"] += npsolves
+                    self.statistics["nprecsetups"] += npevals
+                if self.options["precond_module"] == "BBD":
+                    flag = SUNDIALS.IDABBDPrecGetNumGfnEvals(self.ida_mem, &nrevalsPM) #Number of res evals of the preconditioner
+                    self.statistics["nfcnjacs"] += nrevalsPM
+                elif self.options["precond_module"] == "ILU":
+                    self.statistics["njacs"] += self.pData.ilu.njacs
+                    self.pData.ilu.njacs = 0
         else:
             IF SUNDIALS_VERSION >= (4,0,0):
                 flag = SUNDIALS.IDAGetNumJacEvals(self.ida_mem, &njevals)
@@ -1531,6 +1957,7 @@ cdef class CVode(Explicit_ODE):
     cdef void* cvode_mem
     cdef ProblemData pData      #A struct containing information about the problem
     cdef N_Vector yTemp, ydTemp, nv_atol, nv_rtol
+    cdef N_Vector nv_work       #Data-less vector pointing to the output arrays of the getters
     cdef N_Vector *ySO
     cdef object f
     cdef public object event_func
@@ -1565,11 +1992,15 @@ cdef class CVode(Explicit_ODE):
         self.options["maxncf"] = 10
         self.options["maxnef"] = 20  #Increased from the default 7 in Sundials
         self.options["maxstepshnil"] = 10 # Maximum number of steps with effective step-size zero. Will force minh afterwards
-        self.options["usejac"]   = True if (self.problem_info["jac_fcn"] or self.problem_info["jacv_fcn"]) else False
+        self.options["usejac"]   = True if (self.problem_info["jac_fcn"] or self.problem_info["jacv_fcn"] or self.problem_info["fused_jac"]) else False
         self.options["usesens"] = True if self.problem_info["dimSens"] > 0 else False
         self.options["maxsteps"] = 10000  #Maximum number of steps
         self.options["sensmethod"] = 'STAGGERED'
         self.options["linear_solver"] = "DENSE"
+        self.options["mupper"] = None #Upper half-bandwidth of the BAND linear solver
+        self.options["mlower"] = None #Lower half-bandwidth of the BAND linear solver
+        self.options["klu_ordering"] = "COLAMD" #Fill-reducing ordering of the KLU linear solver
+        self.options["sparse_format"] = "CSC" #Storage format of the sparse Jacobian (KLU)
         self.options["iter"] = "Newton"
         self.options["discr"] = "BDF"
         self.options["suppress_sens"] = False #Turn on or off the local error test on the sensitivity variables
@@ -1581,10 +2012,14 @@ cdef class CVode(Explicit_ODE):
         self.options["external_event_detection"] = False #Sundials rootfinding is used for event location as default
         self.options["stablimit"] = False
         self.options["norm"] = "WRMS"
+        self.options["warm_start"] = False #Keep the Jacobian between consecutive simulations
         self._progress_check = True # On by default
         
         self.options["maxkrylov"] = 5
         self.options["precond"] = PREC_NONE
+        self.options["precond_module"] = None #The SUNDIALS preconditioner module, "BANDED" or "BBD"
+        self.options["max_restarts"] = 0 #Maximum number of restarts of SPGMR and SPFGMR
+        self.options["gram_schmidt"] = "MODIFIED" #Orthogonalization of SPGMR and SPFGMR
         
         #Solver support
         self.supports["report_continuously"] = True
@@ -1592,8 +2027,11 @@ cdef class CVode(Explicit_ODE):
         self.supports["interpolated_sensitivity_output"] = True
         self.supports["state_events"] = True
         self.supports["rtol_as_vector"] = bool(SUNDIALS_CVODE_RTOL_VEC) # not with sensitivities though
+        self.supports["step_schedule"] = True
         
         self.statistics.add_key("nlsred", "Number of order reductions due to stability")
+        self.statistics.add_key("nliters", "Number of linear iterations")
+        self.statistics.add_key("nlcfails", "Number of linear convergence failures")
          
         #Get options from Problem
         if hasattr(problem, 'pbar'):
@@ -1603,11 +2041,29 @@ cdef class CVode(Explicit_ODE):
         if hasattr(problem, 'yS0'):
             self.yS0 = problem.yS0
     
+    def __getstate__(self):
+        state = Explicit_ODE.__getstate__(self)
+        state["yS0"] = self.yS0
+        state["progress_check"] = self._progress_check
+        return state
+    
+    def __setstate__(self, state):
+        Explicit_ODE.__setstate__(self, state)
+        self.yS0 = state["yS0"]
+        self._progress_check = state["progress_check"]
+        
+        #The problem data is set up anew, the memory of CVode on the next call to simulate
+        self.pData = ProblemData()
+        self.set_problem_data()
+    
     def __dealloc__(self):
         
         if self.yTemp != NULL:
             #Deallocate N_Vector
             N_VDestroy(self.yTemp)
+        
+        if self.nv_work != NULL:
+            N_VDestroy(self.nv_work)
             
         if self.nv_atol != NULL:
             N_VDestroy(self.nv_atol)
@@ -1631,29 +2087,15 @@ cdef class CVode(Explicit_ODE):
         Returns the vector of estimated local errors at the current step.
         """
         cdef int flag
+        cdef np.ndarray ele_py
 
         if self.cvode_mem == NULL:
             raise CVodeError(CV_MEM_FAIL)
 
-        IF SUNDIALS_VERSION >= (6,0,0):
-            cdef SUNDIALS.SUNContext ctx = NULL
-            IF SUNDIALS_VERSION >= (7,0,0):
-                cdef SUNDIALS.SUNComm comm = SUNDIALS.SUN_COMM_NULL
-            ELSE:
-                cdef void* comm = NULL
-            SUNDIALS.SUNContext_Create(comm, &ctx)
-            cdef N_Vector ele=N_VNew_Serial(self.pData.dim, ctx)
-        ELSE:
-            cdef N_Vector ele=N_VNew_Serial(self.pData.dim) #Allocates a new N_Vector
-
-        flag = SUNDIALS.CVodeGetEstLocalErrors(self.cvode_mem, ele)
+        ele_py = np.empty(self.pData.dim)
+        flag = SUNDIALS.CVodeGetEstLocalErrors(self.cvode_mem, arr2nv_view(ele_py, self.nv_work))
         if flag < 0:
             raise CVodeError(flag, self.t)
-            
-        ele_py = nv2arr(ele)
-        
-        #Deallocate N_Vector
-        N_VDestroy(ele)
         
         return ele_py
         
@@ -1726,36 +2168,27 @@ cdef class CVode(Explicit_ODE):
         Returns the solution error weights at the current step.
         """
         cdef int flag
+        cdef np.ndarray eweight_py
 
         if self.cvode_mem == NULL:
             raise CVodeError(CV_MEM_FAIL)
-
-        IF SUNDIALS_VERSION >= (6,0,0):
-            cdef SUNDIALS.SUNContext ctx = NULL
-            IF SUNDIALS_VERSION >= (7,0,0):
-                cdef SUNDIALS.SUNComm comm = SUNDIALS.SUN_COMM_NULL
-            ELSE:
-                cdef void* comm = NULL
-            SUNDIALS.SUNContext_Create(comm, &ctx)
-            cdef N_Vector eweight=N_VNew_Serial(self.pData.dim, ctx)
-        ELSE:
-            cdef N_Vector eweight=N_VNew_Serial(self.pData.dim) #Allocates a new N_Vector
         
-        flag = SUNDIALS.CVodeGetErrWeights(self.cvode_mem, eweight)
+        eweight_py = np.empty(self.pData.dim)
+        flag = SUNDIALS.CVodeGetErrWeights(self.cvode_mem, arr2nv_view(eweight_py, self.nv_work))
         if flag < 0:
             raise CVodeError(flag, self.t)
-            
-        eweight_py = nv2arr(eweight)
-        
-        #Deallocate N_Vector
-        N_VDestroy(eweight)
         
         return eweight_py
     
     cdef set_problem_data(self):
         
-        #Sets the residual or rhs
-        self.pt_fcn = self.problem.rhs
+        #Sets the residual or rhs, the Jacobian of a fused function is cached
+        if self.problem_info["fused_jac"]:
+            fused = RHSJacobianCache(self.problem.rhs_and_jac, self._problem_jac if self.problem_info["jac_fcn"] else None)
+            self.pt_fcn = fused.rhs
+        else:
+            fused = None
+            self.pt_fcn = self._problem_rhs
         self.pData.RHS = <void*>self.pt_fcn#<void*>self.problem.f
         self.pData.dim = self.problem_info["dim"]
         self.pData.memSize = self.pData.dim*sizeof(realtype)
@@ -1767,13 +2200,13 @@ cdef class CVode(Explicit_ODE):
         #self.pData.yd = <void*>self.ydTemp
         
         if self.problem_info["state_events"] is True: #Sets the root function
-            self.pt_root = self.problem.state_events
+            self.pt_root = self._problem_state_events
             self.pData.ROOT = <void*>self.pt_root#<void*>self.problem.state_events
             self.pData.dimRoot = self.problem_info["dimRoot"]
             self.pData.memSizeRoot = self.pData.dimRoot*sizeof(realtype)
 
-        if self.problem_info["jac_fcn"] is True: #Sets the jacobian
-            self.pt_jac = self.problem.jac
+        if self.problem_info["jac_fcn"] is True or fused is not None: #Sets the jacobian
+            self.pt_jac = self._problem_jac if fused is None else fused.jac
             self.pData.JAC = <void*>self.pt_jac#<void*>self.problem.jac
             self.pData.memSizeJac = self.pData.dim*self.pData.dim*sizeof(realtype)
         
@@ -1781,6 +2214,15 @@ cdef class CVode(Explicit_ODE):
             self.pt_jacv = self.problem.jacv
             self.pData.JACV = <void*>self.pt_jacv#<void*>self.problem.jacv 
         
+        #Low-level (C) functions are called directly from the callbacks
+        self.pData.set_c_callbacks(self.pt_fcn, self.pt_jac if (self.problem_info["jac_fcn"] or fused is not None) else None,
+                                   self._problem_state_events if self.problem_info["state_events"] else None, False)
+        self.pData.fcn_out = self.problem_info["fcn_out"]
+        self.pData.root_out = self.problem_info["state_events_out"]
+        self.pData.jac_out = self.problem_info["jac_out"]
+        self.pData.jac_band_out = self.problem_info["jac_out"] and not isinstance(self.pt_jac, (LowLevelCallback, ColoredJacobian))
+        self.pData.set_jac_pattern(self.problem_info["jac_pattern"], self.problem_info["jac_pattern_out"])
+        
         if self.problem_info["prec_solve"] is True: #Sets the preconditioner solve function
             self.pt_prec_solve = self.problem.prec_solve
             self.pData.PREC_SOLVE = <void*>self.pt_prec_solve
@@ -1791,8 +2233,9 @@ cdef class CVode(Explicit_ODE):
             self.pData.PREC_DATA = None
             
         if self.problem_info["sens_fcn"] is True: #Sets the sensitivity function
-            self.pt_sens = self.problem.rhs_sens
+            self.pt_sens = self._problem_rhs_sens
             self.pData.RHS_SENS_ALL = <void*>self.pt_sens#<void*>self.problem.sens
+        self.pData.sens_out = self.problem_info["sens_out"]
            
         if self.problem_info["dimSens"] > 0: #Sensitivity parameters (does not need the sensitivity function)
             self.pData.dimSens = self.problem_info["dimSens"]    
@@ -1815,10 +2258,14 @@ cdef class CVode(Explicit_ODE):
                 cdef void* comm = NULL
             SUNDIALS.SUNContext_Create(comm, &ctx)
 
+        if self.yTemp != NULL: #Only used as template and output vector, the solver keeps copies
+            N_VDestroy(self.yTemp)
         if self.options["norm"] == "EUCLIDEAN":
             self.yTemp = arr2nv_euclidean(self.y)
         else:
             self.yTemp = arr2nv(self.y)
+        if self.nv_work == NULL:
+            self.nv_work = N_VCloneEmpty(self.yTemp)
         
         if self.pData.dimSens > 0:
             #Create the initial matrices
@@ -1933,6 +2380,9 @@ cdef class CVode(Explicit_ODE):
             if flag < 0:
                 raise CVodeError(flag, self.t)
             
+            #Use the stored Jacobian for the first evaluation (warm start)
+            self.pData.jac_reuse = self.pData.jac_stored
+            
             #Sensitivity
             if self.pData.dimSens > 0:
                 flag = SUNDIALS.CVodeSensReInit(self.cvode_mem, CV_STAGGERED if self.options["sensmethod"] == "STAGGERED" else CV_SIMULTANEOUS, self.ySO)
@@ -1949,13 +2399,13 @@ cdef class CVode(Explicit_ODE):
             # Event detection in explicit_ode.pyx
             def event_func(t, y):
                 # first argument is an additional error flag, currently unused here, thus 0
-                return 0, self.problem.state_events(t, y, self.sw)
+                return 0, self._problem_state_events(t, y, self.sw)
             self.event_func = event_func
             _, self.g_old = self.event_func(self.t, self.y)
         else:
             # CVode inbuilt event detection
             def event_func(t, y):
-                return self.problem.state_events(t, y, self.sw)
+                return self._problem_state_events(t, y, self.sw)
             self.event_func = event_func
             self.g_old = self.event_func(self.t, self.y)
         self.statistics["nstatefcns"] += 1
@@ -1969,28 +2419,17 @@ cdef class CVode(Explicit_ODE):
         can be from zero to the current order.
         """
         cdef flag
-        cdef np.ndarray res
-        IF SUNDIALS_VERSION >= (6,0,0):
-            cdef SUNDIALS.SUNContext ctx = NULL
-            IF SUNDIALS_VERSION >= (7,0,0):
-                cdef SUNDIALS.SUNComm comm = SUNDIALS.SUN_COMM_NULL
-            ELSE:
-                cdef void* comm = NULL
-            SUNDIALS.SUNContext_Create(comm, &ctx)
-            cdef N_Vector dky=N_VNew_Serial(self.pData.dim, ctx)
-        ELSE:
-            cdef N_Vector dky=N_VNew_Serial(self.pData.dim) #Allocates a new N_Vector
+        cdef np.ndarray res = np.empty(self.pData.dim)
         
-        flag = SUNDIALS.CVodeGetDky(self.cvode_mem, t, k, dky)
+        if self.nv_work == NULL:
+            raise CVodeError(CV_MEM_NULL, t)
+        
+        #The interpolated values are written directly into res
+        flag = SUNDIALS.CVodeGetDky(self.cvode_mem, t, k, arr2nv_view(res, self.nv_work))
         
         if flag < 0:
             raise CVodeError(flag, t)
         
-        res = nv2arr(dky)
-        
-        #Deallocate N_Vector
-        N_VDestroy(dky)
-        
         return res
         
     cpdef np.ndarray interpolate_sensitivity(self, realtype t, int k = 0, int i=-1):
@@ -2015,42 +2454,28 @@ cdef class CVode(Explicit_ODE):
             
                     A matrix containing the Ns vectors or a vector if i is specified.
         """
-        IF SUNDIALS_VERSION >= (6,0,0):
-            cdef SUNDIALS.SUNContext ctx = NULL
-            IF SUNDIALS_VERSION >= (7,0,0):
-                cdef SUNDIALS.SUNComm comm = SUNDIALS.SUN_COMM_NULL
-            ELSE:
-                cdef void* comm = NULL
-            SUNDIALS.SUNContext_Create(comm, &ctx)
-            cdef N_Vector dkyS=N_VNew_Serial(self.pData.dim, ctx)
-        ELSE:
-            cdef N_Vector dkyS=N_VNew_Serial(self.pData.dim)
         cdef int flag
         cdef np.ndarray res
         
+        if self.nv_work == NULL:
+            raise CVodeError(CV_MEM_NULL, t)
+        
         if i==-1:
             
-            matrix = []
+            matrix = np.empty((self.pData.dimSens, self.pData.dim))
             
             for x in range(self.pData.dimSens):
-                flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, x, dkyS)
+                flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, x, arr2nv_view(matrix[x], self.nv_work))
                 if flag<0:
                     raise CVodeError(flag, t)
-                
-                matrix += [nv2arr(dkyS)]
-            
-            N_VDestroy(dkyS)
             
-            return np.array(matrix)
+            return matrix
         else:
-            flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, i, dkyS)
+            res = np.empty(self.pData.dim)
+            flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, i, arr2nv_view(res, self.nv_work))
             if flag <0:
                 raise CVodeError(flag, t)
             
-            res = nv2arr(dkyS)
-            
-            N_VDestroy(dkyS)
-            
             return res
     
     cpdef initialize(self):
@@ -2071,8 +2496,6 @@ cdef class CVode(Explicit_ODE):
         cdef double tr
         cdef np.ndarray yr
         
-        yout = arr2nv(y)
-        
         #Get options
         initialize  = opts["initialize"]
         output_list = opts["output_list"]        
@@ -2082,6 +2505,10 @@ cdef class CVode(Explicit_ODE):
             self.initialize_cvode()
             self.initialize_options()
         
+        #The solution is returned in the (long-lived) template vector
+        yout = self.yTemp
+        arr2nv_inplace(y, yout)
+        
         #Set stop time
         flag = SUNDIALS.CVodeSetStopTime(self.cvode_mem, tf)
         if flag < 0:
@@ -2103,9 +2530,6 @@ cdef class CVode(Explicit_ODE):
         if flag == CV_TSTOP_RETURN: #Reached tf
             flag = ID_COMPLETE
             self.store_statistics(CV_TSTOP_RETURN)
-        
-        #Deallocate
-        N_VDestroy(yout)
                 
         return flag, tr, yr
     
@@ -2118,12 +2542,8 @@ cdef class CVode(Explicit_ODE):
 
         cdef int no_progress_counter = 0
         cdef double previous_time = tret
+        cdef int follow_steps = self.options["record_steps"] or self.options["step_schedule"] is not None
 
-        if self.options["norm"] == "EUCLIDEAN":
-            yout = arr2nv_euclidean(y)
-        else:
-            yout = arr2nv(y)
-        
         #Initialize? 
         if opts["initialize"]:
             self.initialize_cvode() 
@@ -2131,20 +2551,30 @@ cdef class CVode(Explicit_ODE):
             if self.options["external_event_detection"]:
                 self.initialize_event_detection()
         
+        #The solution is returned in the (long-lived) template vector
+        yout = self.yTemp
+        arr2nv_inplace(y, yout)
+        
         # Set stop time
-        flag = SUNDIALS.CVodeSetStopTime(self.cvode_mem, tf)
+        flag = SUNDIALS.CVodeSetStopTime(self.cvode_mem, self.scheduled_stop_time(t, tf))
         if flag < 0:
-            N_VDestroy(yout)
             raise CVodeError(flag, t)
         
-        if (opts["report_continuously"]) or (opts["output_list"] is None): 
+        if (opts["report_continuously"]) or (opts["output_list"] is None) or follow_steps: 
             # Integration loop
             while True:
                 flag = SUNDIALS.CVode(self.cvode_mem,tf,yout,&tret,CV_ONE_STEP)
                 if flag < 0:
                     self.store_statistics(CV_TSTOP_RETURN)
-                    N_VDestroy(yout)
                     raise CVodeError(flag, tret)
+                if flag == CV_TSTOP_RETURN and tret != tf: #Reached a point of the step schedule
+                    flag = SUNDIALS.CVodeSetStopTime(self.cvode_mem, self.scheduled_stop_time(tret, tf))
+                    if flag < 0:
+                        raise CVodeError(flag, tret)
+                    flag = CV_SUCCESS
+                if self.options["record_steps"]:
+                    self.step_times.append(tret)
+                    self.step_orders.append(self.get_last_order())
                 if self._progress_check:
                     if tret == previous_time:
                         no_progress_counter += 1
@@ -2176,6 +2606,18 @@ cdef class CVode(Explicit_ODE):
                     if flag_initialize:
                         #If a step event has occured the integration has to be reinitialized
                         flag = CV_STEP_RETURN
+                elif opts["output_list"] is not None:
+                    #Store results at the communication points (when following the steps)
+                    output_list = opts["output_list"]
+                    output_index = opts["output_index"]
+                    while output_index < len(output_list) and output_list[output_index] <= t:
+                        tr.append(output_list[output_index])
+                        yr.append(self.interpolate(output_list[output_index]))
+                        output_index += 1
+                    opts["output_index"] = output_index
+                    if flag == CV_ROOT_RETURN and (not tr or tr[-1] != t):
+                        tr.append(t)
+                        yr.append(y)
                 else:
                     #Store results
                     tr.append(t)
@@ -2197,7 +2639,6 @@ cdef class CVode(Explicit_ODE):
                 flag = SUNDIALS.CVode(self.cvode_mem,tout,yout,&tret,CV_NORMAL)
                 if flag < 0:
                     self.store_statistics(CV_TSTOP_RETURN)
-                    N_VDestroy(yout)
                     raise CVodeError(flag, tret)
                 
                 #Store results
@@ -2224,11 +2665,24 @@ cdef class CVode(Explicit_ODE):
         
             opts["output_index"] = output_index
         
-        #Deallocate
-        N_VDestroy(yout)
-        
         return flag, tr, yr
     
+    cdef double scheduled_stop_time(self, double t, double tf):
+        """
+        Returns the first point of the step schedule after t (and before tf),
+        otherwise tf.
+        """
+        cdef np.ndarray schedule = self.options["step_schedule"]
+        cdef double tol = 10*np.finfo(float).eps*max(abs(t), abs(tf))
+        cdef int i
+        
+        if schedule is None:
+            return tf
+        i = np.searchsorted(schedule, t + tol, side="right")
+        if i < len(schedule) and schedule[i] < tf - tol:
+            return schedule[i]
+        return tf
+    
     cpdef state_event_info(self):
         """
         Returns the event info.
@@ -2371,22 +2825,72 @@ cdef class CVode(Explicit_ODE):
                 if flag < 0:
                     raise CVodeError(flag)
                     
-        elif self.options["linear_solver"] == 'SPGMR' and self.options["iter"] == "Newton":
+        elif self.options["linear_solver"] == 'BAND' and self.options["iter"] == "Newton":
+            mupper, mlower = get_bandwidths(self.options, self.problem_info["jac_pattern"], self.pData.dim)
             IF SUNDIALS_VERSION >= (3,0,0):
-                #Create the linear solver
+                #Create a band Sundials matrix, with storage for the fill-in of the LU factorization
+                IF SUNDIALS_VERSION >= (6,0,0):
+                    self.sun_matrix = SUNDIALS.SUNBandMatrix(self.pData.dim, mupper, mlower, ctx)
+                ELIF SUNDIALS_VERSION >= (4,0,0):
+                    self.sun_matrix = SUNDIALS.SUNBandMatrix(self.pData.dim, mupper, mlower)
+                ELSE:
+                    self.sun_matrix = SUNDIALS.SUNBandMatrix(self.pData.dim, mupper, mlower, min(self.pData.dim-1, mupper+mlower))
+                #Create a band Sundials linear solver
                 IF SUNDIALS_VERSION >= (4,0,0):
                     IF SUNDIALS_VERSION >= (6,0,0):
-                        self.sun_linearsolver = SUNDIALS.SUNLinSol_SPGMR(self.yTemp, self.options["precond"], self.options["maxkrylov"], ctx)
+                        self.sun_linearsolver = SUNDIALS.SUNLinSol_Band(self.yTemp, self.sun_matrix, ctx)
                     ELSE:
-                        self.sun_linearsolver = SUNDIALS.SUNLinSol_SPGMR(self.yTemp, self.options["precond"], self.options["maxkrylov"])
+                        self.sun_linearsolver = SUNDIALS.SUNLinSol_Band(self.yTemp, self.sun_matrix)
                 ELSE:
-                    self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.yTemp, self.options["precond"], self.options["maxkrylov"])
+                    self.sun_linearsolver = SUNDIALS.SUNBandLinearSolver(self.yTemp, self.sun_matrix)
+                #Attach it to CVode
+                IF SUNDIALS_VERSION >= (4,0,0):
+                    flag = SUNDIALS.CVodeSetLinearSolver(self.cvode_mem, self.sun_linearsolver, self.sun_matrix)
+                ELSE:
+                    flag = SUNDIALS.CVDlsSetLinearSolver(self.cvode_mem, self.sun_linearsolver, self.sun_matrix)
+            ELSE:
+                #Specify the use of the internal band linear algebra functions.
+                flag = SUNDIALS.CVBand(self.cvode_mem, self.pData.dim, mupper, mlower)
+            if flag < 0:
+                raise CVodeError(flag)
+            
+            #Specify the jacobian to the solver, otherwise difference quotients are used
+            if self.pData.JAC != NULL and self.options["usejac"]:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    IF SUNDIALS_VERSION >= (4,0,0):
+                        flag = SUNDIALS.CVodeSetJacFn(self.cvode_mem, cv_jac_band)
+                    ELSE:
+                        flag = SUNDIALS.CVDlsSetJacFn(self.cvode_mem, cv_jac_band)
+                ELSE:
+                    flag = SUNDIALS.CVDlsSetBandJacFn(self.cvode_mem, cv_jac_band)
+            else:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    IF SUNDIALS_VERSION >= (4,0,0):
+                        flag = SUNDIALS.CVodeSetJacFn(self.cvode_mem, NULL)
+                    ELSE:
+                        flag = SUNDIALS.CVDlsSetJacFn(self.cvode_mem, NULL)
+                ELSE:
+                    flag = SUNDIALS.CVDlsSetBandJacFn(self.cvode_mem, NULL)
+            if flag < 0:
+                raise CVodeError(flag)
+                    
+        elif self.options["linear_solver"] in KRYLOV_SOLVERS and self.options["iter"] == "Newton":
+            IF SUNDIALS_VERSION >= (3,0,0):
+                #Create the linear solver
+                IF SUNDIALS_VERSION >= (6,0,0):
+                    self.sun_linearsolver = new_krylov_solver(self.options["linear_solver"], self.yTemp, self.options["precond"], self.options["maxkrylov"],
+                                                              self.options["max_restarts"], GRAM_SCHMIDT[self.options["gram_schmidt"]], <void*>ctx)
+                ELSE:
+                    self.sun_linearsolver = new_krylov_solver(self.options["linear_solver"], self.yTemp, self.options["precond"], self.options["maxkrylov"],
+                                                              self.options["max_restarts"], GRAM_SCHMIDT[self.options["gram_schmidt"]], NULL)
                 #Attach it to CVode
                 IF SUNDIALS_VERSION >= (4,0,0):
                     flag = SUNDIALS.CVodeSetLinearSolver(self.cvode_mem, self.sun_linearsolver, NULL)
                 ELSE:
                     flag = SUNDIALS.CVSpilsSetLinearSolver(self.cvode_mem, self.sun_linearsolver)
             ELSE:
+                if self.options["linear_solver"] != 'SPGMR':
+                    raise AssimuloException("The %s linear solver requires SUNDIALS 3.0.0 or newer."%self.options["linear_solver"])
                 #Specify the use of CVSPGMR linear solver.
                 flag = SUNDIALS.CVSpgmr(self.cvode_mem, self.options["precond"], self.options["maxkrylov"])
             if flag < 0:
@@ -2407,6 +2911,27 @@ cdef class CVode(Explicit_ODE):
                         flag = SUNDIALS.CVSpilsSetPreconditioner(self.cvode_mem, NULL, cv_prec_solve)
                     if flag < 0: 
                         raise CVodeError(flag)
+            
+            if self.options["precond_module"] is not None: #Replaces prec_setup and prec_solve
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    if self.options["precond_module"] == "ILU":
+                        if self.pData.JAC == NULL:
+                            raise AssimuloException("The ILU preconditioner needs the Jacobian, jac or jac_pattern.")
+                        self.pData.ilu = ILUPreconditioner(self.pData.dim)
+                        IF SUNDIALS_VERSION >= (4,0,0):
+                            flag = SUNDIALS.CVodeSetPreconditioner(self.cvode_mem, cv_ilu_setup, cv_ilu_solve)
+                        ELSE:
+                            flag = SUNDIALS.CVSpilsSetPreconditioner(self.cvode_mem, cv_ilu_setup, cv_ilu_solve)
+                    elif self.options["precond_module"] == "BANDED":
+                        mupper, mlower = get_bandwidths(self.options, self.problem_info["jac_pattern"], self.pData.dim)
+                        flag = SUNDIALS.CVBandPrecInit(self.cvode_mem, self.pData.dim, mupper, mlower)
+                    else:
+                        mupper, mlower = get_bandwidths(self.options, self.problem_info["jac_pattern"], self.pData.dim)
+                        flag = SUNDIALS.CVBBDPrecInit(self.cvode_mem, self.pData.dim, mupper, mlower, mupper, mlower, 0.0, cv_bbd_local, NULL)
+                    if flag < 0:
+                        raise CVodeError(flag)
+                ELSE:
+                    raise AssimuloException("The %s preconditioner requires SUNDIALS 3.0.0 or newer."%self.options["precond_module"])
                   
             #Specify the jacobian times vector function
             if self.pData.JACV != NULL and self.options["usejac"]:
@@ -2429,24 +2954,49 @@ cdef class CVode(Explicit_ODE):
                     flag = SUNDIALS.CVSpilsSetJacTimesVecFn(self.cvode_mem, NULL)
                 if flag < 0:
                     raise CVodeError(flag)
-        elif self.options["linear_solver"] == 'SPARSE' and self.options["iter"] == "Newton":
+        elif self.options["linear_solver"] in ('SPARSE', 'KLU') and self.options["iter"] == "Newton":
             
-            if SUNDIALS.version() < (2,6,0): 
-                raise AssimuloException("Not supported with this SUNDIALS version.")
-            if SUNDIALS.with_superlu() == 0:
-                raise AssimuloException("No support for SuperLU was detected, please verify that SuperLU and SUNDIALS has been installed correctly.")
+            if self.options["linear_solver"] == 'KLU':
+                if SUNDIALS.version() < (3,0,0):
+                    raise AssimuloException("The KLU linear solver requires SUNDIALS 3.0.0 or newer.")
+                if SUNDIALS.with_klu() == 0:
+                    raise AssimuloException("No support for KLU was detected, please verify that KLU (SuiteSparse) and SUNDIALS has been installed correctly.")
+            else:
+                if SUNDIALS.version() < (2,6,0): 
+                    raise AssimuloException("Not supported with this SUNDIALS version.")
+                if SUNDIALS.with_superlu() == 0:
+                    raise AssimuloException("No support for SuperLU was detected, please verify that SuperLU and SUNDIALS has been installed correctly.")
                 
-            #Specify the use of CVSPGMR linear solver.
             if self.problem_info["jac_fcn_nnz"] == -1:
-                raise AssimuloException("Need to specify the number of non zero elements in the Jacobian via the option 'jac_nnz'")
+                raise AssimuloException("Need to specify the number of non zero elements in the Jacobian via the option 'jac_nnz' or the sparsity pattern 'jac_pattern'")
+            
+            #KLU can factorize the Jacobian in either format, SuperLU_MT requires CSC
+            csr = self.options["linear_solver"] == 'KLU' and self.options["sparse_format"] == "CSR"
+            self.pData.set_jac_pattern(self.problem_info["jac_pattern"], self.problem_info["jac_pattern_out"], csr)
 
             IF SUNDIALS_VERSION >= (3,0,0):
                 IF SUNDIALS_VERSION >= (6,0,0):
-                    self.sun_matrix = SUNDIALS.SUNSparseMatrix(self.pData.dim, self.pData.dim, self.problem_info["jac_fcn_nnz"], CSC_MAT, ctx)
-                    self.sun_linearsolver = SUNDIALS.SUNLinSol_SuperLUMT(self.yTemp, self.sun_matrix, self.options["num_threads"], ctx)
+                    self.sun_matrix = SUNDIALS.SUNSparseMatrix(self.pData.dim, self.pData.dim, self.problem_info["jac_fcn_nnz"], CSR_MAT if csr else CSC_MAT, ctx)
+                    if self.options["linear_solver"] == 'KLU':
+                        self.sun_linearsolver = SUNDIALS.SUNLinSol_KLU(self.yTemp, self.sun_matrix, ctx)
+                    else:
+                        self.sun_linearsolver = SUNDIALS.SUNLinSol_SuperLUMT(self.yTemp, self.sun_matrix, self.options["num_threads"], ctx)
                 ELSE:
-                    self.sun_matrix = SUNDIALS.SUNSparseMatrix(self.pData.dim, self.pData.dim, self.problem_info["jac_fcn_nnz"], CSC_MAT)
-                    self.sun_linearsolver = SUNDIALS.SUNSuperLUMT(self.yTemp, self.sun_matrix, self.options["num_threads"])
+                    self.sun_matrix = SUNDIALS.SUNSparseMatrix(self.pData.dim, self.pData.dim, self.problem_info["jac_fcn_nnz"], CSR_MAT if csr else CSC_MAT)
+                    if self.options["linear_solver"] == 'KLU':
+                        IF SUNDIALS_VERSION >= (4,0,0):
+                            self.sun_linearsolver = SUNDIALS.SUNLinSol_KLU(self.yTemp, self.sun_matrix)
+                        ELSE:
+                            self.sun_linearsolver = SUNDIALS.SUNKLU(self.yTemp, self.sun_matrix)
+                    else:
+                        self.sun_linearsolver = SUNDIALS.SUNSuperLUMT(self.yTemp, self.sun_matrix, self.options["num_threads"])
+                if self.options["linear_solver"] == 'KLU':
+                    IF SUNDIALS_VERSION >= (4,0,0):
+                        flag = SUNDIALS.SUNLinSol_KLUSetOrdering(self.sun_linearsolver, KLU_ORDERINGS[self.options["klu_ordering"]])
+                    ELSE:
+                        flag = SUNDIALS.SUNKLUSetOrdering(self.sun_linearsolver, KLU_ORDERINGS[self.options["klu_ordering"]])
+                    if flag < 0:
+                        raise CVodeError(flag)
                 IF SUNDIALS_VERSION >= (4,0,0):
                     flag = SUNDIALS.CVodeSetLinearSolver(self.cvode_mem, self.sun_linearsolver, self.sun_matrix)
                 ELSE:
@@ -2468,7 +3018,7 @@ cdef class CVode(Explicit_ODE):
                 if flag < 0:
                     raise CVodeError(flag)
             else:
-                raise AssimuloException("For the SPARSE linear solver, the Jacobian must be provided and activated.")
+                raise AssimuloException("For the %s linear solver, the Jacobian must be provided and activated."%self.options["linear_solver"])
             
         else: #Functional Iteration choosen.
             pass #raise CVodeError(100,t0) #Unknown error message
@@ -2528,7 +3078,12 @@ cdef class CVode(Explicit_ODE):
             flag = SUNDIALS.CVodeSetStabLimDet(self.cvode_mem, self.options["stablimit"])
             if flag < 0:
                 raise CVodeError(flag)
-            
+
+        #Keep a copy of the Jacobian for the next simulation
+        self.pData.set_warm_start(self.options["warm_start"] and self.options["linear_solver"] == "DENSE"
+                                  and self.options["iter"] == "Newton" and self.pData.JAC != NULL
+                                  and self.options["usejac"])
+
         #Initialize sensitivity if any
         if self.pData.dimSens > 0:
             self.initialize_sensitivity_options()
@@ -2755,10 +3310,10 @@ cdef class CVode(Explicit_ODE):
     maxord=property(_get_max_ord,_set_max_ord)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR" or lsolver.upper() == "SPARSE":
+        if lsolver.upper() in ("DENSE", "SPARSE", "BAND", "KLU") + KRYLOV_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise AssimuloException('The linear solver must be either "DENSE", "SPGMR" or "SPARSE".')
+            raise AssimuloException('The linear solver must be either "DENSE", "SPARSE", "BAND", "KLU", "SPGMR", "SPFGMR", "SPBCGS" or "SPTFQMR".')
         
     def _get_linear_solver(self):
         """
@@ -2767,12 +3322,130 @@ cdef class CVode(Explicit_ODE):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR' or 'SPARSE'.
+                        - Default 'DENSE'. Can also be 'SPARSE', 'BAND', 'KLU'
+                          or one of the Krylov solvers 'SPGMR', 'SPFGMR'
+                          (flexible GMRES), 'SPBCGS' (BiCGStab) and 'SPTFQMR'
+                          (TFQMR).
+                        - The Krylov solvers use maxkrylov and precond (see
+                          also the preconditioner modules "BANDED" and
+                          "BBD"), and the GMRES variants max_restarts and
+                          gram_schmidt.
+                        - 'BAND' uses a banded LU factorization with the
+                          half-bandwidths mupper and mlower, see these.
+                        - 'SPARSE' (SuperLU_MT) and 'KLU' factorize a
+                          sparse Jacobian, which needs to be provided
+                          together with jac_nnz or jac_pattern.
         """
         return self.options["linear_solver"]
     
     linear_solver = property(_get_linear_solver, _set_linear_solver)
     
+    def _set_mupper(self, mupper):
+        self.options["mupper"] = check_bandwidth(mupper)
+    
+    def _get_mupper(self):
+        """
+        Specifies the upper half-bandwidth of the Jacobian for the BAND
+        linear solver and the banded preconditioners (precond), i.e.
+        J[i,j] = 0 for j-i > mupper.
+        
+            Parameters::
+            
+                    mupper
+                            - A non-negative integer.
+                            - Default None, the upper half-bandwidth of
+                              the problem's jac_pattern.
+            
+            Returns::
+            
+                The current value of mupper.
+        
+        See assimulo.support.get_bandwidths for the band storage of the
+        Jacobian.
+        """
+        return self.options["mupper"]
+    
+    mupper = property(_get_mupper, _set_mupper)
+    
+    def _set_mlower(self, mlower):
+        self.options["mlower"] = check_bandwidth(mlower)
+    
+    def _get_mlower(self):
+        """
+        Specifies the lower half-bandwidth of the Jacobian for the BAND
+        linear solver and the banded preconditioners (precond), i.e.
+        J[i,j] = 0 for i-j > mlower.
+        
+            Parameters::
+            
+                    mlower
+                            - A non-negative integer.
+                            - Default None, the lower half-bandwidth of
+                              the problem's jac_pattern.
+            
+            Returns::
+            
+                The current value of mlower.
+        
+        See mupper.
+        """
+        return self.options["mlower"]
+    
+    mlower = property(_get_mlower, _set_mlower)
+    
+    def _set_klu_ordering(self, ordering):
+        if str(ordering).upper() in KLU_ORDERINGS:
+            self.options["klu_ordering"] = str(ordering).upper()
+        else:
+            raise AssimuloException('The KLU ordering must be either "AMD", "COLAMD" or "NATURAL".')
+    
+    def _get_klu_ordering(self):
+        """
+        Specifies the fill-reducing ordering of the KLU linear solver.
+        
+            Parameters::
+            
+                    klu_ordering
+                            - Default 'COLAMD'. Can also be 'AMD' or
+                              'NATURAL' (no reordering).
+            
+            Returns::
+            
+                The current value of klu_ordering.
+        """
+        return self.options["klu_ordering"]
+    
+    klu_ordering = property(_get_klu_ordering, _set_klu_ordering)
+    
+    def _set_sparse_format(self, format):
+        if str(format).upper() in ("CSC", "CSR"):
+            self.options["sparse_format"] = str(format).upper()
+        else:
+            raise AssimuloException('The sparse format must be either "CSC" or "CSR".')
+    
+    def _get_sparse_format(self):
+        """
+        Specifies the storage format of the sparse Jacobian of the KLU
+        linear solver, the SPARSE (SuperLU_MT) linear solver always uses
+        CSC.
+        
+            Parameters::
+            
+                    sparse_format
+                            - Default 'CSC'. Can also be 'CSR'.
+            
+            Returns::
+            
+                The current value of sparse_format.
+        
+        A Jacobian is converted to the format. The values of a Jacobian
+        evaluated in-place into its jac_pattern (keyword out) are always in
+        CSC order and are reordered for CSR.
+        """
+        return self.options["sparse_format"]
+    
+    sparse_format = property(_get_sparse_format, _set_sparse_format)
+    
     def _set_initial_step(self, initstep):
         try:
             self.options["inith"] = float(initstep)
@@ -3186,7 +3859,69 @@ cdef class CVode(Explicit_ODE):
     
     maxkrylov = property(_get_max_krylov, _set_max_krylov)
     
+    def _set_max_restarts(self, max_restarts):
+        try:
+            max_restarts = int(max_restarts)
+        except Exception:
+            raise AssimuloException("The maximum number of restarts should be an integer.")
+        if max_restarts < 0:
+            raise AssimuloException("The maximum number of restarts should be a non-negative integer.")
+        self.options["max_restarts"] = max_restarts
+    
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts of the SPGMR and SPFGMR
+        linear solvers.
+        
+            Parameters::
+            
+                    max_restarts
+                            - A non-negative integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of max_restarts.
+        
+        See SUNDIALS documentation 'SUNLinSol_SPGMRSetMaxRestarts'
+        """
+        return self.options["max_restarts"]
+    
+    max_restarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_gram_schmidt(self, gram_schmidt):
+        if str(gram_schmidt).upper() in GRAM_SCHMIDT:
+            self.options["gram_schmidt"] = str(gram_schmidt).upper()
+        else:
+            raise AssimuloException('The Gram-Schmidt orthogonalization must be either "MODIFIED" or "CLASSICAL".')
+    
+    def _get_gram_schmidt(self):
+        """
+        Specifies the Gram-Schmidt orthogonalization of the SPGMR and SPFGMR
+        linear solvers.
+        
+            Parameters::
+            
+                    gram_schmidt
+                            - Default 'MODIFIED'. Can also be 'CLASSICAL',
+                              which needs fewer synchronizations but is
+                              less robust.
+            
+            Returns::
+            
+                The current value of gram_schmidt.
+        
+        See SUNDIALS documentation 'SUNLinSol_SPGMRSetGSType'
+        """
+        return self.options["gram_schmidt"]
+    
+    gram_schmidt = property(_get_gram_schmidt, _set_gram_schmidt)
+    
     def _set_pre_cond(self, precond):
+        if precond.upper() in ("BANDED", "BBD", "ILU"):
+            self.options["precond"] = PREC_LEFT
+            self.options["precond_module"] = precond.upper()
+            return
         if precond.upper() == "PREC_NONE":
             self.options["precond"] = PREC_NONE
         elif precond.upper() == "PREC_LEFT":
@@ -3196,7 +3931,8 @@ cdef class CVode(Explicit_ODE):
         elif precond.upper() == "PREC_BOTH":
             self.options["precond"] = PREC_BOTH
         else:
-            raise AssimuloException('Unknown input of precond. Should be either "PREC_NONE", "PREC_LEFT","PREC_RIGHT" or "PREC_BOTH"')
+            raise AssimuloException('Unknown input of precond. Should be either "PREC_NONE", "PREC_LEFT","PREC_RIGHT", "PREC_BOTH", "BANDED", "BBD" or "ILU"')
+        self.options["precond_module"] = None
     def _get_pre_cond(self):
         """
         Specifies the preconditioning type.
@@ -3205,15 +3941,33 @@ cdef class CVode(Explicit_ODE):
             
                     precond
                             - Should be either "PREC_NONE", "PREC_LEFT"
-                              "PREC_RIGHT" or "PREC_BOTH"
+                              "PREC_RIGHT", "PREC_BOTH", "BANDED", "BBD"
+                              or "ILU"
                             - Default PREC_NONE
             
             Returns::
             
                 The current value of precond (as string).
+        
+        "BANDED" and "BBD" left precondition the Krylov solvers with the
+        SUNDIALS banded and band-block-diagonal preconditioner modules,
+        which approximate the Jacobian by difference quotients of the
+        right-hand side within the half-bandwidths mupper and mlower (or
+        those of jac_pattern). They replace the problem's prec_setup and
+        prec_solve. In the serial case, "BBD" is a banded preconditioner
+        which also keeps the band of the difference quotient Jacobian.
+        
+        "ILU" left preconditions with an incomplete LU factorization without
+        fill-in, ILU(0), of I - gamma*J on the sparsity pattern of the
+        Jacobian J, which is evaluated by jac (dense or sparse) or, with
+        jac_pattern and no jac, by colored finite differences. The Jacobian
+        is kept while CVode considers it current. This replaces prec_setup
+        and prec_solve as well.
                 
-        See SUNDIALS documentation 'CVSpgmr'
+        See SUNDIALS documentation 'CVSpgmr', 'CVBandPrecInit' and 'CVBBDPrecInit'
         """
+        if self.options["precond_module"] is not None:
+            return self.options["precond_module"]
         if self.options["precond"] == PREC_NONE:
             return "PREC_NONE"
         elif self.options["precond"] == PREC_LEFT:
@@ -3282,6 +4036,32 @@ cdef class CVode(Explicit_ODE):
     external_event_detection = property(_get_external_event_detection,
                                         _set_external_event_detection)
 
+    def _set_warm_start(self, warm_start):
+        self.options["warm_start"] = bool(warm_start)
+    
+    def _get_warm_start(self):
+        """
+        If True, the last evaluated Jacobian is kept when the solver is
+        re-initialized (for instance by consecutive calls to simulate from
+        a new initial condition or after an event) and is used for the
+        first Newton iteration instead of evaluating the Jacobian again.
+        Only used together with the DENSE linear solver and a user
+        provided Jacobian.
+        
+            Parameters::
+            
+                warm_start
+                        - Default 'False'.
+                        
+                        - Should be a boolean.
+                        
+                            Example:
+                                warm_start = True
+        """
+        return self.options["warm_start"]
+    
+    warm_start = property(_get_warm_start, _set_warm_start)
+
     def _set_maxstepshnil(self, maxstepshnil):
         if not isinstance(maxstepshnil, int):
             raise TypeError("'maxstepshnil' must be an integer.")
@@ -3320,22 +4100,38 @@ cdef class CVode(Explicit_ODE):
         cdef long int nsteps = 0, njevals = 0, ngevals = 0, netfails = 0, nniters = 0, nncfails = 0
         cdef long int nSniters = 0, nSncfails = 0, nfevalsLS = 0, njvevals = 0, nfevals = 0
         cdef long int nfSevals = 0,nfevalsS = 0,nSetfails = 0,nlinsetupsS = 0, nlinsetups = 0
-        cdef long int npevals = 0, npsolves = 0, nlsred = 0
+        cdef long int npevals = 0, npsolves = 0, nlsred = 0, nliters = 0, nlcfails = 0, nfevalsPM = 0
+        cdef bint precond_module = self.options["linear_solver"] in KRYLOV_SOLVERS and self.options["precond_module"] is not None
         cdef int qlast = 0, qcur = 0
         cdef realtype hinused = 0.0, hlast = 0.0, hcur = 0.0, tcur = 0.0
 
         if self.cvode_mem == NULL:
             raise CVodeError(CV_MEM_FAIL)
 
-        if self.options["linear_solver"] == "SPGMR":
+        if self.options["linear_solver"] in KRYLOV_SOLVERS:
             IF SUNDIALS_VERSION >= (4,0,0):
                 flag = SUNDIALS.CVodeGetNumJtimesEvals(self.cvode_mem, &njvevals) #Number of jac*vector
                 flag = SUNDIALS.CVodeGetNumRhsEvals(self.cvode_mem, &nfevalsLS) #Number of rhs due to jac*vector
+                flag = SUNDIALS.CVodeGetNumLinIters(self.cvode_mem, &nliters) #Number of linear iterations
+                flag = SUNDIALS.CVodeGetNumLinConvFails(self.cvode_mem, &nlcfails) #Number of linear convergence failures
             ELSE:
                 flag = SUNDIALS.CVSpilsGetNumJtimesEvals(self.cvode_mem, &njvevals) #Number of jac*vector
                 flag = SUNDIALS.CVSpilsGetNumRhsEvals(self.cvode_mem, &nfevalsLS) #Number of rhs due to jac*vector
+                flag = SUNDIALS.CVSpilsGetNumLinIters(self.cvode_mem, &nliters) #Number of linear iterations
+                flag = SUNDIALS.CVSpilsGetNumConvFails(self.cvode_mem, &nlcfails) #Number of linear convergence failures
             self.statistics["njacvecs"]  += njvevals
-        elif self.options["linear_solver"] == "SPARSE":
+            self.statistics["nliters"]   += nliters
+            self.statistics["nlcfails"]  += nlcfails
+            IF SUNDIALS_VERSION >= (3,0,0):
+                if self.options["precond_module"] == "BANDED":
+                    flag = SUNDIALS.CVBandPrecGetNumRhsEvals(self.cvode_mem, &nfevalsPM) #Number of rhs evals of the preconditioner
+                elif self.options["precond_module"] == "BBD":
+                    flag = SUNDIALS.CVBBDPrecGetNumGfnEvals(self.cvode_mem, &nfevalsPM)
+                elif self.options["precond_module"] == "ILU":
+                    self.statistics["njacs"] += self.pData.ilu.njacs
+                    self.pData.ilu.njacs = 0
+                self.statistics["nfcnjacs"] += nfevalsPM
+        elif self.options["linear_solver"] in ("SPARSE", "KLU"):
             IF SUNDIALS_VERSION >= (3,0,0):
                 IF SUNDIALS_VERSION >= (4,0,0):
                     flag = SUNDIALS.CVodeGetNumJacEvals(self.cvode_mem, &njevals)
@@ -3352,13 +4148,13 @@ cdef class CVode(Explicit_ODE):
                 flag = SUNDIALS.CVDlsGetNumJacEvals(self.cvode_mem, &njevals) #Number of jac evals
                 flag = SUNDIALS.CVDlsGetNumRhsEvals(self.cvode_mem, &nfevalsLS) #Number of res evals due to jac evals
             self.statistics["njacs"]   += njevals
-        if self.pData.PREC_SOLVE != NULL:
+        if self.pData.PREC_SOLVE != NULL or precond_module:
             IF SUNDIALS_VERSION >= (4,0,0):
                 flag = SUNDIALS.CVodeGetNumPrecSolves(self.cvode_mem, &npsolves)
             ELSE:
                 flag = SUNDIALS.CVSpilsGetNumPrecSolves(self.cvode_mem, &npsolves)
             self.statistics["nprecs"]  += npsolves
-        if self.pData.PREC_SETUP != NULL:
+        if self.pData.PREC_SETUP != NULL or precond_module:
             IF SUNDIALS_VERSION >= (4,0,0):
                 flag = SUNDIALS.CVodeGetNumPrecEvals(self.cvode_mem, &npevals)
             ELSE:
@@ -18,3 +18,21 @@
 cdef class Statistics:
     cdef public object statistics_msg
     cdef public object statistics
+
+#C signatures of low-level callbacks, see LowLevelCallback
+ctypedef int (*c_rhs_t)(double t, const double* y, double* ydot, void* user_data) noexcept nogil
+ctypedef int (*c_res_t)(double t, const double* y, const double* yd, double* res, void* user_data) noexcept nogil
+ctypedef int (*c_jac_t)(double t, const double* y, double* jac, void* user_data) noexcept nogil
+ctypedef int (*c_jac_res_t)(double c, double t, const double* y, const double* yd, double* jac, void* user_data) noexcept nogil
+ctypedef int (*c_events_t)(double t, const double* y, double* gout, void* user_data) noexcept nogil
+ctypedef int (*c_events_res_t)(double t, const double* y, const double* yd, double* gout, void* user_data) noexcept nogil
+
+cdef class LowLevelCallback:
+    cdef void* function
+    cdef void* user_data
+    cdef readonly object kind
+    cdef readonly int implicit
+    cdef readonly int size
+    cdef readonly object pattern
+    cdef int dim
+    cdef object _refs
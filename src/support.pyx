@@ -17,10 +17,17 @@
 
 # distutils: define_macros=NPY_NO_DEPRECATED_API=NPY_1_7_API_VERSION
 
+import ctypes
+import inspect
 import numpy as np
 cimport numpy as np
+import scipy.sparse as sps
+from cpython.pycapsule cimport PyCapsule_CheckExact, PyCapsule_GetPointer, PyCapsule_GetName
 
 from collections import OrderedDict
+from scipy import LowLevelCallable
+
+from assimulo.exception import AssimuloException, AssimuloRecoverableError
 
 realtype = float
 
@@ -81,3 +88,631 @@ cdef class Statistics:
         
     def keys(self):
         return self.statistics.keys()
+
+def _address(obj):
+    """
+    Helper function returning the memory address of a function pointer
+    or user data given as a PyCapsule, ctypes or cffi object, a numba
+    cfunc or a numpy array.
+    """
+    if obj is None:
+        return 0
+    if PyCapsule_CheckExact(obj):
+        return <size_t>PyCapsule_GetPointer(obj, PyCapsule_GetName(obj))
+    if isinstance(obj, LowLevelCallable):
+        return _address(obj.function)
+    if isinstance(obj, (int, np.integer)):
+        return int(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.ctypes.data
+    if isinstance(obj, (ctypes._CFuncPtr, ctypes._Pointer, ctypes.c_void_p, ctypes.c_char_p)):
+        return ctypes.cast(obj, ctypes.c_void_p).value or 0
+    if isinstance(obj, (ctypes._SimpleCData, ctypes.Structure, ctypes.Union, ctypes.Array)):
+        return ctypes.addressof(obj)
+    if type(obj).__module__ == "_cffi_backend":
+        import cffi
+        return int(cffi.FFI().cast("uintptr_t", obj))
+    if hasattr(obj, "address") and hasattr(obj, "ctypes"): #numba cfunc
+        return int(obj.address)
+    raise AssimuloException("Could not retrieve a memory address from an object of type %s."%type(obj).__name__)
+
+def is_low_level_callable(obj):
+    """
+    Returns True if obj is a function pointer that can be wrapped by
+    LowLevelCallback, i.e. a LowLevelCallback, a scipy.LowLevelCallable,
+    a ctypes or cffi function pointer, a numba cfunc or a PyCapsule.
+    """
+    if isinstance(obj, (LowLevelCallback, LowLevelCallable, ctypes._CFuncPtr)) or PyCapsule_CheckExact(obj):
+        return True
+    if type(obj).__module__ == "_cffi_backend":
+        import cffi
+        return cffi.FFI().typeof(obj).kind == "function"
+    return hasattr(obj, "address") and hasattr(obj, "ctypes") and hasattr(obj, "native_name") #numba cfunc
+
+def accepts_out(function):
+    """
+    Returns True if the Python function takes a parameter named 'out',
+    i.e. if it can store its result in-place into a buffer provided by
+    the solver instead of returning a new array.
+    """
+    if function is None or is_low_level_callable(function):
+        return False
+    try:
+        return "out" in inspect.signature(function).parameters
+    except (TypeError, ValueError):
+        return False
+
+class RHSJacobianCache:
+    """
+    Wraps the fused problem function rhs_and_jac(t, y, ...) (res_and_jac
+    for implicit problems) which returns the right-hand side (residual)
+    together with the Jacobian at the same point. The solvers call the
+    methods rhs (res) and jac of this object instead of the problem
+    functions. The Jacobian of the last evaluation is kept and returned
+    when the solver requests the Jacobian at the same t and y (and yd),
+    otherwise the problem jac is called if it exists and else the fused
+    function is evaluated again.
+
+    The Jacobian returned by the fused function may be a matrix, a callable
+    without arguments that computes it on request (evaluated at most once
+    per point) or, for implicit problems, a pair (dF/dy, dF/dyd) or a
+    callable jac(c).
+    """
+    def __init__(self, fused, jac = None):
+        self.fused = fused
+        self.jac_fcn = jac
+        self.t = None
+        self.y = None
+        self.yd = None
+        self.args = []
+        self.kwargs = {}
+        self.J = None
+
+    def _store(self, t, y, yd, args, kwargs, J):
+        #The solvers reuse their buffers, the point is copied into the cache's own arrays
+        self.t = t
+        self.y = _copy_into(self.y, y)
+        self.yd = None if yd is None else _copy_into(self.yd, yd)
+        if len(self.args) != len(args):
+            self.args = [None]*len(args)
+        for i, arg in enumerate(args): #The switches and parameters
+            self.args[i] = _copy_into(self.args[i], arg)
+        for key in list(self.kwargs):
+            if key not in kwargs:
+                del self.kwargs[key]
+        for key, arg in kwargs.items():
+            if key != "out":
+                self.kwargs[key] = _copy_into(self.kwargs.get(key), arg)
+        self.J = J
+
+    def _is_cached(self, t, y, yd, args, kwargs):
+        if self.t is None or self.t != t or not np.array_equal(self.y, y) or \
+           (yd is not None and not np.array_equal(self.yd, yd)) or len(self.args) != len(args):
+            return False
+        if len(self.kwargs) != len(kwargs) - ("out" in kwargs):
+            return False
+        return all(np.array_equal(cached, arg) for cached, arg in zip(self.args, args)) and \
+               all(key in self.kwargs and np.array_equal(self.kwargs[key], arg) for key, arg in kwargs.items() if key != "out")
+
+    def rhs(self, t, y, *args, **kwargs):
+        f, J = self.fused(t, y, *args, **kwargs)
+        self._store(t, y, None, args, kwargs, J)
+        return f
+
+    def res(self, t, y, yd, *args, **kwargs):
+        r, J = self.fused(t, y, yd, *args, **kwargs)
+        self._store(t, y, yd, args, kwargs, J)
+        return r
+
+    def jac(self, t, y, *args, **kwargs):
+        if not self._is_cached(t, y, None, args, kwargs):
+            if self.jac_fcn is not None:
+                return self.jac_fcn(t, y, *args, **kwargs)
+            self.rhs(t, y, *args, **kwargs)
+        if callable(self.J):
+            self.J = self.J()
+        return self.J
+
+    def jac_res(self, c, t, y, yd, *args, **kwargs):
+        if not self._is_cached(t, y, yd, args, kwargs):
+            if self.jac_fcn is not None:
+                return self.jac_fcn(c, t, y, yd, *args, **kwargs)
+            self.res(t, y, yd, *args, **kwargs)
+        if callable(self.J):
+            return self.J(c)
+        return self.J[0] + c*self.J[1]
+
+def _copy_into(buf, a):
+    """
+    Copies a into the array buf, which is only (re)allocated if it does not
+    fit a. Returns the array holding the copy.
+    """
+    if buf is None or buf.shape != np.shape(a) or (np.iscomplexobj(a) and not np.iscomplexobj(buf)):
+        return np.array(a)
+    buf[...] = a
+    return buf
+
+def column_coloring(pattern):
+    """
+    Colors the columns of a Jacobian sparsity pattern such that no two
+    columns of the same color have a non-zero in a common row (greedy,
+    Curtis-Powell-Reid). The columns of one color can be perturbed together
+    in a finite difference approximation of the Jacobian, which then costs
+    one right-hand side evaluation per color instead of one per column.
+    
+        Parameters::
+        
+            pattern
+                        - The sparsity pattern (any SciPy sparse format
+                          or a dense array) of a square Jacobian.
+        
+        Returns::
+        
+            An integer array with the color (0, 1, ...) of each column.
+    """
+    csc = sps.csc_matrix(pattern)
+    csr = csc.tocsr()
+    cdef int n = csc.shape[1]
+    cdef const int[:] indptr = csc.indptr.astype(np.intc, copy=False)
+    cdef const int[:] indices = csc.indices.astype(np.intc, copy=False)
+    cdef const int[:] row_ptr = csr.indptr.astype(np.intc, copy=False)
+    cdef const int[:] row_ind = csr.indices.astype(np.intc, copy=False)
+    cdef np.ndarray[int, ndim=1] colors = np.full(n, -1, dtype=np.intc)
+    cdef np.ndarray[int, ndim=1] forbidden = np.full(n + 1, -1, dtype=np.intc) #forbidden[c] == j: color c is used by a neighbour of column j
+    cdef int i, j, k, l, c
+    
+    if csc.nnz == n*n: #Dense, every column has its own color
+        colors[:] = np.arange(n, dtype=np.intc)
+        return colors
+    
+    for j in range(n):
+        for k in range(indptr[j], indptr[j+1]):
+            i = indices[k]
+            for l in range(row_ptr[i], row_ptr[i+1]):
+                c = colors[row_ind[l]]
+                if c >= 0:
+                    forbidden[c] = j
+        c = 0
+        while forbidden[c] == j:
+            c += 1
+        colors[j] = c
+    return colors
+
+def check_bandwidth(bandwidth, exception = AssimuloException):
+    """
+    Validates a half-bandwidth option (mupper or mlower) of the BAND
+    linear solvers, None or a non-negative integer. Invalid values raise
+    the given exception class.
+    """
+    if bandwidth is None:
+        return None
+    try:
+        bandwidth = int(bandwidth)
+    except Exception:
+        raise exception("The half-bandwidth should be an integer.") from None
+    if bandwidth < 0:
+        raise exception("The half-bandwidth should be a non-negative integer.")
+    return bandwidth
+
+def get_bandwidths(options, pattern, int dim, exception = AssimuloException):
+    """
+    Returns the half-bandwidths (mupper, mlower) of the BAND linear solvers
+    and of the banded preconditioners, from the options or, where not set,
+    from the Jacobian sparsity pattern. Missing half-bandwidths raise the
+    given exception class.
+    
+    A Jacobian (jac) is copied into the band, or, if it accepts the
+    keyword out, evaluated in-place into a view of the band storage of
+    shape (mupper+mlower+1, len(y)), with J[i,j] stored at
+    out[mupper+i-j, j] as in scipy.linalg.solve_banded. Without jac, the
+    band is approximated by difference quotients with mupper+mlower+1
+    function evaluations.
+    """
+    mupper, mlower = options["mupper"], options["mlower"]
+    if pattern is not None:
+        rows, cols = pattern.nonzero()
+        if mupper is None:
+            mupper = int(np.max(cols - rows, initial=0))
+        if mlower is None:
+            mlower = int(np.max(rows - cols, initial=0))
+    if mupper is None or mlower is None:
+        raise exception("The half-bandwidths 'mupper' and 'mlower' need to be set for the BAND linear solver "
+                        "and the banded preconditioners, or be given by 'jac_pattern'.")
+    return min(mupper, dim-1), min(mlower, dim-1)
+
+def detect_jac_pattern(fcn, t, y, args = (), kwargs = None, int samples = 2, nan = True, seed = 0):
+    """
+    Detects the structural sparsity pattern of the Jacobian of a right-hand
+    side by probing it state by state. A state is set to NaN, the rows
+    whose result becomes NaN depend on it (skipped if fcn does not accept
+    NaN), and it is perturbed at randomized points around y, the rows whose
+    result changes depend on it. The pattern is the union of all probes.
+    
+    The detection costs about (samples + 1)*len(y) evaluations and is meant
+    to be done once per problem, see jac_pattern in Explicit_Problem.
+    
+        Parameters::
+        
+            fcn
+                        - The right-hand side, fcn(t, y, *args, **kwargs).
+            
+            t, y
+                        - The point around which the function is probed.
+            
+            args, kwargs
+                        - Additional arguments to fcn, e.g. switches.
+            
+            samples
+                        - The number of randomized points to probe.
+                          Default 2.
+            
+            nan
+                        - Probe with NaN propagation. Default True.
+            
+            seed
+                        - Seed of the randomized points. Default 0.
+        
+        Returns::
+        
+            The pattern as a scipy.sparse.csc_matrix (of ones).
+    """
+    cdef int j, n
+    kwargs = {} if kwargs is None else kwargs
+    y = np.array(y, dtype=float)
+    n = len(y)
+    rows, cols = [], []
+    
+    def evaluate(yc):
+        return np.asarray(fcn(t, yc, *args, **kwargs), dtype=float)
+    
+    def differs(a, b): #NaN rows that stay NaN are unchanged
+        return ~((a == b) | (np.isnan(a) & np.isnan(b)))
+    
+    def add(j, changed):
+        found = np.flatnonzero(changed)
+        rows.append(found)
+        cols.append(np.full(len(found), j))
+    
+    with np.errstate(all="ignore"):
+        if nan:
+            yc = y.copy()
+            try:
+                nan_rows = np.isnan(evaluate(yc)) #Already NaN without a NaN state
+                for j in range(n):
+                    yc[j] = np.nan
+                    add(j, np.isnan(evaluate(yc)) & ~nan_rows)
+                    yc[j] = y[j]
+            except Exception: #The function does not accept NaN, rely on the perturbations
+                rows, cols = [], []
+        
+        rng = np.random.RandomState(seed)
+        for _ in range(samples):
+            ys = y + (np.abs(y) + 1.0)*rng.uniform(-0.1, 0.1, n)
+            fs = evaluate(ys)
+            h = np.sqrt(np.finfo(float).eps)*np.maximum(1.0, np.abs(ys))
+            for j in range(n):
+                yj = ys[j]
+                ys[j] = yj + h[j]
+                add(j, differs(evaluate(ys), fs))
+                ys[j] = yj
+    
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=int)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=int)
+    pattern = sps.csc_matrix((np.ones(len(rows)), (rows, cols)), shape = (n, n))
+    pattern.sum_duplicates()
+    pattern.data[:] = 1.0
+    return pattern
+
+class ColoredJacobian:
+    """
+    Finite difference approximation of a Jacobian with a known sparsity
+    pattern, where the columns are grouped by column_coloring and each
+    group is perturbed together. An evaluation costs one right-hand side
+    evaluation per color plus one at the unperturbed point.
+    
+    With complex_step = True, the right-hand side is instead evaluated at
+    complex points, J[:, j] = imag(f(t, y + i*h*e_j))/h (summed over the
+    columns of a color), which is exact to machine precision as there is
+    no subtraction. This requires a right-hand side that accepts complex
+    input and propagates it, and costs one evaluation per color.
+    
+    Used as the Jacobian of explicit problems which define jac_pattern
+    (or complex_step) but no jac. Called as jac(t, y, ...), additional
+    arguments are passed on to the right-hand side. Returns a CSC matrix
+    with the structure of the pattern, or writes the values into out if
+    given, either the data vector of the pattern or a dense matrix.
+    """
+    def __init__(self, fcn, pattern, complex_step = False, h = 1e-20):
+        """
+        Parameters::
+        
+            fcn
+                        - The right-hand side, fcn(t, y, ...).
+            
+            pattern
+                        - The sparsity pattern of the Jacobian.
+            
+            complex_step
+                        - Use complex-step instead of finite differences.
+                          Default False.
+            
+            h
+                        - The imaginary step of the complex-step.
+                          Default 1e-20.
+        """
+        self.fcn = fcn
+        self.pattern = sps.csc_matrix(pattern, dtype=float)
+        self.pattern.sum_duplicates() #Also sorts the indices
+        self.complex_step = complex_step
+        self.h = h
+        self.colors = column_coloring(self.pattern)
+        self.ncolors = int(self.colors.max()) + 1 if len(self.colors) > 0 else 0
+        self.nfcns = 0
+        
+        cols = np.repeat(np.arange(self.pattern.shape[1]), np.diff(self.pattern.indptr))
+        self._rows = self.pattern.indices
+        self._cols = cols
+        self._columns = [np.flatnonzero(self.colors == c) for c in range(self.ncolors)]
+        self._nonzeros = [np.flatnonzero(self.colors[cols] == c) for c in range(self.ncolors)]
+    
+    def _values(self, t, y, data, args, kwargs):
+        if self.complex_step:
+            yc = y.astype(complex)
+            for columns, nonzeros in zip(self._columns, self._nonzeros):
+                yc[columns] += 1j*self.h
+                df = np.imag(np.asarray(self.fcn(t, yc, *args, **kwargs)))
+                yc[columns] = y[columns]
+                data[nonzeros] = df[self._rows[nonzeros]]/self.h
+            self.nfcns += self.ncolors
+            return
+        
+        f0 = np.asarray(self.fcn(t, y, *args, **kwargs), dtype=float)
+        ypert = y + np.sqrt(np.finfo(float).eps*np.maximum(1e-5, np.abs(y)))
+        delta = ypert - y #Exactly representable increments
+        yc = y.copy()
+        for columns, nonzeros in zip(self._columns, self._nonzeros):
+            yc[columns] = ypert[columns]
+            df = np.asarray(self.fcn(t, yc, *args, **kwargs), dtype=float) - f0
+            yc[columns] = y[columns]
+            data[nonzeros] = df[self._rows[nonzeros]]/delta[self._cols[nonzeros]]
+        self.nfcns += self.ncolors + 1
+    
+    def __call__(self, t, y, *args, out = None, **kwargs):
+        y = np.asarray(y, dtype=float)
+        if out is not None and out.ndim == 2: #Dense matrix
+            data = np.empty(self.pattern.nnz)
+            self._values(t, y, data, args, kwargs)
+            out[:,:] = 0.0
+            out[self._rows, self._cols] = data
+            return out
+        
+        data = np.empty(self.pattern.nnz) if out is None else out
+        self._values(t, y, data, args, kwargs)
+        if out is not None:
+            return out
+        return sps.csc_matrix((data, self.pattern.indices.copy(), self.pattern.indptr.copy()), shape = self.pattern.shape)
+
+class ComplexStepSensitivity:
+    """
+    Right-hand side of the forward sensitivity equations of an explicit
+    problem, s_k' = df/dy*s_k + df/dp_k, by complex-step differentiation in
+    the direction (s_k, e_k): imag(f(t, y + i*h*s_k, p + i*h*e_k))/h. This
+    costs one complex right-hand side evaluation per parameter and is exact
+    to machine precision. The right-hand side needs to accept complex
+    states and parameters.
+    
+    Called as rhs_sens(t, y, s, p, sw = None, out = None).
+    """
+    def __init__(self, fcn, h = 1e-20):
+        """
+        Parameters::
+        
+            fcn
+                        - The right-hand side, fcn(t, y, p) or, with
+                          switches, fcn(t, y, sw = sw, p = p).
+            
+            h
+                        - The imaginary step. Default 1e-20.
+        """
+        self.fcn = fcn
+        self.h = h
+        self.nfcns = 0
+    
+    def __call__(self, t, y, s, p, sw = None, out = None):
+        y = np.asarray(y, dtype=float)
+        s = np.asarray(s, dtype=float)
+        p = np.asarray(p, dtype=float)
+        if out is None:
+            out = np.empty((len(y), len(p)), order="F")
+        
+        for k in range(len(p)):
+            yc = y + 1j*self.h*s[:,k]
+            pc = p.astype(complex)
+            pc[k] += 1j*self.h
+            f = self.fcn(t, yc, sw=sw, p=pc) if sw is not None else self.fcn(t, yc, pc)
+            out[:,k] = np.imag(np.asarray(f))/self.h
+        self.nfcns += len(p)
+        return out
+
+cdef class LowLevelCallback:
+    """
+    Wraps a compiled (C) function so that the solvers call it directly,
+    without creating any Python objects. Low-level callables given as
+    rhs, res, jac or state_events of a problem are wrapped automatically
+    when the solver is created. Supported are scipy.LowLevelCallable,
+    ctypes and cffi function pointers, numba cfuncs and PyCapsules.
+    
+    The functions must have the following C signatures, where all
+    matrices are dense and stored column-major (Fortran order):
+    
+        Explicit problems:
+        
+            int rhs(double t, const double* y, double* ydot, void* user_data)
+            int jac(double t, const double* y, double* jac, void* user_data)
+            int state_events(double t, const double* y, double* gout, void* user_data)
+        
+        Implicit problems:
+        
+            int res(double t, const double* y, const double* yd, double* res, void* user_data)
+            int jac(double c, double t, const double* y, const double* yd, double* jac, void* user_data)
+            int state_events(double t, const double* y, const double* yd, double* gout, void* user_data)
+    
+    The return value should be 0 on success, positive for a recoverable
+    error (the solver retries with a smaller step) and negative for an
+    unrecoverable error.
+    
+    The Jacobian of an explicit problem may instead be given together with
+    its fixed sparsity pattern, LowLevelCallback(jac, pattern = P). The
+    function then has the signature of the dense Jacobian but only writes
+    the P.nnz values of the pattern, ordered as the data of P in sorted CSC
+    format. The pattern is used as the jac_pattern of the problem, with the
+    SPARSE linear solvers of CVode and Radau5ODE the values are written
+    directly into the solver matrix.
+    
+    Low-level callbacks do not support switches or sensitivity parameters.
+    Solvers without a C callback layer call the wrapper from Python.
+    """
+    def __init__(self, function, size = None, user_data = None, pattern = None):
+        """
+        Parameters::
+        
+            function
+                        - The low-level callable.
+            
+            size
+                        - The number of state event indicators, only
+                          needed (and required) for state_events.
+            
+            user_data
+                        - Pointer passed as the last argument to the
+                          function. Default is the user data of a
+                          scipy.LowLevelCallable, otherwise NULL.
+            
+            pattern
+                        - The fixed sparsity pattern (any SciPy sparse
+                          format) of a Jacobian that only evaluates the
+                          values of the pattern.
+        """
+        if isinstance(function, LowLevelCallback):
+            raise AssimuloException("The function is already a LowLevelCallback.")
+        if user_data is None and isinstance(function, LowLevelCallable):
+            user_data = function.user_data
+        
+        self.function = <void*><size_t>_address(function)
+        self.user_data = <void*><size_t>_address(user_data)
+        if self.function == NULL:
+            raise AssimuloException("The low-level callable is a NULL pointer.")
+        
+        self.size = -1 if size is None else size
+        self.pattern = None
+        if pattern is not None:
+            self.pattern = sps.csc_matrix(pattern, dtype=float)
+            self.pattern.sum_duplicates() #Also sorts the indices
+            self.size = self.pattern.nnz
+        self.kind = None
+        self._refs = (function, user_data) #Keep the function and data alive
+    
+    def __reduce__(self):
+        raise AssimuloException("A LowLevelCallback cannot be pickled, the function pointer is not valid in another process.")
+    
+    def bind(self, kind, implicit, int dim):
+        """
+        Returns a copy of the callback bound to the kind of function (rhs,
+        res, jac or state_events) and the problem dimension, which
+        determine the signature used when called. The callback itself is
+        left unchanged, so it can be shared between problems.
+        """
+        cdef LowLevelCallback bound
+        if kind not in ("rhs", "res", "jac", "state_events"):
+            raise AssimuloException("Unknown kind of low-level callback: %s."%kind)
+        if self.pattern is not None and (kind != "jac" or implicit):
+            raise AssimuloException("A sparsity pattern is only supported for the low-level Jacobian of explicit problems.")
+        if kind == "state_events" and self.size < 0:
+            raise AssimuloException("The number of state event indicators needs to be given for a low-level "
+                                    "state_events function, e.g. LowLevelCallback(state_events, size = 2).")
+        bound = LowLevelCallback.__new__(LowLevelCallback)
+        bound.function = self.function
+        bound.user_data = self.user_data
+        bound.size = dim if kind in ("rhs", "res") and self.size < 0 else self.size
+        bound.pattern = self.pattern
+        bound.kind = kind
+        bound.implicit = implicit
+        bound.dim = dim
+        bound._refs = self._refs
+        return bound
+    
+    def __call__(self, *args, np.ndarray out = None):
+        """
+        Calls the function with the arguments of the corresponding Python
+        problem function, additional arguments (switches) are ignored.
+        A Jacobian with a sparsity pattern is returned as a CSC matrix,
+        or its values are written into out if given.
+        """
+        cdef int ret
+        cdef double t, c = 0.0
+        cdef np.ndarray[double, ndim=1, mode="c"] y, yd
+        cdef np.ndarray data
+        
+        if self.kind is None:
+            raise AssimuloException("The low-level callback needs to be bound before it is called.")
+        
+        if self.kind == "jac":
+            if self.implicit:
+                c, t, y, yd = args[0], args[1], np.ascontiguousarray(args[2], dtype=np.double), np.ascontiguousarray(args[3], dtype=np.double)
+            else:
+                t, y = args[0], np.ascontiguousarray(args[1], dtype=np.double)
+            if self.pattern is not None:
+                if out is not None and not (out.dtype == np.double and out.flags.c_contiguous and out.size == self.size):
+                    raise AssimuloException("The output array of the low-level jac needs to be a contiguous array of the %d values of the pattern."%self.size)
+                data = np.empty(self.size) if out is None else out
+                ret = (<c_jac_t>self.function)(t, &y[0], <double*>np.PyArray_DATA(data), self.user_data)
+                if ret > 0:
+                    raise AssimuloRecoverableError("The low-level jac function returned the recoverable error %d."%ret)
+                if ret < 0:
+                    raise AssimuloException("The low-level jac function failed with return value %d."%ret)
+                if out is not None:
+                    return out
+                return sps.csc_matrix((data, self.pattern.indices, self.pattern.indptr), shape = self.pattern.shape)
+            out = np.empty((self.dim, self.dim), order="F")
+        else:
+            t, y = args[0], np.ascontiguousarray(args[1], dtype=np.double)
+            if self.implicit:
+                yd = np.ascontiguousarray(args[2], dtype=np.double)
+            out = np.empty(self.size)
+        
+        if self.kind == "rhs":
+            ret = (<c_rhs_t>self.function)(t, &y[0], <double*>np.PyArray_DATA(out), self.user_data)
+        elif self.kind == "res":
+            ret = (<c_res_t>self.function)(t, &y[0], &yd[0], <double*>np.PyArray_DATA(out), self.user_data)
+        elif self.kind == "jac" and self.implicit:
+            ret = (<c_jac_res_t>self.function)(c, t, &y[0], &yd[0], <double*>np.PyArray_DATA(out), self.user_data)
+        elif self.kind == "jac":
+            ret = (<c_jac_t>self.function)(t, &y[0], <double*>np.PyArray_DATA(out), self.user_data)
+        elif self.implicit:
+            ret = (<c_events_res_t>self.function)(t, &y[0], &yd[0], <double*>np.PyArray_DATA(out), self.user_data)
+        else:
+            ret = (<c_events_t>self.function)(t, &y[0], <double*>np.PyArray_DATA(out), self.user_data)
+        
+        if ret > 0:
+            raise AssimuloRecoverableError("The low-level %s function returned the recoverable error %d."%(self.kind, ret))
+        if ret < 0:
+            raise AssimuloException("The low-level %s function failed with return value %d."%(self.kind, ret))
+        return out
+
+def bind_low_level_callbacks(problem, implicit, int dim, int neq, switches, int dimSens):
+    """
+    Wraps the low-level callables among the problem functions in bound
+    LowLevelCallback objects. Returns a dictionary of these by the name
+    of the problem function, the problem itself is left unchanged.
+    """
+    callbacks = {}
+    for kind in ("res" if implicit else "rhs", "jac", "state_events"):
+        function = getattr(problem, kind, None)
+        if function is None or not is_low_level_callable(function):
+            continue
+        if switches or dimSens > 0:
+            raise AssimuloException("Low-level callbacks are not supported for problems with switches or sensitivity parameters.")
+        if not isinstance(function, LowLevelCallback):
+            function = LowLevelCallback(function)
+        callbacks[kind] = function.bind(kind, implicit, neq if kind == "res" else dim)
+    return callbacks
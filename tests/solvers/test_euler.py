@@ -171,7 +171,7 @@ class Test_Explicit_Euler:
         err_msg = f'The time limit was exceeded at integration time {float_regex}.'
         with pytest.raises(TimeLimitExceeded, match = err_msg):
             sim.simulate(1.)
-    
+
 class Test_Implicit_Euler:
     
     @classmethod
@@ -16,6 +16,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import pytest
+import numpy as np
 from assimulo.solvers.kinsol import KINSOL
 from assimulo.problem import Algebraic_Problem
 
@@ -50,3 +51,21 @@ class Test_KINSOL:
         
         solver.max_beta_fails = 15
         assert solver.max_beta_fails == 15
+
+    @pytest.mark.parametrize("linear_solver", ["SPGMR", "SPFGMR", "SPBCGS", "SPTFQMR"])
+    def test_krylov_solvers(self, linear_solver):
+        """
+        This tests the Krylov linear solvers on a non-symmetric system.
+        """
+        n = 20
+        A = 4.0*np.eye(n) - np.eye(n, k=-1) - 2.0*np.eye(n, k=1)
+        b = np.linspace(1.0, 2.0, n)
+        res = lambda y: A.dot(y) + 0.1*y**3 - b
+        solver = KINSOL(Algebraic_Problem(res, np.zeros(n)))
+        solver.linear_solver = linear_solver
+        solver.max_restarts = 2
+        solver.gram_schmidt = "classical"
+        assert solver.gram_schmidt == "CLASSICAL"
+        y = solver.solve()
+        assert res(y) == pytest.approx(np.zeros(n), abs = 1e-6)
+        assert solver.statistics["nliters"] > 0
@@ -205,6 +205,19 @@ class Test_LSODAR:
         assert self.sim_sp.statistics["nfcnjacs"] == 0
         assert self.sim_sp.y_sol[-1][0] == pytest.approx(1.7061680350, abs = 1e-4)
         
+    def test_usejac_jac_pattern(self):
+        """
+        This tests a Jacobian generated from jac_pattern, the problem has no jac.
+        """
+        prob = Explicit_Problem(self.mod.rhs, [2.0, -0.6])
+        prob.jac_pattern = np.ones((2, 2))
+        sim = LSODAR(prob)
+        sim.usejac = True
+        sim.simulate(2.)
+        
+        assert sim.statistics["njacs"] > 0
+        assert sim.y_sol[-1][0] == pytest.approx(1.7061680350, abs = 1e-4)
+        
     def test_simulation_ncp_list(self):
         self.sim.simulate(1.,ncp_list=[0.5]) #Simulate 2 seconds
 
@@ -251,3 +264,32 @@ class Test_LSODAR:
         err_msg = f'The time limit was exceeded at integration time {float_regex}.'
         with pytest.raises(TimeLimitExceeded, match = err_msg):
             sim.simulate(1.)
+
+    def test_rhs_out(self):
+        """
+        This tests that rhs and state_events with the keyword out are evaluated in-place.
+        """
+        nout = [0, 0]
+        def rhs(t, y, sw, out=None):
+            if out is None:
+                return -y
+            nout[0] += 1
+            out[0] = -y[0]
+        def state_events(t, y, sw, out=None):
+            if out is None:
+                return np.array([y[0] - 0.5])
+            nout[1] += 1
+            out[0] = y[0] - 0.5
+        def handle_event(solver, event_info):
+            solver.sw[0] = True
+        
+        prob = Explicit_Problem(rhs, [1.0], sw0 = [False])
+        prob.state_events = state_events
+        prob.handle_event = handle_event
+        sim = LSODAR(prob)
+        sim.verbosity = 0
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        assert nout[1] > 0
+        assert sim.sw[0]
+        assert sim.y_sol[-1][0] == pytest.approx(np.exp(-1.0), rel = 1e-4)
@@ -15,10 +15,12 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import ctypes
+import pickle
 import pytest
 from assimulo.solvers.radau5 import Radau5DAE, _Radau5DAE
 from assimulo.solvers.radau5 import Radau5ODE, _Radau5ODE
-from assimulo.solvers.radau5 import Radau5Error
+from assimulo.solvers.radau5 import Radau5Error, Radau5LinearSolver
 from assimulo.problem import Explicit_Problem
 from assimulo.problem import Implicit_Problem
 from assimulo.lib.radau_core import Radau_Exception
@@ -38,6 +40,23 @@ import re
 float_regex = r"[\s]*[\d]*.[\d]*((e|E)(\+|\-)\d\d|)"
 
 
+def banded_problem(n = 20):
+    """
+    The linear problem y' = A*y + sin(t) with a banded A (upper half-bandwidth 1,
+    lower half-bandwidth 2). Returns A, the rhs, y0 and a reference simulation
+    to t = 1 with the DENSE linear solver.
+    """
+    A = np.diag(-4.0*np.ones(n)) + np.diag(np.ones(n-1), 1) + np.diag(np.ones(n-1), -1) + np.diag(0.5*np.ones(n-2), -2)
+    A *= 100.0
+    rhs = lambda t, y: A.dot(y) + np.sin(t)
+    y0 = np.linspace(0.0, 1.0, n)
+
+    sim_ref = Radau5ODE(Explicit_Problem(rhs, y0))
+    sim_ref.verbosity = 0
+    sim_ref.simulate(1.0)
+    return A, rhs, y0, sim_ref
+
+
 class Test_Explicit_Radau5_Py:
     """
     Tests the explicit Radau solver (Python implementation).
@@ -284,7 +303,7 @@ class Test_Explicit_Radau5_Py:
         err_msg = "atol must be of length one or same as the dimension of the problem."
         with pytest.raises(Radau_Exception, match = err_msg):
             self.sim.atol = [1e-6,1e-6,1e-6]
-        
+
 class Test_Explicit_Radau5:
     """
     Tests the explicit Radau solver.
@@ -366,6 +385,266 @@ class Test_Explicit_Radau5:
         assert y[-1][2] == pytest.approx(2.0)
         assert exp_sim.get_statistics()['nstateevents'] == 1, "Incorrect number of state events"
     
+    def test_pickle(self):
+        """
+        This tests that a solver can be pickled halfway through a
+        simulation and continued from the restored copy.
+        """
+        exp_sim = Radau5ODE(Extended_Problem())
+        exp_sim.verbosity = 0
+        exp_sim.report_continuously = True
+        exp_sim.rtol = 1e-8
+        exp_sim.simulate(5.0)
+        
+        exp_sim_copy = pickle.loads(pickle.dumps(exp_sim))
+        assert exp_sim_copy.rtol == 1e-8
+        assert exp_sim_copy.t == exp_sim.t
+        assert exp_sim_copy.sw == exp_sim.sw
+        assert exp_sim_copy.statistics["nsteps"] == exp_sim.statistics["nsteps"]
+        
+        t, y = exp_sim_copy.simulate(10.0)
+        assert t[-1] == pytest.approx(10.0)
+        assert y[-1][0] == pytest.approx(8.0)
+        assert y[-1][1] == pytest.approx(3.0)
+        assert y[-1][2] == pytest.approx(2.0)
+    
+    def test_warm_start(self):
+        """
+        This tests that the Jacobian is kept between simulations with warm_start.
+        """
+        A = np.array([[-1000., 1.], [0., -0.5]])
+        prob = Explicit_Problem(lambda t, y: A.dot(y), [1.0, 1.0])
+        
+        sim = Radau5ODE(prob)
+        sim.verbosity = 0
+        assert not sim.warm_start
+        sim.simulate(0.5)
+        assert sim.statistics["njacs"] == 1
+        sim.simulate(1.0)
+        assert sim.statistics["njacs"] == 1
+        
+        sim_ws = Radau5ODE(prob)
+        sim_ws.verbosity = 0
+        sim_ws.warm_start = True
+        sim_ws.simulate(0.5)
+        assert sim_ws.statistics["njacs"] == 1
+        sim_ws.simulate(1.0)
+        assert sim_ws.statistics["njacs"] == 0
+        assert sim_ws.y_sol[-1] == pytest.approx(sim.y_sol[-1])
+        
+        sim_ws.inith = 1.e-4 #The Jacobian is also kept over re_init and a new initial step
+        sim_ws.re_init(0.0, [2.0, 1.0])
+        sim_ws.simulate(1.0)
+        assert sim_ws.statistics["njacs"] == 0
+        
+        sim_ws.warm_start = False
+        sim_ws.re_init(0.0, [2.0, 1.0])
+        sim_ws.simulate(1.0)
+        assert sim_ws.statistics["njacs"] == 1
+    
+    def test_step_schedule_end(self):
+        """
+        This tests that the error control is used again after the last point of a step schedule.
+        """
+        prob = Explicit_Problem(lambda t, y: np.array([y[1], 10.0*(1.0 - y[0]**2)*y[1] - y[0]]), [2.0, 0.0])
+        sim_ref = Radau5ODE(prob)
+        sim_ref.verbosity = 0
+        sim_ref.simulate(20.0)
+
+        sim = Radau5ODE(prob)
+        sim.verbosity = 0
+        sim.step_schedule = [0.5, 1.0]
+        sim.simulate(20.0)
+        assert sim.statistics["nerrfails"] > 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-4)
+
+    def test_lapack(self):
+        """
+        This tests the dense LU decompositions with LAPACK against the built-in ones.
+        """
+        from assimulo.lib import radau5ode
+        A = np.array([[-2., 1., 0.], [1., -2., 1.], [0., 1., -2000.]])
+        prob = Explicit_Problem(lambda t, y: A.dot(y) + np.sin(t), [1.0, 0.5, 0.0])
+
+        sim = Radau5ODE(prob)
+        sim.verbosity = 0
+        assert sim.lapack
+        sim.simulate(1.0)
+
+        sim_ref = Radau5ODE(prob)
+        sim_ref.verbosity = 0
+        sim_ref.lapack = False
+        sim_ref.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+        if radau5ode.lapack_available:
+            assert sim.statistics["nsteps"] == sim_ref.statistics["nsteps"]
+
+    def test_low_level_callbacks(self):
+        """
+        This tests that low-level (C) rhs and Jacobian functions are called directly.
+        """
+        c_fcn = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, ctypes.POINTER(ctypes.c_double),
+                                 ctypes.POINTER(ctypes.c_double), ctypes.c_void_p)
+        def rhs(t, y, yd, user_data):
+            yd[0] = y[1]
+            yd[1] = -1000.0*y[0] - 1001.0*y[1]
+            return 0
+        def jac(t, y, J, user_data): #Column-major
+            J[0], J[1], J[2], J[3] = 0.0, -1000.0, 1.0, -1001.0
+            return 0
+        def fail(t, y, yd, user_data):
+            return -1
+        rhs_c, jac_c, fail_c = c_fcn(rhs), c_fcn(jac), c_fcn(fail)
+        
+        prob_py = Explicit_Problem(lambda t, y: np.array([y[1], -1000.0*y[0] - 1001.0*y[1]]), [1.0, 0.0])
+        sim_py = Radau5ODE(prob_py)
+        sim_py.simulate(1.0)
+        
+        prob = Explicit_Problem(rhs_c, [1.0, 0.0])
+        prob.jac = jac_c
+        sim = Radau5ODE(prob)
+        sim.usejac = True
+        sim.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_py.y_sol[-1], rel = 1e-6)
+        assert sim.statistics["nfcnjacs"] == 0
+        
+        sim = Radau5ODE(Explicit_Problem(fail_c, [1.0, 0.0]))
+        with pytest.raises(Radau5Error):
+            sim.simulate(1.0)
+
+    def test_jac_out(self):
+        """
+        This tests that a Jacobian with the keyword out is evaluated in-place.
+        """
+        nout = [0]
+        def jac(t, y, out=None):
+            J = np.array([[0.0, 1.0], [-1000.0, -1001.0]])
+            if out is None:
+                return J
+            assert out.flags["F_CONTIGUOUS"]
+            nout[0] += 1
+            out[:,:] = J
+        
+        prob_ref = Explicit_Problem(lambda t, y: np.array([y[1], -1000.0*y[0] - 1001.0*y[1]]), [1.0, 0.0])
+        prob_ref.jac = lambda t, y: jac(t, y)
+        sim_ref = Radau5ODE(prob_ref)
+        sim_ref.usejac = True
+        sim_ref.simulate(1.0)
+        
+        prob = Explicit_Problem(lambda t, y: np.array([y[1], -1000.0*y[0] - 1001.0*y[1]]), [1.0, 0.0])
+        prob.jac = jac
+        sim = Radau5ODE(prob)
+        sim.usejac = True
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+
+    def test_callback_buffers_reused(self):
+        """
+        This tests that the callbacks pass the same work arrays and views in every call.
+        """
+        y_ids, out_ids, J_ids = set(), set(), set()
+        def rhs(t, y, out=None):
+            y_ids.add(id(y))
+            out_ids.add(id(out))
+            out[0] = y[1]
+            out[1] = -1000.0*y[0] - 1001.0*y[1]
+        def jac(t, y, out=None):
+            J_ids.add(id(out))
+            out[:,:] = [[0.0, 1.0], [-1000.0, -1001.0]]
+
+        prob = Explicit_Problem(rhs, [1.0, 0.0])
+        prob.jac = jac
+        sim = Radau5ODE(prob)
+        sim.usejac = True
+        sim.simulate(2.0)
+        assert len(y_ids) == 1
+        assert 0 < len(out_ids) <= 8
+        assert len(J_ids) == 1
+        assert sim.y_sol[-1] == pytest.approx(np.array([1.0, -1.0])*1000.0/999.0*np.exp(-2.0), rel = 1e-4)
+
+    def test_colored_jac(self):
+        """
+        This tests the finite difference Jacobian compressed by column coloring of jac_pattern.
+        """
+        n = 30
+        A = sps.diags([np.ones(n-1), -2.0*np.ones(n), np.ones(n-1)], [-1, 0, 1], format="csc")*100.0
+        def rhs(t, y):
+            return A.dot(y) - y**3
+        
+        sim_ref = Radau5ODE(Explicit_Problem(rhs, np.linspace(0.0, 1.0, n)))
+        sim_ref.simulate(0.1)
+        
+        prob = Explicit_Problem(rhs, np.linspace(0.0, 1.0, n))
+        prob.jac_pattern = A
+        sim = Radau5ODE(prob)
+        assert sim.usejac
+        sim.simulate(0.1)
+        assert sim._problem_jac.ncolors == 3
+        assert sim._problem_jac.nfcns == 4*sim.statistics["njacs"]
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-4, abs = 1e-8)
+
+    def test_complex_step_jac(self):
+        """
+        This tests the complex-step Jacobian, with and without jac_pattern.
+        """
+        n = 30
+        A = sps.diags([np.ones(n-1), -2.0*np.ones(n), np.ones(n-1)], [-1, 0, 1], format="csc")*100.0
+        def rhs(t, y):
+            return A.dot(y) - y**3
+        def jac(t, y):
+            return (A - sps.diags(3.0*y**2)).toarray()
+        
+        prob_ref = Explicit_Problem(rhs, np.linspace(0.0, 1.0, n))
+        prob_ref.jac = jac
+        sim_ref = Radau5ODE(prob_ref)
+        assert sim_ref.usejac
+        sim_ref.simulate(0.1)
+        
+        for pattern in (None, A):
+            prob = Explicit_Problem(rhs, np.linspace(0.0, 1.0, n))
+            prob.complex_step = True
+            if pattern is not None:
+                prob.jac_pattern = pattern
+            sim = Radau5ODE(prob)
+            assert sim.usejac
+            sim.simulate(0.1)
+            assert sim._problem_jac.nfcns == sim._problem_jac.ncolors*sim.statistics["njacs"]
+            assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-8, abs = 1e-12)
+
+    def test_rhs_and_jac(self):
+        """
+        This tests that the Jacobian of a fused rhs_and_jac is reused.
+        """
+        ncalls = [0, 0]
+        def rhs(t, y):
+            return np.array([y[1], -1000.0*y[0] - 1001.0*y[1]])
+        def jac(t, y):
+            return np.array([[0.0, 1.0], [-1000.0, -1001.0]])
+        def jac_miss(t, y):
+            ncalls[0] += 1
+            return jac(t, y)
+        def rhs_and_jac(t, y):
+            def lazy_jac():
+                ncalls[1] += 1
+                return jac(t, y)
+            return rhs(t, y), lazy_jac
+        
+        prob_ref = Explicit_Problem(rhs, [1.0, 0.0])
+        prob_ref.jac = jac
+        sim_ref = Radau5ODE(prob_ref)
+        sim_ref.simulate(1.0)
+        
+        prob = Explicit_Problem(rhs, [1.0, 0.0])
+        prob.rhs_and_jac = rhs_and_jac
+        prob.jac = jac_miss #Only called if the Jacobian is not cached
+        sim = Radau5ODE(prob)
+        assert sim.usejac
+        sim.simulate(1.0)
+        assert ncalls[0] == 0
+        assert ncalls[1] == sim.statistics["njacs"]
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+
     def test_nbr_fcn_evals_due_to_jac(self):
         sim = Radau5ODE(self.mod)
         
@@ -847,6 +1126,36 @@ class Test_Explicit_Radau5:
 
             assert sim.simulate(1.), f"Jacobian #{i} failed: {jac(0, 0)}"
 
+    def test_sparse_jac_pattern(self):
+        """
+        This tests that only the values of a Jacobian with a fixed sparsity pattern are evaluated.
+        """
+        pattern = sps.csc_matrix(np.array([[0., 1.], [1., 1.]]))
+        nout = [0]
+        def jac(t, y, out=None):
+            if out is None:
+                return sps.csc_matrix(np.array([[0.0, 1.0], [-1000.0, -1001.0]]))
+            nout[0] += 1
+            out[:] = [-1000.0, 1.0, -1001.0] #CSC order of the pattern
+        
+        prob = Explicit_Problem(lambda t, y: np.array([y[1], -1000.0*y[0] - 1001.0*y[1]]), [1.0, 0.0])
+        prob.jac = jac
+        prob.jac_pattern = pattern
+        sim = Radau5ODE(prob)
+        sim.linear_solver = 'SPARSE'
+        sim.usejac = True
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        
+        prob_ref = Explicit_Problem(lambda t, y: np.array([y[1], -1000.0*y[0] - 1001.0*y[1]]), [1.0, 0.0])
+        prob_ref.jac = lambda t, y: jac(t, y)
+        prob_ref.jac_nnz = 3
+        sim_ref = Radau5ODE(prob_ref)
+        sim_ref.linear_solver = 'SPARSE'
+        sim_ref.usejac = True
+        sim_ref.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+
     def test_linear_solver(self):
         """
         This tests the functionality of the property linear_solver.
@@ -860,16 +1169,274 @@ class Test_Explicit_Radau5:
         self.sim.linear_solver = 'SPARSE'
         assert self.sim.linear_solver == 'SPARSE'
 
-        err_msg = "'linear_solver' parameter needs to be either 'DENSE' or 'SPARSE'. Set value: {}"
+        self.sim.linear_solver = 'band'
+        assert self.sim.linear_solver == 'BAND'
+        self.sim.linear_solver = 'krylov'
+        assert self.sim.linear_solver == 'KRYLOV'
+
+        err_msg = "'linear_solver' parameter needs to be either 'DENSE', 'SPARSE', 'BAND' or 'KRYLOV'. Set value: {}"
         with pytest.raises(Radau_Exception, match = err_msg.format('default')):
             self.sim.linear_solver = 'default'
         with pytest.raises(Radau_Exception, match = err_msg.format('GMRES')):
             self.sim.linear_solver = 'GMRES'
 
-        err_msg = "'linear_solver' parameter needs to be the STRING 'DENSE' or 'SPARSE'. Set value: {}, type: {}"
+        err_msg = "'linear_solver' parameter needs to be the STRING 'DENSE', 'SPARSE', 'BAND' or 'KRYLOV'. Set value: {}, type: {}"
         with pytest.raises(Radau_Exception, match = err_msg.format('0', "<class 'int'>")):
             self.sim.linear_solver = 0
 
+    def test_band(self):
+        """
+        This tests the BAND linear solver against the DENSE one.
+        """
+        A, rhs, y0, sim_ref = banded_problem()
+        n = len(y0)
+
+        sim = Radau5ODE(Explicit_Problem(rhs, y0))
+        sim.verbosity = 0
+        sim.linear_solver = "BAND"
+        with pytest.raises(Radau_Exception, match = "half-bandwidths"):
+            sim.simulate(1.0)
+        sim.mupper, sim.mlower = 1, 2
+        sim.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-8)
+        assert sim.statistics["nsteps"] == sim_ref.statistics["nsteps"]
+        assert sim.statistics["nfcnjacs"] == 4*sim.statistics["njacs"]
+
+        #Bandwidths from the pattern, the (dense) Jacobian is copied into the band
+        prob = Explicit_Problem(rhs, y0)
+        prob.jac = lambda t, y: A
+        sim_ref = Radau5ODE(prob)
+        sim_ref.verbosity = 0
+        sim_ref.simulate(1.0)
+        prob.jac_pattern = A != 0
+        sim = Radau5ODE(prob)
+        sim.verbosity = 0
+        sim.linear_solver = "BAND"
+        sim.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-8)
+
+        #In-place Jacobian, evaluated into the band storage
+        def jac(t, y, out = None):
+            out[:] = 0.0
+            for k in range(-1, 3):
+                d = np.diagonal(A, -k)
+                out[1+k, max(0, -k):n-max(0, k)] = d
+            return out
+        prob = Explicit_Problem(rhs, y0)
+        prob.jac = jac
+        sim = Radau5ODE(prob)
+        sim.verbosity = 0
+        sim.linear_solver = "BAND"
+        sim.mupper, sim.mlower = 1, 2
+        sim.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-8)
+
+    def test_krylov(self):
+        """
+        This tests the matrix-free KRYLOV linear solver against the DENSE one.
+        """
+        A, rhs, y0, sim_ref = banded_problem()
+        n = len(y0)
+
+        sim = Radau5ODE(Explicit_Problem(rhs, y0))
+        sim.verbosity = 0
+        sim.linear_solver = "KRYLOV"
+        sim.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-5)
+        assert sim.statistics["nliters"] > 0
+        assert sim.statistics["njacvecs"] == sim.statistics["nfcnjacs"] > 0
+        assert sim.statistics["nlus"] == 0
+
+        #Exact preconditioner, solving (I - gamma*A) z = r
+        setups = []
+        def prec_setup(t, y, fy, jok, gamma, data):
+            setups.append(jok)
+            return True, gamma
+        def prec_solve(t, y, fy, r, gamma, delta, data):
+            assert data is not None
+            return np.linalg.solve(np.eye(n) - gamma*A, r)
+        prob = Explicit_Problem(rhs, y0)
+        prob.prec_setup = prec_setup
+        prob.prec_solve = prec_solve
+        sim_prec = Radau5ODE(prob)
+        sim_prec.verbosity = 0
+        sim_prec.linear_solver = "KRYLOV"
+        sim_prec.simulate(1.0)
+        assert sim_prec.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-5)
+        assert sim_prec.statistics["nprecs"] > 0
+        assert sim_prec.statistics["nprecsetups"] == len(setups) > 0
+        assert not setups[0]
+        assert sim_prec.statistics["nliters"] < sim.statistics["nliters"]
+
+        with pytest.raises(Radau_Exception):
+            sim.maxl = 0
+        with pytest.raises(Radau_Exception):
+            sim.krylov_tol = 1.5
+        sim.maxl = 5
+        sim.krylov_tol = 0.1
+        assert sim.maxl == 5
+        assert sim.krylov_tol == 0.1
+
+    def test_user_linear_solver(self):
+        """
+        This tests a user-provided linear solver, based on scipy.sparse.linalg.splu, against the DENSE one.
+        """
+        import scipy.sparse.linalg as spsl
+        A, rhs, y0, sim_ref = banded_problem()
+        A = sps.csc_matrix(A)
+        n = len(y0)
+
+        class SPLU(Radau5LinearSolver):
+            def __init__(self):
+                self.njacs = 0
+            def jac(self, t, y, fy):
+                self.njacs += 1
+                self.J = A
+            def factor_real(self, fac1):
+                self.lu_real = spsl.splu(fac1*sps.identity(n, format = "csc") - self.J)
+            def factor_complex(self, alpha, beta):
+                self.lu_complex = spsl.splu((alpha + 1j*beta)*sps.identity(n, format = "csc") - self.J)
+            def solve_real(self, b):
+                return self.lu_real.solve(b)
+            def solve_complex(self, b):
+                return self.lu_complex.solve(b)
+
+        linsol = SPLU()
+        sim = Radau5ODE(Explicit_Problem(rhs, y0))
+        sim.verbosity = 0
+        sim.linear_solver = linsol
+        assert sim.linear_solver is linsol
+        sim.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-4)
+        assert sim.statistics["njacs"] == linsol.njacs > 0
+        assert sim.statistics["nlus"] > 0
+        assert sim.statistics["nfcnjacs"] == 0
+
+        #Singular matrices are recoverable errors
+        class Singular(SPLU):
+            def factor_real(self, fac1):
+                raise np.linalg.LinAlgError("singular")
+        sim = Radau5ODE(Explicit_Problem(rhs, y0))
+        sim.verbosity = 0
+        sim.linear_solver = Singular()
+        with pytest.raises(Radau5Error, match = "Repeated unexpected step rejections"):
+            sim.simulate(1.0)
+
+        #The built-in linear solver is restored without a user-provided one
+        sim = Radau5ODE(Explicit_Problem(rhs, y0))
+        sim.verbosity = 0
+        sim.warm_start = True
+        sim.linear_solver = linsol
+        sim.simulate(0.5)
+        njacs = linsol.njacs
+        sim.linear_solver = "DENSE"
+        sim.simulate(1.0)
+        assert linsol.njacs == njacs
+        assert sim.statistics["nfcnjacs"] > 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-4)
+
+        #All methods have to be implemented
+        class Incomplete(Radau5LinearSolver):
+            def jac(self, t, y, fy):
+                pass
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_user_linear_solver_c(self):
+        """
+        This tests that a linear solver set from Cython with RadauMemory.set_linsol is kept over simulations.
+        """
+        import os
+        import shutil
+        import tempfile
+        import importlib.util
+        src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "thirdparty", "radau5")
+        if not os.path.isfile(os.path.join(src_dir, "radau5ode.pxd")):
+            pytest.skip("The Radau5 sources are not available.")
+        Cython_Build = pytest.importorskip("Cython.Build")
+        from setuptools import Extension
+        from setuptools.dist import Distribution
+
+        source = "\n".join([
+            "import numpy as np",
+            "from assimulo.lib.radau5ode cimport RadauMemory",
+            "cdef int ls_jac(int n, double x, double* y, double* fy, void* EXT) except? -1:",
+            "    (<object>EXT).jac(x, np.array(<double[:n]>y), np.array(<double[:n]>fy))",
+            "    return 0",
+            "cdef int ls_decomr(int n, double fac1, int* ier, void* EXT) except? -1:",
+            "    (<object>EXT).factor_real(fac1)",
+            "    ier[0] = 0",
+            "    return 0",
+            "cdef int ls_decomc(int n, double alphn, double betan, int* ier, void* EXT) except? -1:",
+            "    (<object>EXT).factor_complex(alphn, betan)",
+            "    ier[0] = 0",
+            "    return 0",
+            "cdef int ls_solr(int n, double* b, void* EXT) except? -1:",
+            "    cdef double[:] bv = <double[:n]>b",
+            "    np.asarray(bv)[:] = (<object>EXT).solve_real(np.array(bv))",
+            "    return 0",
+            "cdef int ls_solc(int n, double* br, double* bi, void* EXT) except? -1:",
+            "    cdef double[:] brv = <double[:n]>br",
+            "    cdef double[:] biv = <double[:n]>bi",
+            "    x = (<object>EXT).solve_complex(np.array(brv) + 1j*np.array(biv))",
+            "    np.asarray(brv)[:] = x.real",
+            "    np.asarray(biv)[:] = x.imag",
+            "    return 0",
+            "def set_linsol(RadauMemory rad_memory, linsol):",
+            "    return rad_memory.set_linsol(ls_jac, ls_decomr, ls_decomc, ls_solr, ls_solc, <void*>linsol)",
+            ""])
+        build_dir = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(build_dir, "assimulo", "lib"))
+            for init in [os.path.join(build_dir, "assimulo", "__init__.py"), os.path.join(build_dir, "assimulo", "lib", "__init__.py")]:
+                open(init, "w").close()
+            shutil.copy(os.path.join(src_dir, "radau5ode.pxd"), os.path.join(build_dir, "assimulo", "lib"))
+            with open(os.path.join(build_dir, "radau5_linsol_hook.pyx"), "w") as f:
+                f.write(source)
+            ext = Extension("radau5_linsol_hook", [os.path.join(build_dir, "radau5_linsol_hook.pyx")],
+                            include_dirs = [src_dir, np.get_include()])
+            dist = Distribution({"ext_modules": Cython_Build.cythonize([ext], include_path = [build_dir], quiet = True,
+                                                                        compiler_directives = {"language_level": "3"})})
+            build_ext = dist.get_command_obj("build_ext")
+            build_ext.build_lib = build_ext.build_temp = build_dir
+            build_ext.ensure_finalized()
+            try:
+                build_ext.run()
+            except Exception as e:
+                pytest.skip("Could not compile the Cython linear solver: %s"%e)
+            spec = importlib.util.spec_from_file_location("radau5_linsol_hook", build_ext.get_ext_fullpath("radau5_linsol_hook"))
+            hook = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(hook)
+        finally:
+            shutil.rmtree(build_dir, ignore_errors = True)
+
+        A, rhs, y0, sim_ref = banded_problem()
+        n = len(y0)
+
+        class Dense(Radau5LinearSolver):
+            def __init__(self):
+                self.njacs = 0
+            def jac(self, t, y, fy):
+                self.njacs += 1
+            def factor_real(self, fac1):
+                self.E1 = fac1*np.eye(n) - A
+            def factor_complex(self, alpha, beta):
+                self.E2 = (alpha + 1j*beta)*np.eye(n) - A
+            def solve_real(self, b):
+                return np.linalg.solve(self.E1, b)
+            def solve_complex(self, b):
+                return np.linalg.solve(self.E2, b)
+
+        linsol = Dense()
+        sim = Radau5ODE(Explicit_Problem(rhs, y0))
+        sim.verbosity = 0
+        sim.warm_start = True
+        sim.simulate(0.5)
+        assert hook.set_linsol(sim.rad_memory, linsol) == 0
+        sim.simulate(1.0)
+        assert sim.statistics["njacs"] == linsol.njacs > 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-4)
+
     def test_base_exception_interrupt_fcn(self):
         """Test that BaseExceptions in right-hand side terminate the simulation. Radau5 + C + explicit problem."""
         prob = ExplicitProbBaseException(dim = 2, fcn = True)
@@ -107,3 +107,57 @@ class Test_RodasODE:
         err_msg = f'The time limit was exceeded at integration time {float_regex}.'
         with pytest.raises(TimeLimitExceeded, match = err_msg):
             sim.simulate(1.)
+
+    def test_rhs_and_jac(self):
+        """
+        This tests that the Jacobian of a fused rhs_and_jac is reused.
+        """
+        ncalls = [0, 0]
+        def rhs(t, y):
+            return np.array([y[1], -1000.0*y[0] - 1001.0*y[1]])
+        def jac(t, y):
+            return np.array([[0.0, 1.0], [-1000.0, -1001.0]])
+        def jac_miss(t, y):
+            ncalls[0] += 1
+            return jac(t, y)
+        def rhs_and_jac(t, y):
+            def lazy_jac():
+                ncalls[1] += 1
+                return jac(t, y)
+            return rhs(t, y), lazy_jac
+        
+        prob_ref = Explicit_Problem(rhs, [1.0, 0.0])
+        prob_ref.jac = jac
+        sim_ref = RodasODE(prob_ref)
+        sim_ref.simulate(1.0)
+        
+        prob = Explicit_Problem(rhs, [1.0, 0.0])
+        prob.rhs_and_jac = rhs_and_jac
+        prob.jac = jac_miss #Only called if the Jacobian is not cached
+        sim = RodasODE(prob)
+        assert sim.usejac
+        sim.simulate(1.0)
+        assert ncalls[0] == 0
+        assert ncalls[1] == sim.statistics["njacs"]
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+
+    def test_colored_jac(self):
+        """
+        This tests the finite difference Jacobian compressed by column coloring of jac_pattern.
+        """
+        n = 30
+        A = sps.diags([np.ones(n-1), -2.0*np.ones(n), np.ones(n-1)], [-1, 0, 1], format="csc")*100.0
+        def rhs(t, y):
+            return A.dot(y) - y**3
+        
+        sim_ref = RodasODE(Explicit_Problem(rhs, np.linspace(0.0, 1.0, n)))
+        sim_ref.simulate(0.1)
+        
+        prob = Explicit_Problem(rhs, np.linspace(0.0, 1.0, n))
+        prob.jac_pattern = A
+        sim = RodasODE(prob)
+        assert sim.usejac
+        sim.simulate(0.1)
+        assert sim._problem_jac.ncolors == 3
+        assert sim._problem_jac.nfcns == 4*sim.statistics["njacs"]
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-4, abs = 1e-8)
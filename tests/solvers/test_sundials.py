@@ -16,11 +16,14 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import re
+import ctypes
+import pickle
 import pytest
 from assimulo.solvers.sundials import CVode, IDA, CVodeError, IDAError, get_sundials_version
 from assimulo.problem import Explicit_Problem
 from assimulo.problem import Implicit_Problem
 from assimulo.exception import AssimuloException, TimeLimitExceeded, TerminateSimulation
+from assimulo.support import LowLevelCallback
 import numpy as np
 import scipy.sparse as sps
 from .utils import (
@@ -30,6 +33,56 @@ from .utils import (
     ImplicitProbBaseException
 )
 
+def simulate_klu(sim, tfinal):
+    """Simulates with the KLU linear solver, skips if SUNDIALS lacks KLU support."""
+    try:
+        return sim.simulate(tfinal)
+    except AssimuloException as e:
+        if "KLU" in str(e) and ("No support" in str(e) or "requires" in str(e)):
+            pytest.skip(str(e))
+        raise
+
+def reference_state(solver, problem, tfinal):
+    """Final state of a simulation with the default (DENSE) linear solver, the reference of the linear solver tests."""
+    sim = solver(problem)
+    sim.simulate(tfinal)
+    return sim.y_sol[-1]
+
+def banded_cubic_problem(n = 50):
+    """Banded matrix A, right-hand side A*y - y**3 and initial values of the CVode BAND and KLU tests."""
+    A = sps.diags([np.ones(n-2), np.ones(n-1), -4.0*np.ones(n), 2.0*np.ones(n-1)], [-2, -1, 0, 1], format="csc")*100.0
+    A.sort_indices()
+    def rhs(t, y):
+        return A.dot(y) - y**3
+    return A, rhs, np.linspace(0.0, 1.0, n)
+
+def advection_diffusion_problem(scale, format = "csr", n = 40):
+    """Non-symmetric (advection-diffusion) matrix A, right-hand side A*y and a Gaussian pulse as initial values."""
+    A = sps.diags([np.ones(n-1)*(1.0 + 10.0), -2.0*np.ones(n), np.ones(n-1)*(1.0 - 10.0)], [-1, 0, 1], format=format)*scale
+    def rhs(t, y):
+        return A.dot(y)
+    return A, rhs, np.exp(-100.0*(np.linspace(0.0, 1.0, n) - 0.3)**2)
+
+def unpreconditioned_nliters(rhs, y0):
+    """Number of linear iterations of CVode with SPGMR without a preconditioner."""
+    sim = CVode(Explicit_Problem(rhs, y0))
+    sim.linear_solver = "SPGMR"
+    sim.simulate(0.1)
+    return sim.statistics["nliters"]
+
+def stiff_dae_res(t, y, yd):
+    return yd - np.array([y[1], -1000.0*y[0] - 1001.0*y[1], y[1] - y[2]])
+
+def stiff_dae_jac(c, t, y, yd):
+    return np.array([[c, -1.0, 0.0], [1000.0, c + 1001.0, 0.0], [0.0, -1.0, c + 1.0]])
+
+def stiff_dae_problem(jac = None):
+    """The stiff linear DAE of the IDA linear solver tests, optionally with the Jacobian jac(c, t, y, yd)."""
+    prob = Implicit_Problem(stiff_dae_res, [1.0, 0.0, 0.0], [0.0, -1000.0, 0.0])
+    if jac is not None:
+        prob.jac = jac
+    return prob
+
 
 class Test_CVode:
     
@@ -83,6 +136,23 @@ class Test_CVode:
         assert y[-1][1] == pytest.approx(3.0)
         assert y[-1][2] == pytest.approx(2.0)
     
+    def test_pickle(self):
+        """Test that CVode can be pickled and continued from the restored copy."""
+        exp_sim = CVode(Extended_Problem())
+        exp_sim.verbosity = 0
+        exp_sim.report_continuously = True
+        exp_sim.maxord = 3
+        exp_sim.simulate(5.0)
+        
+        exp_sim_copy = pickle.loads(pickle.dumps(exp_sim))
+        assert exp_sim_copy.maxord == 3
+        assert exp_sim_copy.t == exp_sim.t
+        
+        t, y = exp_sim_copy.simulate(10.0)
+        assert y[-1][0] == pytest.approx(8.0)
+        assert y[-1][1] == pytest.approx(3.0)
+        assert y[-1][2] == pytest.approx(2.0)
+    
     def test_event_localizer_external(self):
         """Test that CVode with Assimulo event localization works correctly."""
         exp_mod = Extended_Problem() # Create the problem
@@ -390,7 +460,444 @@ class Test_CVode:
 
         assert exp_sim.y_sol[-1][0] == pytest.approx(-121.75000143, abs = 1e-4)
         assert exp_sim.statistics["nfcnjacs"] > 0
+
+    def test_warm_start(self):
+        """
+        This tests the functionality of the property warm_start.
+        """
+        A = np.array([[-1000., 1.], [0., -0.5]])
+        calls = [0]
+        def jac(t, y):
+            calls[0] += 1
+            return A
+
+        exp_mod = Explicit_Problem(lambda t, y: A.dot(y), [1.0, 1.0])
+        exp_mod.jac = jac
+
+        def run(warm_start):
+            exp_sim = CVode(exp_mod)
+            exp_sim.warm_start = warm_start
+            exp_sim.simulate(1.)
+            exp_sim.re_init(0.0, [1.0, 1.0])
+            calls[0] = 0
+            exp_sim.simulate(1.)
+            return calls[0], exp_sim.y_sol[-1]
+
+        assert CVode(exp_mod).warm_start == False
+        cold_calls, cold_y = run(False)
+        warm_calls, warm_y = run(True)
+
+        assert warm_calls < cold_calls
+        np.testing.assert_allclose(warm_y, cold_y, rtol = 1e-4)
+
+    def test_step_schedule(self):
+        """
+        This tests the functionality of the properties record_steps and step_schedule.
+        """
+        exp_mod = Explicit_Problem(lambda t, y: np.array([y[1], (1.0 - y[0]**2)*y[1] - y[0]]), [2.0, 0.0])
+
+        exp_sim = CVode(exp_mod)
+        exp_sim.record_steps = True
+        exp_sim.simulate(2.0)
+        assert len(exp_sim.step_times) == exp_sim.statistics["nsteps"]
+        assert len(exp_sim.step_orders) == len(exp_sim.step_times)
+        assert 1 <= min(exp_sim.step_orders) and max(exp_sim.step_orders) <= 5
+
+        schedule = exp_sim.step_times
+        exp_sim = CVode(exp_mod)
+        exp_sim.record_steps = True
+        exp_sim.step_schedule = schedule
+        exp_sim.simulate(2.0)
+        for t in schedule:
+            assert min(abs(np.array(exp_sim.step_times) - t)) < 1e-12
+
+    def test_low_level_callbacks(self):
+        """
+        This tests the use of low-level (C) functions for rhs, jac and state_events.
+        """
+        c_fcn = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, ctypes.POINTER(ctypes.c_double),
+                                 ctypes.POINTER(ctypes.c_double), ctypes.c_void_p)
+        def rhs(t, y, yd, user_data):
+            yd[0] = y[1]
+            yd[1] = -9.82
+            return 0
+        def jac(t, y, J, user_data): #Column-major
+            J[0], J[1], J[2], J[3] = 0.0, 0.0, 1.0, 0.0
+            return 0
+        def events(t, y, g, user_data):
+            g[0] = y[0]
+            return 0
+        rhs_c, jac_c, events_c = c_fcn(rhs), c_fcn(jac), c_fcn(events)
+        
+        exp_mod = Explicit_Problem(rhs_c, [2.0, 0.0])
+        exp_mod.jac = jac_c
+        exp_mod.state_events = LowLevelCallback(events_c, size = 1)
+        def handle_event(solver, event_info):
+            raise TerminateSimulation()
+        exp_mod.handle_event = handle_event
+        
+        exp_sim = CVode(exp_mod)
+        exp_sim.usejac = True
+        exp_sim.simulate(2.0)
+        assert exp_sim.t_sol[-1] == pytest.approx(np.sqrt(2*2.0/9.82), rel = 1e-4)
+        assert exp_sim.statistics["nfcnjacs"] == 0
+
+    def test_codegen(self, tmp_path):
+        """
+        This tests compiled problem functions generated from a symbolic model.
+        """
+        sympy = pytest.importorskip("sympy")
+        from assimulo.codegen import SymbolicModel
+        y1, y2, k1, k2 = sympy.symbols("y1 y2 k1 k2")
+        model = SymbolicModel([y1, y2], [-k1*y1, k1*y1 - k2*y2], parameters = [k1, k2], name = "decay")
+        compiled = model.compile(directory = str(tmp_path))
+
+        sim = CVode(compiled.problem([1.0, 0.0], p = [1.0, 2.0]))
+        sim.usejac = True
+        sim.simulate(1.0)
+        assert sim.y_sol[-1][0] == pytest.approx(np.exp(-1.0), rel = 1e-4)
+        assert sim.statistics["nfcnjacs"] == 0
+
+        sim = CVode(compiled.problem([1.0, 0.0], p = [1.0, 2.0], sensitivities = True))
+        sim.report_continuously = True
+        sim.simulate(1.0)
+        assert sim.p_sol[0][-1][0] == pytest.approx(-np.exp(-1.0), rel = 1e-3)
+
+    def test_colored_jac(self):
+        """
+        This tests the finite difference Jacobian compressed by column coloring of jac_pattern.
+        """
+        n = 30
+        A = sps.diags([np.ones(n-1), -2.0*np.ones(n), np.ones(n-1)], [-1, 0, 1], format="csc")*100.0
+        def rhs(t, y):
+            return A.dot(y) - y**3
+
+        sim_ref = CVode(Explicit_Problem(rhs, np.linspace(0.0, 1.0, n)))
+        sim_ref.simulate(0.1)
+
+        prob = Explicit_Problem(rhs, np.linspace(0.0, 1.0, n))
+        prob.jac_pattern = A
+        sim = CVode(prob)
+        assert sim.usejac
+        sim.simulate(0.1)
+        assert sim._problem_jac.nfcns == 4*sim.statistics["njacs"]
+        assert sim.statistics["nfcnjacs"] == 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-3, abs = 1e-6)
+
+    def test_rhs_out(self):
+        """
+        This tests that rhs and state_events with the keyword out are evaluated in-place.
+        """
+        nout = [0, 0]
+        def rhs(t, y, sw, out=None):
+            if out is None:
+                return -y
+            nout[0] += 1
+            out[0] = -y[0]
+        def state_events(t, y, sw, out=None):
+            if out is None:
+                return np.array([y[0] - 0.5])
+            nout[1] += 1
+            out[0] = y[0] - 0.5
+        def handle_event(solver, event_info):
+            solver.sw[0] = True
+        
+        prob = Explicit_Problem(rhs, [1.0], sw0 = [False])
+        prob.state_events = state_events
+        prob.handle_event = handle_event
+        sim = CVode(prob)
+        sim.verbosity = 0
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        assert nout[1] > 0
+        assert sim.sw[0]
+        assert sim.y_sol[-1][0] == pytest.approx(np.exp(-1.0), rel = 1e-4)
+
+    def test_rhs_and_jac(self):
+        """
+        This tests that the Jacobian of a fused rhs_and_jac is reused.
+        """
+        ncalls = [0, 0]
+        def rhs(t, y):
+            return np.array([y[1], -1000.0*y[0] - 1001.0*y[1]])
+        def jac(t, y):
+            return np.array([[0.0, 1.0], [-1000.0, -1001.0]])
+        def jac_miss(t, y):
+            ncalls[0] += 1
+            return jac(t, y)
+        def rhs_and_jac(t, y):
+            def lazy_jac():
+                ncalls[1] += 1
+                return jac(t, y)
+            return rhs(t, y), lazy_jac
+        
+        prob_ref = Explicit_Problem(rhs, [1.0, 0.0])
+        prob_ref.jac = jac
+        sim_ref = CVode(prob_ref)
+        sim_ref.simulate(1.0)
+        
+        prob = Explicit_Problem(rhs, [1.0, 0.0])
+        prob.rhs_and_jac = rhs_and_jac
+        prob.jac = jac_miss #Only called if the Jacobian is not cached
+        sim = CVode(prob)
+        assert sim.usejac
+        sim.simulate(1.0)
+        assert ncalls[0] == 0
+        assert ncalls[1] == sim.statistics["njacs"]
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+
+    def test_rhs_sens_out(self):
+        """
+        This tests that a sensitivity right-hand-side with the keyword out is evaluated in-place.
+        """
+        nout = [0]
+        def rhs(t, y, p):
+            return np.array([-p[0]*y[0], -p[1]*y[1]])
+        def rhs_sens(t, y, s, p, out=None):
+            sens = -np.array(p)[:,None]*s - np.diag(y)
+            if out is None:
+                return sens
+            assert out.flags["F_CONTIGUOUS"]
+            nout[0] += 1
+            out[:,:] = sens
+        
+        prob_ref = Explicit_Problem(rhs, [1.0, 2.0], p0 = [1.0, 2.0])
+        prob_ref.rhs_sens = lambda t, y, s, p: rhs_sens(t, y, s, p)
+        sim_ref = CVode(prob_ref)
+        sim_ref.report_continuously = True
+        sim_ref.simulate(1.0)
+        
+        prob = Explicit_Problem(rhs, [1.0, 2.0], p0 = [1.0, 2.0])
+        prob.rhs_sens = rhs_sens
+        sim = CVode(prob)
+        sim.report_continuously = True
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        assert sim.p_sol[0][-1] == pytest.approx(sim_ref.p_sol[0][-1], rel = 1e-10)
+        assert sim.p_sol[1][-1] == pytest.approx(sim_ref.p_sol[1][-1], rel = 1e-10)
+        assert sim.p_sol[0][-1][0] == pytest.approx(-np.exp(-1.0), rel = 1e-3)
+
+    def test_complex_step_sens(self):
+        """
+        This tests the complex-step Jacobian and sensitivity right-hand-side.
+        """
+        def rhs(t, y, p):
+            return np.array([-p[0]*y[0], -p[1]*y[1]])
+        def rhs_sens(t, y, s, p):
+            return -np.array(p)[:,None]*s - np.diag(y)
+        
+        prob_ref = Explicit_Problem(rhs, [1.0, 2.0], p0 = [1.0, 2.0])
+        prob_ref.rhs_sens = rhs_sens
+        sim_ref = CVode(prob_ref)
+        sim_ref.report_continuously = True
+        sim_ref.simulate(1.0)
+        
+        prob = Explicit_Problem(rhs, [1.0, 2.0], p0 = [1.0, 2.0])
+        prob.complex_step = True
+        sim = CVode(prob)
+        assert sim.usejac
+        sim.report_continuously = True
+        sim.simulate(1.0)
+        assert sim._problem_rhs_sens.nfcns > 0
+        assert sim.statistics["nfcnjacs"] == 0
+        assert sim.p_sol[0][-1] == pytest.approx(sim_ref.p_sol[0][-1], rel = 1e-6)
+        assert sim.p_sol[1][-1] == pytest.approx(sim_ref.p_sol[1][-1], rel = 1e-6)
+        assert sim.p_sol[0][-1][0] == pytest.approx(-np.exp(-1.0), rel = 1e-3)
+
+    def test_band(self):
+        """
+        This tests the BAND linear solver with difference quotients and with a (in-place) Jacobian.
+        """
+        A, rhs, y0 = banded_cubic_problem()
+        n = len(y0)
+        def jac(t, y):
+            return (A - sps.diags(3.0*y**2)).toarray()
+        nout = [0]
+        def jac_band(t, y, out=None):
+            if out is None:
+                return jac(t, y)
+            assert out.shape == (4, n)
+            nout[0] += 1
+            J = jac(t, y)
+            for i in range(n):
+                for j in range(max(0, i-2), min(n, i+2)):
+                    out[1+i-j, j] = J[i, j]
+        
+        y_ref = reference_state(CVode, Explicit_Problem(rhs, y0), 0.1)
+        
+        prob = Explicit_Problem(rhs, y0)
+        sim = CVode(prob)
+        sim.linear_solver = "BAND"
+        with pytest.raises(AssimuloException):
+            sim.simulate(0.1)
+        sim = CVode(prob)
+        sim.linear_solver = "BAND"
+        sim.mupper, sim.mlower = 1, 2
+        sim.simulate(0.1)
+        assert sim.statistics["nfcnjacs"] == 4*sim.statistics["njacs"]
+        assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-6)
+        
+        for f in (jac, jac_band):
+            prob = Explicit_Problem(rhs, y0)
+            prob.jac = f
+            if f is jac:
+                prob.jac_pattern = A #Gives the half-bandwidths
+            sim = CVode(prob)
+            sim.linear_solver = "BAND"
+            if f is jac_band:
+                sim.mupper, sim.mlower = 1, 2
+            sim.simulate(0.1)
+            assert sim.statistics["njacs"] > 0
+            assert sim.statistics["nfcnjacs"] == 0
+            assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-6)
+        assert nout[0] > 0
+
+    @pytest.mark.parametrize("sparse_format", ["CSC", "CSR"])
+    def test_klu(self, sparse_format):
+        """
+        This tests the KLU linear solver with a returned sparse Jacobian and with the values of a pattern.
+        """
+        A, rhs, y0 = banded_cubic_problem()
+        diagonal = [k for j in range(len(y0)) for k in range(A.indptr[j], A.indptr[j+1]) if A.indices[k] == j]
+        def jac(t, y):
+            return (A - sps.diags(3.0*y**2)).tocsc()
+        nout = [0]
+        def jac_values(t, y, out=None):
+            if out is None:
+                return jac(t, y)
+            nout[0] += 1
+            out[:] = A.data
+            out[diagonal] -= 3.0*y**2
+        
+        y_ref = reference_state(CVode, Explicit_Problem(rhs, y0), 0.1)
+        
+        for f in (jac, jac_values):
+            prob = Explicit_Problem(rhs, y0)
+            prob.jac = f
+            prob.jac_pattern = A
+            sim = CVode(prob)
+            sim.linear_solver = "KLU"
+            sim.sparse_format = sparse_format
+            sim.klu_ordering = "amd"
+            assert sim.klu_ordering == "AMD"
+            simulate_klu(sim, 0.1)
+            assert sim.statistics["njacs"] > 0
+            assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-6)
+        assert nout[0] > 0
+    
+    @pytest.mark.parametrize("linear_solver", ["SPGMR", "SPFGMR", "SPBCGS", "SPTFQMR"])
+    def test_krylov_solvers(self, linear_solver):
+        """
+        This tests the Krylov linear solvers on a non-symmetric (advection-diffusion) problem.
+        """
+        A, rhs, y0 = advection_diffusion_problem(10.0)
+        y_ref = reference_state(CVode, Explicit_Problem(rhs, y0), 0.1)
+        
+        prob = Explicit_Problem(rhs, y0)
+        prob.jacv = lambda t, y, fy, v: A.dot(v)
+        sim = CVode(prob)
+        sim.linear_solver = linear_solver
+        sim.maxkrylov = 10
+        sim.max_restarts = 1
+        sim.gram_schmidt = "CLASSICAL"
+        sim.simulate(0.1)
+        assert sim.statistics["nliters"] > 0
+        assert sim.statistics["njacvecs"] > 0
+        assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-5)
+
+    @pytest.mark.parametrize("precond", ["BANDED", "BBD"])
+    def test_precond_modules(self, precond):
+        """
+        This tests the banded and band-block-diagonal preconditioner modules.
+        """
+        A, rhs, y0 = advection_diffusion_problem(100.0)
+        y_ref = reference_state(CVode, Explicit_Problem(rhs, y0), 0.1)
+        nliters = unpreconditioned_nliters(rhs, y0)
+        
+        sim = CVode(Explicit_Problem(rhs, y0))
+        sim.linear_solver = "SPGMR"
+        sim.precond = precond
+        sim.mupper = sim.mlower = 1
+        assert sim.precond == precond
+        sim.simulate(0.1)
+        assert sim.statistics["nprecsetups"] > 0
+        assert sim.statistics["nprecs"] > 0
+        assert sim.statistics["nliters"] < nliters
+        assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-5)
+        
+        sim.precond = "PREC_NONE"
+        assert sim.precond == "PREC_NONE"
+
+    @pytest.mark.parametrize("jacobian", ["jac", "jac_pattern"])
+    def test_precond_ilu(self, jacobian):
+        """
+        This tests the ILU(0) preconditioner, with the Jacobian and with colored finite differences.
+        """
+        A, rhs, y0 = advection_diffusion_problem(100.0, format = "csc")
+        y_ref = reference_state(CVode, Explicit_Problem(rhs, y0), 0.1)
+        nliters = unpreconditioned_nliters(rhs, y0)
+        
+        prob = Explicit_Problem(rhs, y0)
+        if jacobian == "jac":
+            prob.jac = lambda t, y: A
+        else:
+            prob.jac_pattern = A
+        sim = CVode(prob)
+        sim.linear_solver = "SPGMR"
+        sim.precond = "ILU"
+        assert sim.precond == "ILU"
+        sim.simulate(0.1)
+        assert sim.statistics["njacs"] > 0
+        assert sim.statistics["nprecs"] > 0
+        assert sim.statistics["nliters"] < nliters
+        assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-5)
     
+    def test_precond_ilu_no_jac(self):
+        sim = CVode(Explicit_Problem(lambda t, y: -y, [1.0, 1.0]))
+        sim.linear_solver = "SPGMR"
+        sim.precond = "ILU"
+        with pytest.raises(AssimuloException):
+            sim.simulate(1.0)
+
+    def test_klu_options(self):
+        with pytest.raises(AssimuloException):
+            self.simulator.klu_ordering = "METIS"
+        with pytest.raises(AssimuloException):
+            self.simulator.sparse_format = "COO"
+        self.simulator.sparse_format = "csr"
+        assert self.simulator.sparse_format == "CSR"
+        with pytest.raises(AssimuloException):
+            self.simulator.max_restarts = -1
+        with pytest.raises(AssimuloException):
+            self.simulator.gram_schmidt = "HOUSEHOLDER"
+
+    def test_jac_out(self):
+        """
+        This tests that a Jacobian with the keyword out is evaluated in-place.
+        """
+        nout = [0]
+        def jac(t, y, out=None):
+            J = np.array([[0.0, 1.0], [-1000.0, -1001.0]])
+            if out is None:
+                return J
+            assert out.flags["F_CONTIGUOUS"]
+            nout[0] += 1
+            out[:,:] = J
+        
+        prob_ref = Explicit_Problem(lambda t, y: np.array([y[1], -1000.0*y[0] - 1001.0*y[1]]), [1.0, 0.0])
+        prob_ref.jac = lambda t, y: jac(t, y)
+        sim_ref = CVode(prob_ref)
+        sim_ref.usejac = True
+        sim_ref.simulate(1.0)
+        
+        prob = Explicit_Problem(lambda t, y: np.array([y[1], -1000.0*y[0] - 1001.0*y[1]]), [1.0, 0.0])
+        prob.jac = jac
+        sim = CVode(prob)
+        sim.usejac = True
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+
     def test_usejac_csc_matrix(self):
         """
         This tests the functionality of the property usejac.
@@ -490,6 +997,15 @@ class Test_CVode:
         sim.reset()
         sim.simulate(10.)
         assert y100[-2][0] == pytest.approx(sim.interpolate(9.9, 0)[0], abs = 1e-5)
+        
+        #The results are written into new arrays, not into a shared buffer
+        y1 = sim.interpolate(9.9, 0)
+        y2 = sim.interpolate(9.95, 0)
+        assert y1[0] < y2[0]
+        assert y1[0] == pytest.approx(y100[-2][0], abs = 1e-5)
+        
+        with pytest.raises(CVodeError):
+            CVode(prob).interpolate(0.0)
     
     def test_ncp_list(self):
         f = lambda t,y:np.array(-y)
@@ -1138,7 +1654,42 @@ class Test_IDA:
 
         assert imp_sim.y_sol[-1][0] == pytest.approx(45.1900000, abs = 1e-4)
         assert imp_sim.statistics["nfcnjacs"] > 0
-    
+
+    def test_warm_start(self):
+        """
+        This tests the functionality of the property warm_start.
+        """
+        A = np.array([[-1000., 1.], [0., -0.5]])
+        y0 = np.array([1.0, 999.5]) #No fast transient
+        njacs = [0]
+        def jac(c, t, y, yd):
+            njacs[0] += 1
+            return c*np.eye(2) - A
+
+        imp_mod = Implicit_Problem(lambda t, y, yd: yd - A.dot(y), y0, A.dot(y0))
+        imp_mod.jac = jac
+
+        def run(warm_start):
+            imp_sim = IDA(imp_mod)
+            imp_sim.warm_start = warm_start
+            #Fixed step-size and order, the stored Jacobian is then within the c-ratio window
+            imp_sim.maxord = 1
+            imp_sim.inith = 0.01
+            imp_sim.maxh = 0.01
+            imp_sim.rtol = 1e-3
+            imp_sim.simulate(1.)
+            imp_sim.re_init(0.0, y0, A.dot(y0))
+            njacs[0] = 0
+            imp_sim.simulate(1.)
+            return njacs[0], imp_sim.y_sol[-1]
+
+        assert IDA(imp_mod).warm_start == False
+        cold_njacs, cold_y = run(False)
+        warm_njacs, warm_y = run(True)
+
+        assert warm_njacs < cold_njacs
+        np.testing.assert_allclose(warm_y, cold_y, rtol = 1e-4)
+
     def test_terminate_simulation(self):
         """
         This tests the functionality of raising TerminateSimulation exception in handle_result.
@@ -1316,6 +1867,206 @@ class Test_IDA:
         assert len(sim.t_sol) == sim.statistics["nsteps"] + 1
         assert nsteps == sim.statistics["nsteps"]
 
+    def test_low_level_callbacks(self):
+        """
+        This tests the use of low-level (C) functions for res and jac.
+        """
+        c_res = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double),
+                                 ctypes.POINTER(ctypes.c_double), ctypes.c_void_p)
+        c_jac = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.POINTER(ctypes.c_double),
+                                 ctypes.POINTER(ctypes.c_double), ctypes.POINTER(ctypes.c_double), ctypes.c_void_p)
+        def res(t, y, yd, r, user_data):
+            r[0] = yd[0] + 2.0*y[0]
+            return 0
+        def jac(c, t, y, yd, J, user_data):
+            J[0] = c + 2.0
+            return 0
+        res_c, jac_c = c_res(res), c_jac(jac)
+        
+        imp_mod = Implicit_Problem(res_c, [1.0], [-2.0])
+        imp_mod.jac = jac_c
+        imp_sim = IDA(imp_mod)
+        imp_sim.usejac = True
+        imp_sim.simulate(1.0)
+        assert imp_sim.y_sol[-1][0] == pytest.approx(np.exp(-2.0), rel = 1e-4)
+
+    def test_res_out(self):
+        """
+        This tests that res and state_events with the keyword out are evaluated in-place.
+        """
+        nout = [0, 0]
+        def res(t, y, yd, sw, out=None):
+            if out is None:
+                return yd + y
+            nout[0] += 1
+            out[0] = yd[0] + y[0]
+        def state_events(t, y, yd, sw, out=None):
+            if out is None:
+                return np.array([y[0] - 0.5])
+            nout[1] += 1
+            out[0] = y[0] - 0.5
+        def handle_event(solver, event_info):
+            solver.sw[0] = True
+        
+        prob = Implicit_Problem(res, [1.0], [-1.0], sw0 = [False])
+        prob.state_events = state_events
+        prob.handle_event = handle_event
+        sim = IDA(prob)
+        sim.verbosity = 0
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        assert nout[1] > 0
+        assert sim.sw[0]
+        assert sim.y_sol[-1][0] == pytest.approx(np.exp(-1.0), rel = 1e-4)
+
+    def test_res_and_jac(self):
+        """
+        This tests that the Jacobian of a fused res_and_jac is reused.
+        """
+        ncalls = [0]
+        def res(t, y, yd):
+            return yd - np.array([y[1], -1000.0*y[0] - 1001.0*y[1]])
+        def jac(c, t, y, yd):
+            return np.array([[c, -1.0], [1000.0, c + 1001.0]])
+        def jac_miss(c, t, y, yd):
+            ncalls[0] += 1
+            return jac(c, t, y, yd)
+        def res_and_jac(t, y, yd):
+            return res(t, y, yd), (np.array([[0.0, -1.0], [1000.0, 1001.0]]), np.eye(2))
+        
+        prob_ref = Implicit_Problem(res, [1.0, 0.0], [0.0, -1000.0])
+        prob_ref.jac = jac
+        sim_ref = IDA(prob_ref)
+        sim_ref.simulate(1.0)
+        
+        prob = Implicit_Problem(res, [1.0, 0.0], [0.0, -1000.0])
+        prob.res_and_jac = res_and_jac
+        prob.jac = jac_miss #Only called if the Jacobian is not cached
+        sim = IDA(prob)
+        assert sim.usejac
+        sim.simulate(1.0)
+        assert ncalls[0] == 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+
+    def test_band(self):
+        """
+        This tests the BAND linear solver with difference quotients and with a Jacobian.
+        """
+        y_ref = reference_state(IDA, stiff_dae_problem(), 1.0)
+        
+        for f in (None, stiff_dae_jac):
+            sim = IDA(stiff_dae_problem(f))
+            sim.linear_solver = "BAND"
+            sim.mupper = 1
+            sim.mlower = 1
+            sim.simulate(1.0)
+            assert (sim.statistics["nfcnjacs"] == 0) == (f is not None)
+            assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-4, abs = 1e-8)
+
+    @pytest.mark.parametrize("sparse_format", ["CSC", "CSR"])
+    def test_klu(self, sparse_format):
+        """
+        This tests the KLU linear solver with a returned sparse Jacobian and with the values of a pattern.
+        """
+        def jac(c, t, y, yd):
+            return sps.csc_matrix(stiff_dae_jac(c, t, y, yd))
+        def jac_values(c, t, y, yd, out=None):
+            if out is None:
+                return jac(c, t, y, yd)
+            out[:] = jac(c, t, y, yd).data
+        
+        y_ref = reference_state(IDA, stiff_dae_problem(), 1.0)
+        
+        for f in (jac, jac_values):
+            prob = stiff_dae_problem(f)
+            prob.jac_pattern = jac(1.0, 0.0, None, None)
+            sim = IDA(prob)
+            sim.linear_solver = "KLU"
+            sim.sparse_format = sparse_format
+            simulate_klu(sim, 1.0)
+            assert sim.statistics["njacs"] > 0
+            assert sim.statistics["nfcnjacs"] == 0
+            assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-4, abs = 1e-8)
+        
+        sim = IDA(stiff_dae_problem())
+        sim.linear_solver = "KLU"
+        with pytest.raises(AssimuloException):
+            sim.simulate(1.0)
+
+    @pytest.mark.parametrize("linear_solver", ["SPGMR", "SPFGMR", "SPBCGS", "SPTFQMR"])
+    def test_krylov_solvers(self, linear_solver):
+        """
+        This tests the Krylov linear solvers.
+        """
+        y_ref = reference_state(IDA, stiff_dae_problem(), 1.0)
+        
+        sim = IDA(stiff_dae_problem())
+        sim.linear_solver = linear_solver
+        sim.maxkrylov = 3
+        sim.max_restarts = 1
+        sim.simulate(1.0)
+        assert sim.statistics["nliters"] > 0
+        assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-6)
+
+    def test_precond_bbd(self):
+        """
+        This tests the band-block-diagonal preconditioner module.
+        """
+        y_ref = reference_state(IDA, stiff_dae_problem(), 1.0)
+        
+        sim = IDA(stiff_dae_problem())
+        sim.linear_solver = "SPGMR"
+        sim.precond = "BBD"
+        sim.mupper = sim.mlower = 1
+        assert sim.precond == "BBD"
+        sim.simulate(1.0)
+        assert sim.statistics["nliters"] > 0
+        assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-6)
+        
+        with pytest.raises(AssimuloException):
+            sim.precond = "BANDED"
+
+    def test_precond_ilu(self):
+        """
+        This tests the ILU(0) preconditioner with a sparse Jacobian.
+        """
+        y_ref = reference_state(IDA, stiff_dae_problem(), 1.0)
+        
+        sim = IDA(stiff_dae_problem(lambda c, t, y, yd: sps.csc_matrix(stiff_dae_jac(c, t, y, yd))))
+        sim.linear_solver = "SPGMR"
+        sim.precond = "ILU"
+        sim.simulate(1.0)
+        assert sim.statistics["njacs"] > 0
+        assert sim.statistics["nprecs"] > 0
+        assert sim.y_sol[-1] == pytest.approx(y_ref, rel = 1e-3, abs = 1e-6)
+
+    def test_jac_out(self):
+        """
+        This tests that a Jacobian with the keyword out is evaluated in-place.
+        """
+        nout = [0]
+        def res(t, y, yd):
+            return yd - np.array([y[1], -1000.0*y[0] - 1001.0*y[1]])
+        def jac(c, t, y, yd, out=None):
+            J = np.array([[c, -1.0], [1000.0, c + 1001.0]])
+            if out is None:
+                return J
+            assert out.flags["F_CONTIGUOUS"]
+            nout[0] += 1
+            out[:,:] = J
+        
+        prob_ref = Implicit_Problem(res, [1.0, 0.0], [0.0, -1000.0])
+        prob_ref.jac = lambda c, t, y, yd: jac(c, t, y, yd)
+        sim_ref = IDA(prob_ref)
+        sim_ref.simulate(1.0)
+        
+        prob = Implicit_Problem(res, [1.0, 0.0], [0.0, -1000.0])
+        prob.jac = jac
+        sim = IDA(prob)
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
+
     def test_base_exception_interrupt_fcn(self):
         """Test that BaseExceptions in right-hand side terminate the simulation. Radau5 + C + implicit problem."""
         prob = ImplicitProbBaseException(dim = 2, fcn = True)
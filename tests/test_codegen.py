@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import gc
+import shutil
+import pytest
+import numpy as np
+import scipy.sparse as sps
+
+sympy = pytest.importorskip("sympy")
+
+from assimulo.codegen import SymbolicModel
+from assimulo.problem import Explicit_Problem, Implicit_Problem
+from assimulo.solvers import Radau5ODE, Radau5DAE
+from assimulo.support import LowLevelCallback
+from assimulo.exception import Codegen_Exception
+
+needs_compiler = pytest.mark.skipif(shutil.which(os.environ.get("CC", "cc")) is None, reason = "No C compiler available.")
+
+def van_der_pol(state_events = True):
+    y1, y2, mu = sympy.symbols("y1 y2 mu")
+    return SymbolicModel([y1, y2], [y2, mu*((1 - y1**2)*y2 - y1)], parameters = [mu],
+                         state_events = [y1 - 1.0] if state_events else None, name = "vdp")
+
+class Test_Codegen:
+    def test_pattern(self):
+        """
+        This tests the structural sparsity pattern of the Jacobian.
+        """
+        y1, y2, y3 = sympy.symbols("y1 y2 y3")
+        model = SymbolicModel([y1, y2, y3], [-y1, y1 - y2**2, 2*y3])
+        assert (model.jac_pattern.toarray() != 0).tolist() == [[True, False, False],
+                                                               [True, True, False],
+                                                               [False, False, True]]
+
+    def test_c_code(self):
+        """
+        This tests the functions of the generated code.
+        """
+        code = van_der_pol().c_code()
+        for function in ("vdp_rhs", "vdp_jac", "vdp_jac_data", "vdp_state_events", "vdp_sens"):
+            assert "int %s("%function in code
+        assert "p[0]" in code
+
+    def test_unknown_symbols(self):
+        """
+        This tests that symbols which are neither states nor parameters are rejected.
+        """
+        y, k = sympy.symbols("y k")
+        with pytest.raises(Codegen_Exception, match = "unknown symbols k"):
+            SymbolicModel([y], [-k*y])
+
+    def test_invalid_name(self):
+        y = sympy.Symbol("y")
+        with pytest.raises(Codegen_Exception):
+            SymbolicModel([y], [-y], name = "my model")
+
+    @needs_compiler
+    def test_explicit(self, tmp_path):
+        """
+        This tests a compiled explicit model against the Python formulation.
+        """
+        compiled = van_der_pol(state_events = False).compile(directory = str(tmp_path))
+        problem = compiled.problem([2.0, -0.6], p = [5.0])
+        assert isinstance(problem.rhs, LowLevelCallback)
+
+        def rhs(t, y):
+            return np.array([y[1], 5.0*((1.0 - y[0]**2)*y[1] - y[0])])
+        sim_ref = Radau5ODE(Explicit_Problem(rhs, [2.0, -0.6]))
+        sim_ref.verbosity = 0
+        sim_ref.simulate(2.0)
+
+        sim = Radau5ODE(problem)
+        sim.verbosity = 0
+        sim.usejac = True
+        sim.simulate(2.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-5)
+
+        #The parameters are changed in-place, without recompiling
+        compiled.p = [1.0]
+        sim = Radau5ODE(problem)
+        sim.verbosity = 0
+        sim.simulate(2.0)
+        assert sim.y_sol[-1] != pytest.approx(sim_ref.y_sol[-1], rel = 1e-2)
+
+    @needs_compiler
+    def test_sparse_jac(self, tmp_path):
+        """
+        This tests the Jacobian which only evaluates the values of its pattern.
+        """
+        model = van_der_pol()
+        compiled = model.compile(directory = str(tmp_path))
+        problem = compiled.problem([2.0, -0.6], p = [5.0], sparse = True)
+        jac = problem.jac.bind("jac", False, 2)
+        dense = compiled.problem([2.0, -0.6], p = [5.0]).jac.bind("jac", False, 2)
+
+        J = jac(0.0, np.array([0.5, 2.0]))
+        assert isinstance(J, sps.csc_matrix)
+        assert J.nnz == model.jac_pattern.nnz
+        assert J.toarray() == pytest.approx(dense(0.0, np.array([0.5, 2.0])))
+        assert J.toarray() == pytest.approx(np.array([[0.0, 1.0], [5.0*(-2*0.5*2.0 - 1.0), 5.0*(1.0 - 0.25)]]))
+
+        sim = Radau5ODE(problem)
+        sim.verbosity = 0
+        sim.usejac = True
+        sim.simulate(1.0)
+        assert sim.problem_info["jac_pattern"].nnz == model.jac_pattern.nnz
+
+    @needs_compiler
+    def test_state_events(self, tmp_path):
+        """
+        This tests the compiled state events.
+        """
+        compiled = van_der_pol().compile(directory = str(tmp_path))
+        problem = compiled.problem([2.0, -0.6], p = [5.0])
+        events = []
+        problem.handle_event = lambda solver, event_info: events.append(solver.y[0])
+
+        sim = Radau5ODE(problem)
+        sim.verbosity = 0
+        sim.simulate(10.0)
+        assert len(events) > 0
+        assert events[0] == pytest.approx(1.0, abs = 1e-6)
+
+    @needs_compiler
+    def test_sensitivities(self, tmp_path):
+        """
+        This tests the compiled right-hand side of the sensitivity equations.
+        """
+        compiled = van_der_pol().compile(directory = str(tmp_path))
+        problem = compiled.problem([2.0, -0.6], p = [5.0], sensitivities = True)
+        assert problem.p0 == pytest.approx([5.0])
+
+        y, p = np.array([0.5, 2.0]), np.array([3.0])
+        s = np.asfortranarray([[0.1], [0.2]])
+        J = problem.jac(0.0, y, p)
+        dfdp = np.array([[0.0], [(1.0 - y[0]**2)*y[1] - y[0]]])
+        assert problem.rhs(0.0, y, p) == pytest.approx([2.0, 3.0*((1.0 - 0.25)*2.0 - 0.5)])
+        assert problem.rhs_sens(0.0, y, s, p) == pytest.approx(J.dot(s) + dfdp)
+
+    @needs_compiler
+    def test_sensitivities_state_events(self, tmp_path):
+        """
+        This tests that the state events use the parameters of the solver.
+        """
+        y1, y2, mu = sympy.symbols("y1 y2 mu")
+        model = SymbolicModel([y1, y2], [y2, -y1], parameters = [mu], state_events = [y1 - mu], name = "osc")
+        problem = model.compile(directory = str(tmp_path)).problem([1.0, 0.0], p = [0.5], sensitivities = True)
+
+        y = np.array([0.2, 0.0])
+        assert problem.state_events(0.0, y) == pytest.approx([0.2 - 0.5])
+        problem.rhs(0.0, y, np.array([0.1]))
+        assert problem.state_events(0.0, y) == pytest.approx([0.2 - 0.1])
+
+    @needs_compiler
+    def test_implicit(self, tmp_path):
+        """
+        This tests a compiled implicit model.
+        """
+        y1, y2, yd1, yd2, t = sympy.symbols("y1 y2 yd1 yd2 t")
+        model = SymbolicModel([y1, y2], [yd1 - y2, yd2 + t*y1], t = t, derivatives = [yd1, yd2], name = "dae")
+        compiled = model.compile(directory = str(tmp_path))
+        problem = compiled.problem([1.0, 0.0], yd0 = [0.0, 0.0])
+        assert isinstance(problem.res, LowLevelCallback)
+
+        def res(t, y, yd):
+            return np.array([yd[0] - y[1], yd[1] + t*y[0]])
+        sim_ref = Radau5DAE(Implicit_Problem(res, [1.0, 0.0], [0.0, 0.0]))
+        sim_ref.verbosity = 0
+        sim_ref.simulate(1.0)
+
+        sim = Radau5DAE(problem)
+        sim.verbosity = 0
+        sim.simulate(1.0)
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-8)
+
+    @needs_compiler
+    def test_temporary_directory(self):
+        """
+        This tests that the temporary build directory is removed with the compiled model.
+        """
+        y = sympy.Symbol("y")
+        compiled = SymbolicModel([y], [-y], name = "decay").compile()
+        directory = os.path.dirname(compiled.library)
+        assert os.path.isdir(directory)
+        del compiled
+        gc.collect()
+        assert not os.path.exists(directory)
+
+    @needs_compiler
+    def test_implicit_state_named_c(self, tmp_path):
+        """
+        This tests that a state named c does not collide with the coefficient of the implicit Jacobian.
+        """
+        c, cd = sympy.symbols("c cd")
+        model = SymbolicModel([c], [cd + 2*c], derivatives = [cd], name = "coef")
+        problem = model.compile(directory = str(tmp_path)).problem([1.0], yd0 = [-2.0])
+        jac = problem.jac.bind("jac", True, 1)
+        assert jac(10.0, 0.0, np.array([3.0]), np.array([0.0]))[0, 0] == pytest.approx(12.0)
+
+    def test_compile_error(self, tmp_path):
+        """
+        This tests that failures of the compiler are reported.
+        """
+        y = sympy.Symbol("y")
+        with pytest.raises(Codegen_Exception):
+            SymbolicModel([y], [-y]).compile(directory = str(tmp_path), compiler = "assimulo-no-such-compiler")
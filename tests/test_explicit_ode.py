@@ -15,9 +15,17 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import ctypes
+import pickle
 import pytest
+import numpy as np
 from assimulo.explicit_ode import Explicit_ODE
 from assimulo.problem import Explicit_Problem
+from assimulo.support import LowLevelCallback
+from assimulo.exception import AssimuloException, AssimuloRecoverableError, ODE_Exception
+
+def rhs_pickle(t, y):
+    return y
 
 class Test_Explicit_ODE:
     def test_elapsed_step_time(self):
@@ -50,3 +58,74 @@ class Test_Explicit_ODE:
         
         assert solv.t == 1.0
         assert solv.y[0] == 2.0
+
+    def test_pickle(self):
+        prob = Explicit_Problem(rhs_pickle, 1.0, name="Test")
+        solv = Explicit_ODE(prob)
+        solv.re_init(1.0, 2.0)
+        solv.verbosity = 10
+        
+        prob_copy = pickle.loads(pickle.dumps(prob))
+        assert prob_copy.name == "Test"
+        assert prob_copy.y0[0] == 1.0
+        assert prob_copy.rhs is rhs_pickle
+        
+        solv_copy = pickle.loads(pickle.dumps(solv))
+        assert isinstance(solv_copy, Explicit_ODE)
+        assert solv_copy.t == 1.0
+        assert solv_copy.y[0] == 2.0
+        assert solv_copy.verbosity == 10
+        assert solv_copy.problem.name == "Test"
+        
+        #The state is restored from the solver, the solver is not created anew from the problem
+        prob.y0 = np.array([3.0])
+        solv_copy = pickle.loads(pickle.dumps(solv))
+        assert solv_copy.y0[0] == 1.0
+        assert solv_copy.problem_info == solv.problem_info
+
+    def test_low_level_callbacks(self):
+        c_fcn = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, ctypes.POINTER(ctypes.c_double),
+                                 ctypes.POINTER(ctypes.c_double), ctypes.c_void_p)
+        def rhs(t, y, yd, user_data):
+            yd[0] = -2.0*y[0]
+            return 0 if t < 10.0 else 1
+        def events(t, y, g, user_data):
+            g[0] = y[0] - 0.5
+            return 0
+        rhs_c, events_c = c_fcn(rhs), c_fcn(events)
+        
+        prob = Explicit_Problem(rhs_c, 1.0)
+        prob.jac = rhs_c
+        prob.state_events = events_c
+        with pytest.raises(AssimuloException):
+            Explicit_ODE(prob) #The number of event indicators is needed
+        
+        events_ll = LowLevelCallback(events_c, size = 1)
+        prob.state_events = events_ll
+        solv = Explicit_ODE(prob)
+        assert isinstance(solv._problem_rhs, LowLevelCallback)
+        assert solv._problem_rhs.kind == "rhs"
+        assert solv._problem_jac.kind == "jac"
+        assert solv.problem_info["dimRoot"] == 1
+        assert solv._problem_rhs(0.0, np.array([3.0]))[0] == pytest.approx(-6.0)
+        assert solv._problem_state_events(0.0, np.array([3.0]), None)[0] == pytest.approx(2.5)
+        with pytest.raises(AssimuloRecoverableError):
+            solv._problem_rhs(10.0, np.array([3.0]))
+        #The problem and the user's callback are left unchanged
+        assert prob.rhs is rhs_c
+        assert prob.jac is rhs_c
+        assert prob.state_events is events_ll
+        assert events_ll.kind is None
+        with pytest.raises(AssimuloException, match = "cannot be pickled"):
+            pickle.dumps(solv)
+        with pytest.raises(AssimuloException, match = "cannot be pickled"):
+            pickle.dumps(prob.state_events)
+        
+        prob = Explicit_Problem(rhs_c, 1.0, sw0 = [True])
+        with pytest.raises(AssimuloException):
+            Explicit_ODE(prob)
+        
+        prob = Explicit_Problem(rhs_c, 1.0)
+        prob.complex_step = True
+        with pytest.raises(ODE_Exception, match = "complex_step"):
+            Explicit_ODE(prob)
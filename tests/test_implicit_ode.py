@@ -15,10 +15,14 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import pickle
 import pytest
 from assimulo.implicit_ode import Implicit_ODE
 from assimulo.problem import Implicit_Problem
 
+def res_pickle(t, y, yd):
+    return y
+
 class Test_Implicit_ODE:
     
     def test_elapsed_step_time(self):
@@ -53,3 +57,15 @@ class Test_Implicit_ODE:
         assert solv.t == 1.0
         assert solv.y[0] == 2.0
         assert solv.yd[0] == 3.0
+
+    def test_pickle(self):
+        prob = Implicit_Problem(res_pickle, 0.0, 0.0)
+        solv = Implicit_ODE(prob)
+        solv.re_init(1.0, 2.0, 3.0)
+        
+        solv_copy = pickle.loads(pickle.dumps(solv))
+        assert isinstance(solv_copy.problem, Implicit_Problem)
+        assert solv_copy.problem.res is res_pickle
+        assert solv_copy.t == 1.0
+        assert solv_copy.y[0] == 2.0
+        assert solv_copy.yd[0] == 3.0
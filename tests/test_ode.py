@@ -16,9 +16,13 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import pytest
+import numpy as np
+import scipy.sparse as sps
 from assimulo.ode import ODE, NORMAL
 from assimulo.problem import Explicit_Problem
 from assimulo.exception import AssimuloException
+from assimulo.support import ColoredJacobian, ComplexStepSensitivity, RHSJacobianCache, column_coloring, detect_jac_pattern, \
+    get_bandwidths, check_bandwidth
 
 class Test_ODE:
     @classmethod
@@ -72,3 +76,216 @@ class Test_ODE:
         self.simulator.problem=self.problem
         self.simulator(10.,ncp=10) # output points and step events should set report_continuously to True 
         assert self.simulator.report_continuously
+
+    def test_jac_pattern(self):
+        """
+        This tests that a Jacobian sparsity pattern is converted to CSC and defines jac_nnz.
+        """
+        def jac(t, y, out=None):
+            pass
+        prob = Explicit_Problem(y0=[1.0, 1.0, 1.0])
+        prob.jac = jac
+        prob.jac_pattern = sps.coo_matrix(([1, 1, 1, 1], ([2, 0, 1, 0], [0, 0, 1, 0])), shape=(3, 3))
+        sim = ODE(prob)
+        
+        pattern = sim.problem_info["jac_pattern"]
+        assert isinstance(pattern, sps.csc_matrix)
+        assert sim.problem_info["jac_fcn_nnz"] == 3
+        assert list(pattern.indices) == [0, 2, 1]
+        assert list(pattern.indptr) == [0, 2, 3, 3]
+        assert sim.problem_info["jac_pattern_out"]
+        assert not sim.problem_info["jac_out"]
+        
+        prob.jac_pattern = np.eye(3)
+        assert ODE(prob).problem_info["jac_fcn_nnz"] == 3
+
+    def test_colored_jac(self):
+        """
+        This tests the finite difference Jacobian from a sparsity pattern, compressed by column coloring.
+        """
+        n = 20
+        A = sps.diags([np.ones(n-1), -2.0*np.ones(n), np.ones(n-1)], [-1, 0, 1], format="csc")
+        def rhs(t, y):
+            return A.dot(y) - y**3
+        prob = Explicit_Problem(rhs, y0=np.linspace(0.0, 1.0, n))
+        prob.jac_pattern = A
+        sim = ODE(prob)
+        
+        assert isinstance(sim._problem_jac, ColoredJacobian)
+        assert not hasattr(prob, "jac") #The problem is not changed
+        assert sim._problem_jac.ncolors == 3
+        assert sim.problem_info["jac_fcn"]
+        assert sim.problem_info["jac_pattern_out"]
+        
+        y = np.linspace(-1.0, 1.0, n)
+        J = sim._problem_jac(0.0, y)
+        assert isinstance(J, sps.csc_matrix)
+        assert J.toarray() == pytest.approx((A - sps.diags(3.0*y**2)).toarray(), abs = 1e-6)
+        assert sim._problem_jac.nfcns == 4
+        
+        out = np.empty(J.nnz)
+        sim._problem_jac(0.0, y, out=out)
+        assert out == pytest.approx(J.data)
+
+    def test_complex_step(self):
+        """
+        This tests the complex-step Jacobian and sensitivity right-hand side.
+        """
+        n = 20
+        A = sps.diags([np.ones(n-1), -2.0*np.ones(n), np.ones(n-1)], [-1, 0, 1], format="csc")
+        def rhs(t, y, p):
+            return A.dot(y) - p[0]*y**3 + p[1]*np.sin(y)
+        y, p = np.linspace(-1.0, 1.0, n), np.array([2.0, 0.5])
+        J_exact = (A - sps.diags(3.0*p[0]*y**2 - p[1]*np.cos(y))).toarray()
+        
+        prob = Explicit_Problem(rhs, y0=np.zeros(n), p0=p)
+        prob.jac_pattern = A
+        prob.complex_step = True
+        sim = ODE(prob)
+        assert isinstance(sim._problem_jac, ColoredJacobian)
+        assert isinstance(sim._problem_rhs_sens, ComplexStepSensitivity)
+        assert not hasattr(prob, "jac") and not hasattr(prob, "rhs_sens")
+        assert sim.problem_info["sens_fcn"]
+        assert sim.problem_info["sens_out"]
+        
+        J = sim._problem_jac(0.0, y, p)
+        assert np.abs(J.toarray() - J_exact).max() < 1e-14
+        assert sim._problem_jac.nfcns == 3
+        
+        s = np.asfortranarray(np.vstack([np.ones(n), y]).T)
+        dfdp = np.vstack([-y**3, np.sin(y)]).T
+        assert np.abs(sim._problem_rhs_sens(0.0, y, s, p) - (J_exact.dot(s) + dfdp)).max() < 1e-13
+        
+        #Without a pattern the Jacobian is dense
+        prob = Explicit_Problem(lambda t, y: rhs(t, y, p), y0=np.zeros(n))
+        prob.complex_step = True
+        sim = ODE(prob)
+        assert sim.problem_info["jac_fcn"]
+        assert sim.problem_info["jac_out"]
+        assert sim.problem_info["jac_pattern"] is None
+        out = np.empty((n, n), order="F")
+        sim._problem_jac(0.0, y, out=out)
+        assert np.abs(out - J_exact).max() < 1e-14
+        assert sim._problem_jac.nfcns == n
+
+    def test_detect_jac_pattern(self):
+        """
+        This tests the detection of the Jacobian sparsity pattern by probing the right-hand side.
+        """
+        n = 10
+        def rhs(t, y):
+            ydot = np.zeros(n)
+            ydot[1:-1] = y[:-2] - 2.0*y[1:-1] + y[2:]
+            ydot[0] = y[0]*y[n-1] #Zero derivatives at y = 0
+            ydot[n-1] = np.maximum(y[n-2], -10.0) #Hides NaN
+            return ydot
+        expected = np.zeros((n, n))
+        for i in range(1, n-1):
+            expected[i, i-1:i+2] = 1.0
+        expected[0, 0] = expected[0, n-1] = expected[n-1, n-2] = 1.0
+        
+        pattern = detect_jac_pattern(rhs, 0.0, np.zeros(n))
+        assert isinstance(pattern, sps.csc_matrix)
+        assert pattern.toarray().tolist() == expected.tolist()
+        
+        def rhs_no_nan(t, y):
+            if np.isnan(y).any():
+                raise ValueError("NaN")
+            return rhs(t, y)
+        assert detect_jac_pattern(rhs_no_nan, 0.0, np.zeros(n)).toarray().tolist() == expected.tolist()
+        
+        def rhs_nan_row(t, y): #Row 0 is NaN at every point, it does not depend on all states
+            ydot = rhs(t, y)
+            ydot[0] = np.sqrt(-1.0 - y[0]**2)
+            return ydot
+        for nan in [True, False]:
+            pattern = detect_jac_pattern(rhs_nan_row, 0.0, np.zeros(n), nan=nan).toarray()
+            assert pattern[0].sum() == 0
+            assert pattern[1:].tolist() == expected[1:].tolist()
+        
+        prob = Explicit_Problem(rhs, y0=np.zeros(n))
+        prob.jac_pattern = "auto"
+        sim = ODE(prob)
+        assert sim.problem_info["jac_fcn_nnz"] == expected.sum()
+        assert prob.jac_pattern == "auto"
+        assert sim.problem_info["jac_pattern"].toarray().tolist() == expected.tolist()
+        assert isinstance(sim._problem_jac, ColoredJacobian)
+        
+        #The detected pattern is cached on the problem for the probed point
+        nrhs = [0]
+        def rhs_counted(t, y):
+            nrhs[0] += 1
+            return rhs(t, y)
+        prob = Explicit_Problem(rhs_counted, y0=np.zeros(n))
+        prob.jac_pattern = "auto"
+        ODE(prob)
+        nprobe = nrhs[0]
+        sim = ODE(prob)
+        assert nrhs[0] == nprobe
+        assert sim.problem_info["jac_pattern"].toarray().tolist() == expected.tolist()
+        prob.y0 = np.ones(n)
+        ODE(prob)
+        assert nrhs[0] > nprobe
+        
+        prob = Explicit_Problem(rhs, y0=np.zeros(n))
+        prob.jac_pattern = "unknown"
+        with pytest.raises(AssimuloException):
+            ODE(prob)
+
+    def test_rhs_jacobian_cache(self):
+        """
+        This tests that the cached Jacobian of a fused function is keyed by the point, switches and parameters.
+        """
+        nfused = [0]
+        def rhs_and_jac(t, y, sw, p = None):
+            nfused[0] += 1
+            return -p[0]*y if sw[0] else y, np.diag(-p[0]*np.ones(2))
+        cache = RHSJacobianCache(rhs_and_jac)
+        y = np.array([1.0, 2.0])
+        
+        assert cache.rhs(0.0, y, sw=[True], p=np.array([2.0])).tolist() == [-2.0, -4.0]
+        buf = cache.y
+        assert cache.jac(0.0, y, sw=[True], p=np.array([2.0]))[0, 0] == -2.0
+        assert nfused[0] == 1
+        assert cache.jac(0.0, y, [True], p=np.array([2.0]))[0, 0] == -2.0 #Other arguments
+        assert nfused[0] == 2
+        assert cache.jac(0.0, y, [True], p=np.array([3.0]))[0, 0] == -3.0
+        assert nfused[0] == 3
+        assert cache.jac(0.0, y, [False], p=np.array([3.0]))[0, 0] == -3.0
+        assert nfused[0] == 4
+        
+        y[0] = 0.0 #The solver buffer is changed in-place
+        cache.jac(0.0, y, [False], p=np.array([3.0]))
+        assert nfused[0] == 5
+        assert cache.y is buf
+
+    def test_bandwidths(self):
+        """
+        This tests the half-bandwidths of the BAND linear solvers, from the options and from a pattern.
+        """
+        pattern = sps.diags([np.ones(4), np.ones(5), np.ones(3)], [-1, 0, 2], format="csc")
+        assert get_bandwidths({"mupper": None, "mlower": None}, pattern, 5) == (2, 1)
+        assert get_bandwidths({"mupper": 1, "mlower": None}, pattern, 5) == (1, 1)
+        assert get_bandwidths({"mupper": 7, "mlower": 0}, None, 5) == (4, 0)
+        with pytest.raises(AssimuloException, match = "half-bandwidths"):
+            get_bandwidths({"mupper": 1, "mlower": None}, None, 5)
+        with pytest.raises(ValueError):
+            get_bandwidths({"mupper": None, "mlower": None}, None, 5, ValueError)
+        
+        assert check_bandwidth(None) is None
+        assert check_bandwidth(3.0) == 3
+        with pytest.raises(AssimuloException):
+            check_bandwidth(-1)
+        with pytest.raises(AssimuloException):
+            check_bandwidth("band")
+
+    def test_column_coloring(self):
+        """
+        This tests that columns of the same color have no common row.
+        """
+        pattern = sps.random(30, 30, density=0.1, format="csc", random_state=1) + sps.eye(30)
+        colors = column_coloring(pattern)
+        assert len(colors) == 30
+        structure = (pattern != 0).astype(int)
+        for c in range(colors.max() + 1):
+            assert structure[:, colors == c].sum(axis=1).max() <= 1
@@ -19,6 +19,9 @@ import pytest
 import numpy as np
 from assimulo.problem import Explicit_Problem, Implicit_Problem
 from assimulo.solvers import Radau5DAE, Dopri5, RodasODE
+from assimulo.solvers import RungeKutta34, RungeKutta4, ExplicitEuler, ImplicitEuler
+from assimulo.solvers.radau5 import Radau5ODE, _Radau5ODE
+from assimulo.exception import AssimuloException
 
 def res(t,y,yd,sw):
     return np.array([yd+y])
@@ -63,3 +66,50 @@ class Test_Solvers:
         t,y = solver.simulate(2,33)
         
         assert y[-1][0] == pytest.approx(0.135, abs = 1e-3)
+
+    @pytest.mark.parametrize("solver", [Dopri5, RodasODE, Radau5ODE])
+    def test_step_schedule(self, solver):
+        """
+        This tests that a recorded step-size sequence is followed when replayed.
+        """
+        prob = Explicit_Problem(lambda t, y: np.array([y[1], 1.0*(1.0 - y[0]**2)*y[1] - y[0]]), [2.0, 0.0])
+        sim = solver(prob)
+        sim.verbosity = 0
+        sim.record_steps = True
+        sim.simulate(2.0)
+        assert len(sim.step_times) > 0
+        
+        prob_pert = Explicit_Problem(lambda t, y: np.array([y[1], 1.01*(1.0 - y[0]**2)*y[1] - y[0]]), [2.0, 0.0])
+        sim_pert = solver(prob_pert)
+        sim_pert.verbosity = 0
+        sim_pert.record_steps = True
+        sim_pert.step_schedule = sim.step_times
+        sim_pert.simulate(2.0)
+        assert sim_pert.step_times == pytest.approx(sim.step_times)
+        
+        with pytest.raises(AssimuloException):
+            sim_pert.step_schedule = [1.0, 0.5]
+
+    @pytest.mark.parametrize("solver", [Dopri5, RungeKutta34, RungeKutta4, RodasODE,
+                                        ExplicitEuler, ImplicitEuler, Radau5ODE, _Radau5ODE])
+    def test_rhs_out(self, solver):
+        """
+        This tests that a rhs with the keyword out is evaluated in-place.
+        """
+        nout = [0]
+        def vdp(t, y, out=None):
+            if out is None:
+                return np.array([y[1], 1.0*(1.0 - y[0]**2)*y[1] - y[0]])
+            nout[0] += 1
+            out[0] = y[1]
+            out[1] = 1.0*(1.0 - y[0]**2)*y[1] - y[0]
+        
+        sim_ref = solver(Explicit_Problem(lambda t, y: vdp(t, y), [2.0, 0.0]))
+        sim_ref.verbosity = 0
+        sim_ref.simulate(1.0)
+        
+        sim = solver(Explicit_Problem(vdp, [2.0, 0.0]))
+        sim.verbosity = 0
+        sim.simulate(1.0)
+        assert nout[0] > 0
+        assert sim.y_sol[-1] == pytest.approx(sim_ref.y_sol[-1], rel = 1e-10)
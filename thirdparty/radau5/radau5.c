@@ -5,10 +5,9 @@
 #include <stdio.h>
 #include <math.h>
 #include "radau5.h"
+#include "radau5_linsol.h"
 
 #ifdef __RADAU5_WITH_SUPERLU
-	#include "superlu_double.h"
-	#include "superlu_complex.h"
 	#include "superlu_util.h"
 #endif /*__RADAU5_WITH_SUPERLU*/
 
@@ -52,34 +51,26 @@ static int _radcor(radau_mem_t *rmem, int n, FP_CB_f fcn, void *fcn_EXT,
 			double *z1, double *z2, double *z3,
 			double *y0, double *scal,
 			double *f1, double *f2, double *f3,
-			double *fjac, double *e1, double *e2r, double *e2i,
+			double *fjac,
 			double *cont, double *werr);
 
-/* real LU and solution */
-static int _dec(int n, double *a, int *ip, int *ier);
-static int _sol(int n, double *a, double *b, int *ip);
-
-/* complex LU and solution */
-static int _decc(int n, double *ar, double *ai, int *ip, int *ier);
-static int _solc(int n, double *ar, double *ai, double *br, double *bi, int *ip);
-
-/* assemble real/complex linear systems and create LU decomposition */
-static int _decomr(radau_linsol_mem_t *mem, int n, double *fjac, double fac1, double *e1, int *ier);
-static int _decomc(radau_linsol_mem_t *mem, int n, double *fjac, double alphn, double betan,
-				   double *e2r, double *e2i, int *ier);
+static int _jac_band_fd(radau_mem_t *rmem, int n, FP_CB_f fcn, void *fcn_EXT, double x,
+				   double *y, double *y0, double *cont, double *ysafe, double *delt);
 
 /* LU solve */
 static int _slvrad(radau_mem_t *rmem, int n, double fac1, double alphn, double betan, 
-				   double *e1, double *e2r, double *e2i, 
 				   double *z1, double *z2, double *z3,
 				   double *f1, double *f2, double *f3);
 
+/* step-size to the next point of the step schedule */
+static double _scheduled_step(radau_mem_t *rmem, double x);
+
 /* local error estimation */
 static int _estrad(radau_mem_t *rmem, int n, double h,
 				   double dd1, double dd2, double dd3,
 				   FP_CB_f fcn, void *fcn_EXT,
 				   double *y0, double *y,
-				   double x,double *e1,
+				   double x,
 				   double *z1, double *z2, double *z3,
 				   double *cont, double *werr,
 				   double *f1, double *f2,
@@ -120,13 +111,19 @@ int radau5_solve(void *radau_mem, FP_CB_f fcn, void *fcn_EXT,
 
 /* RTOL,ATOL   RELATIVE AND ABSOLUTE ERROR TOLERANCES. VECTORS OF LENGTH N. */
 
-/* jac         External (dense) Jacobian function: J = jac(x, y) */
+/* jac         External (dense or banded) Jacobian function: J = jac(x, y) */
 /*             Only called if ijac = 1 && sparseLU == 0 in radau_setup_mem(...) */
+/*             The Krylov solver (maxl > 0 in radau_setup_mem(...)) requires ijac = 0, since */
+/*             it only uses Jacobian-vector products by directional differences of fcn */
+/*             A user-provided linear solver (see radau_set_linsol(...)) requires ijac = 0, since */
+/*             it evaluates the Jacobian itself */
 /*             Signature of function: (int n, double x, double *y, double *J, void *EXT) */
 /* 			   n = problem size */
 /* 			   x = time */
 /* 			   y = state vector, length n */
 /* 			   J (output) = evaluated result, vector of length n*n, column-major order */
+/* 			                banded (mljac >= 0 in radau_setup_mem(...)): vector of length (mljac + mujac + 1)*n, */
+/* 			                column-major order with J[i,j] stored at row mujac + i - j of column j */
 /* 			   EXT = optional extra input, see jac_EXT */
 /*             Negative returns are treated as FATAL ERRORS, positive ones as recoverable */
 
@@ -221,7 +218,12 @@ int radau5_solve(void *radau_mem, FP_CB_f fcn, void *fcn_EXT,
 		return RADAU_ERROR_INCONSISTENT_INPUT;
 	}
 
-	if (rmem->lin_sol->sparseLU && !ijac){
+	if (rmem->lin_sol->user_ops){
+		if (ijac){
+			sprintf(rmem->err_log, "The user-provided linear solver evaluates the Jacobian itself, but analytical Jacobian usage is enabled.");
+			return RADAU_ERROR_INCONSISTENT_INPUT;
+		}
+	}else if (rmem->lin_sol->sparseLU && !ijac){
 		sprintf(rmem->err_log, "sparseLU is set true, but analytical Jacobian usage is disabled.");
 		return RADAU_ERROR_INCONSISTENT_INPUT;
 	}
@@ -242,6 +244,21 @@ int radau5_solve(void *radau_mem, FP_CB_f fcn, void *fcn_EXT,
 		return RADAU_ERROR_INCONSISTENT_INPUT;
 	}
 
+	if (rmem->lin_sol->krylov && !rmem->lin_sol->user_ops){
+		if (ijac){
+			sprintf(rmem->err_log, "The Krylov solver is matrix-free, but analytical Jacobian usage is enabled.");
+			return RADAU_ERROR_INCONSISTENT_INPUT;
+		}
+		/* rhs function for the Jacobian-vector products */
+		rmem->lin_sol->fcn = (FP_CB_f)fcn;
+		rmem->lin_sol->fcn_EXT = fcn_EXT;
+	}
+
+	/* memory of the built-in dense linear solver, only allocated once used */
+	if (radau_linsol_alloc_dense(rmem) != RADAU_OK){
+		return RADAU_ERROR_UNEXPECTED_MALLOC_FAILURE;
+	}
+
 	/* POSSIBLE ADDITIONAL RETURN FLAG */
 	*solout_ret = 0;
 	/* -------- CALL TO CORE INTEGRATOR ------------ */
@@ -250,8 +267,7 @@ int radau5_solve(void *radau_mem, FP_CB_f fcn, void *fcn_EXT,
 					(FP_CB_solout)solout, solout_EXT, iout, solout_ret,
 					rmem->z1, rmem->z2, rmem->z3, rmem->y0,
 					rmem->scal, rmem->f1, rmem->f2, rmem->f3,
-					rmem->lin_sol->jac, rmem->lin_sol->e1, rmem->lin_sol->e2r, rmem->lin_sol->e2i, 
-					rmem->cont, rmem->werr);
+					rmem->lin_sol->jac, rmem->cont, rmem->werr);
 } /* radau5_solve */
 
 
@@ -263,7 +279,7 @@ static int _radcor(radau_mem_t *rmem, int n, FP_CB_f fcn, void *fcn_EXT,
 	double *z1, double *z2, double *z3,
 	double *y0, double *scal,
 	double *f1, double *f2, double *f3,
-	double *fjac, double *e1, double *e2r, double *e2i,
+	double *fjac,
 	double *cont, double *werr)
 {
 	int ret = RADAU_OK;
@@ -297,6 +313,9 @@ static int _radcor(radau_mem_t *rmem, int n, FP_CB_f fcn, void *fcn_EXT,
 	double hmaxn; /* maximum stepsize in current step */
 	double facgus;
 	double posneg; /* sign */
+	double hsched; /* step-size given by the step schedule, 0 if none */
+	int use_schedule; /* switch if step-sizes are taken from the step schedule */
+	int sched_step; /* switch if the current step-size is taken from the step schedule */
 
 	/* misc */
     double delt; /* perturbation in jacobian finite diffs */
@@ -321,9 +340,6 @@ static int _radcor(radau_mem_t *rmem, int n, FP_CB_f fcn, void *fcn_EXT,
     --atol;
     --werr;
     fjac -= 1 + n;
-    e2i -= 1 + n;
-    e2r -= 1 + n;
-    e1 -= 1 + n;
 
     posneg = copysign(1., *xend - *x);
     hmaxn = radau_min(radau5_abs(rmem->input->hmax), radau5_abs(*xend - *x));
@@ -332,6 +348,12 @@ static int _radcor(radau_mem_t *rmem, int n, FP_CB_f fcn, void *fcn_EXT,
     }
     *h__ = radau_min(radau5_abs(*h__), hmaxn);
     *h__ = copysign(*h__, posneg);
+    use_schedule = (rmem->input->step_schedule_len > 0) && (posneg > 0.);
+    hsched = use_schedule ? _scheduled_step(rmem, *x) : 0.;
+    sched_step = (hsched > 0.);
+    if (sched_step) {
+		*h__ = hsched;
+    }
     hold = *h__;
     reject = FALSE_;
     first = TRUE_;
@@ -364,7 +386,21 @@ L10:
 		goto L20; /* no new jacobian required; reuse old one*/
 	}
     rmem->stats->njac++;
-    if (ijac == 0) {
+	rmem->jac_valid = FALSE_; /* jacobian memory is overwritten below */
+    if (rmem->lin_sol->ops.jac) {
+		/* --- JACOBIAN IS HANDLED BY THE LINEAR SOLVER (MATRIX-FREE OR USER-PROVIDED) */
+		ier = (*rmem->lin_sol->ops.jac)(n, *x, &y[1], &y0[1], rmem->lin_sol->ops.EXT);
+		if (ier != RADAU_OK) {
+			goto L79;
+		}
+    } else if (ijac == 0 && rmem->lin_sol->banded) {
+		/* --- COMPUTE JACOBIAN MATRIX NUMERICALLY */
+		/* --- JACOBIAN IS BANDED */
+		ier = _jac_band_fd(rmem, n, fcn, fcn_EXT, *x, &y[1], &y0[1], &cont[1], &f1[1], &f2[1]);
+		if (ier != RADAU_OK) {
+			goto L79;
+		}
+    } else if (ijac == 0) {
 		/* --- COMPUTE JACOBIAN MATRIX NUMERICALLY */
 		/* --- JACOBIAN IS FULL */
 		for (i = 1; i <= n; ++i) {
@@ -413,26 +449,32 @@ L10:
 		}
     }
     rmem->jac_is_fresh = TRUE_; /* flag that Jacobian is freshly computed this timestep */
+	rmem->jac_valid = TRUE_; /* complete jacobian available, e.g., for warm starts */
 	rmem->new_jac_req = FALSE_; /* no new Jacobian required */
 /* --- COMPUTE THE MATRICES E1 AND E2 AND THEIR DECOMPOSITIONS */
 L20:
     rmem->fac1 = rmem->mconst->u1 / *h__;
-    _decomr(rmem->lin_sol, n, fjac, rmem->fac1, e1, &ier);
+    ret = (*rmem->lin_sol->ops.decomr)(n, rmem->fac1, &ier, rmem->lin_sol->ops.EXT);
+    if (ret != RADAU_OK) {
+		ier = ret;
+		goto L79;
+    }
     if (ier != 0) {
 		goto L185;
     }
 	rmem->alphn = rmem->mconst->alph / *h__;
     rmem->betan = rmem->mconst->beta / *h__;
-    _decomc(rmem->lin_sol, n, fjac, rmem->alphn, rmem->betan, e2r, e2i, &ier);
+    ret = (*rmem->lin_sol->ops.decomc)(n, rmem->alphn, rmem->betan, &ier, rmem->lin_sol->ops.EXT);
+    if (ret != RADAU_OK) {
+		ier = ret;
+		goto L79;
+    }
     if (ier != 0) {
 		goto L185;
     }
-	if (rmem->lin_sol->sparseLU){
-		#ifdef __RADAU5_WITH_SUPERLU
-			rmem->lin_sol->LU_with_fresh_jac = FALSE_; /* has once been used to create a decomposition now */
-		#endif /*__RADAU5_WITH_SUPERLU*/
+	if (!rmem->lin_sol->krylov || rmem->lin_sol->user_ops) {
+		rmem->stats->ludecomps++; /* increment LU decompositions counter, the Krylov solver only sets up its preconditioner */
 	}
-    rmem->stats->ludecomps++; /* increment LU decompositions counter */
 /* --- NEXT STEP */
 L30:
     rmem->stats->nsteps++;
@@ -521,11 +563,14 @@ L40:
 		z2[i] = ti21 * a1 + ti22 * a2 + ti23 * a3;
 		z3[i] = ti31 * a1 + ti32 * a2 + ti33 * a3;
     }
-    ier = _slvrad(rmem, n, rmem->fac1, rmem->alphn, rmem->betan, &e1[1 + n],
-			&e2r[1 + n], &e2i[1 + n],
+    ier = _slvrad(rmem, n, rmem->fac1, rmem->alphn, rmem->betan,
 			&z1[1], &z2[1], &z3[1], &f1[1], &f2[1], &f3[1]);
 	if (ier != 0){
-		goto L184;
+		if (rmem->lin_sol->sparseLU && !rmem->lin_sol->user_ops){
+			ret = ier;
+			goto L184;
+		}
+		goto L79; /* failure in a callback of the linear solver, e.g., the Jacobian-vector products or the preconditioner */
 	}
     ++newt;
     dyno = 0.;
@@ -580,11 +625,15 @@ L40:
     }
 	/* --- ERROR ESTIMATION */
     ret = _estrad(rmem, n, *h__, rmem->mconst->dd1, rmem->mconst->dd2, rmem->mconst->dd3, (FP_CB_f) fcn, fcn_EXT,
-				   &y0[1], &y[1], *x, &e1[1 + n],
+				   &y0[1], &y[1], *x,
 				   &z1[1], &z2[1], &z3[1], &cont[1], &werr[1], &f1[1], &f2[1],
 				   &err, first, reject);
-	if (ret < 0){
-		goto L184;
+	if (ret != RADAU_OK){
+		if (rmem->lin_sol->sparseLU && !rmem->lin_sol->user_ops){
+			goto L184;
+		}
+		ier = ret;
+		goto L79; /* failure in a callback of the linear solver */
 	}
 	/* --- COMPUTATION OF HNEW */
 	/* --- WE REQUIRE .2<=HNEW/H<=8. */
@@ -593,8 +642,10 @@ L40:
     hnew = *h__ / quot;
 	/* *** *** *** *** *** *** *** */
 	/*  IS THE ERROR SMALL ENOUGH ? */
+	/*  (ALWAYS ACCEPTED IF THE STEP-SIZE IS TAKEN FROM THE STEP SCHEDULE, */
+	/*   A REJECTED STEP OR A STEP AFTER THE LAST SCHEDULED POINT IS ERROR CONTROLLED) */
 	/* *** *** *** *** *** *** *** */
-    if (err < 1.) {
+    if (err < 1. || (sched_step && !reject)) {
 	/* --- STEP IS ACCEPTED */
 		first = FALSE_;
 		rmem->stats->naccpt++;
@@ -659,13 +710,18 @@ L40:
 			hnew = posneg * radau_min(radau5_abs(hnew), radau5_abs(*h__));
 		}
 		reject = FALSE_;
-		if ((*x + hnew / rmem->input->quot1 - *xend) * posneg >= 0.) {
+		hsched = use_schedule ? _scheduled_step(rmem, *x) : 0.;
+		sched_step = (hsched > 0.);
+		if (sched_step) {
+			hnew = hsched;
+		}
+		if ((*x + (hsched > 0. ? hnew * 1.0001 : hnew / rmem->input->quot1) - *xend) * posneg >= 0.) {
 			*h__ = *xend - *x;
 			last = TRUE_;
 		} else {
 			qt = hnew / *h__;
 			hhfac = *h__;
-			if (theta <= rmem->input->theta_jac_recomp && qt >= rmem->input->quot1 && qt <= rmem->input->quot2) {
+			if (theta <= rmem->input->theta_jac_recomp && (hsched > 0. ? hnew == *h__ : (qt >= rmem->input->quot1 && qt <= rmem->input->quot2))) {
 				goto L30;
 			}
 			*h__ = hnew;
@@ -805,396 +861,14 @@ int radau_get_cont_output(void *radau_mem, double x, double *out){
 	return RADAU_OK;
 } /* radau_get_cont_output */
 
-static int _dec(int n, double *a, int *ip, int *ier)
-{
-    int i, j, k, m;
-    double t;
-    int kp1;
-
-/* VERSION REAL DOUBLE PRECISION */
-/* ----------------------------------------------------------------------- */
-/*  MATRIX TRIANGULARIZATION BY GAUSSIAN ELIMINATION. */
-/*  INPUT.. */
-/*     N = ORDER OF MATRIX. */
-/*     A = MATRIX TO BE TRIANGULARIZED. */
-/*  OUTPUT.. */
-/*     A(I,J), I.LE.J = UPPER TRIANGULAR FACTOR, U . */
-/*     A(I,J), I.GT.J = MULTIPLIERS = LOWER TRIANGULAR FACTOR, I - L. */
-/*     IP(K), K.LT.N = INDEX OF K-TH PIVOT ROW. */
-/*     IP(N) = (-1)**(NUMBER OF INTERCHANGES) OR O . */
-/*     IER = 0 IF MATRIX A IS NONSINGULAR, OR K IF FOUND TO BE */
-/*           SINGULAR AT STAGE K. */
-/*  USE  SOL  TO OBTAIN SOLUTION OF LINEAR SYSTEM. */
-/*  DETERM(A) = IP(N)*A(1,1)*A(2,2)*...*A(N,N). */
-/*  IF IP(N)=O, A IS SINGULAR, SOL WILL DIVIDE BY ZERO. */
-
-/*  REFERENCE.. */
-/*     C. B. MOLER, ALGORITHM 423, LINEAR EQUATION SOLVER, */
-/*     C.A.C.M. 15 (1972), P. 274. */
-/* ----------------------------------------------------------------------- */
-    /* Parameter adjustments */
-    --ip;
-
-    /* Function Body */
-    *ier = 0;
-    ip[n] = 1;
-    if (n == 1) {
-		goto L70;
-    }
-    for (k = 1; k <= n - 1; ++k) {
-		kp1 = k + 1;
-		m = k;
-		for (i = kp1; i <= n; ++i) {
-			if (radau5_abs(a[i + k * n]) > radau5_abs(a[m + k * n])) {
-			m = i;
-			}
-		}
-		ip[k] = m;
-		t = a[m + k * n];
-		if (m == k) {
-			goto L20;
-		}
-		ip[n] = -ip[n];
-		a[m + k * n] = a[k + k * n];
-		a[k + k * n] = t;
-L20:
-		if (t == 0.) {
-			goto L80;
-		}
-		t = 1. / t;
-		for (i = kp1; i <= n; ++i) {
-			a[i + k * n] = -a[i + k * n] * t;
-		}
-		for (j = kp1; j <= n; ++j) {
-			t = a[m + j * n];
-			a[m + j * n] = a[k + j * n];
-			a[k + j * n] = t;
-			if (t == 0.) {
-				goto L45;
-			}
-			for (i = kp1; i <= n; ++i) {
-				a[i + j * n] += a[i + k * n] * t;
-			}
-L45:
-			;
-		}
-    }
-L70:
-    k = n;
-    if (a[n + n * n] == 0.) {
-		goto L80;
-    }
-    return RADAU_OK;
-L80:
-    *ier = k;
-    ip[n] = 0;
-    return RADAU_OK;
-} /* _dec */
-
-
-static int _sol(int n, double *a, double *b, int *ip)
-{
-    int i, k, m;
-    double t;
-    int kb, km1;
-
-/* VERSION REAL DOUBLE PRECISION */
-/* ----------------------------------------------------------------------- */
-/*  SOLUTION OF LINEAR SYSTEM, A*X = B . */
-/*  INPUT.. */
-/*    N = ORDER OF MATRIX. */
-/*    A = TRIANGULARIZED MATRIX OBTAINED FROM DEC. */
-/*    B = RIGHT HAND SIDE VECTOR. */
-/*    IP = PIVOT VECTOR OBTAINED FROM DEC. */
-/*  DO NOT USE IF DEC HAS SET IER .NE. 0. */
-/*  OUTPUT.. */
-/*    B = SOLUTION VECTOR, X . */
-/* ----------------------------------------------------------------------- */
-    /* Parameter adjustments */
-    --ip;
-    --b;
-    a -= 1 + n;
-
-    if (n == 1) {
-		goto L50;
-    }
-    for (k = 1; k <= n - 1; ++k) {
-		m = ip[k];
-		t = b[m];
-		b[m] = b[k];
-		b[k] = t;
-		for (i = k + 1; i <= n; ++i) {
-			b[i] += a[i + k * n] * t;
-		}
-    }
-    for (kb = 1; kb <= n - 1; ++kb) {
-		km1 = n - kb;
-		k = km1 + 1;
-		b[k] /= a[k + k * n];
-		t = -b[k];
-		for (i = 1; i <= km1; ++i) {
-			b[i] += a[i + k * n] * t;
-		}
-    }
-L50:
-    b[1] /= a[n + 1];
-    return RADAU_OK;
-} /* _sol */
-
-
-static int _decc(int n, double *ar, double *ai, int *ip, int *ier)
-{
-    int i, j, k, m;
-    double ti, tr;
-    int kp1;
-    double den, prodi, prodr;
-
-/* VERSION COMPLEX DOUBLE PRECISION */
-/* ----------------------------------------------------------------------- */
-/*  MATRIX TRIANGULARIZATION BY GAUSSIAN ELIMINATION */
-/*  ------ MODIFICATION FOR COMPLEX MATRICES -------- */
-/*  INPUT.. */
-/*     N = ORDER OF MATRIX. */
-/*     (AR, AI) = MATRIX TO BE TRIANGULARIZED. */
-/*  OUTPUT.. */
-/*     AR(I,J), I.LE.J = UPPER TRIANGULAR FACTOR, U ; REAL PART. */
-/*     AI(I,J), I.LE.J = UPPER TRIANGULAR FACTOR, U ; IMAGINARY PART. */
-/*     AR(I,J), I.GT.J = MULTIPLIERS = LOWER TRIANGULAR FACTOR, I - L. */
-/*                                                    REAL PART. */
-/*     AI(I,J), I.GT.J = MULTIPLIERS = LOWER TRIANGULAR FACTOR, I - L. */
-/*                                                    IMAGINARY PART. */
-/*     IP(K), K.LT.N = INDEX OF K-TH PIVOT ROW. */
-/*     IP(N) = (-1)**(NUMBER OF INTERCHANGES) OR O . */
-/*     IER = 0 IF MATRIX A IS NONSINGULAR, OR K IF FOUND TO BE */
-/*           SINGULAR AT STAGE K. */
-/*  USE  SOL  TO OBTAIN SOLUTION OF LINEAR SYSTEM. */
-/*  IF IP(N)=O, A IS SINGULAR, SOL WILL DIVIDE BY ZERO. */
-
-/*  REFERENCE.. */
-/*     C. B. MOLER, ALGORITHM 423, LINEAR EQUATION SOLVER, */
-/*     C.A.C.M. 15 (1972), P. 274. */
-/* ----------------------------------------------------------------------- */
-    /* Parameter adjustments */
-    --ip;
-
-    /* Function Body */
-    *ier = 0;
-    ip[n] = 1;
-    if (n == 1) {
-		goto L70;
-    }
-    for (k = 1; k <= n - 1; ++k) {
-		kp1 = k + 1;
-		m = k;
-		for (i = kp1; i <= n; ++i) {
-			if (radau5_abs(ar[i + k * n]) + radau5_abs(ai[i + k * n]) > radau5_abs(ar[m + k * n]) + radau5_abs(ai[m + k * n])) {
-				m = i;
-			}
-		}
-		ip[k] = m;
-		tr = ar[m + k * n];
-		ti = ai[m + k * n];
-		if (m == k) {
-			goto L20;
-		}
-		ip[n] = -ip[n];
-		ar[m + k * n] = ar[k + k * n];
-		ai[m + k * n] = ai[k + k * n];
-		ar[k + k * n] = tr;
-		ai[k + k * n] = ti;
-L20:
-		if (radau5_abs(tr) + radau5_abs(ti) == 0.) {
-			goto L80;
-		}
-		den = tr * tr + ti * ti;
-		tr /= den;
-		ti = -ti / den;
-		for (i = kp1; i <= n; ++i) {
-			prodr = ar[i + k * n] * tr - ai[i + k * n] * ti;
-			prodi = ai[i + k * n] * tr + ar[i + k * n] * ti;
-			ar[i + k * n] = -prodr;
-			ai[i + k * n] = -prodi;
-		}
-		for (j = kp1; j <= n; ++j) {
-			tr = ar[m + j * n];
-			ti = ai[m + j * n];
-			ar[m + j * n] = ar[k + j * n];
-			ai[m + j * n] = ai[k + j * n];
-			ar[k + j * n] = tr;
-			ai[k + j * n] = ti;
-			if (radau5_abs(tr) + radau5_abs(ti) == 0.) {
-				goto L48;
-			}
-			if (ti == 0.) {
-				for (i = kp1; i <= n; ++i) {
-					prodr = ar[i + k * n] * tr;
-					prodi = ai[i + k * n] * tr;
-					ar[i + j * n] += prodr;
-					ai[i + j * n] += prodi;
-				}
-				goto L48;
-			}
-			if (tr == 0.) {
-				for (i = kp1; i <= n; ++i) {
-					prodr = -ai[i + k * n] * ti;
-					prodi = ar[i + k * n] * ti;
-					ar[i + j * n] += prodr;
-					ai[i + j * n] += prodi;
-				}
-				goto L48;
-			}
-			for (i = kp1; i <= n; ++i) {
-				prodr = ar[i + k * n] * tr - ai[i + k * n] * ti;
-				prodi = ai[i + k * n] * tr + ar[i + k * n] * ti;
-				ar[i + j * n] += prodr;
-				ai[i + j * n] += prodi;
-			}
-L48:
-			;
-		}
-    }
-L70:
-    k = n;
-    if (radau5_abs(ar[n + n * n]) + radau5_abs(ai[n + n * n]) == 0.) {
-		goto L80;
-    }
-    return RADAU_OK;
-L80:
-    *ier = k;
-    ip[n] = 0;
-    return RADAU_OK;
-} /* _decc */
-
-
-static int _solc(int n, double *ar, double *ai, double *br, double *bi, int *ip)
-{
-    int i, k, m, kb;
-    double ti, tr;
-    int km1, kp1;
-    double den, prodi, prodr;
-
-/* VERSION COMPLEX DOUBLE PRECISION */
-/* ----------------------------------------------------------------------- */
-/*  SOLUTION OF LINEAR SYSTEM, A*X = B . */
-/*  INPUT.. */
-/*    N = ORDER OF MATRIX. */
-/*    (AR,AI) = TRIANGULARIZED MATRIX OBTAINED FROM DEC. */
-/*    (BR,BI) = RIGHT HAND SIDE VECTOR. */
-/*    IP = PIVOT VECTOR OBTAINED FROM DEC. */
-/*  DO NOT USE IF DEC HAS SET IER .NE. 0. */
-/*  OUTPUT.. */
-/*    (BR,BI) = SOLUTION VECTOR, X . */
-/* ----------------------------------------------------------------------- */
-    /* Parameter adjustments */
-    --ip;
-    --bi;
-    --br;
-    ai -= 1 + n;
-    ar -= 1 + n;
-
-    /* Function Body */
-    if (n == 1) {
-		goto L50;
-    }
-    for (k = 1; k <= n - 1; ++k) {
-		kp1 = k + 1;
-		m = ip[k];
-		tr = br[m];
-		ti = bi[m];
-		br[m] = br[k];
-		bi[m] = bi[k];
-		br[k] = tr;
-		bi[k] = ti;
-		for (i = kp1; i <= n; ++i) {
-			prodr = ar[i + k * n] * tr - ai[i + k * n] * ti;
-			prodi = ai[i + k * n] * tr + ar[i + k * n] * ti;
-			br[i] += prodr;
-			bi[i] += prodi;
-		}
-    }
-    for (kb = 1; kb <= n - 1; ++kb) {
-		km1 = n - kb;
-		k = km1 + 1;
-		den = ar[k + k * n] * ar[k + k * n] + ai[k + k * n] 
-			* ai[k + k * n];
-		prodr = br[k] * ar[k + k * n] + bi[k] * ai[k + k * n];
-		prodi = bi[k] * ar[k + k * n] - br[k] * ai[k + k * n];
-		br[k] = prodr / den;
-		bi[k] = prodi / den;
-		tr = -br[k];
-		ti = -bi[k];
-		for (i = 1; i <= km1; ++i) {
-			prodr = ar[i + k * n] * tr - ai[i + k * n] * ti;
-			prodi = ai[i + k * n] * tr + ar[i + k * n] * ti;
-			br[i] += prodr;
-			bi[i] += prodi;
-		}
-    }
-L50:
-    den = ar[n + 1] * ar[n + 1] + ai[n + 1] * ai[n + 1];
-    prodr = br[1] * ar[n + 1] + bi[1] * ai[n + 1];
-    prodi = bi[1] * ar[n + 1] - br[1] * ai[n + 1];
-    br[1] = prodr / den;
-    bi[1] = prodi / den;
-    return RADAU_OK;
-} /* _solc */
-
-
-static int _decomr(radau_linsol_mem_t *lmem, int n, double *fjac, double fac1, double *e1, int *ier)
-{
-    int i, j;
-
-	if(lmem->sparseLU){
-		#ifdef __RADAU5_WITH_SUPERLU
-			superlu_setup_d((SuperLU_aux_d*)lmem->slu_aux_d, fac1, lmem->jac, lmem->jac_indices, lmem->jac_indptr, lmem->LU_with_fresh_jac, lmem->nnz_actual);
-			*ier = superlu_factorize_d((SuperLU_aux_d*)lmem->slu_aux_d);
-		#endif /*__RADAU5_WITH_SUPERLU*/
-	}else{
-		for (j = 1; j <= n; ++j) {
-			for (i = 1; i <= n; ++i) {
-				e1[i + j * n] = -fjac[i + j * n];
-			}
-			e1[j + j * n] += fac1;
-		}
-		_dec(n, e1, lmem->ip1, ier);
-	}
-	return RADAU_OK;
-} /* _decomr */
-
-
-int _decomc(radau_linsol_mem_t *lmem, int n, double *fjac, double alphn, double betan,
-	double *e2r, double *e2i, int *ier)
-{
-    int i, j;
-
-	if (lmem->sparseLU){
-		#ifdef __RADAU5_WITH_SUPERLU
-			superlu_setup_z((SuperLU_aux_z*)lmem->slu_aux_z, alphn, betan, lmem->jac, lmem->jac_indices, lmem->jac_indptr, lmem->LU_with_fresh_jac, lmem->nnz_actual);
-			*ier = superlu_factorize_z((SuperLU_aux_z*)lmem->slu_aux_z);
-		#endif /*__RADAU5_WITH_SUPERLU*/
-	}else{
-		for (j = 1; j <= n; ++j) {
-			for (i = 1; i <= n; ++i) {
-				e2r[i + j * n] = -fjac[i + j * n];
-				e2i[i + j * n] = 0.;
-			}
-			e2r[j + j * n] += alphn;
-			e2i[j + j * n] = betan;
-		}
-		_decc(n, e2r, e2i, lmem->ip2, ier);
-	}
-	return RADAU_OK;
-} /* _decomc */
-
-
 static int _slvrad(radau_mem_t *rmem, int n, double fac1, double alphn, double betan, 
-	double *e1, double *e2r, double *e2i, 
 	double *z1, double *z2, double *z3,
 	double *f1, double *f2, double *f3)
 {
     int i;
     double s2, s3;
 	int ret = RADAU_OK;
+	radau_linsol_ops_t *ops = &rmem->lin_sol->ops;
 
     for (i = 0; i < n; ++i) {
 		s2 = -f2[i];
@@ -1204,26 +878,81 @@ static int _slvrad(radau_mem_t *rmem, int n, double fac1, double alphn, double b
 		z3[i] = z3[i] + s3 * alphn + s2 * betan;
     }
 
-	if (rmem->lin_sol->sparseLU){
-		#ifdef __RADAU5_WITH_SUPERLU
-			ret = superlu_solve_d((SuperLU_aux_d*)rmem->lin_sol->slu_aux_d, z1);
-			if (ret != 0) { return ret; }
-			ret = superlu_solve_z((SuperLU_aux_z*)rmem->lin_sol->slu_aux_z, z2, z3);
-		#endif /*__RADAU5_WITH_SUPERLU*/
-	}else{
-		_sol(n, e1, z1, rmem->lin_sol->ip1);
-    	_solc(n, e2r, e2i, z2, z3, rmem->lin_sol->ip2);
-	}
+	ret = (*ops->solr)(n, z1, ops->EXT);
+	if (ret != RADAU_OK) { return ret; }
+	ret = (*ops->solc)(n, z2, z3, ops->EXT);
 	rmem->stats->lusolves++; /* increment factorization counter */
 	return ret;
 } /* _slvrad */
 
 
+/* banded Jacobian by finite differences, the columns mljac + mujac + 1 apart are perturbed together */
+static int _jac_band_fd(radau_mem_t *rmem, int n, FP_CB_f fcn, void *fcn_EXT, double x,
+	double *y, double *y0, double *cont, double *ysafe, double *delt)
+{
+	radau_linsol_mem_t *lmem = rmem->lin_sol;
+	int mbjac = radau_min(lmem->mljac + lmem->mujac + 1, n);
+	int i, j, k, ier;
+
+	for (k = 0; k < mbjac; ++k) {
+		for (j = k; j < n; j += mbjac) {
+			ysafe[j] = y[j];
+			delt[j] = sqrt(rmem->input->uround * radau_max(1e-5, radau5_abs(y[j])));
+			y[j] = ysafe[j] + delt[j];
+		}
+		ier = (*fcn)(n, x, y, cont, fcn_EXT);
+		if (ier != RADAU_OK) {
+			/* retry with the perturbations in the opposite direction */
+			for (j = k; j < n; j += mbjac) {
+				delt[j] = -delt[j];
+				y[j] = ysafe[j] + delt[j];
+			}
+			ier = (*fcn)(n, x, y, cont, fcn_EXT);
+		}
+		for (j = k; j < n; j += mbjac) {
+			y[j] = ysafe[j];
+		}
+		if (ier != RADAU_OK) {
+			return ier;
+		}
+		for (j = k; j < n; j += mbjac) {
+			for (i = radau_max(0, j - lmem->mujac); i <= radau_min(n - 1, j + lmem->mljac); ++i) {
+				lmem->jac[lmem->mujac + i - j + j * lmem->ldjac] = (cont[i] - y0[i]) / delt[j];
+			}
+		}
+	}
+	return RADAU_OK;
+} /* _jac_band_fd */
+
+
+/* step-size from x to the first point of the step schedule after x, 0 if there is none */
+static double _scheduled_step(radau_mem_t *rmem, double x){
+	double *sched = rmem->input->step_schedule;
+	double tol = radau5_abs(x) * rmem->input->uround * 10.;
+	int lo = 0;
+	int hi = rmem->input->step_schedule_len;
+	int mid;
+
+	/* binary search for the first point larger than x (up to round-off) */
+	while (lo < hi) {
+		mid = (lo + hi) / 2;
+		if (sched[mid] - x <= tol) {
+			lo = mid + 1;
+		} else {
+			hi = mid;
+		}
+	}
+	if (lo >= rmem->input->step_schedule_len) {
+		return 0.;
+	}
+	return sched[lo] - x;
+} /* _scheduled_step */
+
 static int _estrad(radau_mem_t *rmem, int n, double h,
 	double dd1, double dd2, double dd3,
 	FP_CB_f fcn, void *fcn_EXT,
 	double *y0, double *y,
-	double x, double *e1,
+	double x,
 	double *z1, double *z2, double *z3,
 	double *cont, double *werr,
 	double *f1, double *f2,
@@ -1234,21 +963,16 @@ static int _estrad(radau_mem_t *rmem, int n, double h,
     double hee1 = dd1 / h;
     double hee2 = dd2 / h;
     double hee3 = dd3 / h;
+	radau_linsol_ops_t *ops = &rmem->lin_sol->ops;
 
 	for (i = 0; i < n; ++i) {
 		f2[i] = hee1 * z1[i] + hee2 * z2[i] + hee3 * z3[i];
 		cont[i] = f2[i] + y0[i];
 	}
 
-	if (rmem->lin_sol->sparseLU){
-		#ifdef __RADAU5_WITH_SUPERLU
-			ret = superlu_solve_d((SuperLU_aux_d*)rmem->lin_sol->slu_aux_d, cont);
-			if (ret < 0){
-				return ret;
-			}
-		#endif /*__RADAU5_WITH_SUPERLU*/
-	}else{
-		_sol(n, e1, cont, rmem->lin_sol->ip1);
+	ret = (*ops->solr)(n, cont, ops->EXT);
+	if (ret != RADAU_OK){
+		return ret;
 	}
 
     *err = 0.;
@@ -1271,15 +995,9 @@ static int _estrad(radau_mem_t *rmem, int n, double h,
 			cont[i] = f1[i] + f2[i];
 		}
 
-		if (rmem->lin_sol->sparseLU){
-			#ifdef __RADAU5_WITH_SUPERLU
-				ret = superlu_solve_d((SuperLU_aux_d*)rmem->lin_sol->slu_aux_d, cont);
-				if (ret < 0){
-					return ret;
-				}
-			#endif /*__RADAU5_WITH_SUPERLU*/
-		}else{
-			_sol(n, e1, cont, rmem->lin_sol->ip1);
+		ret = (*ops->solr)(n, cont, ops->EXT);
+		if (ret != RADAU_OK){
+			return ret;
 		}
 
 		*err = 0.;
@@ -27,16 +27,32 @@ typedef int (*FP_CB_f)(int, double, double*, double*, void*);
 typedef int (*FP_CB_jac)(int, double, double*, double*, void*);
 typedef int (*FP_CB_solout)(int, double, double*, double*, double*, int, void*);
 typedef int (*FP_CB_jac_sparse)(int, double, double*, int*, double*, int*, int*, void*);
+typedef int (*FP_CB_prec_solve)(int, double, double*, double*, double*, double*, double, double, void*);
+typedef int (*FP_CB_prec_setup)(int, double, double*, double*, int, double, void*);
+
+/* FP_LS = FunctionPointer_LinearSolver, operations of a linear solver, see radau_set_linsol in radau5_io.c */
+typedef int (*FP_LS_jac)(int, double, double*, double*, void*);
+typedef int (*FP_LS_decomr)(int, double, int*, void*);
+typedef int (*FP_LS_decomc)(int, double, double, int*, void*);
+typedef int (*FP_LS_solr)(int, double*, void*);
+typedef int (*FP_LS_solc)(int, double*, double*, void*);
+
+/* FP_LAPACK = FunctionPointer to LAPACK (?getrf, ?getrs) routines, with Fortran calling convention */
+/* complex matrices and vectors are stored interleaved as (real, imag) pairs of doubles */
+typedef void (*FP_LAPACK_getrf)(int*, int*, double*, int*, int*, int*);
+typedef void (*FP_LAPACK_getrs)(char*, int*, int*, double*, int*, int*, double*, int*, int*);
 
 /* forward declarations of data structures */
 struct radau_mem_t;
 struct radau_linsol_mem_t;
+struct radau_linsol_ops_t;
 struct radau_stats_t;
 struct radau_inputs_t;
 struct radau_math_const_t;
 
 /* shorthands */
 typedef struct radau_linsol_mem_t radau_linsol_mem_t;
+typedef struct radau_linsol_ops_t radau_linsol_ops_t;
 typedef struct radau_stats_t radau_stats_t;
 typedef struct radau_inputs_t radau_inputs_t;
 typedef struct radau_math_const_t radau_math_const_t;
@@ -85,6 +101,7 @@ struct radau_mem_t{
     double faccon; /* factor tracked over several timestep to track jacobian recomputes in newton */
 
 	int new_jac_req; /* flag if new jacobian is required */
+	int jac_valid; /* flag if jacobian memory holds a complete jacobian, used for warm starts */
 
 	/* need to be stored in case LU factorization from previous solve calls is used */
 	double fac1; /* diagonal factor for last real LU factorization */
@@ -92,17 +109,58 @@ struct radau_mem_t{
 	double betan; /* complex diagonal factor for last complex LU factorization */
 };
 
+/* Operations of a linear solver, for the real and complex systems with */
+/* E1 = fac1*I - J and E2 = (alphn + i*betan)*I - J in the Newton iteration */
+struct radau_linsol_ops_t{
+	FP_LS_jac jac; /* new Jacobian at (x, y), fy = f(x, y), NULL = the Jacobian is computed by Radau5 */
+	FP_LS_decomr decomr; /* decomposition of E1, ier (output) != 0 if singular */
+	FP_LS_decomc decomc; /* decomposition of E2, ier (output) != 0 if singular */
+	FP_LS_solr solr; /* solution of E1*x = b, b is overwritten with x */
+	FP_LS_solc solc; /* solution of E2*x = b, b = br + i*bi is overwritten with x */
+	void *EXT; /* extra input to the operations, the Radau memory for the built-in linear solvers */
+};
+
 /* Struct for linear solver related memory info */
 struct radau_linsol_mem_t{
 	int n; /* problem size */
-	int LU_with_fresh_jac; /* flag to superLU, if jacobian is fresh */
+	int LU_with_fresh_jac; /* flag to superLU (and the Krylov preconditioner setup), if jacobian is fresh */
 	int sparseLU; /* flag if using sparse solver */
+	int banded; /* flag if using banded solver */
 	double *jac; /* both dense and sparse */
 
+	/* operations of the built-in linear solver (see radau5_linsol.c) or of a user-provided one */
+	radau_linsol_ops_t ops;
+	int user_ops; /* flag if ops are user-provided, see radau_set_linsol */
+
 	/* DENSE */
 	double *e1, *e2r, *e2i; /* dense LU */
 	int *ip1, *ip2; /* dense LU pivots */
 
+	/* DENSE with LAPACK, NULL pointers = built-in dec/sol routines */
+	FP_LAPACK_getrf dgetrf, zgetrf;
+	FP_LAPACK_getrs dgetrs, zgetrs;
+	double *e2c; /* complex matrix E2, interleaved for zgetrf */
+	double *zwork; /* complex right-hand side, interleaved for zgetrs */
+
+	/* BANDED, using jac, e1, e2r, e2i and ip1, ip2 in band storage */
+	int mljac, mujac; /* lower and upper bandwidth of the Jacobian */
+	int ldjac, lde; /* leading dimensions of jac (mljac + mujac + 1) and e1, e2r, e2i (2*mljac + mujac + 1) */
+
+	/* KRYLOV, matrix-free GMRES with the Jacobian-vector products J*v ~ (f(xkry, ykry + sig*v) - fkry)/sig */
+	int krylov; /* flag if using the Krylov solver */
+	int maxl; /* maximal dimension of the Krylov subspace */
+	double krylov_tol; /* factor on the Newton tolerance for the linear residuals */
+	FP_CB_f fcn; void *fcn_EXT; /* rhs function for the Jacobian-vector products, set in radau5_solve */
+	FP_CB_prec_solve prec_solve; /* optional preconditioner solve, NULL = no preconditioning */
+	FP_CB_prec_setup prec_setup; /* optional preconditioner setup */
+	void *prec_EXT; /* extra input to the preconditioner callback functions */
+	double xkry, ykry_norm; /* point of the Jacobian-vector products and rms norm of ykry */
+	double *ykry, *fkry; /* state and rhs at the point of the Jacobian-vector products */
+	double *kv; /* Krylov basis, maxl + 1 vectors of length 2*n */
+	double *khes; /* Hessenberg matrix, (maxl + 1) x maxl */
+	double *kgiv, *kg; /* Givens rotations and (rotated) residual vector */
+	double *kwork; /* work array of length 6*n */
+
 	/* sparse LU with SUPERLU */
 	int nnz, nproc, nnz_actual;
     int *jac_indices, *jac_indptr; /* sparse structure info */
@@ -123,6 +181,13 @@ struct radau_stats_t{
 	/* one LU decomp/sol includes both the real&complex LU*/
 	int ludecomps; /* LU decompositions */
 	int lusolves; /* LU solves */
+
+	/* Krylov solver */
+	int nliters; /* linear (GMRES) iterations */
+	int nlcfails; /* linear convergence failures */
+	int njvevals; /* rhs function evals in Jacobian-vector products */
+	int nprecs; /* preconditioner solves */
+	int nprecsetups; /* preconditioner setups */
 };
 
 
@@ -144,6 +209,8 @@ struct radau_inputs_t{
 	/* pred_step_control != 0; : CLASSICAL STEP SIZE CONTROL */
 	/* = 0 is considered safer, while != 0 may often yield slightly faster runs for simple problems*/
 	int pred_step_control;
+	int warm_start; /* switch for keeping the jacobian over radau_reinit calls */
+	int step_schedule_len; /* number of points in step_schedule, 0 = step-size control by error estimate */
 	int hmax_set; /* flag if hmax has been set manually */
 	int fnewt_set; /* flag if fnewt has been set manually */
 
@@ -154,6 +221,7 @@ struct radau_inputs_t{
 	double quot1, quot2; /* quot1; if quot1 < HNEW/HOLD < quot2, stepsize is not changed */
 	double hmax; /* maximal step-size */
 	double fac_lower, fac_upper; /* maximal limit for step-size (in|de)crease */
+	double *step_schedule; /* increasing time-points at which steps are to end, replaces step-size control */
 };
 
 /* structure of (computed) mathematical constants inside Radau5 */
@@ -1,4 +1,5 @@
 #include "radau5_io.h"
+#include "radau5_linsol.h"
 #include <stdlib.h>
 #include <stdio.h>
 #include <math.h>
@@ -12,7 +13,7 @@
 #define FALSE_ (0)
 
 /* forward declarations of private functions */
-static int  _radau_setup_linsol_mem(radau_mem_t *rmem, int n, int sparseLU, int nprocs, int nnz);
+static int  _radau_setup_linsol_mem(radau_mem_t *rmem, int n, int sparseLU, int nprocs, int nnz, int mljac, int mujac, int maxl);
 static void _radau_setup_math_consts(radau_math_const_t* mconst);
 static void _radau_reset_stats(radau_stats_t *mem);
 static int  _radau_set_default_inputs(radau_inputs_t **mem_out);
@@ -22,7 +23,7 @@ static void _free_radau_stats_mem(radau_stats_t **mem);
 static void free_radau_inputs_mem(radau_inputs_t **mem);
 
 /* setup radau memory structure with inputs that are required to be fixed. */
-int radau_setup_mem(int n, int sparseLU, int nprocs, int nnz, void **mem_out){
+int radau_setup_mem(int n, int sparseLU, int nprocs, int nnz, int mljac, int mujac, int maxl, void **mem_out){
 	radau_mem_t *rmem;
 	int ret = RADAU_OK;
 	rmem = (radau_mem_t*)malloc(sizeof(radau_mem_t));
@@ -63,7 +64,7 @@ int radau_setup_mem(int n, int sparseLU, int nprocs, int nnz, void **mem_out){
 	_radau_setup_math_consts(rmem->mconst);
 
 	/* Setup linear solver */
-	ret = _radau_setup_linsol_mem(rmem, n, sparseLU, nprocs, nnz);
+	ret = _radau_setup_linsol_mem(rmem, n, sparseLU, nprocs, nnz, mljac, mujac, maxl);
 	if (ret < 0){ return ret;}
 
 	/* Setup stats */
@@ -79,6 +80,8 @@ int radau_setup_mem(int n, int sparseLU, int nprocs, int nnz, void **mem_out){
 	ret = _radau_set_default_inputs(&rmem->input);
 	if (ret < 0){ return ret;}
 
+	rmem->jac_valid = FALSE_; /* no jacobian computed yet */
+
     ret = radau_reinit((void*)rmem);
     if (ret < 0){ return ret;}
 
@@ -107,7 +110,8 @@ int radau_reinit(void *radau_mem){
 	rmem->erracc = .01;
     rmem->faccon = 1;
 
-	rmem->new_jac_req = TRUE_; /* by default: require new Jacobian  */
+	/* by default: require new Jacobian, with warm start: re-use previous one if available */
+	rmem->new_jac_req = (rmem->input->warm_start && rmem->jac_valid) ? FALSE_ : TRUE_;
 
 	rmem->fac1 = 0;
 	rmem->alphn = 0;
@@ -132,6 +136,20 @@ int radau_get_stats(void *radau_mem, int *nfcn, int *njac, int *nsteps, int *nac
 	return RADAU_OK;
 } /* radau_get_stats */
 
+/* returns the statistics of the Krylov solver, e.g., number of linear iterations */
+int radau_get_krylov_stats(void *radau_mem, int *nliters, int *nlcfails, int *njvevals, int *nprecs, int *nprecsetups){
+	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
+	if (!rmem){ return RADAU_ERROR_MEM_NULL;}
+
+	*nliters = rmem->stats->nliters;
+	*nlcfails = rmem->stats->nlcfails;
+	*njvevals = rmem->stats->njvevals;
+	*nprecs = rmem->stats->nprecs;
+	*nprecsetups = rmem->stats->nprecsetups;
+
+	return RADAU_OK;
+} /* radau_get_krylov_stats */
+
 /* Get a detailed error message */
 char *radau_get_err_msg(void *radau_mem){
 	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
@@ -188,6 +206,15 @@ int radau_set_pred_step_control(void *radau_mem, int val){
 	return RADAU_OK;
 } /* radau_set_pred_step_control */
 
+/* Set warm_start parameter; keep jacobian over radau_reinit calls */
+int radau_set_warm_start(void *radau_mem, int val){
+	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
+	if (!rmem){ return RADAU_ERROR_MEM_NULL;}
+
+	rmem->input->warm_start = (val != 0) ? TRUE_ : FALSE_;
+	return RADAU_OK;
+} /* radau_set_warm_start */
+
 /* Set safety factor in timestep control */
 int radau_set_step_size_safety(void *radau_mem, double val){
 	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
@@ -317,6 +344,146 @@ int radau_set_fac_upper(void *radau_mem, double val){
 	return RADAU_OK;
 } /* radau_set_fac_upper */
 
+/* Set time-points at which the steps are to end, n = 0 restores the step-size control */
+int radau_set_step_schedule(void *radau_mem, double *times, int n){
+	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
+	int i;
+	if (!rmem){ return RADAU_ERROR_MEM_NULL;}
+
+	if (n < 0){
+		sprintf(rmem->err_log, "Length of the step schedule must be nonnegative, received n = %i.", n);
+		return RADAU_ERROR_INCONSISTENT_INPUT;
+	}
+	for (i = 1; i < n; ++i){
+		if (times[i] <= times[i-1]){
+			sprintf(rmem->err_log, "Step schedule must be strictly increasing, received %g after %g.", times[i], times[i-1]);
+			return RADAU_ERROR_INCONSISTENT_INPUT;
+		}
+	}
+
+	free(rmem->input->step_schedule);
+	rmem->input->step_schedule = NULL;
+	rmem->input->step_schedule_len = 0;
+	if (n > 0){
+		rmem->input->step_schedule = (double*)malloc(n*sizeof(double));
+		if (!rmem->input->step_schedule){
+			sprintf(rmem->err_log, MSG_MALLOC_FAIL);
+			return RADAU_ERROR_UNEXPECTED_MALLOC_FAILURE;
+		}
+		for (i = 0; i < n; ++i){
+			rmem->input->step_schedule[i] = times[i];
+		}
+		rmem->input->step_schedule_len = n;
+	}
+	return RADAU_OK;
+} /* radau_set_step_schedule */
+
+/* Set LAPACK routines for the dense LU decompositions, NULL pointers restore the built-in routines */
+int radau_set_lapack(void *radau_mem, FP_LAPACK_getrf dgetrf, FP_LAPACK_getrs dgetrs, FP_LAPACK_getrf zgetrf, FP_LAPACK_getrs zgetrs){
+	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
+	radau_linsol_mem_t *lmem;
+	int n;
+	if (!rmem){ return RADAU_ERROR_MEM_NULL;}
+	lmem = rmem->lin_sol;
+	n = lmem->n;
+
+	lmem->dgetrf = 0;
+	lmem->dgetrs = 0;
+	lmem->zgetrf = 0;
+	lmem->zgetrs = 0;
+	if (lmem->sparseLU || lmem->banded || lmem->krylov || !dgetrf || !dgetrs || !zgetrf || !zgetrs){
+		return RADAU_OK;
+	}
+
+	if (!lmem->e2c){
+		lmem->e2c = (double*)calloc(2*n*n, sizeof(double));
+		lmem->zwork = (double*)calloc(2*n, sizeof(double));
+		if (!lmem->e2c || !lmem->zwork){
+			sprintf(rmem->err_log, MSG_MALLOC_FAIL);
+			return RADAU_ERROR_UNEXPECTED_MALLOC_FAILURE;
+		}
+	}
+	lmem->dgetrf = dgetrf;
+	lmem->dgetrs = dgetrs;
+	lmem->zgetrf = zgetrf;
+	lmem->zgetrs = zgetrs;
+	return RADAU_OK;
+} /* radau_set_lapack */
+
+/* Set factor on the Newton tolerance, which the residuals of the Krylov solver have to satisfy */
+int radau_set_krylov_tol(void *radau_mem, double val){
+	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
+	if (!rmem){ return RADAU_ERROR_MEM_NULL;}
+
+	if (val <= 0. || val >= 1.){
+		sprintf(rmem->err_log, "Input for krylov_tol must be between 0 and 1, received = %g.", val);
+		return RADAU_ERROR_INCONSISTENT_INPUT;
+	}else{
+		rmem->lin_sol->krylov_tol = val;
+	}
+	return RADAU_OK;
+} /* radau_set_krylov_tol */
+
+/* Set preconditioner of the Krylov solver, NULL for prec_solve = no preconditioning */
+/* prec_solve  (int n, double x, double *y, double *fy, double *r, double *z, double gamma, double delta, void *EXT) */
+/*             approximately solves (I - gamma*J) z = r, with J the Jacobian at (x, y), fy = f(x, y), */
+/*             delta = tolerance on the weighted rms norm of the residual */
+/* prec_setup  (int n, double x, double *y, double *fy, int jok, double gamma, void *EXT), optional */
+/*             prepares the preconditioner for gamma, called before the solves with a new step-size */
+/*             jok = 0 after the point (x, y) of the Jacobian has changed */
+/* Negative returns are treated as FATAL ERRORS, positive ones as recoverable */
+int radau_set_prec(void *radau_mem, FP_CB_prec_solve prec_solve, FP_CB_prec_setup prec_setup, void *prec_EXT){
+	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
+	if (!rmem){ return RADAU_ERROR_MEM_NULL;}
+
+	rmem->lin_sol->prec_solve = prec_solve;
+	rmem->lin_sol->prec_setup = prec_solve ? prec_setup : 0;
+	rmem->lin_sol->prec_EXT = prec_EXT;
+	return RADAU_OK;
+} /* radau_set_prec */
+
+/* Set a user-provided linear solver, which replaces the built-in one, NULL for decomr restores the built-in one */
+/* The linear solver evaluates (or approximates) the Jacobian J itself, hence it requires ijac = 0 in radau5_solve(...) */
+/* jac     (int n, double x, double *y, double *fy, void *EXT) */
+/*         called when a new Jacobian is required at (x, y), fy = f(x, y) */
+/* decomr  (int n, double fac1, int *ier, void *EXT) */
+/*         decomposition of E1 = fac1*I - J, ier (output) = 0, or in [1, n] if E1 is singular */
+/* decomc  (int n, double alphn, double betan, int *ier, void *EXT) */
+/*         decomposition of E2 = (alphn + i*betan)*I - J, ier (output) = 0, or in [1, n] if E2 is singular */
+/* solr    (int n, double *b, void *EXT) */
+/*         solves E1*x = b, b is overwritten with x */
+/* solc    (int n, double *br, double *bi, void *EXT) */
+/*         solves E2*x = b, b = br + i*bi is overwritten with x */
+/* Negative returns are treated as FATAL ERRORS, positive ones as recoverable */
+int radau_set_linsol(void *radau_mem, FP_LS_jac jac, FP_LS_decomr decomr, FP_LS_decomc decomc, FP_LS_solr solr, FP_LS_solc solc, void *EXT){
+	radau_mem_t *rmem = (radau_mem_t*)radau_mem;
+	radau_linsol_ops_t ops_old;
+	if (!rmem){ return RADAU_ERROR_MEM_NULL;}
+	ops_old = rmem->lin_sol->ops;
+
+	if (!decomr){
+		radau_linsol_set_builtin(rmem);
+	}else if (!jac || !decomc || !solr || !solc){
+		sprintf(rmem->err_log, "All operations of a user-provided linear solver are required.");
+		return RADAU_ERROR_INCONSISTENT_INPUT;
+	}else{
+		rmem->lin_sol->ops.jac = jac;
+		rmem->lin_sol->ops.decomr = decomr;
+		rmem->lin_sol->ops.decomc = decomc;
+		rmem->lin_sol->ops.solr = solr;
+		rmem->lin_sol->ops.solc = solc;
+		rmem->lin_sol->ops.EXT = EXT;
+		rmem->lin_sol->user_ops = TRUE_;
+	}
+
+	/* the Jacobian kept for warm starts belongs to the previous linear solver */
+	if (ops_old.jac != rmem->lin_sol->ops.jac || ops_old.decomr != rmem->lin_sol->ops.decomr || ops_old.EXT != rmem->lin_sol->ops.EXT){
+		rmem->jac_valid = FALSE_;
+		rmem->new_jac_req = TRUE_;
+	}
+	return RADAU_OK;
+} /* radau_set_linsol */
+
 /* free all memory and delete structure */
 void radau_free_mem(void **radau_mem){
 	radau_mem_t *rmem = (radau_mem_t*) *radau_mem;
@@ -341,6 +508,7 @@ void radau_free_mem(void **radau_mem){
 	free_radau_inputs_mem(&rmem->input);
 
 	free(rmem);
+	*radau_mem = NULL;
 } /* radau_free_mem */
 
 /* setting up various computed mathematical constants used */
@@ -370,8 +538,7 @@ static void _radau_setup_math_consts(radau_math_const_t* mconst){
 } /* _radau_setup_math_consts */
 
 /* Setup linear solver related memory */
-static int _radau_setup_linsol_mem(radau_mem_t *rmem, int n, int sparseLU, int nprocs, int nnz){
-	int n_sq;
+static int _radau_setup_linsol_mem(radau_mem_t *rmem, int n, int sparseLU, int nprocs, int nnz, int mljac, int mujac, int maxl){
 	rmem->lin_sol = (radau_linsol_mem_t*)malloc(sizeof(radau_linsol_mem_t));
 	if (!rmem->lin_sol){
 		sprintf(rmem->err_log, MSG_MALLOC_FAIL);
@@ -383,10 +550,18 @@ static int _radau_setup_linsol_mem(radau_mem_t *rmem, int n, int sparseLU, int n
 		sprintf(rmem->err_log, "Problem size must be positive integer, received n = %i", n);
 		return RADAU_ERROR_INCONSISTENT_INPUT;
 	}
-	n_sq = n*n;
 
 	rmem->lin_sol->n = n;
 	rmem->lin_sol->sparseLU = sparseLU;
+	rmem->lin_sol->banded = (mljac >= 0 || mujac >= 0) ? TRUE_ : FALSE_;
+	rmem->lin_sol->mljac = mljac;
+	rmem->lin_sol->mujac = mujac;
+	rmem->lin_sol->ldjac = mljac + mujac + 1;
+	rmem->lin_sol->lde = 2*mljac + mujac + 1;
+	rmem->lin_sol->krylov = (maxl > 0) ? TRUE_ : FALSE_;
+	rmem->lin_sol->maxl = maxl;
+	rmem->lin_sol->krylov_tol = .05;
+	rmem->lin_sol->LU_with_fresh_jac = FALSE_;
 
 	/* initialize all pointers with 0, since we do not use all */
 	rmem->lin_sol->jac = 0;
@@ -395,12 +570,51 @@ static int _radau_setup_linsol_mem(radau_mem_t *rmem, int n, int sparseLU, int n
 	rmem->lin_sol->e2i = 0;
 	rmem->lin_sol->ip1 = 0;
 	rmem->lin_sol->ip2 = 0;
+	rmem->lin_sol->dgetrf = 0;
+	rmem->lin_sol->dgetrs = 0;
+	rmem->lin_sol->zgetrf = 0;
+	rmem->lin_sol->zgetrs = 0;
+	rmem->lin_sol->e2c = 0;
+	rmem->lin_sol->zwork = 0;
+	rmem->lin_sol->fcn = 0;
+	rmem->lin_sol->fcn_EXT = 0;
+	rmem->lin_sol->prec_solve = 0;
+	rmem->lin_sol->prec_setup = 0;
+	rmem->lin_sol->prec_EXT = 0;
+	rmem->lin_sol->ykry = 0;
+	rmem->lin_sol->fkry = 0;
+	rmem->lin_sol->kv = 0;
+	rmem->lin_sol->khes = 0;
+	rmem->lin_sol->kgiv = 0;
+	rmem->lin_sol->kg = 0;
+	rmem->lin_sol->kwork = 0;
 	rmem->lin_sol->jac_indices = 0;
 	rmem->lin_sol->jac_indptr = 0;
 
 	rmem->lin_sol->slu_aux_d = 0;
 	rmem->lin_sol->slu_aux_z = 0;
+	rmem->lin_sol->user_ops = FALSE_;
 	
+	if (rmem->lin_sol->banded){
+		if (sparseLU){
+			sprintf(rmem->err_log, "The banded and the sparse linear solver cannot be used together.");
+			return RADAU_ERROR_INCONSISTENT_INPUT;
+		}
+		if (mljac < 0 || mujac < 0 || mljac >= n || mujac >= n){
+			sprintf(rmem->err_log, "Bandwidths must be nonnegative and smaller than the problem size, received mljac = %i, mujac = %i", mljac, mujac);
+			return RADAU_ERROR_INCONSISTENT_INPUT;
+		}
+	}
+
+	if (maxl < 0){
+		sprintf(rmem->err_log, "Input maxl must be nonnegative, received maxl = %i", maxl);
+		return RADAU_ERROR_INCONSISTENT_INPUT;
+	}
+	if (rmem->lin_sol->krylov && (sparseLU || rmem->lin_sol->banded)){
+		sprintf(rmem->err_log, "The Krylov solver cannot be used together with the sparse or the banded linear solver.");
+		return RADAU_ERROR_INCONSISTENT_INPUT;
+	}
+
 	if(sparseLU){
 		#ifdef __RADAU5_WITH_SUPERLU
 			if (nnz < 0){
@@ -433,11 +647,11 @@ static int _radau_setup_linsol_mem(radau_mem_t *rmem, int n, int sparseLU, int n
 			return RADAU_ERROR_SUPERLU_NOT_ENABLED;
 		#endif /*__RADAU5_WITH_SUPERLU*/
 
-	}else{ /* DENSE */
-		rmem->lin_sol->jac = (double*)calloc(n_sq, sizeof(double));
-		rmem->lin_sol->e1  = (double*)calloc(n_sq, sizeof(double));
-		rmem->lin_sol->e2r = (double*)calloc(n_sq, sizeof(double));
-		rmem->lin_sol->e2i = (double*)calloc(n_sq, sizeof(double));
+	}else if (rmem->lin_sol->banded){ /* BANDED */
+		rmem->lin_sol->jac = (double*)calloc(rmem->lin_sol->ldjac*n, sizeof(double));
+		rmem->lin_sol->e1  = (double*)calloc(rmem->lin_sol->lde*n, sizeof(double));
+		rmem->lin_sol->e2r = (double*)calloc(rmem->lin_sol->lde*n, sizeof(double));
+		rmem->lin_sol->e2i = (double*)calloc(rmem->lin_sol->lde*n, sizeof(double));
 
 		rmem->lin_sol->ip1 = (int*)calloc(n, sizeof(int));
 		rmem->lin_sol->ip2 = (int*)calloc(n, sizeof(int));
@@ -446,7 +660,23 @@ static int _radau_setup_linsol_mem(radau_mem_t *rmem, int n, int sparseLU, int n
 			sprintf(rmem->err_log, MSG_MALLOC_FAIL);
 			return RADAU_ERROR_UNEXPECTED_MALLOC_FAILURE;
 		}
+	}else if (rmem->lin_sol->krylov){ /* KRYLOV, no matrices */
+		rmem->lin_sol->ykry  = (double*)calloc(n, sizeof(double));
+		rmem->lin_sol->fkry  = (double*)calloc(n, sizeof(double));
+		rmem->lin_sol->kv    = (double*)calloc(2*n*(maxl + 1), sizeof(double));
+		rmem->lin_sol->khes  = (double*)calloc((maxl + 1)*maxl, sizeof(double));
+		rmem->lin_sol->kgiv  = (double*)calloc(2*maxl, sizeof(double));
+		rmem->lin_sol->kg    = (double*)calloc(maxl + 1, sizeof(double));
+		rmem->lin_sol->kwork = (double*)calloc(6*n, sizeof(double));
+
+		if(!rmem->lin_sol->ykry || !rmem->lin_sol->fkry || !rmem->lin_sol->kv || !rmem->lin_sol->khes || !rmem->lin_sol->kgiv || !rmem->lin_sol->kg || !rmem->lin_sol->kwork){
+			sprintf(rmem->err_log, MSG_MALLOC_FAIL);
+			return RADAU_ERROR_UNEXPECTED_MALLOC_FAILURE;
+		}
 	}
+	/* DENSE: allocated on the first radau5_solve call, see radau_linsol_alloc_dense */
+
+	radau_linsol_set_builtin(rmem);
 	return RADAU_OK;
 } /* _radau_setup_linsol_mem */
 
@@ -459,6 +689,11 @@ static void _radau_reset_stats(radau_stats_t *rmem){
 	rmem->nreject = 0;
 	rmem->ludecomps = 0;
 	rmem->lusolves = 0;
+	rmem->nliters = 0;
+	rmem->nlcfails = 0;
+	rmem->njvevals = 0;
+	rmem->nprecs = 0;
+	rmem->nprecsetups = 0;
 } /* _radau_reset_stats */
 
 /* Initialize inputs structure and assign default values */
@@ -472,6 +707,7 @@ static int _radau_set_default_inputs(radau_inputs_t **input_out){
 
 	mem->newton_start_zero= FALSE_;
 	mem->pred_step_control = TRUE_;
+	mem->warm_start = FALSE_;
 
 	mem->hmax_set = FALSE_;
 	mem->fnewt_set = FALSE_;
@@ -487,6 +723,9 @@ static int _radau_set_default_inputs(radau_inputs_t **input_out){
 	mem->fac_lower = 5.;
 	mem->fac_upper = 0.125;
 
+	mem->step_schedule = NULL;
+	mem->step_schedule_len = 0;
+
 	*input_out = mem;
 	return RADAU_OK;
 } /* _radau_set_default_inputs */
@@ -502,6 +741,15 @@ static void _free_radau_linsol_mem(radau_linsol_mem_t **lin_sol_mem){
 	free(mem->e2i);
 	free(mem->ip1);
 	free(mem->ip2);
+	free(mem->e2c);
+	free(mem->zwork);
+	free(mem->ykry);
+	free(mem->fkry);
+	free(mem->kv);
+	free(mem->khes);
+	free(mem->kgiv);
+	free(mem->kg);
+	free(mem->kwork);
 
 	free(mem->jac_indices);
 	free(mem->jac_indptr);
@@ -527,5 +775,6 @@ static void free_radau_inputs_mem(radau_inputs_t **para_mem){
 	radau_inputs_t *mem = (radau_inputs_t*) *para_mem;
 	if(!mem){ return;}
 
+	free(mem->step_schedule);
 	free(mem);
 } /* free_radau_inputs_mem */
@@ -4,11 +4,15 @@
 #include "radau5_impl.h"
 
 /* setup radau memory structure with inputs that are required to be fixed. */
-int radau_setup_mem(int n, int sparseLU, int nprocs, int nnz, void **mem_out);
+/* mljac, mujac = lower and upper bandwidth of the Jacobian for the banded solver, -1 otherwise */
+/* maxl = maximal dimension of the Krylov subspace for the matrix-free Krylov solver, 0 otherwise */
+int radau_setup_mem(int n, int sparseLU, int nprocs, int nnz, int mljac, int mujac, int maxl, void **mem_out);
 /* re-initializes internal radau_mem, affects internal parameters & stats, but not inputs */
 int radau_reinit(void *radau_mem); 
 /* returns all solver statistics, e.g., as number of function evaluations */
 int radau_get_stats(void *radau_mem, int *nfcn, int *njac, int *nsteps, int *naccpt, int *nreject, int * ludecomps, int *lusolves);
+/* returns the statistics of the Krylov solver, e.g., number of linear iterations */
+int radau_get_krylov_stats(void *radau_mem, int *nliters, int *nlcfails, int *njvevals, int *nprecs, int *nprecsetups);
 /* Get a detailed error message */
 char *radau_get_err_msg(void *radau_mem);
 
@@ -19,6 +23,7 @@ int radau_set_nmax              (void *radau_mem, int val); /* maximal number of
 int radau_set_nmax_newton       (void *radau_mem, int val); /* max number of newton steps */
 int radau_set_newton_startn     (void *radau_mem, int val); /* newton starting strategy switch */
 int radau_set_pred_step_control (void *radau_mem, int val); /* predictive step-size control switch */
+int radau_set_warm_start        (void *radau_mem, int val); /* keep jacobian over radau_reinit switch */
 
 int radau_set_step_size_safety  (void *radau_mem, double val); /* safety factor in step-size control */
 int radau_set_uround            (void *radau_mem, double val); /* machine epsilon */
@@ -30,6 +35,18 @@ int radau_set_hmax              (void *radau_mem, double val); /* maximal step-s
 int radau_set_fac_lower         (void *radau_mem, double val); /* maximal factor for step-size decrease */
 int radau_set_fac_upper         (void *radau_mem, double val); /* maximal factor for step-size increase */
 
+int radau_set_step_schedule     (void *radau_mem, double *times, int n); /* time-points for steps to end, n = 0 to unset */
+
+/* LAPACK routines for the dense LU decompositions, NULL pointers restore the built-in routines */
+int radau_set_lapack(void *radau_mem, FP_LAPACK_getrf dgetrf, FP_LAPACK_getrs dgetrs, FP_LAPACK_getrf zgetrf, FP_LAPACK_getrs zgetrs);
+
+/* Krylov solver: factor on the Newton tolerance for the linear residuals, and optional preconditioner */
+int radau_set_krylov_tol(void *radau_mem, double val);
+int radau_set_prec(void *radau_mem, FP_CB_prec_solve prec_solve, FP_CB_prec_setup prec_setup, void *prec_EXT);
+
+/* user-provided linear solver, replacing the built-in one, NULL for decomr restores the built-in one */
+int radau_set_linsol(void *radau_mem, FP_LS_jac jac, FP_LS_decomr decomr, FP_LS_decomc decomc, FP_LS_solr solr, FP_LS_solc solc, void *EXT);
+
 /* free all memory and delete structure */
 void radau_free_mem(void **radau_mem);
 
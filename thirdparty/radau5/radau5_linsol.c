@@ -0,0 +1,1358 @@
+/* Built-in linear solvers of Radau5, for the real and complex linear systems with */
+/* E1 = fac1*I - J and E2 = (alphn + i*betan)*I - J in the Newton iteration, see radau_linsol_ops_t */
+/* The dense and banded LU routines are based on the f2c translation of radau_decsol.f, */
+/* hence matrices (double*) are stored in Fortran-style column major format */
+
+#include <stdlib.h>
+#include <stdio.h>
+#include <math.h>
+#include "radau5_linsol.h"
+
+#ifdef __RADAU5_WITH_SUPERLU
+	#include "superlu_double.h"
+	#include "superlu_complex.h"
+#endif /*__RADAU5_WITH_SUPERLU*/
+
+#define TRUE_ (1)
+#define FALSE_ (0)
+#define radau5_abs(x) ((x) >= 0 ? (x) : -(x))
+#define radau_min(a,b) ((a) <= (b) ? (a) : (b))
+#define radau_max(a,b) ((a) >= (b) ? (a) : (b))
+
+/* forward declarations of private functions */
+
+/* real LU and solution */
+static int _dec(int n, double *a, int *ip, int *ier);
+static int _sol(int n, double *a, double *b, int *ip);
+
+/* complex LU and solution */
+static int _decc(int n, double *ar, double *ai, int *ip, int *ier);
+static int _solc(int n, double *ar, double *ai, double *br, double *bi, int *ip);
+
+static int _decb(int n, int ndim, double *a, int ml, int mu, int *ip, int *ier);
+static int _solb(int n, int ndim, double *a, int ml, int mu, double *b, int *ip);
+
+static int _decbc(int n, int ndim, double *ar, double *ai, int ml, int mu, int *ip, int *ier);
+static int _solbc(int n, int ndim, double *ar, double *ai, int ml, int mu, double *br, double *bi, int *ip);
+
+static int _sol_lapack(radau_linsol_mem_t *lmem, int n, double *a, double *b);
+static int _solc_lapack(radau_linsol_mem_t *lmem, int n, double *br, double *bi);
+
+/* matrix-free Krylov (GMRES) solution of the real/complex linear systems */
+static void _krylov_set_point(radau_linsol_mem_t *lmem, int n, double x, double *y, double *fy);
+static int _krylov_jv(radau_mem_t *rmem, int n, double *v, double *jv);
+static int _krylov_matvec(radau_mem_t *rmem, int n, double alphn, double betan, double *v, double *av);
+static int _krylov_prec_setup(radau_mem_t *rmem, int n, double fac1);
+static int _krylov_prec(radau_mem_t *rmem, int n, double alphn, int m, double *r, double *z, double delta);
+static int _krylov_solve(radau_mem_t *rmem, int n, double alphn, double betan, double *br, double *bi);
+
+/* operations of the built-in linear solvers, EXT = radau memory */
+static int _decomr_dense(int n, double fac1, int *ier, void *EXT);
+static int _decomc_dense(int n, double alphn, double betan, int *ier, void *EXT);
+static int _solr_dense(int n, double *b, void *EXT);
+static int _solc_dense(int n, double *br, double *bi, void *EXT);
+
+static int _decomr_band(int n, double fac1, int *ier, void *EXT);
+static int _decomc_band(int n, double alphn, double betan, int *ier, void *EXT);
+static int _solr_band(int n, double *b, void *EXT);
+static int _solc_band(int n, double *br, double *bi, void *EXT);
+
+#ifdef __RADAU5_WITH_SUPERLU
+static int _decomr_superlu(int n, double fac1, int *ier, void *EXT);
+static int _decomc_superlu(int n, double alphn, double betan, int *ier, void *EXT);
+static int _solr_superlu(int n, double *b, void *EXT);
+static int _solc_superlu(int n, double *br, double *bi, void *EXT);
+#endif /*__RADAU5_WITH_SUPERLU*/
+
+static int _jac_krylov(int n, double x, double *y, double *fy, void *EXT);
+static int _decomr_krylov(int n, double fac1, int *ier, void *EXT);
+static int _decomc_krylov(int n, double alphn, double betan, int *ier, void *EXT);
+static int _solr_krylov(int n, double *b, void *EXT);
+static int _solc_krylov(int n, double *br, double *bi, void *EXT);
+
+/* set the operations of the built-in linear solver the memory has been set up for */
+void radau_linsol_set_builtin(radau_mem_t *rmem){
+	radau_linsol_mem_t *lmem = rmem->lin_sol;
+
+	lmem->ops.jac = 0; /* the Jacobian is computed by Radau5 */
+	lmem->ops.EXT = (void*)rmem;
+	if (lmem->sparseLU){
+		#ifdef __RADAU5_WITH_SUPERLU
+			lmem->ops.decomr = _decomr_superlu;
+			lmem->ops.decomc = _decomc_superlu;
+			lmem->ops.solr = _solr_superlu;
+			lmem->ops.solc = _solc_superlu;
+		#endif /*__RADAU5_WITH_SUPERLU*/
+	}else if (lmem->banded){
+		lmem->ops.decomr = _decomr_band;
+		lmem->ops.decomc = _decomc_band;
+		lmem->ops.solr = _solr_band;
+		lmem->ops.solc = _solc_band;
+	}else if (lmem->krylov){
+		lmem->ops.jac = _jac_krylov;
+		lmem->ops.decomr = _decomr_krylov;
+		lmem->ops.decomc = _decomc_krylov;
+		lmem->ops.solr = _solr_krylov;
+		lmem->ops.solc = _solc_krylov;
+	}else{
+		lmem->ops.decomr = _decomr_dense;
+		lmem->ops.decomc = _decomc_dense;
+		lmem->ops.solr = _solr_dense;
+		lmem->ops.solc = _solc_dense;
+	}
+	lmem->user_ops = FALSE_;
+} /* radau_linsol_set_builtin */
+
+/* allocate the memory of the built-in dense linear solver, if it is used and not allocated yet */
+int radau_linsol_alloc_dense(radau_mem_t *rmem){
+	radau_linsol_mem_t *lmem = rmem->lin_sol;
+	int n = lmem->n;
+
+	if (lmem->user_ops || lmem->sparseLU || lmem->banded || lmem->krylov || lmem->jac){
+		return RADAU_OK; /* not used or already allocated */
+	}
+	lmem->jac = (double*)calloc(n*n, sizeof(double));
+	lmem->e1  = (double*)calloc(n*n, sizeof(double));
+	lmem->e2r = (double*)calloc(n*n, sizeof(double));
+	lmem->e2i = (double*)calloc(n*n, sizeof(double));
+
+	lmem->ip1 = (int*)calloc(n, sizeof(int));
+	lmem->ip2 = (int*)calloc(n, sizeof(int));
+
+	if(!lmem->jac || !lmem->e1 || !lmem->e2r || !lmem->e2i || !lmem->ip1 || !lmem->ip2){
+		free(lmem->jac);
+		free(lmem->e1);
+		free(lmem->e2r);
+		free(lmem->e2i);
+		free(lmem->ip1);
+		free(lmem->ip2);
+		lmem->jac = 0;
+		lmem->e1 = 0;
+		lmem->e2r = 0;
+		lmem->e2i = 0;
+		lmem->ip1 = 0;
+		lmem->ip2 = 0;
+		sprintf(rmem->err_log, MSG_MALLOC_FAIL);
+		return RADAU_ERROR_UNEXPECTED_MALLOC_FAILURE;
+	}
+	return RADAU_OK;
+} /* radau_linsol_alloc_dense */
+
+/* DENSE, the real and complex LU decompositions with the built-in routines or LAPACK (see radau_set_lapack) */
+static int _decomr_dense(int n, double fac1, int *ier, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+	double *fjac = lmem->jac - (1 + n);
+	double *e1 = lmem->e1 - (1 + n);
+    int i, j;
+
+	for (j = 1; j <= n; ++j) {
+		for (i = 1; i <= n; ++i) {
+			e1[i + j * n] = -fjac[i + j * n];
+		}
+		e1[j + j * n] += fac1;
+	}
+	if (lmem->dgetrf){
+		(*lmem->dgetrf)(&n, &n, &e1[1 + n], &n, lmem->ip1, ier);
+	}else{
+		_dec(n, e1, lmem->ip1, ier);
+	}
+	return RADAU_OK;
+} /* _decomr_dense */
+
+
+static int _decomc_dense(int n, double alphn, double betan, int *ier, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+	double *fjac = lmem->jac - (1 + n);
+	double *e2r = lmem->e2r - (1 + n);
+	double *e2i = lmem->e2i - (1 + n);
+	double *e2c;
+    int i, j;
+
+	if (lmem->zgetrf){
+		/* E2 is assembled directly in the interleaved complex storage of LAPACK */
+		e2c = lmem->e2c - 2 * (1 + n);
+		for (j = 1; j <= n; ++j) {
+			for (i = 1; i <= n; ++i) {
+				e2c[2 * (i + j * n)] = -fjac[i + j * n];
+				e2c[2 * (i + j * n) + 1] = 0.;
+			}
+			e2c[2 * (j + j * n)] += alphn;
+			e2c[2 * (j + j * n) + 1] = betan;
+		}
+		(*lmem->zgetrf)(&n, &n, lmem->e2c, &n, lmem->ip2, ier);
+	}else{
+		for (j = 1; j <= n; ++j) {
+			for (i = 1; i <= n; ++i) {
+				e2r[i + j * n] = -fjac[i + j * n];
+				e2i[i + j * n] = 0.;
+			}
+			e2r[j + j * n] += alphn;
+			e2i[j + j * n] = betan;
+		}
+		_decc(n, e2r, e2i, lmem->ip2, ier);
+	}
+	return RADAU_OK;
+} /* _decomc_dense */
+
+
+static int _solr_dense(int n, double *b, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+
+	if (lmem->dgetrf){
+		return _sol_lapack(lmem, n, lmem->e1, b);
+	}
+	return _sol(n, lmem->e1, b, lmem->ip1);
+} /* _solr_dense */
+
+
+static int _solc_dense(int n, double *br, double *bi, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+
+	if (lmem->zgetrf){
+		return _solc_lapack(lmem, n, br, bi);
+	}
+	return _solc(n, lmem->e2r, lmem->e2i, br, bi, lmem->ip2);
+} /* _solc_dense */
+
+
+/* BANDED, E1 and E2 in band storage with leading dimension lde, see radau_linsol_mem_t */
+static int _decomr_band(int n, double fac1, int *ier, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+    int i, j;
+	int mbjac = lmem->mljac + lmem->mujac + 1;
+
+	for (j = 0; j < n; ++j) {
+		for (i = 0; i < mbjac; ++i) {
+			lmem->e1[i + lmem->mljac + j * lmem->lde] = -lmem->jac[i + j * lmem->ldjac];
+		}
+		lmem->e1[lmem->mljac + lmem->mujac + j * lmem->lde] += fac1;
+	}
+	_decb(n, lmem->lde, lmem->e1, lmem->mljac, lmem->mujac, lmem->ip1, ier);
+	return RADAU_OK;
+} /* _decomr_band */
+
+
+static int _decomc_band(int n, double alphn, double betan, int *ier, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+    int i, j;
+	int mbjac = lmem->mljac + lmem->mujac + 1;
+
+	for (j = 0; j < n; ++j) {
+		for (i = 0; i < mbjac; ++i) {
+			lmem->e2r[i + lmem->mljac + j * lmem->lde] = -lmem->jac[i + j * lmem->ldjac];
+			lmem->e2i[i + lmem->mljac + j * lmem->lde] = 0.;
+		}
+		lmem->e2r[lmem->mljac + lmem->mujac + j * lmem->lde] += alphn;
+		lmem->e2i[lmem->mljac + lmem->mujac + j * lmem->lde] = betan;
+	}
+	_decbc(n, lmem->lde, lmem->e2r, lmem->e2i, lmem->mljac, lmem->mujac, lmem->ip2, ier);
+	return RADAU_OK;
+} /* _decomc_band */
+
+
+static int _solr_band(int n, double *b, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+	return _solb(n, lmem->lde, lmem->e1, lmem->mljac, lmem->mujac, b, lmem->ip1);
+} /* _solr_band */
+
+
+static int _solc_band(int n, double *br, double *bi, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+	return _solbc(n, lmem->lde, lmem->e2r, lmem->e2i, lmem->mljac, lmem->mujac, br, bi, lmem->ip2);
+} /* _solc_band */
+
+
+#ifdef __RADAU5_WITH_SUPERLU
+/* SPARSE with SUPERLU, ier > 0 from the factorizations: singular (ier <= n) or malloc failure (ier > n) */
+static int _decomr_superlu(int n, double fac1, int *ier, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+
+	superlu_setup_d((SuperLU_aux_d*)lmem->slu_aux_d, fac1, lmem->jac, lmem->jac_indices, lmem->jac_indptr, lmem->LU_with_fresh_jac, lmem->nnz_actual);
+	*ier = superlu_factorize_d((SuperLU_aux_d*)lmem->slu_aux_d);
+	return RADAU_OK;
+} /* _decomr_superlu */
+
+
+static int _decomc_superlu(int n, double alphn, double betan, int *ier, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+
+	superlu_setup_z((SuperLU_aux_z*)lmem->slu_aux_z, alphn, betan, lmem->jac, lmem->jac_indices, lmem->jac_indptr, lmem->LU_with_fresh_jac, lmem->nnz_actual);
+	*ier = superlu_factorize_z((SuperLU_aux_z*)lmem->slu_aux_z);
+	if (*ier == 0){
+		lmem->LU_with_fresh_jac = FALSE_; /* has once been used to create a decomposition now */
+	}
+	return RADAU_OK;
+} /* _decomc_superlu */
+
+
+static int _solr_superlu(int n, double *b, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+	return superlu_solve_d((SuperLU_aux_d*)lmem->slu_aux_d, b);
+} /* _solr_superlu */
+
+
+static int _solc_superlu(int n, double *br, double *bi, void *EXT)
+{
+	radau_linsol_mem_t *lmem = ((radau_mem_t*)EXT)->lin_sol;
+	return superlu_solve_z((SuperLU_aux_z*)lmem->slu_aux_z, br, bi);
+} /* _solc_superlu */
+#endif /*__RADAU5_WITH_SUPERLU*/
+
+
+/* KRYLOV, matrix-free: the point of the Jacobian-vector products is stored instead of a Jacobian, */
+/* the preconditioner is set up instead of the decompositions */
+static int _jac_krylov(int n, double x, double *y, double *fy, void *EXT)
+{
+	_krylov_set_point(((radau_mem_t*)EXT)->lin_sol, n, x, y, fy);
+	return RADAU_OK;
+} /* _jac_krylov */
+
+
+static int _decomr_krylov(int n, double fac1, int *ier, void *EXT)
+{
+	*ier = 0;
+	return _krylov_prec_setup((radau_mem_t*)EXT, n, fac1);
+} /* _decomr_krylov */
+
+
+static int _decomc_krylov(int n, double alphn, double betan, int *ier, void *EXT)
+{
+	*ier = 0; /* the preconditioner is shared with the real system */
+	return RADAU_OK;
+} /* _decomc_krylov */
+
+
+static int _solr_krylov(int n, double *b, void *EXT)
+{
+	radau_mem_t *rmem = (radau_mem_t*)EXT;
+	return _krylov_solve(rmem, n, rmem->fac1, 0., b, NULL);
+} /* _solr_krylov */
+
+
+static int _solc_krylov(int n, double *br, double *bi, void *EXT)
+{
+	radau_mem_t *rmem = (radau_mem_t*)EXT;
+	return _krylov_solve(rmem, n, rmem->alphn, rmem->betan, br, bi);
+} /* _solc_krylov */
+
+
+static int _dec(int n, double *a, int *ip, int *ier)
+{
+    int i, j, k, m;
+    double t;
+    int kp1;
+
+/* VERSION REAL DOUBLE PRECISION */
+/* ----------------------------------------------------------------------- */
+/*  MATRIX TRIANGULARIZATION BY GAUSSIAN ELIMINATION. */
+/*  INPUT.. */
+/*     N = ORDER OF MATRIX. */
+/*     A = MATRIX TO BE TRIANGULARIZED. */
+/*  OUTPUT.. */
+/*     A(I,J), I.LE.J = UPPER TRIANGULAR FACTOR, U . */
+/*     A(I,J), I.GT.J = MULTIPLIERS = LOWER TRIANGULAR FACTOR, I - L. */
+/*     IP(K), K.LT.N = INDEX OF K-TH PIVOT ROW. */
+/*     IP(N) = (-1)**(NUMBER OF INTERCHANGES) OR O . */
+/*     IER = 0 IF MATRIX A IS NONSINGULAR, OR K IF FOUND TO BE */
+/*           SINGULAR AT STAGE K. */
+/*  USE  SOL  TO OBTAIN SOLUTION OF LINEAR SYSTEM. */
+/*  DETERM(A) = IP(N)*A(1,1)*A(2,2)*...*A(N,N). */
+/*  IF IP(N)=O, A IS SINGULAR, SOL WILL DIVIDE BY ZERO. */
+
+/*  REFERENCE.. */
+/*     C. B. MOLER, ALGORITHM 423, LINEAR EQUATION SOLVER, */
+/*     C.A.C.M. 15 (1972), P. 274. */
+/* ----------------------------------------------------------------------- */
+    /* Parameter adjustments */
+    --ip;
+
+    /* Function Body */
+    *ier = 0;
+    ip[n] = 1;
+    if (n == 1) {
+		goto L70;
+    }
+    for (k = 1; k <= n - 1; ++k) {
+		kp1 = k + 1;
+		m = k;
+		for (i = kp1; i <= n; ++i) {
+			if (radau5_abs(a[i + k * n]) > radau5_abs(a[m + k * n])) {
+			m = i;
+			}
+		}
+		ip[k] = m;
+		t = a[m + k * n];
+		if (m == k) {
+			goto L20;
+		}
+		ip[n] = -ip[n];
+		a[m + k * n] = a[k + k * n];
+		a[k + k * n] = t;
+L20:
+		if (t == 0.) {
+			goto L80;
+		}
+		t = 1. / t;
+		for (i = kp1; i <= n; ++i) {
+			a[i + k * n] = -a[i + k * n] * t;
+		}
+		for (j = kp1; j <= n; ++j) {
+			t = a[m + j * n];
+			a[m + j * n] = a[k + j * n];
+			a[k + j * n] = t;
+			if (t == 0.) {
+				goto L45;
+			}
+			for (i = kp1; i <= n; ++i) {
+				a[i + j * n] += a[i + k * n] * t;
+			}
+L45:
+			;
+		}
+    }
+L70:
+    k = n;
+    if (a[n + n * n] == 0.) {
+		goto L80;
+    }
+    return RADAU_OK;
+L80:
+    *ier = k;
+    ip[n] = 0;
+    return RADAU_OK;
+} /* _dec */
+
+
+static int _sol(int n, double *a, double *b, int *ip)
+{
+    int i, k, m;
+    double t;
+    int kb, km1;
+
+/* VERSION REAL DOUBLE PRECISION */
+/* ----------------------------------------------------------------------- */
+/*  SOLUTION OF LINEAR SYSTEM, A*X = B . */
+/*  INPUT.. */
+/*    N = ORDER OF MATRIX. */
+/*    A = TRIANGULARIZED MATRIX OBTAINED FROM DEC. */
+/*    B = RIGHT HAND SIDE VECTOR. */
+/*    IP = PIVOT VECTOR OBTAINED FROM DEC. */
+/*  DO NOT USE IF DEC HAS SET IER .NE. 0. */
+/*  OUTPUT.. */
+/*    B = SOLUTION VECTOR, X . */
+/* ----------------------------------------------------------------------- */
+    /* Parameter adjustments */
+    --ip;
+    --b;
+    a -= 1 + n;
+
+    if (n == 1) {
+		goto L50;
+    }
+    for (k = 1; k <= n - 1; ++k) {
+		m = ip[k];
+		t = b[m];
+		b[m] = b[k];
+		b[k] = t;
+		for (i = k + 1; i <= n; ++i) {
+			b[i] += a[i + k * n] * t;
+		}
+    }
+    for (kb = 1; kb <= n - 1; ++kb) {
+		km1 = n - kb;
+		k = km1 + 1;
+		b[k] /= a[k + k * n];
+		t = -b[k];
+		for (i = 1; i <= km1; ++i) {
+			b[i] += a[i + k * n] * t;
+		}
+    }
+L50:
+    b[1] /= a[n + 1];
+    return RADAU_OK;
+} /* _sol */
+
+
+static int _decc(int n, double *ar, double *ai, int *ip, int *ier)
+{
+    int i, j, k, m;
+    double ti, tr;
+    int kp1;
+    double den, prodi, prodr;
+
+/* VERSION COMPLEX DOUBLE PRECISION */
+/* ----------------------------------------------------------------------- */
+/*  MATRIX TRIANGULARIZATION BY GAUSSIAN ELIMINATION */
+/*  ------ MODIFICATION FOR COMPLEX MATRICES -------- */
+/*  INPUT.. */
+/*     N = ORDER OF MATRIX. */
+/*     (AR, AI) = MATRIX TO BE TRIANGULARIZED. */
+/*  OUTPUT.. */
+/*     AR(I,J), I.LE.J = UPPER TRIANGULAR FACTOR, U ; REAL PART. */
+/*     AI(I,J), I.LE.J = UPPER TRIANGULAR FACTOR, U ; IMAGINARY PART. */
+/*     AR(I,J), I.GT.J = MULTIPLIERS = LOWER TRIANGULAR FACTOR, I - L. */
+/*                                                    REAL PART. */
+/*     AI(I,J), I.GT.J = MULTIPLIERS = LOWER TRIANGULAR FACTOR, I - L. */
+/*                                                    IMAGINARY PART. */
+/*     IP(K), K.LT.N = INDEX OF K-TH PIVOT ROW. */
+/*     IP(N) = (-1)**(NUMBER OF INTERCHANGES) OR O . */
+/*     IER = 0 IF MATRIX A IS NONSINGULAR, OR K IF FOUND TO BE */
+/*           SINGULAR AT STAGE K. */
+/*  USE  SOL  TO OBTAIN SOLUTION OF LINEAR SYSTEM. */
+/*  IF IP(N)=O, A IS SINGULAR, SOL WILL DIVIDE BY ZERO. */
+
+/*  REFERENCE.. */
+/*     C. B. MOLER, ALGORITHM 423, LINEAR EQUATION SOLVER, */
+/*     C.A.C.M. 15 (1972), P. 274. */
+/* ----------------------------------------------------------------------- */
+    /* Parameter adjustments */
+    --ip;
+
+    /* Function Body */
+    *ier = 0;
+    ip[n] = 1;
+    if (n == 1) {
+		goto L70;
+    }
+    for (k = 1; k <= n - 1; ++k) {
+		kp1 = k + 1;
+		m = k;
+		for (i = kp1; i <= n; ++i) {
+			if (radau5_abs(ar[i + k * n]) + radau5_abs(ai[i + k * n]) > radau5_abs(ar[m + k * n]) + radau5_abs(ai[m + k * n])) {
+				m = i;
+			}
+		}
+		ip[k] = m;
+		tr = ar[m + k * n];
+		ti = ai[m + k * n];
+		if (m == k) {
+			goto L20;
+		}
+		ip[n] = -ip[n];
+		ar[m + k * n] = ar[k + k * n];
+		ai[m + k * n] = ai[k + k * n];
+		ar[k + k * n] = tr;
+		ai[k + k * n] = ti;
+L20:
+		if (radau5_abs(tr) + radau5_abs(ti) == 0.) {
+			goto L80;
+		}
+		den = tr * tr + ti * ti;
+		tr /= den;
+		ti = -ti / den;
+		for (i = kp1; i <= n; ++i) {
+			prodr = ar[i + k * n] * tr - ai[i + k * n] * ti;
+			prodi = ai[i + k * n] * tr + ar[i + k * n] * ti;
+			ar[i + k * n] = -prodr;
+			ai[i + k * n] = -prodi;
+		}
+		for (j = kp1; j <= n; ++j) {
+			tr = ar[m + j * n];
+			ti = ai[m + j * n];
+			ar[m + j * n] = ar[k + j * n];
+			ai[m + j * n] = ai[k + j * n];
+			ar[k + j * n] = tr;
+			ai[k + j * n] = ti;
+			if (radau5_abs(tr) + radau5_abs(ti) == 0.) {
+				goto L48;
+			}
+			if (ti == 0.) {
+				for (i = kp1; i <= n; ++i) {
+					prodr = ar[i + k * n] * tr;
+					prodi = ai[i + k * n] * tr;
+					ar[i + j * n] += prodr;
+					ai[i + j * n] += prodi;
+				}
+				goto L48;
+			}
+			if (tr == 0.) {
+				for (i = kp1; i <= n; ++i) {
+					prodr = -ai[i + k * n] * ti;
+					prodi = ar[i + k * n] * ti;
+					ar[i + j * n] += prodr;
+					ai[i + j * n] += prodi;
+				}
+				goto L48;
+			}
+			for (i = kp1; i <= n; ++i) {
+				prodr = ar[i + k * n] * tr - ai[i + k * n] * ti;
+				prodi = ai[i + k * n] * tr + ar[i + k * n] * ti;
+				ar[i + j * n] += prodr;
+				ai[i + j * n] += prodi;
+			}
+L48:
+			;
+		}
+    }
+L70:
+    k = n;
+    if (radau5_abs(ar[n + n * n]) + radau5_abs(ai[n + n * n]) == 0.) {
+		goto L80;
+    }
+    return RADAU_OK;
+L80:
+    *ier = k;
+    ip[n] = 0;
+    return RADAU_OK;
+} /* _decc */
+
+
+static int _solc(int n, double *ar, double *ai, double *br, double *bi, int *ip)
+{
+    int i, k, m, kb;
+    double ti, tr;
+    int km1, kp1;
+    double den, prodi, prodr;
+
+/* VERSION COMPLEX DOUBLE PRECISION */
+/* ----------------------------------------------------------------------- */
+/*  SOLUTION OF LINEAR SYSTEM, A*X = B . */
+/*  INPUT.. */
+/*    N = ORDER OF MATRIX. */
+/*    (AR,AI) = TRIANGULARIZED MATRIX OBTAINED FROM DEC. */
+/*    (BR,BI) = RIGHT HAND SIDE VECTOR. */
+/*    IP = PIVOT VECTOR OBTAINED FROM DEC. */
+/*  DO NOT USE IF DEC HAS SET IER .NE. 0. */
+/*  OUTPUT.. */
+/*    (BR,BI) = SOLUTION VECTOR, X . */
+/* ----------------------------------------------------------------------- */
+    /* Parameter adjustments */
+    --ip;
+    --bi;
+    --br;
+    ai -= 1 + n;
+    ar -= 1 + n;
+
+    /* Function Body */
+    if (n == 1) {
+		goto L50;
+    }
+    for (k = 1; k <= n - 1; ++k) {
+		kp1 = k + 1;
+		m = ip[k];
+		tr = br[m];
+		ti = bi[m];
+		br[m] = br[k];
+		bi[m] = bi[k];
+		br[k] = tr;
+		bi[k] = ti;
+		for (i = kp1; i <= n; ++i) {
+			prodr = ar[i + k * n] * tr - ai[i + k * n] * ti;
+			prodi = ai[i + k * n] * tr + ar[i + k * n] * ti;
+			br[i] += prodr;
+			bi[i] += prodi;
+		}
+    }
+    for (kb = 1; kb <= n - 1; ++kb) {
+		km1 = n - kb;
+		k = km1 + 1;
+		den = ar[k + k * n] * ar[k + k * n] + ai[k + k * n] 
+			* ai[k + k * n];
+		prodr = br[k] * ar[k + k * n] + bi[k] * ai[k + k * n];
+		prodi = bi[k] * ar[k + k * n] - br[k] * ai[k + k * n];
+		br[k] = prodr / den;
+		bi[k] = prodi / den;
+		tr = -br[k];
+		ti = -bi[k];
+		for (i = 1; i <= km1; ++i) {
+			prodr = ar[i + k * n] * tr - ai[i + k * n] * ti;
+			prodi = ai[i + k * n] * tr + ar[i + k * n] * ti;
+			br[i] += prodr;
+			bi[i] += prodi;
+		}
+    }
+L50:
+    den = ar[n + 1] * ar[n + 1] + ai[n + 1] * ai[n + 1];
+    prodr = br[1] * ar[n + 1] + bi[1] * ai[n + 1];
+    prodi = bi[1] * ar[n + 1] - br[1] * ai[n + 1];
+    br[1] = prodr / den;
+    bi[1] = prodi / den;
+    return RADAU_OK;
+} /* _solc */
+
+static int _decb(int n, int ndim, double *a, int ml, int mu, int *ip, int *ier)
+{
+    int i, j, k, m, md, md1, mdl, mm, ju, jk, kp1;
+    double t;
+
+/* VERSION BANDED REAL DOUBLE PRECISION */
+/* ----------------------------------------------------------------------- */
+/*  MATRIX TRIANGULARIZATION BY GAUSSIAN ELIMINATION OF A BANDED MATRIX WITH */
+/*  LOWER BANDWIDTH ML AND UPPER BANDWIDTH MU */
+/*  INPUT.. */
+/*     N       ORDER OF THE ORIGINAL MATRIX A. */
+/*     NDIM    DECLARED DIMENSION OF ARRAY  A. */
+/*     A       CONTAINS THE MATRIX IN BAND STORAGE.   THE COLUMNS */
+/*                OF THE MATRIX ARE STORED IN THE COLUMNS OF  A  AND */
+/*                THE DIAGONALS OF THE MATRIX ARE STORED IN ROWS */
+/*                ML+1 THROUGH 2*ML+MU+1 OF  A. */
+/*     ML      LOWER BANDWIDTH OF A (DIAGONAL IS NOT COUNTED). */
+/*     MU      UPPER BANDWIDTH OF A (DIAGONAL IS NOT COUNTED). */
+/*  OUTPUT.. */
+/*     A       AN UPPER TRIANGULAR MATRIX IN BAND STORAGE AND */
+/*                THE MULTIPLIERS WHICH WERE USED TO OBTAIN IT. */
+/*     IP      INDEX VECTOR OF PIVOT INDICES. */
+/*     IP(N)   (-1)**(NUMBER OF INTERCHANGES) OR O . */
+/*     IER     = 0 IF MATRIX A IS NONSINGULAR, OR  = K IF FOUND TO BE */
+/*                SINGULAR AT STAGE K. */
+/*  USE  SOLB  TO OBTAIN SOLUTION OF LINEAR SYSTEM. */
+/*  IF IP(N)=O, A IS SINGULAR, SOLB WILL DIVIDE BY ZERO. */
+
+/*  REFERENCE.. */
+/*     THIS IS A MODIFICATION OF */
+/*     C. B. MOLER, ALGORITHM 423, LINEAR EQUATION SOLVER, */
+/*     C.A.C.M. 15 (1972), P. 274. */
+/* ----------------------------------------------------------------------- */
+    /* Parameter adjustments */
+    --ip;
+    a -= 1 + ndim;
+
+    /* Function Body */
+    *ier = 0;
+    ip[n] = 1;
+    md = ml + mu + 1;
+    md1 = md + 1;
+    ju = 0;
+    if (ml == 0 || n == 1) {
+		goto L70;
+    }
+    for (j = mu + 2; j <= n; ++j) {
+		for (i = 1; i <= ml; ++i) {
+			a[i + j * ndim] = 0.;
+		}
+    }
+    for (k = 1; k <= n - 1; ++k) {
+		kp1 = k + 1;
+		m = md;
+		mdl = radau_min(ml, n - k) + md;
+		for (i = md1; i <= mdl; ++i) {
+			if (radau5_abs(a[i + k * ndim]) > radau5_abs(a[m + k * ndim])) {
+				m = i;
+			}
+		}
+		ip[k] = m + k - md;
+		t = a[m + k * ndim];
+		if (m != md) {
+			ip[n] = -ip[n];
+			a[m + k * ndim] = a[md + k * ndim];
+			a[md + k * ndim] = t;
+		}
+		if (t == 0.) {
+			goto L80;
+		}
+		t = 1. / t;
+		for (i = md1; i <= mdl; ++i) {
+			a[i + k * ndim] = -a[i + k * ndim] * t;
+		}
+		ju = radau_min(radau_max(ju, mu + ip[k]), n);
+		mm = md;
+		for (j = kp1; j <= ju; ++j) {
+			--m;
+			--mm;
+			t = a[m + j * ndim];
+			if (m != mm) {
+				a[m + j * ndim] = a[mm + j * ndim];
+				a[mm + j * ndim] = t;
+			}
+			if (t == 0.) {
+				continue;
+			}
+			jk = j - k;
+			for (i = md1; i <= mdl; ++i) {
+				a[i - jk + j * ndim] += a[i + k * ndim] * t;
+			}
+		}
+    }
+L70:
+    k = n;
+    if (a[md + n * ndim] == 0.) {
+		goto L80;
+    }
+    return RADAU_OK;
+L80:
+    *ier = k;
+    ip[n] = 0;
+    return RADAU_OK;
+} /* _decb */
+
+
+static int _solb(int n, int ndim, double *a, int ml, int mu, double *b, int *ip)
+{
+    int i, k, m, md, md1, mdm, mdl, kb, kmd, lm;
+    double t;
+
+/* VERSION BANDED REAL DOUBLE PRECISION */
+/* ----------------------------------------------------------------------- */
+/*  SOLUTION OF LINEAR SYSTEM, A*X = B . */
+/*  INPUT.. */
+/*    N      ORDER OF MATRIX A. */
+/*    NDIM   DECLARED DIMENSION OF ARRAY  A . */
+/*    A      TRIANGULARIZED MATRIX OBTAINED FROM DECB. */
+/*    ML     LOWER BANDWIDTH OF A (DIAGONAL IS NOT COUNTED). */
+/*    MU     UPPER BANDWIDTH OF A (DIAGONAL IS NOT COUNTED). */
+/*    B      RIGHT HAND SIDE VECTOR. */
+/*    IP     PIVOT VECTOR OBTAINED FROM DECB. */
+/*  DO NOT USE IF DECB HAS SET IER .NE. 0. */
+/*  OUTPUT.. */
+/*    B      SOLUTION VECTOR, X . */
+/* ----------------------------------------------------------------------- */
+    /* Parameter adjustments */
+    --ip;
+    --b;
+    a -= 1 + ndim;
+
+    /* Function Body */
+    md = ml + mu + 1;
+    md1 = md + 1;
+    mdm = md - 1;
+    if (n == 1) {
+		goto L50;
+    }
+    if (ml != 0) {
+		for (k = 1; k <= n - 1; ++k) {
+			m = ip[k];
+			t = b[m];
+			b[m] = b[k];
+			b[k] = t;
+			mdl = radau_min(ml, n - k) + md;
+			for (i = md1; i <= mdl; ++i) {
+				b[i + k - md] += a[i + k * ndim] * t;
+			}
+		}
+    }
+    for (kb = 1; kb <= n - 1; ++kb) {
+		k = n + 1 - kb;
+		b[k] /= a[md + k * ndim];
+		t = -b[k];
+		kmd = md - k;
+		lm = radau_max(1, kmd + 1);
+		for (i = lm; i <= mdm; ++i) {
+			b[i - kmd] += a[i + k * ndim] * t;
+		}
+    }
+L50:
+    b[1] /= a[md + ndim];
+    return RADAU_OK;
+} /* _solb */
+
+
+static int _decbc(int n, int ndim, double *ar, double *ai, int ml, int mu, int *ip, int *ier)
+{
+    int i, j, k, m, md, md1, mdl, mm, ju, jk, kp1;
+    double tr, ti, den, prodr, prodi;
+
+/* VERSION BANDED COMPLEX DOUBLE PRECISION */
+/* ----------------------------------------------------------------------- */
+/*  MATRIX TRIANGULARIZATION BY GAUSSIAN ELIMINATION OF A BANDED COMPLEX */
+/*  MATRIX WITH LOWER BANDWIDTH ML AND UPPER BANDWIDTH MU */
+/*  INPUT.. */
+/*     N       ORDER OF THE ORIGINAL MATRIX A. */
+/*     NDIM    DECLARED DIMENSION OF ARRAY  A. */
+/*     AR, AI     CONTAINS THE MATRIX IN BAND STORAGE.   THE COLUMNS */
+/*                OF THE MATRIX ARE STORED IN THE COLUMNS OF  AR (REAL */
+/*                PART) AND AI (IMAGINARY PART)  AND */
+/*                THE DIAGONALS OF THE MATRIX ARE STORED IN ROWS */
+/*                ML+1 THROUGH 2*ML+MU+1 OF  AR AND AI. */
+/*     ML      LOWER BANDWIDTH OF A (DIAGONAL IS NOT COUNTED). */
+/*     MU      UPPER BANDWIDTH OF A (DIAGONAL IS NOT COUNTED). */
+/*  OUTPUT.. */
+/*     AR, AI  AN UPPER TRIANGULAR MATRIX IN BAND STORAGE AND */
+/*                THE MULTIPLIERS WHICH WERE USED TO OBTAIN IT. */
+/*     IP      INDEX VECTOR OF PIVOT INDICES. */
+/*     IP(N)   (-1)**(NUMBER OF INTERCHANGES) OR O . */
+/*     IER     = 0 IF MATRIX A IS NONSINGULAR, OR  = K IF FOUND TO BE */
+/*                SINGULAR AT STAGE K. */
+/*  USE  SOLBC  TO OBTAIN SOLUTION OF LINEAR SYSTEM. */
+/*  IF IP(N)=O, A IS SINGULAR, SOLBC WILL DIVIDE BY ZERO. */
+
+/*  REFERENCE.. */
+/*     THIS IS A MODIFICATION OF */
+/*     C. B. MOLER, ALGORITHM 423, LINEAR EQUATION SOLVER, */
+/*     C.A.C.M. 15 (1972), P. 274. */
+/* ----------------------------------------------------------------------- */
+    /* Parameter adjustments */
+    --ip;
+    ai -= 1 + ndim;
+    ar -= 1 + ndim;
+
+    /* Function Body */
+    *ier = 0;
+    ip[n] = 1;
+    md = ml + mu + 1;
+    md1 = md + 1;
+    ju = 0;
+    if (ml == 0 || n == 1) {
+		goto L70;
+    }
+    for (j = mu + 2; j <= n; ++j) {
+		for (i = 1; i <= ml; ++i) {
+			ar[i + j * ndim] = 0.;
+			ai[i + j * ndim] = 0.;
+		}
+    }
+    for (k = 1; k <= n - 1; ++k) {
+		kp1 = k + 1;
+		m = md;
+		mdl = radau_min(ml, n - k) + md;
+		for (i = md1; i <= mdl; ++i) {
+			if (radau5_abs(ar[i + k * ndim]) + radau5_abs(ai[i + k * ndim]) > radau5_abs(ar[m + k * ndim]) + radau5_abs(ai[m + k * ndim])) {
+				m = i;
+			}
+		}
+		ip[k] = m + k - md;
+		tr = ar[m + k * ndim];
+		ti = ai[m + k * ndim];
+		if (m != md) {
+			ip[n] = -ip[n];
+			ar[m + k * ndim] = ar[md + k * ndim];
+			ai[m + k * ndim] = ai[md + k * ndim];
+			ar[md + k * ndim] = tr;
+			ai[md + k * ndim] = ti;
+		}
+		if (radau5_abs(tr) + radau5_abs(ti) == 0.) {
+			goto L80;
+		}
+		den = tr * tr + ti * ti;
+		tr /= den;
+		ti = -ti / den;
+		for (i = md1; i <= mdl; ++i) {
+			prodr = ar[i + k * ndim] * tr - ai[i + k * ndim] * ti;
+			prodi = ai[i + k * ndim] * tr + ar[i + k * ndim] * ti;
+			ar[i + k * ndim] = -prodr;
+			ai[i + k * ndim] = -prodi;
+		}
+		ju = radau_min(radau_max(ju, mu + ip[k]), n);
+		mm = md;
+		for (j = kp1; j <= ju; ++j) {
+			--m;
+			--mm;
+			tr = ar[m + j * ndim];
+			ti = ai[m + j * ndim];
+			if (m != mm) {
+				ar[m + j * ndim] = ar[mm + j * ndim];
+				ai[m + j * ndim] = ai[mm + j * ndim];
+				ar[mm + j * ndim] = tr;
+				ai[mm + j * ndim] = ti;
+			}
+			if (radau5_abs(tr) + radau5_abs(ti) == 0.) {
+				continue;
+			}
+			jk = j - k;
+			for (i = md1; i <= mdl; ++i) {
+				prodr = ar[i + k * ndim] * tr - ai[i + k * ndim] * ti;
+				prodi = ai[i + k * ndim] * tr + ar[i + k * ndim] * ti;
+				ar[i - jk + j * ndim] += prodr;
+				ai[i - jk + j * ndim] += prodi;
+			}
+		}
+    }
+L70:
+    k = n;
+    if (radau5_abs(ar[md + n * ndim]) + radau5_abs(ai[md + n * ndim]) == 0.) {
+		goto L80;
+    }
+    return RADAU_OK;
+L80:
+    *ier = k;
+    ip[n] = 0;
+    return RADAU_OK;
+} /* _decbc */
+
+
+static int _solbc(int n, int ndim, double *ar, double *ai, int ml, int mu, double *br, double *bi, int *ip)
+{
+    int i, k, m, md, md1, mdm, mdl, kb, kmd, lm, imd;
+    double tr, ti, den, prodr, prodi;
+
+/* VERSION BANDED COMPLEX DOUBLE PRECISION */
+/* ----------------------------------------------------------------------- */
+/*  SOLUTION OF LINEAR SYSTEM, A*X = B , */
+/*                  VERSION BANDED AND COMPLEX-DOUBLE PRECISION. */
+/*  INPUT.. */
+/*    N      ORDER OF MATRIX A. */
+/*    NDIM   DECLARED DIMENSION OF ARRAY  A . */
+/*    AR, AI TRIANGULARIZED MATRIX OBTAINED FROM DECB (REAL AND IMAG. PART). */
+/*    ML     LOWER BANDWIDTH OF A (DIAGONAL IS NOT COUNTED). */
+/*    MU     UPPER BANDWIDTH OF A (DIAGONAL IS NOT COUNTED). */
+/*    BR, BI RIGHT HAND SIDE VECTOR (REAL AND IMAG. PART). */
+/*    IP     PIVOT VECTOR OBTAINED FROM DECBC. */
+/*  DO NOT USE IF DECB HAS SET IER .NE. 0. */
+/*  OUTPUT.. */
+/*    BR, BI SOLUTION VECTOR, X (REAL AND IMAG. PART). */
+/* ----------------------------------------------------------------------- */
+    /* Parameter adjustments */
+    --ip;
+    --bi;
+    --br;
+    ai -= 1 + ndim;
+    ar -= 1 + ndim;
+
+    /* Function Body */
+    md = ml + mu + 1;
+    md1 = md + 1;
+    mdm = md - 1;
+    if (n == 1) {
+		goto L50;
+    }
+    if (ml != 0) {
+		for (k = 1; k <= n - 1; ++k) {
+			m = ip[k];
+			tr = br[m];
+			ti = bi[m];
+			br[m] = br[k];
+			bi[m] = bi[k];
+			br[k] = tr;
+			bi[k] = ti;
+			mdl = radau_min(ml, n - k) + md;
+			for (i = md1; i <= mdl; ++i) {
+				imd = i + k - md;
+				prodr = ar[i + k * ndim] * tr - ai[i + k * ndim] * ti;
+				prodi = ai[i + k * ndim] * tr + ar[i + k * ndim] * ti;
+				br[imd] += prodr;
+				bi[imd] += prodi;
+			}
+		}
+    }
+    for (kb = 1; kb <= n - 1; ++kb) {
+		k = n + 1 - kb;
+		den = ar[md + k * ndim] * ar[md + k * ndim] + ai[md + k * ndim] * ai[md + k * ndim];
+		prodr = br[k] * ar[md + k * ndim] + bi[k] * ai[md + k * ndim];
+		prodi = bi[k] * ar[md + k * ndim] - br[k] * ai[md + k * ndim];
+		br[k] = prodr / den;
+		bi[k] = prodi / den;
+		tr = -br[k];
+		ti = -bi[k];
+		kmd = md - k;
+		lm = radau_max(1, kmd + 1);
+		for (i = lm; i <= mdm; ++i) {
+			imd = i - kmd;
+			prodr = ar[i + k * ndim] * tr - ai[i + k * ndim] * ti;
+			prodi = ai[i + k * ndim] * tr + ar[i + k * ndim] * ti;
+			br[imd] += prodr;
+			bi[imd] += prodi;
+		}
+    }
+L50:
+    den = ar[md + ndim] * ar[md + ndim] + ai[md + ndim] * ai[md + ndim];
+    prodr = br[1] * ar[md + ndim] + bi[1] * ai[md + ndim];
+    prodi = bi[1] * ar[md + ndim] - br[1] * ai[md + ndim];
+    br[1] = prodr / den;
+    bi[1] = prodi / den;
+    return RADAU_OK;
+} /* _solbc */
+
+
+static int _sol_lapack(radau_linsol_mem_t *lmem, int n, double *a, double *b)
+{
+	/* SOLUTION OF LINEAR SYSTEM, A*X = B, WITH THE DGETRF DECOMPOSITION OF A */
+	char trans = 'N';
+	int nrhs = 1;
+	int info;
+
+	(*lmem->dgetrs)(&trans, &n, &nrhs, a, &n, lmem->ip1, b, &n, &info);
+	return info; /* info < 0: illegal argument, handled as an unrecoverable failure in _radcor */
+} /* _sol_lapack */
+
+
+static int _solc_lapack(radau_linsol_mem_t *lmem, int n, double *br, double *bi)
+{
+	/* SOLUTION OF COMPLEX LINEAR SYSTEM, E2*X = B, WITH THE ZGETRF DECOMPOSITION OF E2 */
+	char trans = 'N';
+	int nrhs = 1;
+	int info, i;
+
+	for (i = 0; i < n; ++i) {
+		lmem->zwork[2 * i] = br[i];
+		lmem->zwork[2 * i + 1] = bi[i];
+	}
+	(*lmem->zgetrs)(&trans, &n, &nrhs, lmem->e2c, &n, lmem->ip2, lmem->zwork, &n, &info);
+	for (i = 0; i < n; ++i) {
+		br[i] = lmem->zwork[2 * i];
+		bi[i] = lmem->zwork[2 * i + 1];
+	}
+	return info; /* info < 0: illegal argument, see _sol_lapack */
+} /* _solc_lapack */
+
+
+/* store the point (x, y), fy = f(x, y), at which the Jacobian-vector products are taken */
+static void _krylov_set_point(radau_linsol_mem_t *lmem, int n, double x, double *y, double *fy)
+{
+	int i;
+	double ynorm = 0.;
+
+	lmem->xkry = x;
+	for (i = 0; i < n; ++i) {
+		lmem->ykry[i] = y[i];
+		lmem->fkry[i] = fy[i];
+		ynorm += y[i] * y[i];
+	}
+	lmem->ykry_norm = sqrt(ynorm / n);
+	lmem->LU_with_fresh_jac = TRUE_; /* the preconditioner needs a new setup */
+} /* _krylov_set_point */
+
+
+/* Jacobian-vector product jv = J*v by the directional difference (f(xkry, ykry + sig*v) - fkry)/sig */
+static int _krylov_jv(radau_mem_t *rmem, int n, double *v, double *jv)
+{
+	radau_linsol_mem_t *lmem = rmem->lin_sol;
+	double *ytmp = lmem->kwork + 4*n;
+	double vnorm = 0., sig;
+	int i, ier;
+
+	for (i = 0; i < n; ++i) {
+		vnorm += v[i] * v[i];
+	}
+	vnorm = sqrt(vnorm / n);
+	if (vnorm == 0.) {
+		for (i = 0; i < n; ++i) {
+			jv[i] = 0.;
+		}
+		return RADAU_OK;
+	}
+	sig = sqrt(rmem->input->uround) * (1. + lmem->ykry_norm) / vnorm;
+	for (i = 0; i < n; ++i) {
+		ytmp[i] = lmem->ykry[i] + sig * v[i];
+	}
+	ier = (*lmem->fcn)(n, lmem->xkry, ytmp, jv, lmem->fcn_EXT);
+	rmem->stats->njvevals++;
+	if (ier != RADAU_OK) {
+		return ier;
+	}
+	for (i = 0; i < n; ++i) {
+		jv[i] = (jv[i] - lmem->fkry[i]) / sig;
+	}
+	return RADAU_OK;
+} /* _krylov_jv */
+
+
+/* av = E*v, with E = fac1*I - J (betan = 0, v of length n) */
+/* or E = [alphn*I - J, -betan*I; betan*I, alphn*I - J] (betan != 0, v = [vr; vi] of length 2*n) */
+static int _krylov_matvec(radau_mem_t *rmem, int n, double alphn, double betan, double *v, double *av)
+{
+	int i, ier;
+
+	ier = _krylov_jv(rmem, n, v, av);
+	if (ier != RADAU_OK) {
+		return ier;
+	}
+	for (i = 0; i < n; ++i) {
+		av[i] = alphn * v[i] - av[i];
+	}
+	if (betan != 0.) {
+		ier = _krylov_jv(rmem, n, &v[n], &av[n]);
+		if (ier != RADAU_OK) {
+			return ier;
+		}
+		for (i = 0; i < n; ++i) {
+			av[i + n] = alphn * v[i + n] - av[i + n] + betan * v[i];
+			av[i] -= betan * v[i + n];
+		}
+	}
+	return RADAU_OK;
+} /* _krylov_matvec */
+
+
+/* setup of the (optional) preconditioner, for I - J/fac1 */
+static int _krylov_prec_setup(radau_mem_t *rmem, int n, double fac1)
+{
+	radau_linsol_mem_t *lmem = rmem->lin_sol;
+	int ier;
+
+	if (!lmem->prec_setup) {
+		return RADAU_OK;
+	}
+	ier = (*lmem->prec_setup)(n, lmem->xkry, lmem->ykry, lmem->fkry, !lmem->LU_with_fresh_jac, 1. / fac1, lmem->prec_EXT);
+	rmem->stats->nprecsetups++;
+	if (ier != RADAU_OK) {
+		return ier;
+	}
+	lmem->LU_with_fresh_jac = FALSE_;
+	return RADAU_OK;
+} /* _krylov_prec_setup */
+
+
+/* z ~ (alphn*I - J)^-1 r by the preconditioner, applied to each of the m/n parts of length n */
+/* since the preconditioner solves (I - gamma*J) z = r, it is called with gamma = 1/alphn and r/alphn */
+static int _krylov_prec(radau_mem_t *rmem, int n, double alphn, int m, double *r, double *z, double delta)
+{
+	radau_linsol_mem_t *lmem = rmem->lin_sol;
+	double *rtmp = lmem->kwork + 5*n;
+	int i, j, ier;
+
+	for (j = 0; j < m; j += n) {
+		for (i = 0; i < n; ++i) {
+			rtmp[i] = r[i + j] / alphn;
+		}
+		ier = (*lmem->prec_solve)(n, lmem->xkry, lmem->ykry, lmem->fkry, rtmp, &z[j], 1. / alphn, delta / alphn, lmem->prec_EXT);
+		rmem->stats->nprecs++;
+		if (ier != RADAU_OK) {
+			return ier;
+		}
+	}
+	return RADAU_OK;
+} /* _krylov_prec */
+
+
+/* Solve E x = b by right preconditioned GMRES without restarts, see _krylov_matvec for E */
+/* The iteration is done in the variables scaled by scal and stops once the weighted rms norm of the */
+/* residual is below krylov_tol*fnewt*|alphn + i*betan|, i.e., the error in the Newton increment is */
+/* (about) a fraction krylov_tol of the Newton tolerance. If the tolerance is not reached in maxl */
+/* iterations, the final iterate is used. b = br (betan = 0) or br + i*bi is overwritten with x. */
+static int _krylov_solve(radau_mem_t *rmem, int n, double alphn, double betan, double *br, double *bi)
+{
+	radau_linsol_mem_t *lmem = rmem->lin_sol;
+	double *scal = rmem->scal;
+	int maxl = lmem->maxl;
+	int ldh = maxl + 1; /* leading dimension of the Hessenberg matrix */
+	int m = bi ? 2*n : n; /* size of the (real) system */
+	double *v = lmem->kv, *hes = lmem->khes, *g = lmem->kg;
+	double *c = lmem->kgiv, *s = lmem->kgiv + maxl;
+	double *t = lmem->kwork, *z = lmem->kwork + 2*n;
+	double *vl, *vl1;
+	double delta, tol, beta, h, nu, a, b;
+	int i, j, l, ier;
+	int converged = FALSE_;
+
+	delta = lmem->krylov_tol * rmem->input->fnewt * sqrt(alphn * alphn + betan * betan);
+	tol = delta * sqrt((double)m); /* bound on the 2-norm of the scaled residual */
+
+	/* initial residual in scaled variables, the initial guess is zero */
+	beta = 0.;
+	for (i = 0; i < n; ++i) {
+		v[i] = br[i] / scal[i];
+		beta += v[i] * v[i];
+		if (bi) {
+			v[i + n] = bi[i] / scal[i];
+			beta += v[i + n] * v[i + n];
+		}
+	}
+	beta = sqrt(beta);
+	if (beta <= tol) {
+		for (i = 0; i < n; ++i) {
+			br[i] = 0.;
+			if (bi) {
+				bi[i] = 0.;
+			}
+		}
+		return RADAU_OK;
+	}
+	for (i = 0; i < m; ++i) {
+		v[i] /= beta;
+	}
+	g[0] = beta;
+
+	/* Arnoldi process with modified Gram-Schmidt, the Hessenberg matrix is kept */
+	/* triangular by Givens rotations, such that |g[l]| is the residual norm */
+	for (l = 0; l < maxl && !converged; ++l) {
+		vl = &v[l * m];
+		vl1 = &v[(l + 1) * m];
+		for (i = 0; i < m; ++i) {
+			t[i] = vl[i] * scal[i % n];
+		}
+		if (lmem->prec_solve) {
+			ier = _krylov_prec(rmem, n, alphn, m, t, z, delta);
+			if (ier != RADAU_OK) {
+				return ier;
+			}
+			for (i = 0; i < m; ++i) {
+				t[i] = z[i];
+			}
+		}
+		ier = _krylov_matvec(rmem, n, alphn, betan, t, vl1);
+		if (ier != RADAU_OK) {
+			return ier;
+		}
+		rmem->stats->nliters++;
+		for (i = 0; i < m; ++i) {
+			vl1[i] /= scal[i % n];
+		}
+		for (j = 0; j <= l; ++j) {
+			h = 0.;
+			for (i = 0; i < m; ++i) {
+				h += v[i + j * m] * vl1[i];
+			}
+			for (i = 0; i < m; ++i) {
+				vl1[i] -= h * v[i + j * m];
+			}
+			hes[j + l * ldh] = h;
+		}
+		h = 0.;
+		for (i = 0; i < m; ++i) {
+			h += vl1[i] * vl1[i];
+		}
+		h = sqrt(h);
+		hes[l + 1 + l * ldh] = h;
+		if (h > 0.) {
+			for (i = 0; i < m; ++i) {
+				vl1[i] /= h;
+			}
+		}
+
+		/* apply the previous rotations to the new column and compute the next one */
+		for (j = 0; j < l; ++j) {
+			a = hes[j + l * ldh];
+			b = hes[j + 1 + l * ldh];
+			hes[j + l * ldh] = c[j] * a + s[j] * b;
+			hes[j + 1 + l * ldh] = c[j] * b - s[j] * a;
+		}
+		a = hes[l + l * ldh];
+		nu = sqrt(a * a + h * h);
+		if (nu == 0.) {
+			break; /* singular, keep the iterate of the previous iteration */
+		}
+		c[l] = a / nu;
+		s[l] = h / nu;
+		hes[l + l * ldh] = nu;
+		hes[l + 1 + l * ldh] = 0.;
+		g[l + 1] = -s[l] * g[l];
+		g[l] = c[l] * g[l];
+		converged = (radau5_abs(g[l + 1]) <= tol || h == 0.);
+	}
+	if (!converged) {
+		rmem->stats->nlcfails++;
+	}
+
+	/* back substitution for the coefficients of the iterate in the Krylov basis, stored in g */
+	for (j = l - 1; j >= 0; --j) {
+		for (i = j + 1; i < l; ++i) {
+			g[j] -= hes[j + i * ldh] * g[i];
+		}
+		g[j] /= hes[j + j * ldh];
+	}
+	for (i = 0; i < m; ++i) {
+		t[i] = 0.;
+	}
+	for (j = 0; j < l; ++j) {
+		for (i = 0; i < m; ++i) {
+			t[i] += g[j] * v[i + j * m];
+		}
+	}
+	for (i = 0; i < m; ++i) {
+		t[i] *= scal[i % n];
+	}
+	if (lmem->prec_solve) {
+		ier = _krylov_prec(rmem, n, alphn, m, t, z, delta);
+		if (ier != RADAU_OK) {
+			return ier;
+		}
+		t = z;
+	}
+	for (i = 0; i < n; ++i) {
+		br[i] = t[i];
+		if (bi) {
+			bi[i] = t[i + n];
+		}
+	}
+	return RADAU_OK;
+} /* _krylov_solve */
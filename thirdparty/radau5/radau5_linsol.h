@@ -0,0 +1,14 @@
+#ifndef _RADAU5_LINSOL_H
+#define _RADAU5_LINSOL_H
+
+#include "radau5_impl.h"
+
+/* set the operations of the built-in linear solver the memory has been set up for in radau_setup_mem(...), */
+/* i.e., dense (with or without LAPACK, see radau_set_lapack(...)), banded, sparse (SuperLU) or Krylov */
+void radau_linsol_set_builtin(radau_mem_t *rmem);
+
+/* allocate the memory of the built-in dense linear solver, if it is used and not allocated yet */
+/* called by radau5_solve(...), such that no n x n matrices are allocated for a user-provided linear solver */
+int radau_linsol_alloc_dense(radau_mem_t *rmem);
+
+#endif /*_RADAU5_LINSOL_H*/
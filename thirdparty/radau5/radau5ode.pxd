@@ -15,6 +15,8 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+cimport numpy as np
+
 cdef extern from "string.h":
     void *memcpy(void *s1, void *s2, int n)
 
@@ -24,6 +26,19 @@ cdef extern from "radau5_impl.h":
     ctypedef int (*FP_CB_jac)(int, double, double*, double*, void*) except? -1
     ctypedef int (*FP_CB_solout)(int, double, double*, double*, double*, int, void*) except? -1
     ctypedef int (*FP_CB_jac_sparse)(int, double, double*, int*, double*, int*, int*, void*) except? -1
+    ctypedef int (*FP_CB_prec_solve)(int, double, double*, double*, double*, double*, double, double, void*) except? -1
+    ctypedef int (*FP_CB_prec_setup)(int, double, double*, double*, int, double, void*) except? -1
+
+    ## FunctionPointer_LinearSolver
+    ctypedef int (*FP_LS_jac)(int, double, double*, double*, void*) except? -1
+    ctypedef int (*FP_LS_decomr)(int, double, int*, void*) except? -1
+    ctypedef int (*FP_LS_decomc)(int, double, double, int*, void*) except? -1
+    ctypedef int (*FP_LS_solr)(int, double*, void*) except? -1
+    ctypedef int (*FP_LS_solc)(int, double*, double*, void*) except? -1
+
+    ## FunctionPointer_LAPACK
+    ctypedef void (*FP_LAPACK_getrf)(int*, int*, double*, int*, int*, int*) noexcept nogil
+    ctypedef void (*FP_LAPACK_getrs)(char*, int*, int*, double*, int*, int*, double*, int*, int*) noexcept nogil
     
     int RADAU_OK
     int RADAU_ERROR_CALLBACK_RECOVERABLE
@@ -32,13 +47,15 @@ cdef extern from "radau5_impl.h":
     int RADAU_ERROR_CALLBACK_INVALID_NNZ
 
 cdef extern from "radau5_io.h":
-    int radau_setup_mem(int n, int sparseLU, int nprocs, int nnz, void **mem_out)
+    int radau_setup_mem(int n, int sparseLU, int nprocs, int nnz, int mljac, int mujac, int maxl, void **mem_out)
     int radau_reinit(void *radau_mem)
     int radau_get_stats(void *radau_mem, int *nfcn, int *njac, int *nsteps, int *naccpt, int *nreject, int *ludecomps, int *lusolves)
+    int radau_get_krylov_stats(void *radau_mem, int *nliters, int *nlcfails, int *njvevals, int *nprecs, int *nprecsetups)
     char *radau_get_err_msg(void *radau_mem)
 
     int radau_set_nmax              (void *radau_mem, int val)
     int radau_set_nmax_newton       (void *radau_mem, int val)
+    int radau_set_warm_start        (void *radau_mem, int val)
 
     int radau_set_step_size_safety  (void *radau_mem, double val)
     int radau_set_theta_jac_recomp  (void *radau_mem, double val)
@@ -49,6 +66,14 @@ cdef extern from "radau5_io.h":
     int radau_set_fac_lower         (void *radau_mem, double val)
     int radau_set_fac_upper         (void *radau_mem, double val)
 
+    int radau_set_step_schedule     (void *radau_mem, double *times, int n)
+
+    int radau_set_lapack(void *radau_mem, FP_LAPACK_getrf dgetrf, FP_LAPACK_getrs dgetrs, FP_LAPACK_getrf zgetrf, FP_LAPACK_getrs zgetrs)
+
+    int radau_set_krylov_tol(void *radau_mem, double val)
+    int radau_set_prec(void *radau_mem, FP_CB_prec_solve prec_solve, FP_CB_prec_setup prec_setup, void *prec_EXT)
+    int radau_set_linsol(void *radau_mem, FP_LS_jac jac, FP_LS_decomr decomr, FP_LS_decomc decomc, FP_LS_solr solr, FP_LS_solc solc, void *EXT)
+
     void radau_free_mem(void **radau_mem)
 
 cdef extern from "radau5.h":
@@ -59,3 +84,32 @@ cdef extern from "radau5.h":
 			 FP_CB_solout, void*, int, int*)
 
     int radau_get_cont_output(void *radau_mem, double x, double *out)
+
+cdef class RadauMemory:
+    cdef void* rmem
+    cdef int n
+    cdef object callbacks
+    cdef bint py_linsol
+
+    cpdef int initialize(self, int n, int superLU, int nprocs, int nnz, int mljac = *, int mujac = *, int maxl = *)
+    cpdef int set_nmax(self, int val)
+    cpdef int set_nmax_newton(self, int val)
+    cpdef int set_warm_start(self, int val)
+    cpdef int set_step_size_safety(self, double val)
+    cpdef int set_theta_jac(self, double val)
+    cpdef int set_fnewt(self, double val)
+    cpdef int set_quot1(self, double val)
+    cpdef int set_quot2(self, double val)
+    cpdef int set_hmax(self, double val)
+    cpdef int set_fac_lower(self, double val)
+    cpdef int set_fac_upper(self, double val)
+    cpdef int set_step_schedule(self, object times)
+    cpdef int set_lapack(self, int val)
+    cpdef int set_krylov_tol(self, double val)
+    cdef int set_linsol(self, FP_LS_jac jac, FP_LS_decomr decomr, FP_LS_decomc decomc, FP_LS_solr solr, FP_LS_solc solc, void *EXT)
+    cpdef str get_err_msg(self)
+    cpdef int reinit(self)
+    cpdef int interpolate(self, double t, np.ndarray output_array)
+    cpdef list get_stats(self)
+    cpdef list get_krylov_stats(self)
+    cpdef void finalize(self)
@@ -25,6 +25,18 @@ import scipy.sparse as sps
 cimport radau5ode # .pxd
 
 from numpy cimport PyArray_DATA
+from assimulo.support cimport LowLevelCallback, c_rhs_t, c_jac_t
+
+IF RADAU5_WITH_LAPACK:
+    #The LAPACK (and BLAS) which SciPy is linked against
+    from scipy.linalg.cython_lapack cimport dgetrf, dgetrs, zgetrf, zgetrs
+
+#Flag if the dense LU decompositions can be done with LAPACK, see RadauMemory.set_lapack
+lapack_available = RADAU5_WITH_LAPACK
+
+cdef struct c_function:
+    void* function
+    void* user_data
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
@@ -43,19 +55,22 @@ cdef void py2c_d_matrix_flat_F(double* dest, object source, int nrow, int ncol)
     """
     Copy (square) 2D numpy array (order = c) to (double *) C matrix (with Fortran-style column major ordering)
     """
-    cdef np.ndarray[double, ndim=2] source_np = np.array(source, copy=False, dtype = np.float64)
-    for i in range(ncol):
-        for j in range(nrow):
-            dest[j + i*nrow] = source_np[j][i]
+    cdef np.ndarray[double, ndim=2, mode="fortran"] source_np = np.asfortranarray(source, dtype = np.float64)
+    memcpy(dest, <double*>PyArray_DATA(source_np), nrow*ncol*sizeof(double))
     
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cdef void c2py_d(np.ndarray[double, ndim=1, mode='c'] dest, double* source, int dim) noexcept:
+cdef void py2c_d_matrix_band_F(double* dest, object source, int n, int ml, int mu) noexcept:
     """
-    Copy (double *) C vector to 1D numpy array
+    Copy the band of a (square) 2D numpy array to (double *) C matrix in band storage (with Fortran-style
+    column major ordering), source[i,j] is stored at row mu+i-j of column j
     """
-    memcpy(PyArray_DATA(dest), source, dim*sizeof(double))
-    
+    cdef double[:, :] source_v = np.asarray(source, dtype = np.float64)
+    cdef int i, j, ld = ml + mu + 1
+    for j in range(n):
+        for i in range(max(0, j - mu), min(n, j + ml + 1)):
+            dest[mu + i - j + j*ld] = source_v[i, j]
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 cdef void py2c_i(int* dest, object source, int dim) noexcept:
@@ -67,25 +82,128 @@ cdef void py2c_i(int* dest, object source, int dim) noexcept:
     assert source.size >= dim, "The dimension of the vector is {} and not equal to the problem dimension {}. Please verify the output vectors from the min/max/nominal/evalute methods in the Problem class.".format(source.size, dim)
     memcpy(dest, <int*>PyArray_DATA(source), dim*sizeof(int))
 
-cdef int callback_fcn(int n, double x, double* y_in, double* y_out, void* fcn_PY) except? -1:
+cdef enum:
+    VIEW_CACHE_SIZE = 8
+
+cdef class ViewCache:
+    """
+    Numpy views over the C buffers passed to the callbacks by radau5.c. The buffers are
+    owned by the Radau memory and only a few distinct ones are used, hence each view is
+    created once and reused as long as the memory is alive.
+    """
+    cdef double* ptrs[VIEW_CACHE_SIZE]
+    cdef list views
+    cdef int nviews, next, nrow, ncol
+
+    def __init__(self, int nrow, int ncol = 1):
+        """
+        nrow, ncol = shape of the views, ncol > 1 gives Fortran-ordered matrices
+        """
+        self.views = [None]*VIEW_CACHE_SIZE
+        self.nviews = 0
+        self.next = 0
+        self.nrow = nrow
+        self.ncol = ncol
+
+    cdef object get(self, double* ptr):
+        cdef int i
+        cdef np.npy_intp dim = self.nrow*self.ncol
+        for i in range(self.nviews):
+            if self.ptrs[i] == ptr:
+                return self.views[i]
+        view = np.PyArray_SimpleNewFromData(1, &dim, np.NPY_DOUBLE, <void*>ptr)
+        if self.ncol > 1:
+            view = view.reshape((self.nrow, self.ncol), order = "F")
+        i = self.next
+        self.next = (self.next + 1) % VIEW_CACHE_SIZE
+        self.nviews = min(self.nviews + 1, VIEW_CACHE_SIZE)
+        self.ptrs[i] = ptr
+        self.views[i] = view
+        return view
+
+cdef class RadauCallbacks:
+    """
+    Python based callback functions together with the work arrays and views handed to them,
+    kept over multiple calls such that a callback call does not allocate any arrays.
+    """
+    cdef object fcn, jac, solout, prec_solve, prec_setup, linsol
+    cdef np.ndarray y, y_sol, werr, fy, r, rc, pattern_indices, pattern_indptr
+    cdef ViewCache fcn_views, jac_views, data_views
+    cdef c_function jac_C
+    cdef int n, mljac, mujac
+
+    def __init__(self, int n, int mljac = -1, int mujac = -1):
+        """
+        n = problem size
+        mljac, mujac = bandwidths of the banded Jacobian, -1 for the dense one
+        """
+        self.n = n
+        self.mljac = mljac
+        self.mujac = mujac
+        self.y = np.empty(n, dtype = np.double)
+        self.y_sol = np.empty(n, dtype = np.double)
+        self.werr = np.empty(n, dtype = np.double)
+        self.fy = np.empty(n, dtype = np.double)
+        self.r = np.empty(n, dtype = np.double)
+        self.rc = np.empty(n, dtype = np.complex128)
+        self.fcn_views = ViewCache(n)
+        self.jac_views = ViewCache(mljac + mujac + 1 if mljac >= 0 else n, n)
+
+    cdef void set_pattern(self, object jac_pattern):
+        indices = np.ascontiguousarray(jac_pattern.indices, dtype = np.intc)
+        if self.data_views is None or self.data_views.nrow != len(indices):
+            self.data_views = ViewCache(len(indices))
+        self.pattern_indices = indices
+        self.pattern_indptr = np.ascontiguousarray(jac_pattern.indptr, dtype = np.intc)
+
+    cdef inline np.ndarray load_y(self, double* y):
+        memcpy(PyArray_DATA(self.y), y, self.n*sizeof(double))
+        return self.y
+
+cdef int callback_fcn(int n, double x, double* y_in, double* y_out, void* cb_PY) except? -1:
     """
     Internal callback function to enable call to Python based rhs function from C
     """
-    cdef np.ndarray[double, ndim=1, mode="c"]y_py_in = np.empty(n, dtype = np.double)
-    c2py_d(y_py_in, y_in, n)
-    rhs, ret = (<object>fcn_PY)(x, y_py_in)
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    rhs, ret = cb.fcn(x, cb.load_y(y_in))
 
     py2c_d(y_out, rhs, len(rhs))
 
     return ret[0] 
 
-cdef int callback_jac(int n, double x, double* y, double* fjac, void* jac_PY) except? -1:
+cdef int callback_fcn_out(int n, double x, double* y_in, double* y_out, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to Python based rhs function from C,
+    the rhs function writes into y_out directly, which is passed as a numpy view
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    _, ret = cb.fcn(x, cb.load_y(y_in), cb.fcn_views.get(y_out))
+
+    return ret[0]
+
+cdef int callback_fcn_c(int n, double x, double* y_in, double* y_out, void* fcn_C) except? -1:
+    """
+    Internal callback function to call a low-level (C) rhs function directly
+    """
+    cdef c_function* fcn = <c_function*>fcn_C
+    cdef int ret = (<c_rhs_t>fcn.function)(x, y_in, y_out, fcn.user_data)
+    return 1 if ret > 0 else (-1 if ret < 0 else RADAU_OK)
+
+cdef int callback_jac_c(int n, double x, double* y, double* fjac, void* jac_C) except? -1:
+    """
+    Internal callback function to call a low-level (C) Jacobian function directly,
+    the (dense) Jacobian is written column-major into fjac
+    """
+    cdef c_function* jac = <c_function*>jac_C
+    cdef int ret = (<c_jac_t>jac.function)(x, y, fjac, jac.user_data)
+    return 1 if ret > 0 else (-1 if ret < 0 else RADAU_OK)
+
+cdef int callback_jac(int n, double x, double* y, double* fjac, void* cb_PY) except? -1:
     """
     Internal callback function to enable call to Python based Jacobian function from C
     """
-    cdef np.ndarray[double, ndim=1, mode="c"]y_py_in = np.empty(n, dtype = np.double)
-    c2py_d(y_py_in, y, n)
-    J, ret = (<object>jac_PY)(x, y_py_in)
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    J, ret = cb.jac(x, cb.load_y(y))
 
     if ret[0]: # non-zero returns from Python; recoverable or non-recoverable
         return ret[0]
@@ -93,26 +211,137 @@ cdef int callback_jac(int n, double x, double* y, double* fjac, void* jac_PY) ex
     py2c_d_matrix_flat_F(fjac, J, J.shape[0], J.shape[1])
     return RADAU_OK
 
+cdef int callback_jac_out(int n, double x, double* y, double* fjac, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to Python based Jacobian function from C,
+    the Jacobian function writes into fjac directly, which is passed as a Fortran-ordered
+    numpy view
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    _, ret = cb.jac(x, cb.load_y(y), cb.jac_views.get(fjac))
+
+    return ret[0]
+
+cdef int callback_jac_band(int n, double x, double* y, double* fjac, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to Python based Jacobian function from C,
+    the band of the (dense) Jacobian is copied into fjac in band storage
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    J, ret = cb.jac(x, cb.load_y(y))
+
+    if ret[0]: # non-zero returns from Python; recoverable or non-recoverable
+        return ret[0]
+
+    py2c_d_matrix_band_F(fjac, J, n, cb.mljac, cb.mujac)
+    return RADAU_OK
+
+cdef int callback_prec_solve(int n, double x, double* y, double* fy, double* r, double* z,
+                             double gamma, double delta, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to Python based preconditioner solve function from C,
+    [ret, z] = prec_solve(x, y, fy, r, gamma, delta) approximately solves (I - gamma*J) z = r
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    memcpy(PyArray_DATA(cb.fy), fy, n*sizeof(double))
+    memcpy(PyArray_DATA(cb.r), r, n*sizeof(double))
+    zres, ret = cb.prec_solve(x, cb.load_y(y), cb.fy, cb.r, gamma, delta)
+
+    if ret[0]: # non-zero returns from Python; recoverable or non-recoverable
+        return ret[0]
+
+    py2c_d(z, zres, n)
+    return RADAU_OK
+
+cdef int callback_prec_setup(int n, double x, double* y, double* fy, int jok, double gamma, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to Python based preconditioner setup function from C
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    memcpy(PyArray_DATA(cb.fy), fy, n*sizeof(double))
+    _, ret = cb.prec_setup(x, cb.load_y(y), cb.fy, jok != 0, gamma)
+
+    return ret[0]
+
+cdef int callback_linsol_jac(int n, double x, double* y, double* fy, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to the Jacobian evaluation of a Python based linear solver from C
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    memcpy(PyArray_DATA(cb.fy), fy, n*sizeof(double))
+    _, ret = cb.linsol[0](x, cb.load_y(y), cb.fy)
+
+    return ret[0]
+
+cdef int callback_linsol_decomr(int n, double fac1, int* ier, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to the real decomposition of a Python based linear solver from C
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    ier[0] = 0
+    _, ret = cb.linsol[1](fac1)
+
+    return ret[0]
+
+cdef int callback_linsol_decomc(int n, double alphn, double betan, int* ier, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to the complex decomposition of a Python based linear solver from C
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    ier[0] = 0
+    _, ret = cb.linsol[2](alphn, betan)
+
+    return ret[0]
+
+cdef int callback_linsol_solr(int n, double* b, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to the real solve of a Python based linear solver from C,
+    b is overwritten with the solution
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    memcpy(PyArray_DATA(cb.r), b, n*sizeof(double))
+    x, ret = cb.linsol[3](cb.r)
+
+    if ret[0]: # non-zero returns from Python; recoverable or non-recoverable
+        return ret[0]
+
+    py2c_d(b, x, n)
+    return RADAU_OK
+
+cdef int callback_linsol_solc(int n, double* br, double* bi, void* cb_PY) except? -1:
+    """
+    Internal callback function to enable call to the complex solve of a Python based linear solver from C,
+    br + i*bi is overwritten with the solution
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    cb.rc.real = <double[:n]>br
+    cb.rc.imag = <double[:n]>bi
+    x, ret = cb.linsol[4](cb.rc)
+
+    if ret[0]: # non-zero returns from Python; recoverable or non-recoverable
+        return ret[0]
+
+    py2c_d(br, np.real(x), n)
+    py2c_d(bi, np.imag(x), n)
+    return RADAU_OK
+
 cdef int callback_solout(int nrsol, double xosol, double *xsol, double* y,
-                         double* werr, int n, void* solout_PY) except? -1:
+                         double* werr, int n, void* cb_PY) except? -1:
     """
     Internal callback function to enable call to Python based solution output function from C
     """
-    cdef np.ndarray[double, ndim=1, mode="c"]y_py = np.empty(n, dtype = np.double)
-    cdef np.ndarray[double, ndim=1, mode="c"]werr_py = np.empty(n, dtype = np.double)
-    c2py_d(y_py, y, n)
-    c2py_d(werr_py, werr, n)
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    memcpy(PyArray_DATA(cb.y_sol), y, n*sizeof(double))
+    memcpy(PyArray_DATA(cb.werr), werr, n*sizeof(double))
 
-    return (<object>solout_PY)(nrsol, xosol, xsol[0], y_py, werr_py)
+    return cb.solout(nrsol, xosol, xsol[0], cb.y_sol, cb.werr)
 
 cdef int callback_jac_sparse(int n, double x, double *y, int *nnz,
                              double *data, int *indices, int *indptr,
-                             void* jac_PY) except? -1:
+                             void* cb_PY) except? -1:
     """Internal callback function to enable call to Python based evaluation of sparse (csc) jacobians."""
-    cdef np.ndarray[double, ndim=1, mode="c"]y_py = np.empty(n, dtype = np.double)
-    c2py_d(y_py, y, n)
-
-    J, ret = (<object>jac_PY)(x, y_py)
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    J, ret = cb.jac(x, cb.load_y(y))
 
     if ret[0]: # non-zero returns from Python; recoverable or non-recoverable
         return ret[0]
@@ -123,31 +352,76 @@ cdef int callback_jac_sparse(int n, double x, double *y, int *nnz,
     if J.nnz > nnz[0]:
         return RADAU_ERROR_CALLBACK_INVALID_NNZ - J.nnz
 
-    cdef np.ndarray[double, mode="c", ndim=1] jac_data_py = J.data.astype(np.double)
-    cdef np.ndarray[int, mode="c", ndim=1] jac_indices_py = J.indices.astype(np.intc)
-    cdef np.ndarray[int, mode="c", ndim=1] jac_indptr_py = J.indptr.astype(np.intc)
-
     ## copy data to output structures
     nnz[0] = J.nnz
-    py2c_d(data, jac_data_py, nnz[0])
-    py2c_i(indices, jac_indices_py, nnz[0])
-    py2c_i(indptr, jac_indptr_py, n + 1)
+    py2c_d(data, J.data, nnz[0])
+    py2c_i(indices, J.indices, nnz[0])
+    py2c_i(indptr, J.indptr, n + 1)
+    return RADAU_OK
+
+cdef int callback_jac_sparse_pattern(int n, double x, double *y, int *nnz,
+                                     double *data, int *indices, int *indptr,
+                                     void* cb_PY) except? -1:
+    """
+    Internal callback function for sparse (csc) jacobians with a fixed sparsity pattern,
+    the Python based function only writes the values into data, which is passed as a numpy view.
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    cdef int pattern_nnz = cb.data_views.nrow
+
+    if pattern_nnz > nnz[0]:
+        return RADAU_ERROR_CALLBACK_INVALID_NNZ - pattern_nnz
+
+    _, ret = cb.jac(x, cb.load_y(y), cb.data_views.get(data))
+
+    if ret[0]: # non-zero returns from Python; recoverable or non-recoverable
+        return ret[0]
+
+    ## copy the structure to output structures
+    nnz[0] = pattern_nnz
+    memcpy(indices, PyArray_DATA(cb.pattern_indices), pattern_nnz*sizeof(int))
+    memcpy(indptr, PyArray_DATA(cb.pattern_indptr), (n + 1)*sizeof(int))
+    return RADAU_OK
+
+cdef int callback_jac_sparse_pattern_c(int n, double x, double *y, int *nnz,
+                                       double *data, int *indices, int *indptr,
+                                       void* cb_PY) except? -1:
+    """
+    Internal callback function to call a low-level (C) Jacobian function with a fixed
+    sparsity pattern directly, the values of the pattern are written into data
+    """
+    cdef RadauCallbacks cb = <RadauCallbacks>cb_PY
+    cdef int pattern_nnz = cb.data_views.nrow
+    cdef int ret
+
+    if pattern_nnz > nnz[0]:
+        return RADAU_ERROR_CALLBACK_INVALID_NNZ - pattern_nnz
+
+    ret = (<c_jac_t>cb.jac_C.function)(x, y, data, cb.jac_C.user_data)
+    if ret:
+        return 1 if ret > 0 else -1
+
+    nnz[0] = pattern_nnz
+    memcpy(indices, PyArray_DATA(cb.pattern_indices), pattern_nnz*sizeof(int))
+    memcpy(indptr, PyArray_DATA(cb.pattern_indptr), (n + 1)*sizeof(int))
     return RADAU_OK
 
 cdef class RadauMemory:
     """Auxiliary data structure required to have C structs persists over multiple integrate calls."""
-    cdef void* rmem
-    cdef int n
 
-    cpdef int initialize(self, int n, int superLU, int nprocs, int nnz):
+    cpdef int initialize(self, int n, int superLU, int nprocs, int nnz, int mljac = -1, int mujac = -1, int maxl = 0):
         """
         n = problem size
         superLU = 0 || 1, flag if using superLU
         nprocs = number of processors/threads in superLU
         nnz = number of non-zero elements with sparse LU
+        mljac, mujac = lower and upper bandwidth of the Jacobian with banded LU, -1 otherwise
+        maxl = maximal dimension of the Krylov subspace with the matrix-free Krylov solver, 0 otherwise
         """
         self.n = n
-        return radau5ode.radau_setup_mem(n, superLU, nprocs, nnz, &self.rmem)
+        self.callbacks = RadauCallbacks(n, mljac, mujac)
+        self.py_linsol = False
+        return radau5ode.radau_setup_mem(n, superLU, nprocs, nnz, mljac, mujac, maxl, &self.rmem)
 
     cpdef int set_nmax(self, int val):
         """ Set maximum number of steps."""
@@ -157,6 +431,10 @@ cdef class RadauMemory:
         """ Set maximum number of newton steps."""
         return radau5ode.radau_set_nmax_newton(self.rmem, val)
 
+    cpdef int set_warm_start(self, int val):
+        """ Set switch for keeping the Jacobian over reinit calls."""
+        return radau5ode.radau_set_warm_start(self.rmem, val)
+
     cpdef int set_step_size_safety(self, double val):
         """ Set stepsize safety factor."""
         return radau5ode.radau_set_step_size_safety(self.rmem, val)
@@ -189,6 +467,32 @@ cdef class RadauMemory:
         """ Set maximal factor for stepsize increases."""
         return radau5ode.radau_set_fac_upper(self.rmem, val)
 
+    cpdef int set_step_schedule(self, object times):
+        """ Set time-points at which the steps are to end, None restores the stepsize control."""
+        if times is None:
+            return radau5ode.radau_set_step_schedule(self.rmem, NULL, 0)
+        cdef np.ndarray[double, ndim=1, mode="c"] times_c = np.ascontiguousarray(times, dtype = np.double)
+        return radau5ode.radau_set_step_schedule(self.rmem, <double*>PyArray_DATA(times_c), len(times_c))
+
+    cpdef int set_lapack(self, int val):
+        """ Set switch for the dense LU decompositions with LAPACK (?getrf/?getrs), 0 uses the built-in routines."""
+        IF RADAU5_WITH_LAPACK:
+            if val:
+                return radau5ode.radau_set_lapack(self.rmem, <radau5ode.FP_LAPACK_getrf>dgetrf, <radau5ode.FP_LAPACK_getrs>dgetrs,
+                                                  <radau5ode.FP_LAPACK_getrf>zgetrf, <radau5ode.FP_LAPACK_getrs>zgetrs)
+        return radau5ode.radau_set_lapack(self.rmem, NULL, NULL, NULL, NULL)
+
+    cpdef int set_krylov_tol(self, double val):
+        """ Set factor on the Newton tolerance for the linear residuals of the Krylov solver."""
+        return radau5ode.radau_set_krylov_tol(self.rmem, val)
+
+    cdef int set_linsol(self, radau5ode.FP_LS_jac jac, radau5ode.FP_LS_decomr decomr, radau5ode.FP_LS_decomc decomc,
+                        radau5ode.FP_LS_solr solr, radau5ode.FP_LS_solc solc, void* EXT):
+        """ Set a linear solver implemented in C, see radau_set_linsol in radau5_io.h. It is kept over
+            the calls of radau5_py_solve, unless a Python based linear solver is given there."""
+        self.py_linsol = False
+        return radau5ode.radau_set_linsol(self.rmem, jac, decomr, decomc, solr, solc, EXT)
+
     cpdef str get_err_msg(self):
         cdef char* ret = radau5ode.radau_get_err_msg(self.rmem)
         return ret.decode('UTF-8')
@@ -208,14 +512,24 @@ cdef class RadauMemory:
         radau5ode.radau_get_stats(self.rmem, &nfcn, &njac, &nsteps, &naccpt, &nreject, &ludecomps, &lusolves)
         return [nfcn, njac, nsteps, naccpt, nreject, ludecomps, lusolves]
 
+    cpdef list get_krylov_stats(self):
+        """ Return runtime stats of the Krylov solver logged in Radau5."""
+        cdef int nliters = 0, nlcfails = 0, njvevals = 0, nprecs = 0, nprecsetups = 0
+        radau5ode.radau_get_krylov_stats(self.rmem, &nliters, &nlcfails, &njvevals, &nprecs, &nprecsetups)
+        return [nliters, nlcfails, njvevals, nprecs, nprecsetups]
+
     cpdef void finalize(self):
         """ Free all internal memory."""
         radau_free_mem(&self.rmem)
 
+    def __dealloc__(self):
+        radau_free_mem(&self.rmem)
+
 cpdef radau5_py_solve(fcn_PY, double x, np.ndarray y,
                       double xend, double h__, np.ndarray rtol, np.ndarray atol,
                       jac_PY, int ijac, solout_PY,
-                      int iout, RadauMemory rad_memory):
+                      int iout, RadauMemory rad_memory, int fcn_out = 0, int jac_out = 0,
+                      jac_pattern = None, prec_solve_PY = None, prec_setup_PY = None, linsol_PY = None):
     """
     Python interface for calling the C based Radau solver
 
@@ -224,6 +538,7 @@ cpdef radau5_py_solve(fcn_PY, double x, np.ndarray y,
             fcn_PY
                         - Right-hand side function [ret, ydot] = f(x, y), where 'x' is time.
                           ret: 0 = OK, > 0 non-recoverable exception, < 0, recoverable
+                          A bound LowLevelCallback is called directly from C.
             x
                         - Start time
             y
@@ -239,6 +554,8 @@ cpdef radau5_py_solve(fcn_PY, double x, np.ndarray y,
             jac_PY
                         - Jacobian function [ret, J] = jac(x, y), where 'x' is time
                           ret: 0 = OK, > 0 non-recoverable exception, < 0, recoverable
+                          A bound LowLevelCallback is called directly from C (dense, or sparse
+                          with the pattern given by jac_pattern).
             ijac
                         - Switch for Jacobian computation:
                           ijac == 0: C based finite differences
@@ -258,6 +575,34 @@ cpdef radau5_py_solve(fcn_PY, double x, np.ndarray y,
                           iout == 1: solout_PY is called after each successful time-integration step
             rad_memory
                         - instance of RadauMemory, needs to be initialized via RadauMemory.initialize
+            fcn_out
+                        - Switch for in-place evaluation of the right-hand side:
+                          fcn_out == 1: fcn_PY is called as [ret, ydot] = f(x, y, out), writing
+                                        ydot into 'out', a view of the internal buffer
+            jac_out
+                        - Switch for in-place evaluation of the (dense or banded) Jacobian:
+                          jac_out == 1: jac_PY is called as [ret, J] = jac(x, y, out), writing
+                                        J into 'out', a Fortran-ordered view of the internal buffer.
+                                        With banded LU, 'out' has the shape (mljac+mujac+1, n) and
+                                        J[i,j] is stored at out[mujac+i-j, j]
+            jac_pattern
+                        - Fixed sparsity pattern (scipy.sparse.csc_matrix) of the sparse Jacobian.
+                          If given, jac_PY is called as [ret, data] = jac(x, y, out), writing only
+                          the values of the pattern into 'out', a view of the internal buffer
+            prec_solve_PY
+                        - Preconditioner of the Krylov solver [ret, z] = prec_solve(x, y, fy, r, gamma, delta),
+                          approximately solving (I - gamma*J) z = r, with J the Jacobian at (x, y) and
+                          fy = f(x, y). None = no preconditioning
+            prec_setup_PY
+                        - Preconditioner setup of the Krylov solver [ret, _] = prec_setup(x, y, fy, jok, gamma),
+                          jok is False if the point (x, y) has changed since the last call. None = no setup
+            linsol_PY
+                        - User-provided linear solver replacing the built-in one, requires ijac == 0. A sequence
+                          of the functions [ret, _] = jac(x, y, fy), [ret, _] = factor_real(fac1),
+                          [ret, _] = factor_complex(alpha, beta), [ret, x] = solve_real(b) and
+                          [ret, x] = solve_complex(b), for the matrices E1 = fac1*I - J and
+                          E2 = (alpha + i*beta)*I - J, with J the Jacobian at (x, y) and fy = f(x, y).
+                          None = built-in linear solver
         Returns::
             
             x
@@ -274,8 +619,56 @@ cpdef radau5_py_solve(fcn_PY, double x, np.ndarray y,
     cdef np.ndarray[double, mode="c", ndim=1] rtol_vec = rtol
     cdef np.ndarray[double, mode="c", ndim=1] atol_vec = atol
 
-    ret = radau5ode.radau5_solve(rad_memory.rmem, callback_fcn, <void*>fcn_PY, &x, &y_vec[0], &xend,
-                        &h__, &rtol_vec[0], &atol_vec[0], callback_jac, callback_jac_sparse, <void*> jac_PY,
-                        ijac, callback_solout, <void*>solout_PY, iout, &idid)
+    cdef radau5ode.FP_CB_f fcn = callback_fcn
+    cdef radau5ode.FP_CB_jac jac = callback_jac
+    cdef radau5ode.FP_CB_jac_sparse jac_sparse = callback_jac_sparse
+    cdef radau5ode.FP_CB_prec_solve prec_solve = NULL
+    cdef radau5ode.FP_CB_prec_setup prec_setup = NULL
+    cdef RadauCallbacks cb = rad_memory.callbacks
+    cdef void* fcn_EXT = <void*>cb
+    cdef void* jac_EXT = <void*>cb
+    cdef c_function fcn_C, jac_C
+
+    cb.fcn, cb.jac, cb.solout = fcn_PY, jac_PY, solout_PY
+    cb.prec_solve, cb.prec_setup = prec_solve_PY, prec_setup_PY
+    if prec_solve_PY is not None:
+        prec_solve = callback_prec_solve
+    if prec_setup_PY is not None:
+        prec_setup = callback_prec_setup
+    radau5ode.radau_set_prec(rad_memory.rmem, prec_solve, prec_setup, <void*>cb)
+    cb.linsol = linsol_PY
+    if linsol_PY is not None:
+        radau5ode.radau_set_linsol(rad_memory.rmem, callback_linsol_jac, callback_linsol_decomr, callback_linsol_decomc,
+                                   callback_linsol_solr, callback_linsol_solc, <void*>cb)
+        rad_memory.py_linsol = True
+    elif rad_memory.py_linsol: #Restore the built-in linear solver, one set with RadauMemory.set_linsol is kept
+        radau5ode.radau_set_linsol(rad_memory.rmem, NULL, NULL, NULL, NULL, NULL, NULL)
+        rad_memory.py_linsol = False
+    if fcn_out:
+        fcn = callback_fcn_out
+    if jac_out:
+        jac = callback_jac_out
+    elif cb.mljac >= 0:
+        jac = callback_jac_band
+    if jac_pattern is not None:
+        cb.set_pattern(jac_pattern)
+        jac_sparse = callback_jac_sparse_pattern
+    #Low-level callbacks are called without going through Python
+    if isinstance(fcn_PY, LowLevelCallback):
+        fcn_C.function = (<LowLevelCallback>fcn_PY).function
+        fcn_C.user_data = (<LowLevelCallback>fcn_PY).user_data
+        fcn, fcn_EXT = callback_fcn_c, &fcn_C
+    if isinstance(jac_PY, LowLevelCallback) and jac_pattern is not None:
+        cb.jac_C.function = (<LowLevelCallback>jac_PY).function
+        cb.jac_C.user_data = (<LowLevelCallback>jac_PY).user_data
+        jac_sparse = callback_jac_sparse_pattern_c
+    elif isinstance(jac_PY, LowLevelCallback) and cb.mljac < 0:
+        jac_C.function = (<LowLevelCallback>jac_PY).function
+        jac_C.user_data = (<LowLevelCallback>jac_PY).user_data
+        jac, jac_EXT = callback_jac_c, &jac_C
+
+    ret = radau5ode.radau5_solve(rad_memory.rmem, fcn, fcn_EXT, &x, &y_vec[0], &xend,
+                        &h__, &rtol_vec[0], &atol_vec[0], jac, jac_sparse, jac_EXT,
+                        ijac, callback_solout, <void*>cb, iout, &idid)
 
     return x, y, ret
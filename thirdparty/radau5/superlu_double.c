@@ -1,5 +1,6 @@
 #include "slu_mt_ddefs.h"
 #include "superlu_double.h"
+#include "superlu_util.h"
 
 struct SuperLU_aux_d{
     int nprocs, n, nnz_jac;
@@ -7,6 +8,7 @@ struct SuperLU_aux_d{
 
     double *data_sys;
     int *indices_sys, *indptr_sys;
+    int *indices_ord, *indptr_ord; /* sparsity pattern of the last column ordering (perm_c) */
 
     int panel_size, relax; /* System specific tuning parameters */
     fact_t fact; /* if factorized matrix is being supplied, if not: how to factorize */
@@ -77,6 +79,12 @@ SuperLU_aux_d* superlu_init_d(int nprocs, int n, int nnz){
     if (!slu_aux->perm_r) {SUPERLU_ABORT("Malloc failed for double perm_r[].");}
     if (!slu_aux->perm_c) {SUPERLU_ABORT("Malloc failed for double perm_c[].");}
 
+    slu_aux->indptr_ord = intMalloc(slu_aux->n + 1);
+    slu_aux->indices_ord = intMalloc(min(slu_aux->nnz_jac + slu_aux->n, n*n));
+
+    if (!slu_aux->indptr_ord)  {SUPERLU_ABORT("Malloc failed for double indptr_ord[].");}
+    if (!slu_aux->indices_ord) {SUPERLU_ABORT("Malloc failed for double indices_ord[].");}
+
     dCreate_Dense_Matrix(slu_aux->B, slu_aux->n, 1, NULL, slu_aux->n, SLU_DN, SLU_D, SLU_GE);
 
     /* allocate memory for storing matrix of linear system */
@@ -119,8 +127,15 @@ int superlu_setup_d(SuperLU_aux_d *slu_aux, double scale,
                            SLU_NC, SLU_D, SLU_GE);
 
     if (fresh_jacobian){
-        get_perm_c(3, slu_aux->A, slu_aux->perm_c); /* 3 = approximate minimum degree for unsymmetrical matrices */
-        slu_aux->refact = NO; /* new jacobian, do new factorization */
+        /* the column ordering and elimination tree only depend on the sparsity pattern, */
+        /* a new jacobian with the same pattern is re-factorized with them, with new row pivoting */
+        if (slu_aux->fact_done && sparse_csc_same_pattern(slu_aux->n, indptr_J, indices_J, slu_aux->indptr_ord, slu_aux->indices_ord)){
+            slu_aux->refact = YES;
+        }else{
+            get_perm_c(3, slu_aux->A, slu_aux->perm_c); /* 3 = approximate minimum degree for unsymmetrical matrices */
+            sparse_csc_copy_pattern(slu_aux->n, indptr_J, indices_J, slu_aux->indptr_ord, slu_aux->indices_ord);
+            slu_aux->refact = NO; /* new jacobian structure, do new factorization */
+        }
     }else{
         slu_aux->refact = YES; /* same jacobian structure, re-factorization  */
     }
@@ -184,6 +199,8 @@ void superlu_finalize_d(SuperLU_aux_d *slu_aux){
     }
     SUPERLU_FREE(slu_aux->perm_r);
     SUPERLU_FREE(slu_aux->perm_c);
+    SUPERLU_FREE(slu_aux->indptr_ord);
+    SUPERLU_FREE(slu_aux->indices_ord);
 
     Destroy_SuperMatrix_Store(slu_aux->B);
     StatFree(slu_aux->Gstat);
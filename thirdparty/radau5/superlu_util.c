@@ -86,3 +86,30 @@ int sparse_csc_add_diagonal(int n, int* nnz, double* jac_data, int* jac_indices,
     free(jac_indptr_original);
     return 0;
 }
+
+int sparse_csc_same_pattern(int n, int* indptr_a, int* indices_a, int* indptr_b, int* indices_b){
+    /* Returns 1 if the two sparse (CSC) matrices have the same sparsity pattern, else 0. */
+    int i;
+    for(i = 0; i < n + 1; i++){
+        if (indptr_a[i] != indptr_b[i]){
+            return 0;
+        }
+    }
+    for(i = 0; i < indptr_a[n]; i++){
+        if (indices_a[i] != indices_b[i]){
+            return 0;
+        }
+    }
+    return 1;
+}
+
+void sparse_csc_copy_pattern(int n, int* indptr_src, int* indices_src, int* indptr_dst, int* indices_dst){
+    /* Copies the sparsity pattern of a sparse (CSC) matrix. */
+    int i;
+    for(i = 0; i < n + 1; i++){
+        indptr_dst[i] = indptr_src[i];
+    }
+    for(i = 0; i < indptr_src[n]; i++){
+        indices_dst[i] = indices_src[i];
+    }
+}
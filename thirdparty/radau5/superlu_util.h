@@ -6,5 +6,7 @@
 #define MALLOC_FAILURE -1
 
 int sparse_csc_add_diagonal(int, int *, double *, int *, int *);
+int sparse_csc_same_pattern(int, int *, int *, int *, int *);
+void sparse_csc_copy_pattern(int, int *, int *, int *, int *);
 
 #endif